@@ -79,7 +79,7 @@ CREATE TABLE estudiantes (
     activo BOOLEAN DEFAULT TRUE,
     fecha_registro TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
     
-    CONSTRAINT uk_estudiante_ci UNIQUE (ci_numero),
+    CONSTRAINT uk_estudiante_ci_expedicion UNIQUE (ci_numero, ci_expedicion),
     CONSTRAINT ck_email_valido CHECK (email IS NULL OR email ~* '^[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Za-z]{2,}$')
 );
 
@@ -102,7 +102,7 @@ CREATE TABLE docentes (
     activo BOOLEAN DEFAULT TRUE,
     fecha_registro TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
     
-    CONSTRAINT uk_docente_ci UNIQUE (ci_numero),
+    CONSTRAINT uk_docente_ci_expedicion UNIQUE (ci_numero, ci_expedicion),
     CONSTRAINT ck_email_docente_valido CHECK (email IS NULL OR email ~* '^[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Za-z]{2,}$'),
     CONSTRAINT ck_honorario_positivo CHECK (honorario_hora >= 0)
 );
@@ -179,7 +179,12 @@ CREATE TABLE inscripciones (
     fecha_inscripcion DATE DEFAULT CURRENT_DATE,
     estado d_estado_academico DEFAULT 'PREINSCRITO',
     descuento_aplicado DECIMAL(10,2) DEFAULT 0,
+    valor_final NUMERIC(10,2) DEFAULT 0,
     observaciones TEXT,
+    -- Mantenidos por triggers sobre transacciones (ver 6.5)
+    total_pagado NUMERIC(12,2) NOT NULL DEFAULT 0,
+    saldo_pendiente NUMERIC(12,2) NOT NULL DEFAULT 0,
+    ultimo_pago DATE,
     created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
     
     CONSTRAINT fk_inscripcion_estudiante 
@@ -365,22 +370,154 @@ CREATE TABLE configuraciones (
     updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
 );
 
+-- 4.14 CONTADORES DE NUMERACIÓN DE TRANSACCIONES (uno por año)
+CREATE TABLE contadores_transaccion (
+    anio INTEGER PRIMARY KEY,
+    ultimo_numero INTEGER NOT NULL DEFAULT 0,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    
+    CONSTRAINT ck_ultimo_numero_positivo CHECK (ultimo_numero >= 0)
+);
+
+-- 4.15 RESUMEN DIARIO DE CAJA (acumulados por día y forma de pago)
+CREATE TABLE caja_resumen_diario (
+    fecha DATE NOT NULL,
+    forma_pago d_forma_pago NOT NULL,
+    ingresos DECIMAL(12,2) NOT NULL DEFAULT 0,
+    egresos DECIMAL(12,2) NOT NULL DEFAULT 0,
+    cantidad_ingresos INTEGER NOT NULL DEFAULT 0,
+    cantidad_egresos INTEGER NOT NULL DEFAULT 0,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+
+    CONSTRAINT pk_caja_resumen_diario PRIMARY KEY (fecha, forma_pago)
+);
+
+-- 4.16 CIERRES DE CAJA (totales congelados al cerrar el día)
+CREATE TABLE cierres_caja (
+    fecha DATE PRIMARY KEY,
+    total_ingresos DECIMAL(12,2) NOT NULL,
+    total_egresos DECIMAL(12,2) NOT NULL,
+    saldo_anterior DECIMAL(14,2) NOT NULL,
+    saldo_final DECIMAL(14,2) NOT NULL,
+    cantidad_movimientos INTEGER NOT NULL,
+    detalle_formas_pago JSONB NOT NULL DEFAULT '[]',
+    cerrado_por INTEGER NOT NULL,
+    cerrado_en TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    observaciones TEXT,
+
+    CONSTRAINT fk_cierre_caja_usuario
+        FOREIGN KEY (cerrado_por)
+        REFERENCES usuarios(id)
+        ON DELETE RESTRICT
+);
+
+-- 4.17 OPERACIONES APLICADAS (claves de idempotencia del diario local de pagos)
+CREATE TABLE operaciones_aplicadas (
+    clave_idempotencia UUID PRIMARY KEY,
+    transaccion_id INTEGER NOT NULL,
+    tipo VARCHAR(30) NOT NULL,
+    aplicado_en TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+
+    CONSTRAINT fk_operacion_transaccion
+        FOREIGN KEY (transaccion_id)
+        REFERENCES transacciones(id)
+        ON DELETE CASCADE
+);
+
+-- 4.18 CUOTAS DE INSCRIPCIÓN (cronograma materializado, ver 6.6)
+CREATE TABLE cuotas_inscripcion (
+    id SERIAL PRIMARY KEY,
+    inscripcion_id INTEGER NOT NULL,
+    numero_cuota INTEGER NOT NULL,
+    concepto VARCHAR(100) NOT NULL,
+    fecha_vencimiento DATE NOT NULL,
+    monto NUMERIC(12,2) NOT NULL,
+    monto_pagado NUMERIC(12,2) NOT NULL DEFAULT 0,
+    saldo NUMERIC(12,2) GENERATED ALWAYS AS (monto - monto_pagado) STORED,
+
+    CONSTRAINT fk_cuota_inscripcion
+        FOREIGN KEY (inscripcion_id)
+        REFERENCES inscripciones(id)
+        ON DELETE CASCADE,
+
+    CONSTRAINT uk_cuota_inscripcion UNIQUE (inscripcion_id, numero_cuota),
+    CONSTRAINT ck_cuota_montos CHECK (monto >= 0 AND monto_pagado >= 0 AND monto_pagado <= monto)
+);
+
+-- 4.19 ARCHIVO HISTÓRICO (programas cerrados hace años y su historial financiero, ver 9.8)
+-- Mismas columnas e IDs que las tablas de trabajo, más archivado_en
+CREATE TABLE programas_archivo (
+    LIKE programas INCLUDING CONSTRAINTS,
+    archivado_en TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (id)
+);
+
+CREATE TABLE inscripciones_archivo (
+    LIKE inscripciones INCLUDING CONSTRAINTS,
+    archivado_en TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (id)
+);
+
+CREATE TABLE cuotas_inscripcion_archivo (
+    LIKE cuotas_inscripcion INCLUDING CONSTRAINTS,
+    archivado_en TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (id)
+);
+
+CREATE TABLE transacciones_archivo (
+    LIKE transacciones INCLUDING CONSTRAINTS,
+    archivado_en TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (id)
+);
+
+CREATE TABLE detalles_transaccion_archivo (
+    LIKE detalles_transaccion INCLUDING CONSTRAINTS,
+    archivado_en TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (id)
+);
+
+CREATE TABLE documentos_respaldo_archivo (
+    LIKE documentos_respaldo INCLUDING CONSTRAINTS,
+    archivado_en TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (id)
+);
+
 -- 5. ÍNDICES PARA OPTIMIZACIÓN
 CREATE INDEX idx_estudiantes_ci ON estudiantes(ci_numero);
 CREATE INDEX idx_estudiantes_nombre ON estudiantes(nombres, apellido_paterno);
+CREATE INDEX idx_estudiantes_activos_orden ON estudiantes(apellido_paterno, nombres, id) WHERE activo = TRUE;
 CREATE INDEX idx_docentes_ci ON docentes(ci_numero);
+CREATE UNIQUE INDEX ux_estudiantes_ci_norm ON estudiantes(UPPER(BTRIM(ci_numero)), ci_expedicion);
+CREATE UNIQUE INDEX ux_estudiantes_email_lower ON estudiantes(LOWER(BTRIM(email))) WHERE email IS NOT NULL;
+CREATE UNIQUE INDEX ux_docentes_ci_norm ON docentes(UPPER(BTRIM(ci_numero)), ci_expedicion);
+CREATE UNIQUE INDEX ux_docentes_email_lower ON docentes(LOWER(BTRIM(email))) WHERE email IS NOT NULL;
 CREATE INDEX idx_programas_codigo ON programas(codigo);
 CREATE INDEX idx_programas_estado ON programas(estado);
 CREATE INDEX idx_transacciones_numero ON transacciones(numero_transaccion);
 CREATE INDEX idx_transacciones_fecha ON transacciones(fecha_pago DESC);
 CREATE INDEX idx_transacciones_estudiante ON transacciones(estudiante_id);
 CREATE INDEX idx_transacciones_programa ON transacciones(programa_id);
+CREATE INDEX idx_transacciones_comprobante ON transacciones(numero_comprobante) WHERE numero_comprobante IS NOT NULL;
+CREATE INDEX idx_transacciones_inscripcion_confirmadas ON transacciones(estudiante_id, programa_id) INCLUDE (monto_final, fecha_pago) WHERE estado = 'CONFIRMADO';
 CREATE INDEX idx_detalles_transaccion ON detalles_transaccion(transaccion_id);
+CREATE INDEX idx_operaciones_aplicadas_transaccion ON operaciones_aplicadas(transaccion_id);
 CREATE INDEX idx_inscripciones_estudiante ON inscripciones(estudiante_id);
 CREATE INDEX idx_inscripciones_programa ON inscripciones(programa_id);
+CREATE INDEX idx_inscripciones_fecha ON inscripciones(fecha_inscripcion);
+CREATE INDEX idx_inscripciones_programa_estudiante_vigentes ON inscripciones(programa_id, estudiante_id) WHERE estado <> 'RETIRADO';
+CREATE INDEX idx_cuotas_inscripcion_pendientes ON cuotas_inscripcion(fecha_vencimiento) INCLUDE (inscripcion_id, saldo) WHERE monto_pagado < monto;
 CREATE INDEX idx_movimientos_caja_fecha ON movimientos_caja(fecha DESC);
 CREATE INDEX idx_facturas_numero ON facturas(numero_factura);
 CREATE INDEX idx_facturas_fecha ON facturas(fecha_emision DESC);
+CREATE INDEX idx_programas_archivo_codigo ON programas_archivo(codigo);
+CREATE INDEX idx_inscripciones_archivo_estudiante ON inscripciones_archivo(estudiante_id);
+CREATE INDEX idx_inscripciones_archivo_programa ON inscripciones_archivo(programa_id);
+CREATE INDEX idx_cuotas_inscripcion_archivo ON cuotas_inscripcion_archivo(inscripcion_id);
+CREATE INDEX idx_transacciones_archivo_numero ON transacciones_archivo(numero_transaccion);
+CREATE INDEX idx_transacciones_archivo_estudiante_programa ON transacciones_archivo(estudiante_id, programa_id);
+CREATE INDEX idx_transacciones_archivo_programa ON transacciones_archivo(programa_id);
+CREATE INDEX idx_detalles_transaccion_archivo ON detalles_transaccion_archivo(transaccion_id);
+CREATE INDEX idx_documentos_respaldo_archivo ON documentos_respaldo_archivo(transaccion_id);
 
 -- 6. FUNCIONES Y TRIGGERS
 
@@ -396,11 +533,14 @@ BEGIN
     -- Formato: T-YYYY-000001
     SELECT TO_CHAR(CURRENT_DATE, 'YYYY') INTO anio;
     
-    -- Obtener último consecutivo del año
-    SELECT COALESCE(MAX(SUBSTRING(numero_transaccion FROM '^T-\d{4}-(\d+)$')::INTEGER), 0) + 1
-    INTO consecutivo
-    FROM transacciones
-    WHERE numero_transaccion LIKE 'T-' || anio || '-%';
+    -- Incrementar el contador del año de forma atómica (el bloqueo de fila
+    -- serializa a los cajeros concurrentes sin recorrer transacciones)
+    INSERT INTO contadores_transaccion (anio, ultimo_numero)
+    VALUES (anio::INTEGER, 1)
+    ON CONFLICT ON CONSTRAINT contadores_transaccion_pkey DO UPDATE
+        SET ultimo_numero = contadores_transaccion.ultimo_numero + 1,
+            updated_at = CURRENT_TIMESTAMP
+    RETURNING ultimo_numero INTO consecutivo;
     
     nuevo_numero := 'T-' || anio || '-' || LPAD(consecutivo::TEXT, 6, '0');
     
@@ -416,41 +556,84 @@ CREATE TRIGGER tr_generar_numero_transaccion
     WHEN (NEW.numero_transaccion IS NULL)
     EXECUTE FUNCTION fn_generar_numero_transaccion();
 
--- 6.2 Función para actualizar monto total de transacción desde detalles
+-- 6.2 Funciones para actualizar monto total de transacción desde detalles
+CREATE OR REPLACE FUNCTION fn_recalcular_montos_transacciones(p_transaccion_ids INTEGER[])
+RETURNS VOID AS $$
+BEGIN
+    -- Un único UPDATE para todas las transacciones afectadas
+    UPDATE transacciones t
+    SET monto_total = s.total,
+        monto_final = s.total - COALESCE(t.descuento_total, 0)
+    FROM (
+        SELECT ids.id AS transaccion_id, COALESCE(SUM(d.subtotal), 0) AS total
+        FROM UNNEST(p_transaccion_ids) AS ids(id)
+        LEFT JOIN detalles_transaccion d ON d.transaccion_id = ids.id
+        GROUP BY ids.id
+    ) s
+    WHERE t.id = s.transaccion_id;
+END;
+$$ LANGUAGE plpgsql;
+
 CREATE OR REPLACE FUNCTION fn_actualizar_monto_transaccion()
 RETURNS TRIGGER AS $$
 DECLARE
-    total_transaccion DECIMAL(10,2);
+    v_transaccion_ids INTEGER[];
 BEGIN
-    IF TG_OP = 'INSERT' OR TG_OP = 'UPDATE' OR TG_OP = 'DELETE' THEN
-        -- Calcular nuevo total
-        SELECT COALESCE(SUM(subtotal), 0)
-        INTO total_transaccion
-        FROM detalles_transaccion
-        WHERE transaccion_id = COALESCE(NEW.transaccion_id, OLD.transaccion_id);
-        
-        -- Actualizar transacción
-        UPDATE transacciones
-        SET monto_total = total_transaccion,
-            monto_final = total_transaccion - COALESCE(descuento_total, 0)
-        WHERE id = COALESCE(NEW.transaccion_id, OLD.transaccion_id);
+    -- Trigger por sentencia: recalcula cada transacción afectada una sola vez
+    -- usando las tablas de transición (detalles_nuevos / detalles_anteriores)
+    IF TG_OP = 'INSERT' THEN
+        SELECT ARRAY_AGG(DISTINCT transaccion_id) INTO v_transaccion_ids
+        FROM detalles_nuevos;
+    ELSIF TG_OP = 'UPDATE' THEN
+        SELECT ARRAY_AGG(DISTINCT transaccion_id) INTO v_transaccion_ids
+        FROM (
+            SELECT transaccion_id FROM detalles_nuevos
+            UNION
+            SELECT transaccion_id FROM detalles_anteriores
+        ) afectados;
+    ELSIF TG_OP = 'DELETE' THEN
+        SELECT ARRAY_AGG(DISTINCT transaccion_id) INTO v_transaccion_ids
+        FROM detalles_anteriores;
+    END IF;
+    
+    IF v_transaccion_ids IS NOT NULL THEN
+        PERFORM fn_recalcular_montos_transacciones(v_transaccion_ids);
     END IF;
     
-    RETURN COALESCE(NEW, OLD);
+    RETURN NULL;
 END;
 $$ LANGUAGE plpgsql;
 
--- Trigger para actualizar montos
-CREATE TRIGGER tr_actualizar_monto_transaccion
-    AFTER INSERT OR UPDATE OR DELETE ON detalles_transaccion
-    FOR EACH ROW
+-- Triggers por sentencia (PostgreSQL no admite tablas de transición en un
+-- trigger con varios eventos, por eso se define uno por operación)
+CREATE TRIGGER tr_actualizar_monto_transaccion_ins
+    AFTER INSERT ON detalles_transaccion
+    REFERENCING NEW TABLE AS detalles_nuevos
+    FOR EACH STATEMENT
+    EXECUTE FUNCTION fn_actualizar_monto_transaccion();
+
+CREATE TRIGGER tr_actualizar_monto_transaccion_upd
+    AFTER UPDATE ON detalles_transaccion
+    REFERENCING OLD TABLE AS detalles_anteriores NEW TABLE AS detalles_nuevos
+    FOR EACH STATEMENT
+    EXECUTE FUNCTION fn_actualizar_monto_transaccion();
+
+CREATE TRIGGER tr_actualizar_monto_transaccion_del
+    AFTER DELETE ON detalles_transaccion
+    REFERENCING OLD TABLE AS detalles_anteriores
+    FOR EACH STATEMENT
     EXECUTE FUNCTION fn_actualizar_monto_transaccion();
 
 -- 6.3 Función para registrar movimiento de caja automático
 CREATE OR REPLACE FUNCTION fn_registrar_movimiento_caja()
 RETURNS TRIGGER AS $$
+DECLARE
+    v_neto NUMERIC(12,2);
 BEGIN
-    IF TG_OP = 'INSERT' AND NEW.estado = 'CONFIRMADO' THEN
+    -- El pago entra a caja al registrarse ya confirmado o al confirmarse
+    -- después (TransaccionOverlay y fn_finalizar_transaccion usan UPDATE)
+    IF (TG_OP = 'INSERT' AND NEW.estado = 'CONFIRMADO')
+       OR (TG_OP = 'UPDATE' AND OLD.estado IS DISTINCT FROM 'CONFIRMADO' AND NEW.estado = 'CONFIRMADO') THEN
         INSERT INTO movimientos_caja (fecha, tipo, transaccion_id, monto, forma_pago, descripcion, usuario_id)
         VALUES (
             NEW.fecha_pago,
@@ -461,6 +644,32 @@ BEGIN
             'Pago transacción ' || NEW.numero_transaccion,
             NEW.registrado_por
         );
+
+    -- Pago confirmado que se anula: sus movimientos de días abiertos se
+    -- eliminan; si el ingreso ya quedó en un cierre se compensa con un
+    -- egreso en la fecha de la anulación
+    ELSIF TG_OP = 'UPDATE' AND OLD.estado = 'CONFIRMADO' AND NEW.estado IS DISTINCT FROM 'CONFIRMADO' THEN
+        DELETE FROM movimientos_caja m
+        WHERE m.transaccion_id = NEW.id
+        AND NOT EXISTS (SELECT 1 FROM cierres_caja cc WHERE cc.fecha = m.fecha);
+
+        SELECT COALESCE(SUM(CASE WHEN m.tipo = 'INGRESO' THEN m.monto ELSE -m.monto END), 0)
+        INTO v_neto
+        FROM movimientos_caja m
+        WHERE m.transaccion_id = NEW.id;
+
+        IF v_neto > 0 THEN
+            INSERT INTO movimientos_caja (fecha, tipo, transaccion_id, monto, forma_pago, descripcion, usuario_id)
+            VALUES (
+                CURRENT_DATE,
+                'EGRESO',
+                NEW.id,
+                v_neto,
+                NEW.forma_pago,
+                'Anulación transacción ' || NEW.numero_transaccion,
+                NEW.registrado_por
+            );
+        END IF;
     END IF;
     RETURN NEW;
 END;
@@ -472,6 +681,118 @@ CREATE TRIGGER tr_registrar_movimiento_caja
     FOR EACH ROW
     EXECUTE FUNCTION fn_registrar_movimiento_caja();
 
+-- 6.3.1 Acumulados diarios de caja desde movimientos_caja
+CREATE OR REPLACE FUNCTION fn_acumular_movimientos_caja()
+RETURNS TRIGGER AS $$
+DECLARE
+    v_cambios JSONB;
+    v_fecha_cerrada DATE;
+BEGIN
+    -- Variación por (fecha, forma_pago) de la sentencia completa; las filas
+    -- anteriores restan y las nuevas suman
+    IF TG_OP = 'INSERT' THEN
+        SELECT jsonb_agg(c) INTO v_cambios FROM (
+            SELECT fecha, forma_pago,
+                SUM(monto) FILTER (WHERE tipo = 'INGRESO') AS ingresos,
+                SUM(monto) FILTER (WHERE tipo = 'EGRESO') AS egresos,
+                COUNT(*) FILTER (WHERE tipo = 'INGRESO') AS cantidad_ingresos,
+                COUNT(*) FILTER (WHERE tipo = 'EGRESO') AS cantidad_egresos
+            FROM movimientos_nuevos
+            GROUP BY fecha, forma_pago
+        ) c;
+    ELSIF TG_OP = 'UPDATE' THEN
+        SELECT jsonb_agg(c) INTO v_cambios FROM (
+            SELECT fecha, forma_pago,
+                SUM(signo * monto) FILTER (WHERE tipo = 'INGRESO') AS ingresos,
+                SUM(signo * monto) FILTER (WHERE tipo = 'EGRESO') AS egresos,
+                SUM(signo) FILTER (WHERE tipo = 'INGRESO') AS cantidad_ingresos,
+                SUM(signo) FILTER (WHERE tipo = 'EGRESO') AS cantidad_egresos
+            FROM (
+                SELECT fecha, forma_pago, tipo, monto, 1 AS signo FROM movimientos_nuevos
+                UNION ALL
+                SELECT fecha, forma_pago, tipo, monto, -1 AS signo FROM movimientos_anteriores
+            ) m
+            GROUP BY fecha, forma_pago
+            -- Sólo los grupos cuyos totales cambian: actualizar columnas que no
+            -- los afectan (p. ej. transaccion_id al archivar) no toca días cerrados
+            HAVING SUM(signo * monto) FILTER (WHERE tipo = 'INGRESO') <> 0
+                OR SUM(signo * monto) FILTER (WHERE tipo = 'EGRESO') <> 0
+                OR SUM(signo) FILTER (WHERE tipo = 'INGRESO') <> 0
+                OR SUM(signo) FILTER (WHERE tipo = 'EGRESO') <> 0
+        ) c;
+    ELSIF TG_OP = 'DELETE' THEN
+        SELECT jsonb_agg(c) INTO v_cambios FROM (
+            SELECT fecha, forma_pago,
+                -SUM(monto) FILTER (WHERE tipo = 'INGRESO') AS ingresos,
+                -SUM(monto) FILTER (WHERE tipo = 'EGRESO') AS egresos,
+                -COUNT(*) FILTER (WHERE tipo = 'INGRESO') AS cantidad_ingresos,
+                -COUNT(*) FILTER (WHERE tipo = 'EGRESO') AS cantidad_egresos
+            FROM movimientos_anteriores
+            GROUP BY fecha, forma_pago
+        ) c;
+    END IF;
+
+    IF v_cambios IS NULL THEN
+        RETURN NULL;
+    END IF;
+
+    -- Bloqueo compartido por día: excluye un cierre concurrente del mismo día
+    PERFORM pg_advisory_xact_lock_shared(hashtext('cierre_caja'), d.fecha - DATE '2000-01-01')
+    FROM (
+        SELECT DISTINCT c.fecha
+        FROM jsonb_to_recordset(v_cambios) AS c(fecha DATE)
+        ORDER BY c.fecha
+    ) d;
+
+    SELECT cc.fecha INTO v_fecha_cerrada
+    FROM jsonb_to_recordset(v_cambios) AS c(fecha DATE)
+    JOIN cierres_caja cc ON cc.fecha = c.fecha
+    LIMIT 1;
+
+    IF v_fecha_cerrada IS NOT NULL THEN
+        RAISE EXCEPTION 'La caja del % ya está cerrada; no se pueden modificar sus movimientos', v_fecha_cerrada;
+    END IF;
+
+    INSERT INTO caja_resumen_diario AS r (
+        fecha, forma_pago, ingresos, egresos, cantidad_ingresos, cantidad_egresos
+    )
+    SELECT c.fecha, c.forma_pago,
+        COALESCE(c.ingresos, 0), COALESCE(c.egresos, 0),
+        COALESCE(c.cantidad_ingresos, 0), COALESCE(c.cantidad_egresos, 0)
+    FROM jsonb_to_recordset(v_cambios) AS c(
+        fecha DATE, forma_pago TEXT, ingresos NUMERIC, egresos NUMERIC,
+        cantidad_ingresos INTEGER, cantidad_egresos INTEGER
+    )
+    ON CONFLICT ON CONSTRAINT pk_caja_resumen_diario DO UPDATE
+    SET ingresos = r.ingresos + EXCLUDED.ingresos,
+        egresos = r.egresos + EXCLUDED.egresos,
+        cantidad_ingresos = r.cantidad_ingresos + EXCLUDED.cantidad_ingresos,
+        cantidad_egresos = r.cantidad_egresos + EXCLUDED.cantidad_egresos,
+        updated_at = CURRENT_TIMESTAMP;
+
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Triggers por sentencia, uno por operación (tablas de transición)
+CREATE TRIGGER tr_acumular_movimientos_caja_ins
+    AFTER INSERT ON movimientos_caja
+    REFERENCING NEW TABLE AS movimientos_nuevos
+    FOR EACH STATEMENT
+    EXECUTE FUNCTION fn_acumular_movimientos_caja();
+
+CREATE TRIGGER tr_acumular_movimientos_caja_upd
+    AFTER UPDATE ON movimientos_caja
+    REFERENCING OLD TABLE AS movimientos_anteriores NEW TABLE AS movimientos_nuevos
+    FOR EACH STATEMENT
+    EXECUTE FUNCTION fn_acumular_movimientos_caja();
+
+CREATE TRIGGER tr_acumular_movimientos_caja_del
+    AFTER DELETE ON movimientos_caja
+    REFERENCING OLD TABLE AS movimientos_anteriores
+    FOR EACH STATEMENT
+    EXECUTE FUNCTION fn_acumular_movimientos_caja();
+
 -- 6.4 Función para actualizar updated_at
 CREATE OR REPLACE FUNCTION fn_actualizar_timestamp()
 RETURNS TRIGGER AS $$
@@ -487,6 +808,258 @@ CREATE TRIGGER tr_actualizar_timestamp_programa
     FOR EACH ROW
     EXECUTE FUNCTION fn_actualizar_timestamp();
 
+-- 6.5 Saldos precalculados de inscripciones (total_pagado, saldo_pendiente, ultimo_pago)
+CREATE OR REPLACE FUNCTION fn_recalcular_saldos_inscripciones(
+    p_estudiante_ids INTEGER[],
+    p_programa_ids INTEGER[]
+)
+RETURNS INTEGER AS $$
+DECLARE
+    v_actualizadas INTEGER;
+BEGIN
+    -- Bloquear primero las inscripciones (en orden de id para no generar
+    -- interbloqueos): en READ COMMITTED la suma siguiente se calcula con una
+    -- instantánea nueva y ve los pagos que otra sesión confirmó mientras se
+    -- esperaba el bloqueo.
+    PERFORM 1
+    FROM inscripciones i
+    JOIN UNNEST(p_estudiante_ids, p_programa_ids) AS k(estudiante_id, programa_id)
+        ON k.estudiante_id = i.estudiante_id
+       AND k.programa_id = i.programa_id
+    ORDER BY i.id
+    FOR UPDATE OF i;
+
+    UPDATE inscripciones i
+    SET total_pagado = s.total_pagado,
+        saldo_pendiente = GREATEST(COALESCE(i.valor_final, p.costo_total, 0) - s.total_pagado, 0),
+        ultimo_pago = s.ultimo_pago
+    FROM (
+        SELECT
+            k.estudiante_id,
+            k.programa_id,
+            COALESCE(SUM(t.monto_final), 0) AS total_pagado,
+            MAX(t.fecha_pago) AS ultimo_pago
+        FROM (
+            SELECT DISTINCT u.estudiante_id, u.programa_id
+            FROM UNNEST(p_estudiante_ids, p_programa_ids) AS u(estudiante_id, programa_id)
+        ) k
+        LEFT JOIN transacciones t
+            ON t.estudiante_id = k.estudiante_id
+           AND t.programa_id = k.programa_id
+           AND t.estado = 'CONFIRMADO'
+        GROUP BY k.estudiante_id, k.programa_id
+    ) s, programas p
+    WHERE i.estudiante_id = s.estudiante_id
+      AND i.programa_id = s.programa_id
+      AND p.id = i.programa_id;
+
+    GET DIAGNOSTICS v_actualizadas = ROW_COUNT;
+    RETURN v_actualizadas;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION fn_actualizar_saldos_inscripciones()
+RETURNS TRIGGER AS $$
+DECLARE
+    v_estudiante_ids INTEGER[];
+    v_programa_ids INTEGER[];
+BEGIN
+    -- Trigger por sentencia: cada inscripción afectada se recalcula una sola
+    -- vez. Sólo interesan las filas que son o eran CONFIRMADAS.
+    IF TG_OP = 'INSERT' THEN
+        SELECT ARRAY_AGG(a.estudiante_id), ARRAY_AGG(a.programa_id)
+        INTO v_estudiante_ids, v_programa_ids
+        FROM (
+            SELECT DISTINCT n.estudiante_id, n.programa_id
+            FROM transacciones_nuevas n
+            WHERE n.estado = 'CONFIRMADO'
+        ) a;
+    ELSIF TG_OP = 'UPDATE' THEN
+        -- Cambios de estado (incluida la anulación), monto, fecha o inscripción
+        WITH cambios AS (
+            SELECT n.estudiante_id AS est_nuevo, n.programa_id AS prog_nuevo,
+                   o.estudiante_id AS est_anterior, o.programa_id AS prog_anterior
+            FROM transacciones_nuevas n
+            JOIN transacciones_anteriores o ON o.id = n.id
+            WHERE (n.estado = 'CONFIRMADO' OR o.estado = 'CONFIRMADO')
+              AND (n.estado, n.monto_final, n.fecha_pago, n.estudiante_id, n.programa_id)
+                  IS DISTINCT FROM
+                  (o.estado, o.monto_final, o.fecha_pago, o.estudiante_id, o.programa_id)
+        )
+        SELECT ARRAY_AGG(a.estudiante_id), ARRAY_AGG(a.programa_id)
+        INTO v_estudiante_ids, v_programa_ids
+        FROM (
+            SELECT est_nuevo AS estudiante_id, prog_nuevo AS programa_id FROM cambios
+            UNION
+            SELECT est_anterior, prog_anterior FROM cambios
+        ) a;
+    ELSIF TG_OP = 'DELETE' THEN
+        SELECT ARRAY_AGG(a.estudiante_id), ARRAY_AGG(a.programa_id)
+        INTO v_estudiante_ids, v_programa_ids
+        FROM (
+            SELECT DISTINCT o.estudiante_id, o.programa_id
+            FROM transacciones_anteriores o
+            WHERE o.estado = 'CONFIRMADO'
+        ) a;
+    END IF;
+
+    IF v_estudiante_ids IS NOT NULL THEN
+        PERFORM fn_recalcular_saldos_inscripciones(v_estudiante_ids, v_programa_ids);
+    END IF;
+
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Un trigger por operación (las tablas de transición no admiten varios eventos)
+CREATE TRIGGER tr_saldos_inscripciones_ins
+    AFTER INSERT ON transacciones
+    REFERENCING NEW TABLE AS transacciones_nuevas
+    FOR EACH STATEMENT
+    EXECUTE FUNCTION fn_actualizar_saldos_inscripciones();
+
+CREATE TRIGGER tr_saldos_inscripciones_upd
+    AFTER UPDATE ON transacciones
+    REFERENCING OLD TABLE AS transacciones_anteriores NEW TABLE AS transacciones_nuevas
+    FOR EACH STATEMENT
+    EXECUTE FUNCTION fn_actualizar_saldos_inscripciones();
+
+CREATE TRIGGER tr_saldos_inscripciones_del
+    AFTER DELETE ON transacciones
+    REFERENCING OLD TABLE AS transacciones_anteriores
+    FOR EACH STATEMENT
+    EXECUTE FUNCTION fn_actualizar_saldos_inscripciones();
+
+CREATE OR REPLACE FUNCTION fn_calcular_saldo_inscripcion()
+RETURNS TRIGGER AS $$
+DECLARE
+    v_costo_total NUMERIC(10,2);
+BEGIN
+    -- Alta de inscripción o cambio de valor_final / estudiante / programa
+    SELECT COALESCE(SUM(t.monto_final), 0), MAX(t.fecha_pago)
+    INTO NEW.total_pagado, NEW.ultimo_pago
+    FROM transacciones t
+    WHERE t.estudiante_id = NEW.estudiante_id
+      AND t.programa_id = NEW.programa_id
+      AND t.estado = 'CONFIRMADO';
+
+    SELECT costo_total INTO v_costo_total FROM programas WHERE id = NEW.programa_id;
+
+    NEW.saldo_pendiente := GREATEST(COALESCE(NEW.valor_final, v_costo_total, 0) - NEW.total_pagado, 0);
+    RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER tr_calcular_saldo_inscripcion
+    BEFORE INSERT OR UPDATE OF valor_final, estudiante_id, programa_id ON inscripciones
+    FOR EACH ROW
+    EXECUTE FUNCTION fn_calcular_saldo_inscripcion();
+
+-- 6.6 Cronograma de cuotas por inscripción (generado al inscribir, pagos aplicados desde total_pagado)
+CREATE OR REPLACE FUNCTION fn_aplicar_pagos_cuotas(p_inscripcion_id INTEGER)
+RETURNS INTEGER AS $$
+DECLARE
+    v_actualizadas INTEGER;
+BEGIN
+    -- El total pagado de la inscripción cubre las cuotas en orden; sólo se
+    -- escriben las cuotas cuyo monto_pagado cambia.
+    UPDATE cuotas_inscripcion c
+    SET monto_pagado = d.monto_pagado
+    FROM (
+        SELECT
+            c2.id,
+            LEAST(c2.monto, GREATEST(i.total_pagado - COALESCE(SUM(c2.monto) OVER (
+                ORDER BY c2.numero_cuota
+                ROWS BETWEEN UNBOUNDED PRECEDING AND 1 PRECEDING
+            ), 0), 0)) AS monto_pagado
+        FROM cuotas_inscripcion c2
+        JOIN inscripciones i ON i.id = c2.inscripcion_id
+        WHERE c2.inscripcion_id = p_inscripcion_id
+    ) d
+    WHERE c.id = d.id
+      AND c.monto_pagado IS DISTINCT FROM d.monto_pagado;
+
+    GET DIAGNOSTICS v_actualizadas = ROW_COUNT;
+    RETURN v_actualizadas;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION fn_generar_cuotas_inscripcion(p_inscripcion_id INTEGER)
+RETURNS INTEGER AS $$
+DECLARE
+    v_cuotas INTEGER;
+BEGIN
+    DELETE FROM cuotas_inscripcion WHERE inscripcion_id = p_inscripcion_id;
+
+    -- Mismo plan que sugería fn_cronograma_pagos_estudiante: numero_cuotas
+    -- mensualidades iguales desde el inicio del programa; la última absorbe
+    -- el redondeo.
+    INSERT INTO cuotas_inscripcion (inscripcion_id, numero_cuota, concepto, fecha_vencimiento, monto)
+    SELECT
+        i.id,
+        gs.n,
+        CONCAT('Cuota ', gs.n, ' - ', p.nombre)::VARCHAR(100),
+        (COALESCE(p.fecha_inicio, i.fecha_inscripcion, CURRENT_DATE) + (gs.n - 1) * INTERVAL '1 month')::DATE,
+        CASE
+            WHEN gs.n < p.numero_cuotas
+                THEN TRUNC(COALESCE(i.valor_final, p.costo_total, 0) / p.numero_cuotas, 2)
+            ELSE COALESCE(i.valor_final, p.costo_total, 0)
+                 - TRUNC(COALESCE(i.valor_final, p.costo_total, 0) / p.numero_cuotas, 2) * (p.numero_cuotas - 1)
+        END
+    FROM inscripciones i
+    JOIN programas p ON p.id = i.programa_id
+    CROSS JOIN generate_series(1, GREATEST(p.numero_cuotas, 1)) AS gs(n)
+    WHERE i.id = p_inscripcion_id;
+
+    GET DIAGNOSTICS v_cuotas = ROW_COUNT;
+
+    PERFORM fn_aplicar_pagos_cuotas(p_inscripcion_id);
+    RETURN v_cuotas;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION fn_sincronizar_cuotas_inscripcion()
+RETURNS TRIGGER AS $$
+BEGIN
+    -- AFTER: total_pagado ya fue recalculado por tr_calcular_saldo_inscripcion
+    -- o por los triggers de saldos sobre transacciones.
+    IF TG_OP = 'INSERT'
+       OR NEW.valor_final IS DISTINCT FROM OLD.valor_final
+       OR NEW.programa_id IS DISTINCT FROM OLD.programa_id THEN
+        PERFORM fn_generar_cuotas_inscripcion(NEW.id);
+    ELSIF NEW.total_pagado IS DISTINCT FROM OLD.total_pagado THEN
+        PERFORM fn_aplicar_pagos_cuotas(NEW.id);
+    END IF;
+
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER tr_sincronizar_cuotas_inscripcion
+    AFTER INSERT OR UPDATE OF valor_final, programa_id, total_pagado ON inscripciones
+    FOR EACH ROW
+    EXECUTE FUNCTION fn_sincronizar_cuotas_inscripcion();
+
+CREATE OR REPLACE FUNCTION fn_regenerar_cuotas_programa()
+RETURNS TRIGGER AS $$
+BEGIN
+    -- Cambio del plan del programa: regenerar las cuotas de sus inscripciones
+    PERFORM fn_generar_cuotas_inscripcion(i.id)
+    FROM inscripciones i
+    WHERE i.programa_id = NEW.id;
+
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER tr_regenerar_cuotas_programa
+    AFTER UPDATE OF numero_cuotas, fecha_inicio, costo_total ON programas
+    FOR EACH ROW
+    WHEN ((NEW.numero_cuotas, NEW.fecha_inicio, NEW.costo_total)
+          IS DISTINCT FROM
+          (OLD.numero_cuotas, OLD.fecha_inicio, OLD.costo_total))
+    EXECUTE FUNCTION fn_regenerar_cuotas_programa();
+
 -- 7. DATOS INICIALES
 
 -- 7.1 Empresa
@@ -595,9 +1168,130 @@ WHERE estado = 'CONFIRMADO'
 GROUP BY fecha_pago, forma_pago
 ORDER BY fecha_pago DESC;
 
+-- 8.5 Vistas de lectura histórica (datos vigentes y archivados; archivado_en es NULL en los vigentes)
+CREATE OR REPLACE VIEW vw_programas_historico AS
+SELECT p.*, NULL::TIMESTAMP AS archivado_en FROM programas p
+UNION ALL
+SELECT a.* FROM programas_archivo a;
+
+CREATE OR REPLACE VIEW vw_inscripciones_historico AS
+SELECT i.*, NULL::TIMESTAMP AS archivado_en FROM inscripciones i
+UNION ALL
+SELECT a.* FROM inscripciones_archivo a;
+
+CREATE OR REPLACE VIEW vw_cuotas_inscripcion_historico AS
+SELECT c.*, NULL::TIMESTAMP AS archivado_en FROM cuotas_inscripcion c
+UNION ALL
+SELECT a.* FROM cuotas_inscripcion_archivo a;
+
+CREATE OR REPLACE VIEW vw_transacciones_historico AS
+SELECT t.*, NULL::TIMESTAMP AS archivado_en FROM transacciones t
+UNION ALL
+SELECT a.* FROM transacciones_archivo a;
+
+CREATE OR REPLACE VIEW vw_detalles_transaccion_historico AS
+SELECT d.*, NULL::TIMESTAMP AS archivado_en FROM detalles_transaccion d
+UNION ALL
+SELECT a.* FROM detalles_transaccion_archivo a;
+
 -- 9. PROCEDIMIENTOS ALMACENADOS ÚTILES
 
--- 9.1 Procedimiento para registrar transacción completa
+-- 9.1 Función para registrar una transacción con todos sus detalles
+CREATE OR REPLACE FUNCTION fn_registrar_transaccion_con_detalles(
+    p_transaccion JSONB,
+    p_detalles JSONB
+)
+RETURNS JSONB
+LANGUAGE plpgsql
+AS $$
+DECLARE
+    v_transaccion transacciones%ROWTYPE;
+    v_total DECIMAL(10,2);
+    v_descuento DECIMAL(10,2);
+    v_detalles JSONB;
+BEGIN
+    -- Validar que haya detalles
+    IF p_detalles IS NULL OR jsonb_typeof(p_detalles) <> 'array' OR jsonb_array_length(p_detalles) = 0 THEN
+        RAISE EXCEPTION 'Debe proporcionar al menos un detalle para la transacción';
+    END IF;
+    
+    -- Validar conceptos y cálculos de todos los detalles en una sola pasada
+    IF EXISTS (
+        SELECT 1
+        FROM jsonb_array_elements(p_detalles) d
+        LEFT JOIN conceptos_pago c ON c.id = (d->>'concepto_pago_id')::INTEGER
+        WHERE c.id IS NULL
+    ) THEN
+        RAISE EXCEPTION 'Uno o más conceptos de pago no existen';
+    END IF;
+    
+    IF EXISTS (
+        SELECT 1
+        FROM jsonb_array_elements(p_detalles) d
+        WHERE (d->>'subtotal')::DECIMAL(10,2) <>
+              COALESCE((d->>'cantidad')::INTEGER, 1) * (d->>'precio_unitario')::DECIMAL(10,2)
+    ) THEN
+        RAISE EXCEPTION 'El subtotal no coincide con cantidad * precio unitario';
+    END IF;
+    
+    -- Totales calculados a partir de los detalles
+    SELECT COALESCE(SUM((d->>'subtotal')::DECIMAL(10,2)), 0)
+    INTO v_total
+    FROM jsonb_array_elements(p_detalles) d;
+    
+    v_descuento := COALESCE((p_transaccion->>'descuento_total')::DECIMAL(10,2), 0);
+    
+    -- Insertar transacción principal (el número lo genera el trigger)
+    INSERT INTO transacciones (
+        estudiante_id, programa_id, fecha_pago,
+        monto_total, descuento_total, monto_final,
+        forma_pago, estado, numero_comprobante, banco_origen, cuenta_origen,
+        observaciones, registrado_por
+    ) VALUES (
+        (p_transaccion->>'estudiante_id')::INTEGER,
+        (p_transaccion->>'programa_id')::INTEGER,
+        COALESCE((p_transaccion->>'fecha_pago')::DATE, CURRENT_DATE),
+        v_total, v_descuento, v_total - v_descuento,
+        p_transaccion->>'forma_pago',
+        COALESCE(p_transaccion->>'estado', 'REGISTRADO'),
+        p_transaccion->>'numero_comprobante',
+        p_transaccion->>'banco_origen',
+        p_transaccion->>'cuenta_origen',
+        p_transaccion->>'observaciones',
+        (p_transaccion->>'registrado_por')::INTEGER
+    )
+    RETURNING * INTO v_transaccion;
+    
+    -- Insertar todos los detalles en una sentencia; el orden por defecto es
+    -- la posición del detalle en el arreglo
+    WITH nuevos AS (
+        INSERT INTO detalles_transaccion (
+            transaccion_id, concepto_pago_id, descripcion,
+            cantidad, precio_unitario, subtotal, orden
+        )
+        SELECT
+            v_transaccion.id,
+            (x.d->>'concepto_pago_id')::INTEGER,
+            x.d->>'descripcion',
+            COALESCE((x.d->>'cantidad')::INTEGER, 1),
+            (x.d->>'precio_unitario')::DECIMAL(10,2),
+            (x.d->>'subtotal')::DECIMAL(10,2),
+            COALESCE(NULLIF((x.d->>'orden')::INTEGER, 0), x.n::INTEGER)
+        FROM jsonb_array_elements(p_detalles) WITH ORDINALITY AS x(d, n)
+        RETURNING *
+    )
+    SELECT COALESCE(jsonb_agg(to_jsonb(nuevos) ORDER BY nuevos.orden), '[]'::JSONB)
+    INTO v_detalles
+    FROM nuevos;
+    
+    RETURN jsonb_build_object(
+        'transaccion', to_jsonb(v_transaccion),
+        'detalles', v_detalles
+    );
+END;
+$$;
+
+-- 9.1.1 Procedimiento para registrar transacción completa (delega en 9.1)
 CREATE OR REPLACE PROCEDURE sp_registrar_transaccion_completa(
     p_estudiante_id INTEGER,
     p_programa_id INTEGER,
@@ -614,72 +1308,30 @@ CREATE OR REPLACE PROCEDURE sp_registrar_transaccion_completa(
 LANGUAGE plpgsql
 AS $$
 DECLARE
-    v_transaccion_id INTEGER;
-    v_detalle JSONB;
-    v_concepto_id INTEGER;
-    v_descripcion TEXT;
-    v_cantidad INTEGER;
-    v_precio_unitario DECIMAL(10,2);
-    v_subtotal DECIMAL(10,2);
-    v_orden INTEGER;
+    v_resultado JSONB;
 BEGIN
-    -- Validar que haya detalles
-    IF p_detalles IS NULL OR jsonb_array_length(p_detalles) = 0 THEN
-        RAISE EXCEPTION 'Debe proporcionar al menos un detalle para la transacción';
-    END IF;
-    
-    -- Insertar transacción principal (sin número de transacción, se genera automáticamente)
-    INSERT INTO transacciones (
-        estudiante_id, programa_id, fecha_pago, forma_pago, descuento_total,
-        numero_comprobante, banco_origen, cuenta_origen, observaciones, registrado_por,
-        estado
-    ) VALUES (
-        p_estudiante_id, p_programa_id, p_fecha_pago, p_forma_pago, p_descuento_total,
-        p_numero_comprobante, p_banco_origen, p_cuenta_origen, p_observaciones, p_registrado_por,
-        'CONFIRMADO'
-    ) RETURNING id INTO v_transaccion_id;
-    
-    -- Insertar detalles
-    FOR v_detalle IN SELECT * FROM jsonb_array_elements(p_detalles)
-    LOOP
-        -- Extraer valores del JSON
-        v_concepto_id := (v_detalle->>'concepto_pago_id')::INTEGER;
-        v_descripcion := v_detalle->>'descripcion';
-        v_cantidad := COALESCE((v_detalle->>'cantidad')::INTEGER, 1);
-        v_precio_unitario := (v_detalle->>'precio_unitario')::DECIMAL(10,2);
-        v_subtotal := (v_detalle->>'subtotal')::DECIMAL(10,2);
-        v_orden := COALESCE((v_detalle->>'orden')::INTEGER, 0);
-        
-        -- Validar que el concepto existe
-        IF NOT EXISTS (SELECT 1 FROM conceptos_pago WHERE id = v_concepto_id) THEN
-            RAISE EXCEPTION 'Concepto de pago con ID % no existe', v_concepto_id;
-        END IF;
-        
-        -- Validar cálculos
-        IF v_subtotal != (v_cantidad * v_precio_unitario) THEN
-            RAISE EXCEPTION 'El subtotal no coincide con cantidad * precio unitario';
-        END IF;
-        
-        -- Insertar detalle
-        INSERT INTO detalles_transaccion (
-            transaccion_id, concepto_pago_id, descripcion, 
-            cantidad, precio_unitario, subtotal, orden
-        ) VALUES (
-            v_transaccion_id,
-            v_concepto_id,
-            v_descripcion,
-            v_cantidad,
-            v_precio_unitario,
-            v_subtotal,
-            v_orden
-        );
-    END LOOP;
+    v_resultado := fn_registrar_transaccion_con_detalles(
+        jsonb_build_object(
+            'estudiante_id', p_estudiante_id,
+            'programa_id', p_programa_id,
+            'fecha_pago', p_fecha_pago,
+            'forma_pago', p_forma_pago,
+            'registrado_por', p_registrado_por,
+            'descuento_total', p_descuento_total,
+            'numero_comprobante', p_numero_comprobante,
+            'banco_origen', p_banco_origen,
+            'cuenta_origen', p_cuenta_origen,
+            'observaciones', p_observaciones,
+            'estado', 'CONFIRMADO'
+        ),
+        p_detalles
+    );
     
-    RAISE NOTICE 'Transacción % registrada exitosamente', v_transaccion_id;
+    RAISE NOTICE 'Transacción % registrada exitosamente', v_resultado->'transaccion'->>'id';
 END;
 $$;
 
--- 9.2 Función para obtener saldo pendiente por estudiante
+-- 9.2 Función para obtener saldo pendiente por estudiante (desde las columnas precalculadas)
 CREATE OR REPLACE FUNCTION fn_saldo_pendiente_estudiante(p_estudiante_id INTEGER)
 RETURNS TABLE(
     programa_id INTEGER,
@@ -690,17 +1342,440 @@ RETURNS TABLE(
 ) AS $$
 BEGIN
     RETURN QUERY
-    SELECT 
+    SELECT
         p.id,
         p.nombre,
-        p.costo_total,
-        COALESCE(SUM(t.monto_final), 0),
-        p.costo_total - COALESCE(SUM(t.monto_final), 0)
+        COALESCE(i.valor_final, p.costo_total),
+        i.total_pagado,
+        i.saldo_pendiente
     FROM inscripciones i
     JOIN programas p ON i.programa_id = p.id
-    LEFT JOIN transacciones t ON i.estudiante_id = t.estudiante_id AND i.programa_id = t.programa_id AND t.estado = 'CONFIRMADO'
-    WHERE i.estudiante_id = p_estudiante_id
-    GROUP BY p.id, p.nombre, p.costo_total;
+    WHERE i.estudiante_id = p_estudiante_id;
+END;
+$$ LANGUAGE plpgsql;
+
+-- 9.3 Cierre y reapertura de caja diaria
+CREATE OR REPLACE FUNCTION fn_cerrar_caja(
+    p_fecha DATE,
+    p_usuario_id INTEGER,
+    p_observaciones TEXT DEFAULT NULL
+)
+RETURNS SETOF cierres_caja AS $$
+DECLARE
+    v_ultimo_cierre cierres_caja%ROWTYPE;
+    v_saldo_anterior NUMERIC(14,2);
+BEGIN
+    -- Bloqueo exclusivo del día: espera a los movimientos en curso y bloquea
+    -- los nuevos hasta confirmar el cierre
+    PERFORM pg_advisory_xact_lock(hashtext('cierre_caja'), p_fecha - DATE '2000-01-01');
+
+    IF EXISTS (SELECT 1 FROM cierres_caja WHERE fecha = p_fecha) THEN
+        RAISE EXCEPTION 'La caja del % ya está cerrada', p_fecha;
+    END IF;
+
+    -- Saldo anterior: último cierre más los días intermedios sin cerrar
+    SELECT * INTO v_ultimo_cierre
+    FROM cierres_caja
+    WHERE fecha < p_fecha
+    ORDER BY fecha DESC
+    LIMIT 1;
+
+    SELECT COALESCE(v_ultimo_cierre.saldo_final, 0) + COALESCE(SUM(r.ingresos - r.egresos), 0)
+    INTO v_saldo_anterior
+    FROM caja_resumen_diario r
+    WHERE r.fecha < p_fecha
+    AND (v_ultimo_cierre.fecha IS NULL OR r.fecha > v_ultimo_cierre.fecha);
+
+    RETURN QUERY
+    WITH cierre AS (
+        INSERT INTO cierres_caja (
+            fecha, total_ingresos, total_egresos, saldo_anterior, saldo_final,
+            cantidad_movimientos, detalle_formas_pago, cerrado_por, observaciones
+        )
+        SELECT
+            p_fecha,
+            COALESCE(SUM(r.ingresos), 0),
+            COALESCE(SUM(r.egresos), 0),
+            v_saldo_anterior,
+            v_saldo_anterior + COALESCE(SUM(r.ingresos - r.egresos), 0),
+            COALESCE(SUM(r.cantidad_ingresos + r.cantidad_egresos), 0),
+            COALESCE(
+                jsonb_agg(jsonb_build_object(
+                    'forma_pago', r.forma_pago,
+                    'ingresos', r.ingresos,
+                    'egresos', r.egresos,
+                    'neto', r.ingresos - r.egresos,
+                    'cantidad', r.cantidad_ingresos + r.cantidad_egresos
+                ) ORDER BY r.forma_pago) FILTER (WHERE r.forma_pago IS NOT NULL),
+                '[]'::JSONB
+            ),
+            p_usuario_id,
+            p_observaciones
+        FROM caja_resumen_diario r
+        WHERE r.fecha = p_fecha
+        RETURNING *
+    )
+    SELECT * FROM cierre;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION fn_reabrir_caja(p_fecha DATE)
+RETURNS BOOLEAN AS $$
+BEGIN
+    -- Sólo se puede reabrir el último cierre para no invalidar los saldos
+    -- congelados de los días siguientes
+    PERFORM pg_advisory_xact_lock(hashtext('cierre_caja'), p_fecha - DATE '2000-01-01');
+
+    IF EXISTS (SELECT 1 FROM cierres_caja WHERE fecha > p_fecha) THEN
+        RAISE EXCEPTION 'No se puede reabrir la caja del %: existen cierres posteriores', p_fecha;
+    END IF;
+
+    DELETE FROM cierres_caja WHERE fecha = p_fecha;
+    RETURN FOUND;
+END;
+$$ LANGUAGE plpgsql;
+
+-- 9.4 Reporte de caja con saldo acumulado (desde los acumulados diarios)
+CREATE OR REPLACE FUNCTION fn_reporte_caja(p_desde DATE, p_hasta DATE)
+RETURNS TABLE(
+    fecha DATE,
+    forma_pago TEXT,
+    ingresos NUMERIC,
+    egresos NUMERIC,
+    neto NUMERIC,
+    cantidad INTEGER,
+    saldo_acumulado NUMERIC,
+    cerrado BOOLEAN
+) AS $$
+    SELECT
+        r.fecha,
+        r.forma_pago::TEXT,
+        r.ingresos,
+        r.egresos,
+        r.ingresos - r.egresos,
+        r.cantidad_ingresos + r.cantidad_egresos,
+        COALESCE(b.saldo, 0)
+            + SUM(r.ingresos - r.egresos) OVER (PARTITION BY r.forma_pago ORDER BY r.fecha),
+        cc.fecha IS NOT NULL
+    FROM caja_resumen_diario r
+    LEFT JOIN (
+        SELECT forma_pago, SUM(ingresos - egresos) AS saldo
+        FROM caja_resumen_diario
+        WHERE fecha < p_desde
+        GROUP BY forma_pago
+    ) b ON b.forma_pago = r.forma_pago
+    LEFT JOIN cierres_caja cc ON cc.fecha = r.fecha
+    WHERE r.fecha BETWEEN p_desde AND p_hasta
+    ORDER BY r.fecha, r.forma_pago;
+$$ LANGUAGE sql STABLE;
+
+-- 9.5 Finalización idempotente de una transacción (detalles + confirmación)
+CREATE OR REPLACE FUNCTION fn_finalizar_transaccion(
+    p_clave UUID,
+    p_transaccion_id INTEGER,
+    p_datos JSONB,
+    p_detalles JSONB DEFAULT '[]'::JSONB
+)
+RETURNS JSONB AS $$
+DECLARE
+    v_transaccion transacciones%ROWTYPE;
+    v_ultimo_orden INTEGER;
+BEGIN
+    -- La clave se registra en la misma transacción que los cambios: o se
+    -- aplica todo, o el reintento la vuelve a encontrar libre
+    INSERT INTO operaciones_aplicadas (clave_idempotencia, transaccion_id, tipo)
+    VALUES (p_clave, p_transaccion_id, 'FINALIZAR')
+    ON CONFLICT (clave_idempotencia) DO NOTHING;
+
+    IF NOT FOUND THEN
+        SELECT * INTO v_transaccion FROM transacciones WHERE id = p_transaccion_id;
+        RETURN jsonb_build_object(
+            'aplicado', FALSE,
+            'duplicado', TRUE,
+            'transaccion', to_jsonb(v_transaccion)
+        );
+    END IF;
+
+    SELECT * INTO v_transaccion
+    FROM transacciones
+    WHERE id = p_transaccion_id
+    FOR UPDATE;
+
+    IF NOT FOUND THEN
+        RAISE EXCEPTION 'La transacción % no existe', p_transaccion_id;
+    END IF;
+
+    IF v_transaccion.estado = 'ANULADO' THEN
+        RAISE EXCEPTION 'La transacción % está anulada', v_transaccion.numero_transaccion;
+    END IF;
+
+    -- Detalles pendientes en un único INSERT
+    IF jsonb_array_length(p_detalles) > 0 THEN
+        SELECT COALESCE(MAX(orden), 0) INTO v_ultimo_orden
+        FROM detalles_transaccion
+        WHERE transaccion_id = p_transaccion_id;
+
+        INSERT INTO detalles_transaccion (
+            transaccion_id, concepto_pago_id, descripcion,
+            cantidad, precio_unitario, subtotal, orden
+        )
+        SELECT
+            p_transaccion_id,
+            (d.value->>'concepto_pago_id')::INTEGER,
+            d.value->>'descripcion',
+            COALESCE((d.value->>'cantidad')::INTEGER, 1),
+            (d.value->>'precio_unitario')::DECIMAL(10,2),
+            (d.value->>'subtotal')::DECIMAL(10,2),
+            COALESCE((d.value->>'orden')::INTEGER, v_ultimo_orden + d.posicion::INTEGER)
+        FROM jsonb_array_elements(p_detalles) WITH ORDINALITY AS d(value, posicion);
+    END IF;
+
+    -- Confirmar con los datos capturados en caja
+    UPDATE transacciones
+    SET fecha_pago = COALESCE((p_datos->>'fecha_pago')::DATE, fecha_pago),
+        forma_pago = COALESCE(p_datos->>'forma_pago', forma_pago),
+        numero_comprobante = COALESCE(p_datos->>'numero_comprobante', numero_comprobante),
+        banco_origen = COALESCE(p_datos->>'banco_origen', banco_origen),
+        cuenta_origen = COALESCE(p_datos->>'cuenta_origen', cuenta_origen),
+        observaciones = COALESCE(p_datos->>'observaciones', observaciones),
+        monto_total = COALESCE((p_datos->>'monto_total')::DECIMAL(10,2), monto_total),
+        monto_final = COALESCE((p_datos->>'monto_final')::DECIMAL(10,2), monto_final),
+        estado = 'CONFIRMADO'
+    WHERE id = p_transaccion_id
+    RETURNING * INTO v_transaccion;
+
+    RETURN jsonb_build_object(
+        'aplicado', TRUE,
+        'duplicado', FALSE,
+        'transaccion', to_jsonb(v_transaccion)
+    );
+END;
+$$ LANGUAGE plpgsql;
+
+-- 9.6 Verificación (y corrección opcional) de los saldos precalculados
+CREATE OR REPLACE FUNCTION fn_verificar_saldos_inscripciones(p_corregir BOOLEAN DEFAULT FALSE)
+RETURNS TABLE (
+    inscripcion_id INTEGER,
+    total_pagado_registrado NUMERIC(12,2),
+    total_pagado_real NUMERIC(12,2),
+    saldo_registrado NUMERIC(12,2),
+    saldo_real NUMERIC(12,2),
+    ultimo_pago_registrado DATE,
+    ultimo_pago_real DATE,
+    corregido BOOLEAN
+) AS $$
+BEGIN
+    RETURN QUERY
+    WITH pagos AS (
+        SELECT t.estudiante_id, t.programa_id,
+               SUM(t.monto_final) AS total,
+               MAX(t.fecha_pago) AS ultimo
+        FROM transacciones t
+        WHERE t.estado = 'CONFIRMADO'
+        GROUP BY t.estudiante_id, t.programa_id
+    ),
+    desviadas AS (
+        SELECT
+            i.id,
+            i.total_pagado AS pagado_reg,
+            COALESCE(pg.total, 0)::NUMERIC(12,2) AS pagado_real,
+            i.saldo_pendiente AS saldo_reg,
+            GREATEST(COALESCE(i.valor_final, p.costo_total, 0) - COALESCE(pg.total, 0), 0)::NUMERIC(12,2) AS saldo_calc,
+            i.ultimo_pago AS ultimo_reg,
+            pg.ultimo AS ultimo_calc
+        FROM inscripciones i
+        JOIN programas p ON p.id = i.programa_id
+        LEFT JOIN pagos pg
+            ON pg.estudiante_id = i.estudiante_id
+           AND pg.programa_id = i.programa_id
+        WHERE (i.total_pagado, i.saldo_pendiente, i.ultimo_pago)
+              IS DISTINCT FROM
+              (COALESCE(pg.total, 0),
+               GREATEST(COALESCE(i.valor_final, p.costo_total, 0) - COALESCE(pg.total, 0), 0),
+               pg.ultimo)
+    ),
+    corregidas AS (
+        UPDATE inscripciones i
+        SET total_pagado = d.pagado_real,
+            saldo_pendiente = d.saldo_calc,
+            ultimo_pago = d.ultimo_calc
+        FROM desviadas d
+        WHERE p_corregir
+          AND i.id = d.id
+        RETURNING i.id
+    )
+    SELECT d.id, d.pagado_reg, d.pagado_real, d.saldo_reg, d.saldo_calc,
+           d.ultimo_reg, d.ultimo_calc, (c.id IS NOT NULL)
+    FROM desviadas d
+    LEFT JOIN corregidas c ON c.id = d.id
+    ORDER BY d.id;
+END;
+$$ LANGUAGE plpgsql;
+
+-- 9.7 Reserva atómica de cupos (dentro de la transacción de inscripción)
+CREATE OR REPLACE FUNCTION fn_reservar_cupos(
+    p_programa_id INTEGER,
+    p_cantidad INTEGER DEFAULT 1,
+    p_estados_permitidos TEXT[] DEFAULT ARRAY['INSCRIPCIONES', 'EN_CURSO']
+)
+RETURNS TABLE (
+    reservado BOOLEAN,
+    cupos_disponibles INTEGER,
+    mensaje TEXT
+) AS $$
+DECLARE
+    v_programa programas%ROWTYPE;
+    v_restantes INTEGER;
+BEGIN
+    IF p_cantidad IS NULL OR p_cantidad <= 0 THEN
+        RETURN QUERY SELECT FALSE, 0, 'La cantidad de cupos a reservar debe ser mayor a 0'::TEXT;
+        RETURN;
+    END IF;
+
+    -- UPDATE condicional: si otra sesión modificó la fila, PostgreSQL espera
+    -- su confirmación y vuelve a evaluar la condición sobre la versión nueva,
+    -- así dos reservas simultáneas nunca superan cupos_maximos. El bloqueo
+    -- de la fila se mantiene hasta el final de la transacción.
+    UPDATE programas p
+    SET cupos_inscritos = p.cupos_inscritos + p_cantidad
+    WHERE p.id = p_programa_id
+      AND (p_estados_permitidos IS NULL OR p.estado = ANY(p_estados_permitidos))
+      AND (p.cupos_maximos IS NULL OR p.cupos_inscritos + p_cantidad <= p.cupos_maximos)
+    RETURNING COALESCE(p.cupos_maximos - p.cupos_inscritos, 9999) INTO v_restantes;
+
+    IF FOUND THEN
+        RETURN QUERY SELECT TRUE, v_restantes, format('%s cupo(s) reservado(s)', p_cantidad);
+        RETURN;
+    END IF;
+
+    -- Sin reserva: explicar el motivo
+    SELECT * INTO v_programa FROM programas WHERE id = p_programa_id;
+
+    IF NOT FOUND THEN
+        RETURN QUERY SELECT FALSE, 0, 'Programa no encontrado'::TEXT;
+    ELSIF p_estados_permitidos IS NOT NULL AND NOT (v_programa.estado = ANY(p_estados_permitidos)) THEN
+        RETURN QUERY SELECT FALSE, 0,
+            ('Programa no está en periodo de inscripciones. Estado: ' || v_programa.estado)::TEXT;
+    ELSE
+        v_restantes := GREATEST(v_programa.cupos_maximos - v_programa.cupos_inscritos, 0);
+        RETURN QUERY SELECT FALSE, v_restantes,
+            CASE WHEN v_restantes = 0 THEN 'Cupos agotados'
+                 ELSE format('Cupos insuficientes: se solicitaron %s y quedan %s', p_cantidad, v_restantes)
+            END;
+    END IF;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION fn_liberar_cupos(
+    p_programa_id INTEGER,
+    p_cantidad INTEGER DEFAULT 1
+)
+RETURNS INTEGER AS $$
+DECLARE
+    v_inscritos INTEGER;
+BEGIN
+    UPDATE programas
+    SET cupos_inscritos = GREATEST(cupos_inscritos - p_cantidad, 0)
+    WHERE id = p_programa_id
+    RETURNING cupos_inscritos INTO v_inscritos;
+
+    RETURN v_inscritos;
+END;
+$$ LANGUAGE plpgsql;
+
+-- 9.8 Archivo de programas concluidos o cancelados hace más de N años
+CREATE OR REPLACE FUNCTION fn_archivar_programas(
+    p_anios INTEGER DEFAULT 5,
+    p_limite INTEGER DEFAULT 50
+)
+RETURNS TABLE (
+    programa_id INTEGER,
+    codigo VARCHAR,
+    estado TEXT,
+    fecha_fin DATE,
+    inscripciones_archivadas INTEGER,
+    transacciones_archivadas INTEGER
+) AS $$
+DECLARE
+    v_programas INTEGER[];
+    v_transacciones INTEGER[];
+BEGIN
+    IF p_anios IS NULL OR p_anios < 1 THEN
+        RAISE EXCEPTION 'La antigüedad mínima para archivar es de 1 año';
+    END IF;
+
+    -- Programas cerrados hace más de p_anios años y sin pagos en trámite;
+    -- SKIP LOCKED: un programa que se está editando queda para la próxima vez
+    v_programas := ARRAY(
+        SELECT p.id
+        FROM programas p
+        WHERE p.estado IN ('CONCLUIDO', 'CANCELADO')
+          AND COALESCE(p.fecha_fin, p.updated_at::DATE) < CURRENT_DATE - make_interval(years => p_anios)
+          AND NOT EXISTS (
+              SELECT 1 FROM transacciones t
+              WHERE t.programa_id = p.id
+                AND t.estado IN ('REGISTRADO', 'PENDIENTE')
+          )
+        ORDER BY p.fecha_fin, p.id
+        LIMIT p_limite
+        FOR UPDATE SKIP LOCKED
+    );
+
+    IF cardinality(v_programas) = 0 THEN
+        RETURN;
+    END IF;
+
+    v_transacciones := ARRAY(
+        SELECT t.id
+        FROM transacciones t
+        WHERE t.programa_id = ANY(v_programas)
+        FOR UPDATE
+    );
+
+    RETURN QUERY
+    SELECT
+        p.id,
+        p.codigo,
+        p.estado::TEXT,
+        p.fecha_fin,
+        (SELECT COUNT(*)::INTEGER FROM inscripciones i WHERE i.programa_id = p.id),
+        (SELECT COUNT(*)::INTEGER FROM transacciones t WHERE t.programa_id = p.id)
+    FROM programas p
+    WHERE p.id = ANY(v_programas)
+    ORDER BY p.fecha_fin, p.id;
+
+    -- Copias con los mismos IDs
+    INSERT INTO programas_archivo
+    SELECT p.*, CURRENT_TIMESTAMP FROM programas p WHERE p.id = ANY(v_programas);
+
+    INSERT INTO inscripciones_archivo
+    SELECT i.*, CURRENT_TIMESTAMP FROM inscripciones i WHERE i.programa_id = ANY(v_programas);
+
+    -- El saldo (columna generada en cuotas_inscripcion) se guarda como valor
+    INSERT INTO cuotas_inscripcion_archivo
+    SELECT c.*, CURRENT_TIMESTAMP
+    FROM cuotas_inscripcion c
+    JOIN inscripciones i ON i.id = c.inscripcion_id
+    WHERE i.programa_id = ANY(v_programas);
+
+    INSERT INTO transacciones_archivo
+    SELECT t.*, CURRENT_TIMESTAMP FROM transacciones t WHERE t.id = ANY(v_transacciones);
+
+    INSERT INTO detalles_transaccion_archivo
+    SELECT d.*, CURRENT_TIMESTAMP FROM detalles_transaccion d WHERE d.transaccion_id = ANY(v_transacciones);
+
+    INSERT INTO documentos_respaldo_archivo
+    SELECT dr.*, CURRENT_TIMESTAMP FROM documentos_respaldo dr WHERE dr.transaccion_id = ANY(v_transacciones);
+
+    -- Inscripciones primero (sus cuotas, ya copiadas, se van en cascada) para que los
+    -- triggers de saldos no recalculen inscripciones que se están archivando
+    DELETE FROM inscripciones i WHERE i.programa_id = ANY(v_programas);
+
+    -- Detalles, documentos y claves de idempotencia se van en cascada;
+    -- movimientos de caja y facturas quedan con transaccion_id en NULL
+    DELETE FROM transacciones t WHERE t.id = ANY(v_transacciones);
+
+    DELETE FROM programas p WHERE p.id = ANY(v_programas);
 END;
 $$ LANGUAGE plpgsql;
 
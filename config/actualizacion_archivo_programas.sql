@@ -0,0 +1,346 @@
+-- ============================================================================
+-- SCRIPT DE ACTUALIZACIÓN: ARCHIVO HISTÓRICO DE PROGRAMAS
+-- Versión: 1.0.0
+-- Descripción: Mueve los programas concluidos o cancelados hace más de N años,
+--              junto con sus inscripciones (y sus cuotas), transacciones,
+--              detalles y documentos de respaldo, a tablas *_archivo con las mismas
+--              columnas (y los mismos IDs). Las tablas de trabajo y sus
+--              índices quedan con los datos vigentes; las consultas
+--              históricas leen ambos niveles a través de las vistas
+--              vw_*_historico y fn_obtener_programa_por_id.
+--              Los movimientos de caja y las facturas no se archivan: conservan
+--              sus montos y su descripción, y su transaccion_id pasa a NULL.
+--              Requiere actualizacion_cierre_caja.sql y
+--              actualizacion_cuotas_inscripcion.sql.
+--              Al agregar columnas a una tabla archivable, agregarlas también
+--              (en la misma posición) a su tabla *_archivo.
+-- ============================================================================
+
+BEGIN;
+
+-- ==================== 1. TABLAS DE ARCHIVO =================================
+CREATE TABLE IF NOT EXISTS programas_archivo (
+    LIKE programas INCLUDING CONSTRAINTS,
+    archivado_en TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (id)
+);
+
+CREATE TABLE IF NOT EXISTS inscripciones_archivo (
+    LIKE inscripciones INCLUDING CONSTRAINTS,
+    archivado_en TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (id)
+);
+
+CREATE TABLE IF NOT EXISTS cuotas_inscripcion_archivo (
+    LIKE cuotas_inscripcion INCLUDING CONSTRAINTS,
+    archivado_en TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (id)
+);
+
+CREATE TABLE IF NOT EXISTS transacciones_archivo (
+    LIKE transacciones INCLUDING CONSTRAINTS,
+    archivado_en TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (id)
+);
+
+CREATE TABLE IF NOT EXISTS detalles_transaccion_archivo (
+    LIKE detalles_transaccion INCLUDING CONSTRAINTS,
+    archivado_en TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (id)
+);
+
+CREATE TABLE IF NOT EXISTS documentos_respaldo_archivo (
+    LIKE documentos_respaldo INCLUDING CONSTRAINTS,
+    archivado_en TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (id)
+);
+
+-- ==================== 2. ÍNDICES ===========================================
+CREATE INDEX IF NOT EXISTS idx_programas_archivo_codigo ON programas_archivo(codigo);
+CREATE INDEX IF NOT EXISTS idx_inscripciones_archivo_estudiante ON inscripciones_archivo(estudiante_id);
+CREATE INDEX IF NOT EXISTS idx_inscripciones_archivo_programa ON inscripciones_archivo(programa_id);
+CREATE INDEX IF NOT EXISTS idx_cuotas_inscripcion_archivo ON cuotas_inscripcion_archivo(inscripcion_id);
+CREATE INDEX IF NOT EXISTS idx_transacciones_archivo_numero ON transacciones_archivo(numero_transaccion);
+CREATE INDEX IF NOT EXISTS idx_transacciones_archivo_estudiante_programa ON transacciones_archivo(estudiante_id, programa_id);
+CREATE INDEX IF NOT EXISTS idx_transacciones_archivo_programa ON transacciones_archivo(programa_id);
+CREATE INDEX IF NOT EXISTS idx_detalles_transaccion_archivo ON detalles_transaccion_archivo(transaccion_id);
+CREATE INDEX IF NOT EXISTS idx_documentos_respaldo_archivo ON documentos_respaldo_archivo(transaccion_id);
+
+-- ==================== 3. VISTAS DE LECTURA HISTÓRICA =======================
+-- Datos vigentes y archivados juntos; archivado_en es NULL en los vigentes
+CREATE OR REPLACE VIEW vw_programas_historico AS
+SELECT p.*, NULL::TIMESTAMP AS archivado_en FROM programas p
+UNION ALL
+SELECT a.* FROM programas_archivo a;
+
+CREATE OR REPLACE VIEW vw_inscripciones_historico AS
+SELECT i.*, NULL::TIMESTAMP AS archivado_en FROM inscripciones i
+UNION ALL
+SELECT a.* FROM inscripciones_archivo a;
+
+CREATE OR REPLACE VIEW vw_cuotas_inscripcion_historico AS
+SELECT c.*, NULL::TIMESTAMP AS archivado_en FROM cuotas_inscripcion c
+UNION ALL
+SELECT a.* FROM cuotas_inscripcion_archivo a;
+
+CREATE OR REPLACE VIEW vw_transacciones_historico AS
+SELECT t.*, NULL::TIMESTAMP AS archivado_en FROM transacciones t
+UNION ALL
+SELECT a.* FROM transacciones_archivo a;
+
+CREATE OR REPLACE VIEW vw_detalles_transaccion_historico AS
+SELECT d.*, NULL::TIMESTAMP AS archivado_en FROM detalles_transaccion d
+UNION ALL
+SELECT a.* FROM detalles_transaccion_archivo a;
+
+-- ==================== 4. ACUMULADOS DE CAJA ================================
+-- Al archivar, el transaccion_id de los movimientos pasa a NULL: esa
+-- actualización no cambia ningún total y no debe rechazarse en días cerrados
+CREATE OR REPLACE FUNCTION fn_acumular_movimientos_caja()
+RETURNS TRIGGER AS $$
+DECLARE
+    v_cambios JSONB;
+    v_fecha_cerrada DATE;
+BEGIN
+    -- Variación por (fecha, forma_pago) de la sentencia completa; las filas
+    -- anteriores restan y las nuevas suman
+    IF TG_OP = 'INSERT' THEN
+        SELECT jsonb_agg(c) INTO v_cambios FROM (
+            SELECT fecha, forma_pago,
+                SUM(monto) FILTER (WHERE tipo = 'INGRESO') AS ingresos,
+                SUM(monto) FILTER (WHERE tipo = 'EGRESO') AS egresos,
+                COUNT(*) FILTER (WHERE tipo = 'INGRESO') AS cantidad_ingresos,
+                COUNT(*) FILTER (WHERE tipo = 'EGRESO') AS cantidad_egresos
+            FROM movimientos_nuevos
+            GROUP BY fecha, forma_pago
+        ) c;
+    ELSIF TG_OP = 'UPDATE' THEN
+        SELECT jsonb_agg(c) INTO v_cambios FROM (
+            SELECT fecha, forma_pago,
+                SUM(signo * monto) FILTER (WHERE tipo = 'INGRESO') AS ingresos,
+                SUM(signo * monto) FILTER (WHERE tipo = 'EGRESO') AS egresos,
+                SUM(signo) FILTER (WHERE tipo = 'INGRESO') AS cantidad_ingresos,
+                SUM(signo) FILTER (WHERE tipo = 'EGRESO') AS cantidad_egresos
+            FROM (
+                SELECT fecha, forma_pago, tipo, monto, 1 AS signo FROM movimientos_nuevos
+                UNION ALL
+                SELECT fecha, forma_pago, tipo, monto, -1 AS signo FROM movimientos_anteriores
+            ) m
+            GROUP BY fecha, forma_pago
+            -- Sólo los grupos cuyos totales cambian: actualizar columnas que no
+            -- los afectan (p. ej. transaccion_id al archivar) no toca días cerrados
+            HAVING SUM(signo * monto) FILTER (WHERE tipo = 'INGRESO') <> 0
+                OR SUM(signo * monto) FILTER (WHERE tipo = 'EGRESO') <> 0
+                OR SUM(signo) FILTER (WHERE tipo = 'INGRESO') <> 0
+                OR SUM(signo) FILTER (WHERE tipo = 'EGRESO') <> 0
+        ) c;
+    ELSIF TG_OP = 'DELETE' THEN
+        SELECT jsonb_agg(c) INTO v_cambios FROM (
+            SELECT fecha, forma_pago,
+                -SUM(monto) FILTER (WHERE tipo = 'INGRESO') AS ingresos,
+                -SUM(monto) FILTER (WHERE tipo = 'EGRESO') AS egresos,
+                -COUNT(*) FILTER (WHERE tipo = 'INGRESO') AS cantidad_ingresos,
+                -COUNT(*) FILTER (WHERE tipo = 'EGRESO') AS cantidad_egresos
+            FROM movimientos_anteriores
+            GROUP BY fecha, forma_pago
+        ) c;
+    END IF;
+
+    IF v_cambios IS NULL THEN
+        RETURN NULL;
+    END IF;
+
+    -- Bloqueo compartido por día: excluye un cierre concurrente del mismo día
+    PERFORM pg_advisory_xact_lock_shared(hashtext('cierre_caja'), d.fecha - DATE '2000-01-01')
+    FROM (
+        SELECT DISTINCT c.fecha
+        FROM jsonb_to_recordset(v_cambios) AS c(fecha DATE)
+        ORDER BY c.fecha
+    ) d;
+
+    SELECT cc.fecha INTO v_fecha_cerrada
+    FROM jsonb_to_recordset(v_cambios) AS c(fecha DATE)
+    JOIN cierres_caja cc ON cc.fecha = c.fecha
+    LIMIT 1;
+
+    IF v_fecha_cerrada IS NOT NULL THEN
+        RAISE EXCEPTION 'La caja del % ya está cerrada; no se pueden modificar sus movimientos', v_fecha_cerrada;
+    END IF;
+
+    INSERT INTO caja_resumen_diario AS r (
+        fecha, forma_pago, ingresos, egresos, cantidad_ingresos, cantidad_egresos
+    )
+    SELECT c.fecha, c.forma_pago,
+        COALESCE(c.ingresos, 0), COALESCE(c.egresos, 0),
+        COALESCE(c.cantidad_ingresos, 0), COALESCE(c.cantidad_egresos, 0)
+    FROM jsonb_to_recordset(v_cambios) AS c(
+        fecha DATE, forma_pago TEXT, ingresos NUMERIC, egresos NUMERIC,
+        cantidad_ingresos INTEGER, cantidad_egresos INTEGER
+    )
+    ON CONFLICT ON CONSTRAINT pk_caja_resumen_diario DO UPDATE
+    SET ingresos = r.ingresos + EXCLUDED.ingresos,
+        egresos = r.egresos + EXCLUDED.egresos,
+        cantidad_ingresos = r.cantidad_ingresos + EXCLUDED.cantidad_ingresos,
+        cantidad_egresos = r.cantidad_egresos + EXCLUDED.cantidad_egresos,
+        updated_at = CURRENT_TIMESTAMP;
+
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+-- ==================== 5. ARCHIVO DE PROGRAMAS ==============================
+CREATE OR REPLACE FUNCTION fn_archivar_programas(
+    p_anios INTEGER DEFAULT 5,
+    p_limite INTEGER DEFAULT 50
+)
+RETURNS TABLE (
+    programa_id INTEGER,
+    codigo VARCHAR,
+    estado TEXT,
+    fecha_fin DATE,
+    inscripciones_archivadas INTEGER,
+    transacciones_archivadas INTEGER
+) AS $$
+DECLARE
+    v_programas INTEGER[];
+    v_transacciones INTEGER[];
+BEGIN
+    IF p_anios IS NULL OR p_anios < 1 THEN
+        RAISE EXCEPTION 'La antigüedad mínima para archivar es de 1 año';
+    END IF;
+
+    -- Programas cerrados hace más de p_anios años y sin pagos en trámite;
+    -- SKIP LOCKED: un programa que se está editando queda para la próxima vez
+    v_programas := ARRAY(
+        SELECT p.id
+        FROM programas p
+        WHERE p.estado IN ('CONCLUIDO', 'CANCELADO')
+          AND COALESCE(p.fecha_fin, p.updated_at::DATE) < CURRENT_DATE - make_interval(years => p_anios)
+          AND NOT EXISTS (
+              SELECT 1 FROM transacciones t
+              WHERE t.programa_id = p.id
+                AND t.estado IN ('REGISTRADO', 'PENDIENTE')
+          )
+        ORDER BY p.fecha_fin, p.id
+        LIMIT p_limite
+        FOR UPDATE SKIP LOCKED
+    );
+
+    IF cardinality(v_programas) = 0 THEN
+        RETURN;
+    END IF;
+
+    v_transacciones := ARRAY(
+        SELECT t.id
+        FROM transacciones t
+        WHERE t.programa_id = ANY(v_programas)
+        FOR UPDATE
+    );
+
+    RETURN QUERY
+    SELECT
+        p.id,
+        p.codigo,
+        p.estado::TEXT,
+        p.fecha_fin,
+        (SELECT COUNT(*)::INTEGER FROM inscripciones i WHERE i.programa_id = p.id),
+        (SELECT COUNT(*)::INTEGER FROM transacciones t WHERE t.programa_id = p.id)
+    FROM programas p
+    WHERE p.id = ANY(v_programas)
+    ORDER BY p.fecha_fin, p.id;
+
+    -- Copias con los mismos IDs
+    INSERT INTO programas_archivo
+    SELECT p.*, CURRENT_TIMESTAMP FROM programas p WHERE p.id = ANY(v_programas);
+
+    INSERT INTO inscripciones_archivo
+    SELECT i.*, CURRENT_TIMESTAMP FROM inscripciones i WHERE i.programa_id = ANY(v_programas);
+
+    -- El saldo (columna generada en cuotas_inscripcion) se guarda como valor
+    INSERT INTO cuotas_inscripcion_archivo
+    SELECT c.*, CURRENT_TIMESTAMP
+    FROM cuotas_inscripcion c
+    JOIN inscripciones i ON i.id = c.inscripcion_id
+    WHERE i.programa_id = ANY(v_programas);
+
+    INSERT INTO transacciones_archivo
+    SELECT t.*, CURRENT_TIMESTAMP FROM transacciones t WHERE t.id = ANY(v_transacciones);
+
+    INSERT INTO detalles_transaccion_archivo
+    SELECT d.*, CURRENT_TIMESTAMP FROM detalles_transaccion d WHERE d.transaccion_id = ANY(v_transacciones);
+
+    INSERT INTO documentos_respaldo_archivo
+    SELECT dr.*, CURRENT_TIMESTAMP FROM documentos_respaldo dr WHERE dr.transaccion_id = ANY(v_transacciones);
+
+    -- Inscripciones primero (sus cuotas, ya copiadas, se van en cascada) para que los
+    -- triggers de saldos no recalculen inscripciones que se están archivando
+    DELETE FROM inscripciones i WHERE i.programa_id = ANY(v_programas);
+
+    -- Detalles, documentos y claves de idempotencia se van en cascada;
+    -- movimientos de caja y facturas quedan con transaccion_id en NULL
+    DELETE FROM transacciones t WHERE t.id = ANY(v_transacciones);
+
+    DELETE FROM programas p WHERE p.id = ANY(v_programas);
+END;
+$$ LANGUAGE plpgsql;
+
+-- ==================== 6. LECTURA TRANSPARENTE ==============================
+CREATE OR REPLACE FUNCTION fn_obtener_programa_por_id(p_id INTEGER)
+RETURNS TABLE(
+    id INTEGER,
+    codigo VARCHAR,
+    nombre VARCHAR,
+    descripcion TEXT,
+    duracion_meses INTEGER,
+    horas_totales INTEGER,
+    costo_total DECIMAL,
+    costo_matricula DECIMAL,
+    costo_inscripcion DECIMAL,
+    costo_mensualidad DECIMAL,
+    numero_cuotas INTEGER,
+    cupos_maximos INTEGER,
+    cupos_inscritos INTEGER,
+    estado d_estado_programa,
+    fecha_inicio DATE,
+    fecha_fin DATE,
+    docente_coordinador_id INTEGER,
+    promocion_descuento DECIMAL,
+    promocion_descripcion TEXT,
+    promocion_valido_hasta DATE,
+    created_at TIMESTAMP,
+    updated_at TIMESTAMP
+) AS $$
+BEGIN
+    RETURN QUERY
+    SELECT 
+        p.id, p.codigo, p.nombre, p.descripcion, p.duracion_meses, p.horas_totales,
+        p.costo_total, p.costo_matricula, p.costo_inscripcion, p.costo_mensualidad,
+        p.numero_cuotas, p.cupos_maximos, p.cupos_inscritos, p.estado,
+        p.fecha_inicio, p.fecha_fin, p.docente_coordinador_id,
+        p.promocion_descuento, p.promocion_descripcion, p.promocion_valido_hasta,
+        p.created_at, p.updated_at
+    FROM programas p
+    WHERE p.id = p_id;
+
+    -- Si no está vigente, buscarlo en el archivo histórico
+    IF NOT FOUND THEN
+        RETURN QUERY
+        SELECT 
+            p.id, p.codigo, p.nombre, p.descripcion, p.duracion_meses, p.horas_totales,
+            p.costo_total, p.costo_matricula, p.costo_inscripcion, p.costo_mensualidad,
+            p.numero_cuotas, p.cupos_maximos, p.cupos_inscritos, p.estado,
+            p.fecha_inicio, p.fecha_fin, p.docente_coordinador_id,
+            p.promocion_descuento, p.promocion_descripcion, p.promocion_valido_hasta,
+            p.created_at, p.updated_at
+        FROM programas_archivo p
+        WHERE p.id = p_id;
+    END IF;
+END;
+$$ LANGUAGE plpgsql;
+
+COMMIT;
+
+DO $$
+BEGIN
+    RAISE NOTICE '✅ Archivo histórico de programas instalado';
+END $$;
@@ -0,0 +1,382 @@
+-- ============================================================================
+-- SCRIPT DE ACTUALIZACIÓN: CIERRE DE CAJA DIARIO
+-- Versión: 1.0.0
+-- Descripción: Acumulados de caja por día y forma de pago mantenidos de forma
+--              incremental desde movimientos_caja (trigger por sentencia con
+--              tablas de transición), cierres diarios congelados con saldo
+--              acumulado y reporte de caja servido desde los acumulados.
+-- ============================================================================
+
+BEGIN;
+
+-- ==================== 1. TABLAS ============================================
+CREATE TABLE IF NOT EXISTS caja_resumen_diario (
+    fecha DATE NOT NULL,
+    forma_pago d_forma_pago NOT NULL,
+    ingresos DECIMAL(12,2) NOT NULL DEFAULT 0,
+    egresos DECIMAL(12,2) NOT NULL DEFAULT 0,
+    cantidad_ingresos INTEGER NOT NULL DEFAULT 0,
+    cantidad_egresos INTEGER NOT NULL DEFAULT 0,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+
+    CONSTRAINT pk_caja_resumen_diario PRIMARY KEY (fecha, forma_pago)
+);
+
+CREATE TABLE IF NOT EXISTS cierres_caja (
+    fecha DATE PRIMARY KEY,
+    total_ingresos DECIMAL(12,2) NOT NULL,
+    total_egresos DECIMAL(12,2) NOT NULL,
+    saldo_anterior DECIMAL(14,2) NOT NULL,
+    saldo_final DECIMAL(14,2) NOT NULL,
+    cantidad_movimientos INTEGER NOT NULL,
+    detalle_formas_pago JSONB NOT NULL DEFAULT '[]',
+    cerrado_por INTEGER NOT NULL,
+    cerrado_en TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    observaciones TEXT,
+
+    CONSTRAINT fk_cierre_caja_usuario
+        FOREIGN KEY (cerrado_por)
+        REFERENCES usuarios(id)
+        ON DELETE RESTRICT
+);
+
+-- ==================== 2. ACUMULADOS INCREMENTALES ==========================
+-- Origen de los acumulados: el movimiento de caja de cada pago confirmado,
+-- también cuando se confirma con un UPDATE posterior, y su reverso al anularse
+CREATE OR REPLACE FUNCTION fn_registrar_movimiento_caja()
+RETURNS TRIGGER AS $$
+DECLARE
+    v_neto NUMERIC(12,2);
+BEGIN
+    -- El pago entra a caja al registrarse ya confirmado o al confirmarse
+    -- después (TransaccionOverlay y fn_finalizar_transaccion usan UPDATE)
+    IF (TG_OP = 'INSERT' AND NEW.estado = 'CONFIRMADO')
+       OR (TG_OP = 'UPDATE' AND OLD.estado IS DISTINCT FROM 'CONFIRMADO' AND NEW.estado = 'CONFIRMADO') THEN
+        INSERT INTO movimientos_caja (fecha, tipo, transaccion_id, monto, forma_pago, descripcion, usuario_id)
+        VALUES (
+            NEW.fecha_pago,
+            'INGRESO',
+            NEW.id,
+            NEW.monto_final,
+            NEW.forma_pago,
+            'Pago transacción ' || NEW.numero_transaccion,
+            NEW.registrado_por
+        );
+
+    -- Pago confirmado que se anula: sus movimientos de días abiertos se
+    -- eliminan; si el ingreso ya quedó en un cierre se compensa con un
+    -- egreso en la fecha de la anulación
+    ELSIF TG_OP = 'UPDATE' AND OLD.estado = 'CONFIRMADO' AND NEW.estado IS DISTINCT FROM 'CONFIRMADO' THEN
+        DELETE FROM movimientos_caja m
+        WHERE m.transaccion_id = NEW.id
+        AND NOT EXISTS (SELECT 1 FROM cierres_caja cc WHERE cc.fecha = m.fecha);
+
+        SELECT COALESCE(SUM(CASE WHEN m.tipo = 'INGRESO' THEN m.monto ELSE -m.monto END), 0)
+        INTO v_neto
+        FROM movimientos_caja m
+        WHERE m.transaccion_id = NEW.id;
+
+        IF v_neto > 0 THEN
+            INSERT INTO movimientos_caja (fecha, tipo, transaccion_id, monto, forma_pago, descripcion, usuario_id)
+            VALUES (
+                CURRENT_DATE,
+                'EGRESO',
+                NEW.id,
+                v_neto,
+                NEW.forma_pago,
+                'Anulación transacción ' || NEW.numero_transaccion,
+                NEW.registrado_por
+            );
+        END IF;
+    END IF;
+    RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS tr_registrar_movimiento_caja ON transacciones;
+
+CREATE TRIGGER tr_registrar_movimiento_caja
+    AFTER INSERT OR UPDATE OF estado ON transacciones
+    FOR EACH ROW
+    EXECUTE FUNCTION fn_registrar_movimiento_caja();
+
+CREATE OR REPLACE FUNCTION fn_acumular_movimientos_caja()
+RETURNS TRIGGER AS $$
+DECLARE
+    v_cambios JSONB;
+    v_fecha_cerrada DATE;
+BEGIN
+    -- Variación por (fecha, forma_pago) de la sentencia completa; las filas
+    -- anteriores restan y las nuevas suman
+    IF TG_OP = 'INSERT' THEN
+        SELECT jsonb_agg(c) INTO v_cambios FROM (
+            SELECT fecha, forma_pago,
+                SUM(monto) FILTER (WHERE tipo = 'INGRESO') AS ingresos,
+                SUM(monto) FILTER (WHERE tipo = 'EGRESO') AS egresos,
+                COUNT(*) FILTER (WHERE tipo = 'INGRESO') AS cantidad_ingresos,
+                COUNT(*) FILTER (WHERE tipo = 'EGRESO') AS cantidad_egresos
+            FROM movimientos_nuevos
+            GROUP BY fecha, forma_pago
+        ) c;
+    ELSIF TG_OP = 'UPDATE' THEN
+        SELECT jsonb_agg(c) INTO v_cambios FROM (
+            SELECT fecha, forma_pago,
+                SUM(signo * monto) FILTER (WHERE tipo = 'INGRESO') AS ingresos,
+                SUM(signo * monto) FILTER (WHERE tipo = 'EGRESO') AS egresos,
+                SUM(signo) FILTER (WHERE tipo = 'INGRESO') AS cantidad_ingresos,
+                SUM(signo) FILTER (WHERE tipo = 'EGRESO') AS cantidad_egresos
+            FROM (
+                SELECT fecha, forma_pago, tipo, monto, 1 AS signo FROM movimientos_nuevos
+                UNION ALL
+                SELECT fecha, forma_pago, tipo, monto, -1 AS signo FROM movimientos_anteriores
+            ) m
+            GROUP BY fecha, forma_pago
+        ) c;
+    ELSIF TG_OP = 'DELETE' THEN
+        SELECT jsonb_agg(c) INTO v_cambios FROM (
+            SELECT fecha, forma_pago,
+                -SUM(monto) FILTER (WHERE tipo = 'INGRESO') AS ingresos,
+                -SUM(monto) FILTER (WHERE tipo = 'EGRESO') AS egresos,
+                -COUNT(*) FILTER (WHERE tipo = 'INGRESO') AS cantidad_ingresos,
+                -COUNT(*) FILTER (WHERE tipo = 'EGRESO') AS cantidad_egresos
+            FROM movimientos_anteriores
+            GROUP BY fecha, forma_pago
+        ) c;
+    END IF;
+
+    IF v_cambios IS NULL THEN
+        RETURN NULL;
+    END IF;
+
+    -- Bloqueo compartido por día: excluye un cierre concurrente del mismo día
+    PERFORM pg_advisory_xact_lock_shared(hashtext('cierre_caja'), d.fecha - DATE '2000-01-01')
+    FROM (
+        SELECT DISTINCT c.fecha
+        FROM jsonb_to_recordset(v_cambios) AS c(fecha DATE)
+        ORDER BY c.fecha
+    ) d;
+
+    SELECT cc.fecha INTO v_fecha_cerrada
+    FROM jsonb_to_recordset(v_cambios) AS c(fecha DATE)
+    JOIN cierres_caja cc ON cc.fecha = c.fecha
+    LIMIT 1;
+
+    IF v_fecha_cerrada IS NOT NULL THEN
+        RAISE EXCEPTION 'La caja del % ya está cerrada; no se pueden modificar sus movimientos', v_fecha_cerrada;
+    END IF;
+
+    INSERT INTO caja_resumen_diario AS r (
+        fecha, forma_pago, ingresos, egresos, cantidad_ingresos, cantidad_egresos
+    )
+    SELECT c.fecha, c.forma_pago,
+        COALESCE(c.ingresos, 0), COALESCE(c.egresos, 0),
+        COALESCE(c.cantidad_ingresos, 0), COALESCE(c.cantidad_egresos, 0)
+    FROM jsonb_to_recordset(v_cambios) AS c(
+        fecha DATE, forma_pago TEXT, ingresos NUMERIC, egresos NUMERIC,
+        cantidad_ingresos INTEGER, cantidad_egresos INTEGER
+    )
+    ON CONFLICT ON CONSTRAINT pk_caja_resumen_diario DO UPDATE
+    SET ingresos = r.ingresos + EXCLUDED.ingresos,
+        egresos = r.egresos + EXCLUDED.egresos,
+        cantidad_ingresos = r.cantidad_ingresos + EXCLUDED.cantidad_ingresos,
+        cantidad_egresos = r.cantidad_egresos + EXCLUDED.cantidad_egresos,
+        updated_at = CURRENT_TIMESTAMP;
+
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS tr_acumular_movimientos_caja_ins ON movimientos_caja;
+DROP TRIGGER IF EXISTS tr_acumular_movimientos_caja_upd ON movimientos_caja;
+DROP TRIGGER IF EXISTS tr_acumular_movimientos_caja_del ON movimientos_caja;
+
+CREATE TRIGGER tr_acumular_movimientos_caja_ins
+    AFTER INSERT ON movimientos_caja
+    REFERENCING NEW TABLE AS movimientos_nuevos
+    FOR EACH STATEMENT
+    EXECUTE FUNCTION fn_acumular_movimientos_caja();
+
+CREATE TRIGGER tr_acumular_movimientos_caja_upd
+    AFTER UPDATE ON movimientos_caja
+    REFERENCING OLD TABLE AS movimientos_anteriores NEW TABLE AS movimientos_nuevos
+    FOR EACH STATEMENT
+    EXECUTE FUNCTION fn_acumular_movimientos_caja();
+
+CREATE TRIGGER tr_acumular_movimientos_caja_del
+    AFTER DELETE ON movimientos_caja
+    REFERENCING OLD TABLE AS movimientos_anteriores
+    FOR EACH STATEMENT
+    EXECUTE FUNCTION fn_acumular_movimientos_caja();
+
+-- ==================== 3. CIERRE Y REAPERTURA ===============================
+CREATE OR REPLACE FUNCTION fn_cerrar_caja(
+    p_fecha DATE,
+    p_usuario_id INTEGER,
+    p_observaciones TEXT DEFAULT NULL
+)
+RETURNS SETOF cierres_caja AS $$
+DECLARE
+    v_ultimo_cierre cierres_caja%ROWTYPE;
+    v_saldo_anterior NUMERIC(14,2);
+BEGIN
+    -- Bloqueo exclusivo del día: espera a los movimientos en curso y bloquea
+    -- los nuevos hasta confirmar el cierre
+    PERFORM pg_advisory_xact_lock(hashtext('cierre_caja'), p_fecha - DATE '2000-01-01');
+
+    IF EXISTS (SELECT 1 FROM cierres_caja WHERE fecha = p_fecha) THEN
+        RAISE EXCEPTION 'La caja del % ya está cerrada', p_fecha;
+    END IF;
+
+    -- Saldo anterior: último cierre más los días intermedios sin cerrar
+    SELECT * INTO v_ultimo_cierre
+    FROM cierres_caja
+    WHERE fecha < p_fecha
+    ORDER BY fecha DESC
+    LIMIT 1;
+
+    SELECT COALESCE(v_ultimo_cierre.saldo_final, 0) + COALESCE(SUM(r.ingresos - r.egresos), 0)
+    INTO v_saldo_anterior
+    FROM caja_resumen_diario r
+    WHERE r.fecha < p_fecha
+    AND (v_ultimo_cierre.fecha IS NULL OR r.fecha > v_ultimo_cierre.fecha);
+
+    RETURN QUERY
+    WITH cierre AS (
+        INSERT INTO cierres_caja (
+            fecha, total_ingresos, total_egresos, saldo_anterior, saldo_final,
+            cantidad_movimientos, detalle_formas_pago, cerrado_por, observaciones
+        )
+        SELECT
+            p_fecha,
+            COALESCE(SUM(r.ingresos), 0),
+            COALESCE(SUM(r.egresos), 0),
+            v_saldo_anterior,
+            v_saldo_anterior + COALESCE(SUM(r.ingresos - r.egresos), 0),
+            COALESCE(SUM(r.cantidad_ingresos + r.cantidad_egresos), 0),
+            COALESCE(
+                jsonb_agg(jsonb_build_object(
+                    'forma_pago', r.forma_pago,
+                    'ingresos', r.ingresos,
+                    'egresos', r.egresos,
+                    'neto', r.ingresos - r.egresos,
+                    'cantidad', r.cantidad_ingresos + r.cantidad_egresos
+                ) ORDER BY r.forma_pago) FILTER (WHERE r.forma_pago IS NOT NULL),
+                '[]'::JSONB
+            ),
+            p_usuario_id,
+            p_observaciones
+        FROM caja_resumen_diario r
+        WHERE r.fecha = p_fecha
+        RETURNING *
+    )
+    SELECT * FROM cierre;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION fn_reabrir_caja(p_fecha DATE)
+RETURNS BOOLEAN AS $$
+BEGIN
+    -- Sólo se puede reabrir el último cierre para no invalidar los saldos
+    -- congelados de los días siguientes
+    PERFORM pg_advisory_xact_lock(hashtext('cierre_caja'), p_fecha - DATE '2000-01-01');
+
+    IF EXISTS (SELECT 1 FROM cierres_caja WHERE fecha > p_fecha) THEN
+        RAISE EXCEPTION 'No se puede reabrir la caja del %: existen cierres posteriores', p_fecha;
+    END IF;
+
+    DELETE FROM cierres_caja WHERE fecha = p_fecha;
+    RETURN FOUND;
+END;
+$$ LANGUAGE plpgsql;
+
+-- ==================== 4. REPORTE DESDE ACUMULADOS ==========================
+CREATE OR REPLACE FUNCTION fn_reporte_caja(p_desde DATE, p_hasta DATE)
+RETURNS TABLE(
+    fecha DATE,
+    forma_pago TEXT,
+    ingresos NUMERIC,
+    egresos NUMERIC,
+    neto NUMERIC,
+    cantidad INTEGER,
+    saldo_acumulado NUMERIC,
+    cerrado BOOLEAN
+) AS $$
+    SELECT
+        r.fecha,
+        r.forma_pago::TEXT,
+        r.ingresos,
+        r.egresos,
+        r.ingresos - r.egresos,
+        r.cantidad_ingresos + r.cantidad_egresos,
+        COALESCE(b.saldo, 0)
+            + SUM(r.ingresos - r.egresos) OVER (PARTITION BY r.forma_pago ORDER BY r.fecha),
+        cc.fecha IS NOT NULL
+    FROM caja_resumen_diario r
+    LEFT JOIN (
+        SELECT forma_pago, SUM(ingresos - egresos) AS saldo
+        FROM caja_resumen_diario
+        WHERE fecha < p_desde
+        GROUP BY forma_pago
+    ) b ON b.forma_pago = r.forma_pago
+    LEFT JOIN cierres_caja cc ON cc.fecha = r.fecha
+    WHERE r.fecha BETWEEN p_desde AND p_hasta
+    ORDER BY r.fecha, r.forma_pago;
+$$ LANGUAGE sql STABLE;
+
+-- ==================== 5. CARGA INICIAL DE ACUMULADOS =======================
+LOCK TABLE movimientos_caja IN SHARE ROW EXCLUSIVE MODE;
+
+-- Pagos confirmados por UPDATE con la versión anterior del trigger (sólo
+-- INSERT) quedaron sin movimiento de caja; se completan salvo en días cerrados
+INSERT INTO movimientos_caja (fecha, tipo, transaccion_id, monto, forma_pago, descripcion, usuario_id)
+SELECT t.fecha_pago, 'INGRESO', t.id, t.monto_final, t.forma_pago,
+    'Pago transacción ' || t.numero_transaccion, t.registrado_por
+FROM transacciones t
+WHERE t.estado = 'CONFIRMADO'
+AND NOT EXISTS (SELECT 1 FROM movimientos_caja m WHERE m.transaccion_id = t.id)
+AND NOT EXISTS (SELECT 1 FROM cierres_caja cc WHERE cc.fecha = t.fecha_pago);
+
+-- Pagos anulados después de confirmarse conservaban su ingreso: se eliminan
+-- los movimientos de días abiertos y se compensan los que ya están cerrados
+DELETE FROM movimientos_caja m
+USING transacciones t
+WHERE m.transaccion_id = t.id
+AND t.estado <> 'CONFIRMADO'
+AND NOT EXISTS (SELECT 1 FROM cierres_caja cc WHERE cc.fecha = m.fecha);
+
+INSERT INTO movimientos_caja (fecha, tipo, transaccion_id, monto, forma_pago, descripcion, usuario_id)
+SELECT CURRENT_DATE, 'EGRESO', t.id, n.neto, t.forma_pago,
+    'Anulación transacción ' || t.numero_transaccion, t.registrado_por
+FROM transacciones t
+JOIN (
+    SELECT transaccion_id,
+        SUM(CASE WHEN tipo = 'INGRESO' THEN monto ELSE -monto END) AS neto
+    FROM movimientos_caja
+    GROUP BY transaccion_id
+) n ON n.transaccion_id = t.id
+WHERE t.estado <> 'CONFIRMADO'
+AND n.neto > 0
+AND NOT EXISTS (SELECT 1 FROM cierres_caja cc WHERE cc.fecha = CURRENT_DATE);
+
+TRUNCATE caja_resumen_diario;
+
+INSERT INTO caja_resumen_diario (
+    fecha, forma_pago, ingresos, egresos, cantidad_ingresos, cantidad_egresos
+)
+SELECT
+    fecha,
+    forma_pago,
+    COALESCE(SUM(monto) FILTER (WHERE tipo = 'INGRESO'), 0),
+    COALESCE(SUM(monto) FILTER (WHERE tipo = 'EGRESO'), 0),
+    COUNT(*) FILTER (WHERE tipo = 'INGRESO'),
+    COUNT(*) FILTER (WHERE tipo = 'EGRESO')
+FROM movimientos_caja
+GROUP BY fecha, forma_pago;
+
+COMMIT;
+
+DO $$
+BEGIN
+    RAISE NOTICE '✅ Cierre de caja disponible: % días con movimientos acumulados',
+        (SELECT COUNT(DISTINCT fecha) FROM caja_resumen_diario);
+END $$;
@@ -0,0 +1,272 @@
+-- ============================================================================
+-- SCRIPT DE ACTUALIZACIÓN: CRONOGRAMA DE CUOTAS POR INSCRIPCIÓN
+-- Versión: 1.0.0
+-- Descripción: Materializa el plan de cuotas de cada inscripción en la tabla
+--              cuotas_inscripcion. El plan se genera al crear la inscripción
+--              (o al cambiar su valor_final / programa, o el plan del
+--              programa) y los pagos se aplican a las cuotas cuando cambia
+--              inscripciones.total_pagado, que ya mantienen los triggers de
+--              saldos precalculados. Las consultas de cuotas vencidas y
+--              próximas a vencer pasan a ser recorridos por rango sobre
+--              fecha_vencimiento.
+--              Requiere actualizacion_saldos_inscripciones.sql.
+-- ============================================================================
+
+BEGIN;
+
+-- ==================== 1. TABLA =============================================
+CREATE TABLE IF NOT EXISTS cuotas_inscripcion (
+    id SERIAL PRIMARY KEY,
+    inscripcion_id INTEGER NOT NULL,
+    numero_cuota INTEGER NOT NULL,
+    concepto VARCHAR(100) NOT NULL,
+    fecha_vencimiento DATE NOT NULL,
+    monto NUMERIC(12,2) NOT NULL,
+    monto_pagado NUMERIC(12,2) NOT NULL DEFAULT 0,
+    saldo NUMERIC(12,2) GENERATED ALWAYS AS (monto - monto_pagado) STORED,
+
+    CONSTRAINT fk_cuota_inscripcion
+        FOREIGN KEY (inscripcion_id)
+        REFERENCES inscripciones(id)
+        ON DELETE CASCADE,
+
+    CONSTRAINT uk_cuota_inscripcion UNIQUE (inscripcion_id, numero_cuota),
+    CONSTRAINT ck_cuota_montos CHECK (monto >= 0 AND monto_pagado >= 0 AND monto_pagado <= monto)
+);
+
+-- Cuotas con saldo: vencidas (fecha < hoy) y próximas (hoy .. hoy + n días)
+CREATE INDEX IF NOT EXISTS idx_cuotas_inscripcion_pendientes
+    ON cuotas_inscripcion(fecha_vencimiento)
+    INCLUDE (inscripcion_id, saldo)
+    WHERE monto_pagado < monto;
+
+-- ==================== 2. GENERACIÓN Y APLICACIÓN DE PAGOS ==================
+CREATE OR REPLACE FUNCTION fn_aplicar_pagos_cuotas(p_inscripcion_id INTEGER)
+RETURNS INTEGER AS $$
+DECLARE
+    v_actualizadas INTEGER;
+BEGIN
+    -- El total pagado de la inscripción cubre las cuotas en orden; sólo se
+    -- escriben las cuotas cuyo monto_pagado cambia.
+    UPDATE cuotas_inscripcion c
+    SET monto_pagado = d.monto_pagado
+    FROM (
+        SELECT
+            c2.id,
+            LEAST(c2.monto, GREATEST(i.total_pagado - COALESCE(SUM(c2.monto) OVER (
+                ORDER BY c2.numero_cuota
+                ROWS BETWEEN UNBOUNDED PRECEDING AND 1 PRECEDING
+            ), 0), 0)) AS monto_pagado
+        FROM cuotas_inscripcion c2
+        JOIN inscripciones i ON i.id = c2.inscripcion_id
+        WHERE c2.inscripcion_id = p_inscripcion_id
+    ) d
+    WHERE c.id = d.id
+      AND c.monto_pagado IS DISTINCT FROM d.monto_pagado;
+
+    GET DIAGNOSTICS v_actualizadas = ROW_COUNT;
+    RETURN v_actualizadas;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION fn_generar_cuotas_inscripcion(p_inscripcion_id INTEGER)
+RETURNS INTEGER AS $$
+DECLARE
+    v_cuotas INTEGER;
+BEGIN
+    DELETE FROM cuotas_inscripcion WHERE inscripcion_id = p_inscripcion_id;
+
+    -- Mismo plan que sugería fn_cronograma_pagos_estudiante: numero_cuotas
+    -- mensualidades iguales desde el inicio del programa; la última absorbe
+    -- el redondeo.
+    INSERT INTO cuotas_inscripcion (inscripcion_id, numero_cuota, concepto, fecha_vencimiento, monto)
+    SELECT
+        i.id,
+        gs.n,
+        CONCAT('Cuota ', gs.n, ' - ', p.nombre)::VARCHAR(100),
+        (COALESCE(p.fecha_inicio, i.fecha_inscripcion, CURRENT_DATE) + (gs.n - 1) * INTERVAL '1 month')::DATE,
+        CASE
+            WHEN gs.n < p.numero_cuotas
+                THEN TRUNC(COALESCE(i.valor_final, p.costo_total, 0) / p.numero_cuotas, 2)
+            ELSE COALESCE(i.valor_final, p.costo_total, 0)
+                 - TRUNC(COALESCE(i.valor_final, p.costo_total, 0) / p.numero_cuotas, 2) * (p.numero_cuotas - 1)
+        END
+    FROM inscripciones i
+    JOIN programas p ON p.id = i.programa_id
+    CROSS JOIN generate_series(1, GREATEST(p.numero_cuotas, 1)) AS gs(n)
+    WHERE i.id = p_inscripcion_id;
+
+    GET DIAGNOSTICS v_cuotas = ROW_COUNT;
+
+    PERFORM fn_aplicar_pagos_cuotas(p_inscripcion_id);
+    RETURN v_cuotas;
+END;
+$$ LANGUAGE plpgsql;
+
+-- ==================== 3. TRIGGERS ==========================================
+CREATE OR REPLACE FUNCTION fn_sincronizar_cuotas_inscripcion()
+RETURNS TRIGGER AS $$
+BEGIN
+    -- AFTER: total_pagado ya fue recalculado por tr_calcular_saldo_inscripcion
+    -- o por los triggers de saldos sobre transacciones.
+    IF TG_OP = 'INSERT'
+       OR NEW.valor_final IS DISTINCT FROM OLD.valor_final
+       OR NEW.programa_id IS DISTINCT FROM OLD.programa_id THEN
+        PERFORM fn_generar_cuotas_inscripcion(NEW.id);
+    ELSIF NEW.total_pagado IS DISTINCT FROM OLD.total_pagado THEN
+        PERFORM fn_aplicar_pagos_cuotas(NEW.id);
+    END IF;
+
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS tr_sincronizar_cuotas_inscripcion ON inscripciones;
+
+CREATE TRIGGER tr_sincronizar_cuotas_inscripcion
+    AFTER INSERT OR UPDATE OF valor_final, programa_id, total_pagado ON inscripciones
+    FOR EACH ROW
+    EXECUTE FUNCTION fn_sincronizar_cuotas_inscripcion();
+
+CREATE OR REPLACE FUNCTION fn_regenerar_cuotas_programa()
+RETURNS TRIGGER AS $$
+BEGIN
+    -- Cambio del plan del programa: regenerar las cuotas de sus inscripciones
+    PERFORM fn_generar_cuotas_inscripcion(i.id)
+    FROM inscripciones i
+    WHERE i.programa_id = NEW.id;
+
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS tr_regenerar_cuotas_programa ON programas;
+
+CREATE TRIGGER tr_regenerar_cuotas_programa
+    AFTER UPDATE OF numero_cuotas, fecha_inicio, costo_total ON programas
+    FOR EACH ROW
+    WHEN ((NEW.numero_cuotas, NEW.fecha_inicio, NEW.costo_total)
+          IS DISTINCT FROM
+          (OLD.numero_cuotas, OLD.fecha_inicio, OLD.costo_total))
+    EXECUTE FUNCTION fn_regenerar_cuotas_programa();
+
+-- ==================== 4. LECTURAS DESDE LAS CUOTAS =========================
+CREATE OR REPLACE FUNCTION fn_cronograma_pagos_estudiante(p_estudiante_id INTEGER)
+RETURNS TABLE(
+    programa_id INTEGER,
+    programa_nombre VARCHAR,
+    mes_pago INTEGER,
+    concepto VARCHAR,
+    monto_sugerido DECIMAL(10,2),
+    fecha_sugerida DATE,
+    estado VARCHAR(20)
+)
+LANGUAGE plpgsql
+AS $$
+BEGIN
+    RETURN QUERY
+    SELECT
+        p.id,
+        p.nombre,
+        c.numero_cuota,
+        c.concepto,
+        c.saldo::DECIMAL(10,2),
+        c.fecha_vencimiento,
+        (CASE
+            WHEN c.fecha_vencimiento < CURRENT_DATE THEN 'VENCIDO'
+            ELSE 'PENDIENTE'
+        END)::VARCHAR(20)
+    FROM inscripciones i
+    JOIN programas p ON p.id = i.programa_id
+    JOIN cuotas_inscripcion c ON c.inscripcion_id = i.id
+    WHERE i.estudiante_id = p_estudiante_id
+      AND i.estado <> 'RETIRADO'
+      AND c.monto_pagado < c.monto
+    ORDER BY p.id, c.numero_cuota;
+END;
+$$;
+
+CREATE OR REPLACE FUNCTION fn_resumen_financiero_estudiante(p_estudiante_id INTEGER)
+RETURNS TABLE(
+    total_programas INTEGER,
+    total_inscrito DECIMAL(12,2),
+    total_pagado DECIMAL(12,2),
+    total_deuda DECIMAL(12,2),
+    promedio_pagado DECIMAL(5,2),
+    transacciones_totales INTEGER,
+    ultimo_pago DATE,
+    proximo_vencimiento DATE,
+    estado_financiero VARCHAR(20)
+)
+LANGUAGE plpgsql
+AS $$
+BEGIN
+    RETURN QUERY
+    WITH programas_estudiante AS (
+        SELECT
+            COALESCE(i.valor_final, p.costo_total) AS costo,
+            i.total_pagado AS pagado,
+            i.saldo_pendiente AS deuda,
+            i.ultimo_pago AS ultima_fecha
+        FROM inscripciones i
+        INNER JOIN programas p ON i.programa_id = p.id
+        WHERE i.estudiante_id = p_estudiante_id
+    )
+    SELECT
+        COUNT(*)::INTEGER AS total_programas,
+        COALESCE(SUM(pe.costo), 0)::DECIMAL(12,2) AS total_inscrito,
+        COALESCE(SUM(pe.pagado), 0)::DECIMAL(12,2) AS total_pagado,
+        COALESCE(SUM(pe.deuda), 0)::DECIMAL(12,2) AS total_deuda,
+        CASE
+            WHEN SUM(pe.costo) > 0 THEN
+                ROUND((SUM(pe.pagado) * 100.0 / SUM(pe.costo)), 2)
+            ELSE 0
+        END::DECIMAL(5,2) AS promedio_pagado,
+        (
+            SELECT COUNT(*)
+            FROM transacciones t
+            WHERE t.estudiante_id = p_estudiante_id
+              AND t.estado = 'CONFIRMADO'
+        )::INTEGER AS transacciones_totales,
+        MAX(pe.ultima_fecha) AS ultimo_pago,
+        (
+            SELECT MIN(c.fecha_vencimiento)
+            FROM cuotas_inscripcion c
+            JOIN inscripciones i ON i.id = c.inscripcion_id
+            WHERE i.estudiante_id = p_estudiante_id
+              AND i.estado <> 'RETIRADO'
+              AND c.monto_pagado < c.monto
+        ) AS proximo_vencimiento,
+        CASE
+            WHEN COALESCE(SUM(pe.costo), 0) = 0 THEN 'SIN_PROGRAMAS'
+            WHEN SUM(pe.pagado) >= SUM(pe.costo) THEN 'AL_DIA'
+            WHEN SUM(pe.pagado) >= (SUM(pe.costo) * 0.5) THEN 'PARCIAL'
+            ELSE 'MOROSO'
+        END::VARCHAR(20) AS estado_financiero
+    FROM programas_estudiante pe;
+END;
+$$;
+
+-- ==================== 5. CARGA INICIAL =====================================
+-- Sin pagos concurrentes mientras se generan los planes
+LOCK TABLE transacciones IN SHARE ROW EXCLUSIVE MODE;
+
+DO $$
+DECLARE
+    v_cuotas INTEGER;
+BEGIN
+    SELECT COALESCE(SUM(fn_generar_cuotas_inscripcion(i.id)), 0) INTO v_cuotas
+    FROM inscripciones i
+    WHERE NOT EXISTS (
+        SELECT 1 FROM cuotas_inscripcion c WHERE c.inscripcion_id = i.id
+    );
+
+    RAISE NOTICE '📝 % cuotas generadas para las inscripciones existentes', v_cuotas;
+END $$;
+
+COMMIT;
+
+DO $$
+BEGIN
+    RAISE NOTICE '✅ Cronograma de cuotas por inscripción instalado';
+END $$;
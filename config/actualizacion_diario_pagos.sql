@@ -0,0 +1,116 @@
+-- ============================================================================
+-- SCRIPT DE ACTUALIZACIÓN: FINALIZACIÓN IDEMPOTENTE DE TRANSACCIONES
+-- Versión: 1.0.0
+-- Descripción: Registro de claves de idempotencia y función que guarda los
+--              detalles y confirma una transacción en una sola llamada. El
+--              diario local de pagos reenvía cada operación con su clave; si
+--              la clave ya fue aplicada la llamada no vuelve a insertar nada.
+-- ============================================================================
+
+BEGIN;
+
+-- ==================== 1. CLAVES DE IDEMPOTENCIA ============================
+CREATE TABLE IF NOT EXISTS operaciones_aplicadas (
+    clave_idempotencia UUID PRIMARY KEY,
+    transaccion_id INTEGER NOT NULL,
+    tipo VARCHAR(30) NOT NULL,
+    aplicado_en TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+
+    CONSTRAINT fk_operacion_transaccion
+        FOREIGN KEY (transaccion_id)
+        REFERENCES transacciones(id)
+        ON DELETE CASCADE
+);
+
+CREATE INDEX IF NOT EXISTS idx_operaciones_aplicadas_transaccion
+    ON operaciones_aplicadas(transaccion_id);
+
+-- ==================== 2. FINALIZACIÓN IDEMPOTENTE ==========================
+CREATE OR REPLACE FUNCTION fn_finalizar_transaccion(
+    p_clave UUID,
+    p_transaccion_id INTEGER,
+    p_datos JSONB,
+    p_detalles JSONB DEFAULT '[]'::JSONB
+)
+RETURNS JSONB AS $$
+DECLARE
+    v_transaccion transacciones%ROWTYPE;
+    v_ultimo_orden INTEGER;
+BEGIN
+    -- La clave se registra en la misma transacción que los cambios: o se
+    -- aplica todo, o el reintento la vuelve a encontrar libre
+    INSERT INTO operaciones_aplicadas (clave_idempotencia, transaccion_id, tipo)
+    VALUES (p_clave, p_transaccion_id, 'FINALIZAR')
+    ON CONFLICT (clave_idempotencia) DO NOTHING;
+
+    IF NOT FOUND THEN
+        SELECT * INTO v_transaccion FROM transacciones WHERE id = p_transaccion_id;
+        RETURN jsonb_build_object(
+            'aplicado', FALSE,
+            'duplicado', TRUE,
+            'transaccion', to_jsonb(v_transaccion)
+        );
+    END IF;
+
+    SELECT * INTO v_transaccion
+    FROM transacciones
+    WHERE id = p_transaccion_id
+    FOR UPDATE;
+
+    IF NOT FOUND THEN
+        RAISE EXCEPTION 'La transacción % no existe', p_transaccion_id;
+    END IF;
+
+    IF v_transaccion.estado = 'ANULADO' THEN
+        RAISE EXCEPTION 'La transacción % está anulada', v_transaccion.numero_transaccion;
+    END IF;
+
+    -- Detalles pendientes en un único INSERT
+    IF jsonb_array_length(p_detalles) > 0 THEN
+        SELECT COALESCE(MAX(orden), 0) INTO v_ultimo_orden
+        FROM detalles_transaccion
+        WHERE transaccion_id = p_transaccion_id;
+
+        INSERT INTO detalles_transaccion (
+            transaccion_id, concepto_pago_id, descripcion,
+            cantidad, precio_unitario, subtotal, orden
+        )
+        SELECT
+            p_transaccion_id,
+            (d.value->>'concepto_pago_id')::INTEGER,
+            d.value->>'descripcion',
+            COALESCE((d.value->>'cantidad')::INTEGER, 1),
+            (d.value->>'precio_unitario')::DECIMAL(10,2),
+            (d.value->>'subtotal')::DECIMAL(10,2),
+            COALESCE((d.value->>'orden')::INTEGER, v_ultimo_orden + d.posicion::INTEGER)
+        FROM jsonb_array_elements(p_detalles) WITH ORDINALITY AS d(value, posicion);
+    END IF;
+
+    -- Confirmar con los datos capturados en caja
+    UPDATE transacciones
+    SET fecha_pago = COALESCE((p_datos->>'fecha_pago')::DATE, fecha_pago),
+        forma_pago = COALESCE(p_datos->>'forma_pago', forma_pago),
+        numero_comprobante = COALESCE(p_datos->>'numero_comprobante', numero_comprobante),
+        banco_origen = COALESCE(p_datos->>'banco_origen', banco_origen),
+        cuenta_origen = COALESCE(p_datos->>'cuenta_origen', cuenta_origen),
+        observaciones = COALESCE(p_datos->>'observaciones', observaciones),
+        monto_total = COALESCE((p_datos->>'monto_total')::DECIMAL(10,2), monto_total),
+        monto_final = COALESCE((p_datos->>'monto_final')::DECIMAL(10,2), monto_final),
+        estado = 'CONFIRMADO'
+    WHERE id = p_transaccion_id
+    RETURNING * INTO v_transaccion;
+
+    RETURN jsonb_build_object(
+        'aplicado', TRUE,
+        'duplicado', FALSE,
+        'transaccion', to_jsonb(v_transaccion)
+    );
+END;
+$$ LANGUAGE plpgsql;
+
+COMMIT;
+
+DO $$
+BEGIN
+    RAISE NOTICE '✅ Finalización idempotente de transacciones disponible';
+END $$;
@@ -0,0 +1,110 @@
+-- ============================================================================
+-- SCRIPT DE ACTUALIZACIÓN: ESTUDIANTES DISPONIBLES PARA UN PROGRAMA
+-- Versión: 1.0.0
+-- Descripción: Anti-join indexado y paginado para listar los estudiantes que
+--              aún no están inscritos en un programa, con los criterios de
+--              búsqueda resueltos en el servidor y paginación por clave
+--              (keyset) sobre (apellido_paterno, nombres, id).
+-- ============================================================================
+
+-- ==================== 1. ÍNDICES ===========================================
+-- Anti-join: inscripciones vigentes por (programa, estudiante)
+CREATE INDEX IF NOT EXISTS idx_inscripciones_programa_estudiante_vigentes
+    ON inscripciones (programa_id, estudiante_id)
+    WHERE estado <> 'RETIRADO';
+
+-- Orden de presentación de estudiantes activos: es también la clave de
+-- paginación, así cada página empieza con un salto en el índice
+DROP INDEX IF EXISTS idx_estudiantes_activos_orden;
+CREATE INDEX idx_estudiantes_activos_orden
+    ON estudiantes (apellido_paterno, nombres, id)
+    WHERE activo = TRUE;
+
+-- ==================== 2. FUNCIÓN PAGINADA ==================================
+-- Todos los términos de p_criterios deben aparecer en alguno de los campos
+-- del estudiante. p_limite NULL devuelve todos los registros.
+-- La página siguiente empieza después de la clave (p_despues_apellido,
+-- p_despues_nombres, p_despues_id) de la última fila recibida: a diferencia
+-- de OFFSET, no salta filas cuando el anti-join se achica porque otros
+-- estudiantes se inscribieron entre una página y otra.
+DROP FUNCTION IF EXISTS fn_estudiantes_disponibles_programa_paginado(INTEGER, TEXT, INTEGER, INTEGER);
+
+CREATE OR REPLACE FUNCTION fn_estudiantes_disponibles_programa_paginado(
+    p_programa_id INTEGER,
+    p_criterios TEXT DEFAULT NULL,
+    p_limite INTEGER DEFAULT 50,
+    p_despues_apellido VARCHAR DEFAULT NULL,
+    p_despues_nombres VARCHAR DEFAULT NULL,
+    p_despues_id INTEGER DEFAULT NULL
+)
+RETURNS TABLE (
+    estudiante_id INTEGER,
+    ci_numero VARCHAR,
+    ci_expedicion VARCHAR,
+    ci_completo TEXT,
+    estudiante_nombre TEXT,
+    nombres VARCHAR,
+    apellido_paterno VARCHAR,
+    apellido_materno VARCHAR,
+    email VARCHAR,
+    telefono VARCHAR,
+    profesion VARCHAR,
+    universidad VARCHAR
+)
+LANGUAGE sql
+STABLE
+AS $$
+    WITH patrones AS (
+        SELECT COALESCE(ARRAY_AGG(DISTINCT '%' || t || '%'), '{}'::TEXT[]) AS lista
+        FROM UNNEST(STRING_TO_ARRAY(LOWER(BTRIM(COALESCE(p_criterios, ''))), ' ')) AS t
+        WHERE t <> ''
+    )
+    SELECT
+        e.id,
+        e.ci_numero::VARCHAR,
+        e.ci_expedicion::VARCHAR,
+        CONCAT(e.ci_numero, '-', e.ci_expedicion),
+        TRIM(CONCAT(e.apellido_paterno, ' ', COALESCE(e.apellido_materno, ''), ' ', e.nombres)),
+        e.nombres::VARCHAR,
+        e.apellido_paterno::VARCHAR,
+        e.apellido_materno::VARCHAR,
+        e.email::VARCHAR,
+        e.telefono::VARCHAR,
+        e.profesion::VARCHAR,
+        e.universidad::VARCHAR
+    FROM estudiantes e
+    CROSS JOIN patrones p
+    WHERE e.activo = TRUE
+        AND (
+            p_despues_id IS NULL
+            OR (e.apellido_paterno, e.nombres, e.id)
+                > (p_despues_apellido, p_despues_nombres, p_despues_id)
+        )
+        AND NOT EXISTS (
+            SELECT 1
+            FROM inscripciones i
+            WHERE i.programa_id = p_programa_id
+                AND i.estudiante_id = e.id
+                AND i.estado <> 'RETIRADO'
+        )
+        AND (
+            CARDINALITY(p.lista) = 0
+            OR LOWER(
+                COALESCE(e.ci_numero, '') || '-' || COALESCE(e.ci_expedicion::TEXT, '') || ' ' ||
+                COALESCE(e.nombres, '') || ' ' ||
+                COALESCE(e.apellido_paterno, '') || ' ' ||
+                COALESCE(e.apellido_materno, '') || ' ' ||
+                COALESCE(e.email, '') || ' ' ||
+                COALESCE(e.telefono, '') || ' ' ||
+                COALESCE(e.profesion, '') || ' ' ||
+                COALESCE(e.universidad, '')
+            ) LIKE ALL (p.lista)
+        )
+    ORDER BY e.apellido_paterno, e.nombres, e.id
+    LIMIT p_limite;
+$$;
+
+DO $$
+BEGIN
+    RAISE NOTICE '✅ fn_estudiantes_disponibles_programa_paginado disponible';
+END $$;
@@ -0,0 +1,16 @@
+-- ============================================================================
+-- SCRIPT DE ACTUALIZACIÓN: IMPORTACIÓN MASIVA DE PAGOS DESDE EXTRACTOS
+-- Versión: 1.0.0
+-- Descripción: Índice sobre el número de comprobante de las transacciones,
+--              usado por la conciliación de extractos bancarios para
+--              descartar en una sola consulta los comprobantes ya registrados.
+-- ============================================================================
+
+CREATE INDEX IF NOT EXISTS idx_transacciones_comprobante
+    ON transacciones(numero_comprobante)
+    WHERE numero_comprobante IS NOT NULL;
+
+DO $$
+BEGIN
+    RAISE NOTICE '✅ Índice idx_transacciones_comprobante disponible';
+END $$;
@@ -0,0 +1,74 @@
+-- ============================================================================
+-- SCRIPT DE ACTUALIZACIÓN: NUMERACIÓN DE TRANSACCIONES CON CONTADOR POR AÑO
+-- Versión: 1.0.0
+-- Descripción: Reemplaza el cálculo MAX() sobre transacciones en
+--              fn_generar_numero_transaccion por un contador por año que se
+--              incrementa atómicamente. Crea la tabla y la inicializa con el
+--              último consecutivo existente de cada año.
+-- ============================================================================
+
+-- ==================== 1. TABLA DE CONTADORES ===============================
+CREATE TABLE IF NOT EXISTS contadores_transaccion (
+    anio INTEGER PRIMARY KEY,
+    ultimo_numero INTEGER NOT NULL DEFAULT 0,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    
+    CONSTRAINT ck_ultimo_numero_positivo CHECK (ultimo_numero >= 0)
+);
+
+-- ==================== 2. INICIALIZAR DESDE LOS DATOS EXISTENTES ============
+-- Bloquear inserciones mientras se siembra para no perder números
+BEGIN;
+
+LOCK TABLE transacciones IN SHARE ROW EXCLUSIVE MODE;
+
+INSERT INTO contadores_transaccion (anio, ultimo_numero)
+SELECT
+    SUBSTRING(numero_transaccion FROM '^T-(\d{4})-\d+$')::INTEGER AS anio,
+    MAX(SUBSTRING(numero_transaccion FROM '^T-\d{4}-(\d+)$')::INTEGER) AS ultimo_numero
+FROM transacciones
+WHERE numero_transaccion ~ '^T-\d{4}-\d+$'
+GROUP BY 1
+ON CONFLICT (anio) DO UPDATE
+    SET ultimo_numero = GREATEST(contadores_transaccion.ultimo_numero, EXCLUDED.ultimo_numero),
+        updated_at = CURRENT_TIMESTAMP;
+
+-- ==================== 3. FUNCIÓN DEL TRIGGER ===============================
+CREATE OR REPLACE FUNCTION fn_generar_numero_transaccion()
+RETURNS TRIGGER AS $$
+DECLARE
+    prefijo VARCHAR(10);
+    anio VARCHAR(4);
+    consecutivo INTEGER;
+    nuevo_numero VARCHAR(50);
+BEGIN
+    -- Formato: T-YYYY-000001
+    SELECT TO_CHAR(CURRENT_DATE, 'YYYY') INTO anio;
+    
+    -- Incrementar el contador del año de forma atómica (el bloqueo de fila
+    -- serializa a los cajeros concurrentes sin recorrer transacciones)
+    INSERT INTO contadores_transaccion (anio, ultimo_numero)
+    VALUES (anio::INTEGER, 1)
+    ON CONFLICT ON CONSTRAINT contadores_transaccion_pkey DO UPDATE
+        SET ultimo_numero = contadores_transaccion.ultimo_numero + 1,
+            updated_at = CURRENT_TIMESTAMP
+    RETURNING ultimo_numero INTO consecutivo;
+    
+    nuevo_numero := 'T-' || anio || '-' || LPAD(consecutivo::TEXT, 6, '0');
+    
+    NEW.numero_transaccion := nuevo_numero;
+    RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+
+COMMIT;
+
+-- ==================== 4. VERIFICACIÓN ======================================
+DO $$
+DECLARE
+    v_registro RECORD;
+BEGIN
+    FOR v_registro IN SELECT anio, ultimo_numero FROM contadores_transaccion ORDER BY anio LOOP
+        RAISE NOTICE '✅ Año %: último número %', v_registro.anio, v_registro.ultimo_numero;
+    END LOOP;
+END $$;
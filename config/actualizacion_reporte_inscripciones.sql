@@ -0,0 +1,20 @@
+-- ============================================================================
+-- SCRIPT DE ACTUALIZACIÓN: ÍNDICE PARA REPORTES DE INSCRIPCIONES POR PERIODO
+-- Versión: 1.0.0
+-- Descripción: El reporte de inscripciones agrega (GROUPING SETS) y recorre
+--              las inscripciones por rango de fecha_inscripcion; con este
+--              índice los periodos de varios años no recorren toda la tabla
+--              cuando el rango es selectivo.
+-- ============================================================================
+
+BEGIN;
+
+CREATE INDEX IF NOT EXISTS idx_inscripciones_fecha
+    ON inscripciones(fecha_inscripcion);
+
+COMMIT;
+
+DO $$
+BEGIN
+    RAISE NOTICE '✅ Índice de reportes de inscripciones instalado';
+END $$;
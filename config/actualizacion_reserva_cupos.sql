@@ -0,0 +1,298 @@
+-- ============================================================================
+-- SCRIPT DE ACTUALIZACIÓN: RESERVA ATÓMICA DE CUPOS
+-- Versión: 1.0.0
+-- Descripción: Evita la sobreventa de cupos cuando varias estaciones inscriben
+--              a la vez en el mismo programa. La verificación y el incremento
+--              de cupos_inscritos se hacen en un único UPDATE condicional
+--              dentro de la misma transacción que inserta la inscripción; si
+--              el INSERT falla, la reserva se deshace con él.
+-- ============================================================================
+
+BEGIN;
+
+-- ==================== 1. RESERVA Y LIBERACIÓN DE CUPOS =====================
+CREATE OR REPLACE FUNCTION fn_reservar_cupos(
+    p_programa_id INTEGER,
+    p_cantidad INTEGER DEFAULT 1,
+    p_estados_permitidos TEXT[] DEFAULT ARRAY['INSCRIPCIONES', 'EN_CURSO']
+)
+RETURNS TABLE (
+    reservado BOOLEAN,
+    cupos_disponibles INTEGER,
+    mensaje TEXT
+) AS $$
+DECLARE
+    v_programa programas%ROWTYPE;
+    v_restantes INTEGER;
+BEGIN
+    IF p_cantidad IS NULL OR p_cantidad <= 0 THEN
+        RETURN QUERY SELECT FALSE, 0, 'La cantidad de cupos a reservar debe ser mayor a 0'::TEXT;
+        RETURN;
+    END IF;
+
+    -- UPDATE condicional: si otra sesión modificó la fila, PostgreSQL espera
+    -- su confirmación y vuelve a evaluar la condición sobre la versión nueva,
+    -- así dos reservas simultáneas nunca superan cupos_maximos. El bloqueo
+    -- de la fila se mantiene hasta el final de la transacción.
+    UPDATE programas p
+    SET cupos_inscritos = p.cupos_inscritos + p_cantidad
+    WHERE p.id = p_programa_id
+      AND (p_estados_permitidos IS NULL OR p.estado = ANY(p_estados_permitidos))
+      AND (p.cupos_maximos IS NULL OR p.cupos_inscritos + p_cantidad <= p.cupos_maximos)
+    RETURNING COALESCE(p.cupos_maximos - p.cupos_inscritos, 9999) INTO v_restantes;
+
+    IF FOUND THEN
+        RETURN QUERY SELECT TRUE, v_restantes, format('%s cupo(s) reservado(s)', p_cantidad);
+        RETURN;
+    END IF;
+
+    -- Sin reserva: explicar el motivo
+    SELECT * INTO v_programa FROM programas WHERE id = p_programa_id;
+
+    IF NOT FOUND THEN
+        RETURN QUERY SELECT FALSE, 0, 'Programa no encontrado'::TEXT;
+    ELSIF p_estados_permitidos IS NOT NULL AND NOT (v_programa.estado = ANY(p_estados_permitidos)) THEN
+        RETURN QUERY SELECT FALSE, 0,
+            ('Programa no está en periodo de inscripciones. Estado: ' || v_programa.estado)::TEXT;
+    ELSE
+        v_restantes := GREATEST(v_programa.cupos_maximos - v_programa.cupos_inscritos, 0);
+        RETURN QUERY SELECT FALSE, v_restantes,
+            CASE WHEN v_restantes = 0 THEN 'Cupos agotados'
+                 ELSE format('Cupos insuficientes: se solicitaron %s y quedan %s', p_cantidad, v_restantes)
+            END;
+    END IF;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION fn_liberar_cupos(
+    p_programa_id INTEGER,
+    p_cantidad INTEGER DEFAULT 1
+)
+RETURNS INTEGER AS $$
+DECLARE
+    v_inscritos INTEGER;
+BEGIN
+    UPDATE programas
+    SET cupos_inscritos = GREATEST(cupos_inscritos - p_cantidad, 0)
+    WHERE id = p_programa_id
+    RETURNING cupos_inscritos INTO v_inscritos;
+
+    RETURN v_inscritos;
+END;
+$$ LANGUAGE plpgsql;
+
+-- ==================== 2. CREACIÓN DE INSCRIPCIONES =========================
+CREATE OR REPLACE FUNCTION fn_crear_inscripcion(
+    p_estudiante_id INT,
+    p_programa_id INT,
+    p_valor_final NUMERIC(10,2),
+    p_observaciones TEXT,
+    p_fecha_inscripcion DATE DEFAULT CURRENT_DATE
+)
+RETURNS JSON AS $$
+DECLARE
+    v_inscripcion_id INT;
+    v_costo_total NUMERIC(10,2);
+    v_reserva RECORD;
+BEGIN
+    -- Obtener el costo total del programa
+    SELECT costo_total INTO v_costo_total
+    FROM programas
+    WHERE id = p_programa_id;
+
+    IF NOT FOUND THEN
+        RETURN json_build_object('success', false, 'message', 'Programa no encontrado');
+    END IF;
+
+    -- Validar que el valor final no sea mayor al costo total
+    IF p_valor_final > v_costo_total THEN
+        RETURN json_build_object(
+            'success', false,
+            'message', format('El valor final (%s) no puede ser mayor al costo total del programa (%s)',
+                            p_valor_final, v_costo_total)
+        );
+    END IF;
+
+    -- Evitar consumir un cupo si ya está inscrito (la restricción única
+    -- cubre el caso concurrente más abajo)
+    IF EXISTS (
+        SELECT 1 FROM inscripciones
+        WHERE estudiante_id = p_estudiante_id
+          AND programa_id = p_programa_id
+    ) THEN
+        RETURN json_build_object(
+            'success', false,
+            'message', 'El estudiante ya está inscrito en este programa'
+        );
+    END IF;
+
+    -- Reservar el cupo en esta misma transacción
+    SELECT * INTO v_reserva FROM fn_reservar_cupos(p_programa_id, 1);
+
+    IF NOT v_reserva.reservado THEN
+        RETURN json_build_object(
+            'success', false,
+            'message', v_reserva.mensaje,
+            'cupos_disponibles', v_reserva.cupos_disponibles
+        );
+    END IF;
+
+    -- Insertar la nueva inscripción
+    INSERT INTO inscripciones (
+        estudiante_id,
+        programa_id,
+        fecha_inscripcion,
+        valor_final,
+        observaciones,
+        estado
+    ) VALUES (
+        p_estudiante_id,
+        p_programa_id,
+        COALESCE(p_fecha_inscripcion, CURRENT_DATE),
+        p_valor_final,
+        p_observaciones,
+        'PREINSCRITO'
+    )
+    RETURNING id INTO v_inscripcion_id;
+
+    RETURN json_build_object(
+        'success', true,
+        'id', v_inscripcion_id,
+        'message', 'Inscripción creada exitosamente',
+        'cupos_disponibles', v_reserva.cupos_disponibles
+    );
+-- Cualquier error deshace también la reserva del cupo (subtransacción del bloque)
+EXCEPTION
+    WHEN unique_violation THEN
+        RETURN json_build_object(
+            'success', false,
+            'message', 'El estudiante ya está inscrito en este programa'
+        );
+    WHEN OTHERS THEN
+        RETURN json_build_object(
+            'success', false,
+            'message', SQLERRM
+        );
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION fn_crear_inscripcion_retroactiva(
+    p_estudiante_id INT,
+    p_programa_id INT,
+    p_fecha_inscripcion DATE,
+    p_valor_final NUMERIC(10,2),
+    p_observaciones TEXT
+)
+RETURNS JSON AS $$
+DECLARE
+    v_inscripcion_id INT;
+    v_costo_total NUMERIC(10,2);
+    v_reserva RECORD;
+BEGIN
+    -- Obtener el costo total del programa
+    SELECT costo_total INTO v_costo_total
+    FROM programas
+    WHERE id = p_programa_id;
+
+    IF NOT FOUND THEN
+        RETURN json_build_object('success', false, 'message', 'Programa no encontrado');
+    END IF;
+
+    -- Validar que el valor final no sea mayor al costo total
+    IF p_valor_final > v_costo_total THEN
+        RETURN json_build_object(
+            'success', false,
+            'message', format('El valor final (%s) no puede ser mayor al costo total del programa (%s)',
+                            p_valor_final, v_costo_total)
+        );
+    END IF;
+
+    -- Las inscripciones retroactivas se admiten en cualquier estado salvo CANCELADO
+    SELECT * INTO v_reserva
+    FROM fn_reservar_cupos(p_programa_id, 1, ARRAY['PLANIFICADO', 'INSCRIPCIONES', 'EN_CURSO', 'CONCLUIDO']);
+
+    IF NOT v_reserva.reservado THEN
+        RETURN json_build_object(
+            'success', false,
+            'message', v_reserva.mensaje,
+            'cupos_disponibles', v_reserva.cupos_disponibles
+        );
+    END IF;
+
+    -- Insertar la nueva inscripción
+    INSERT INTO inscripciones (
+        estudiante_id,
+        programa_id,
+        fecha_inscripcion,
+        valor_final,
+        observaciones,
+        estado
+    ) VALUES (
+        p_estudiante_id,
+        p_programa_id,
+        p_fecha_inscripcion,
+        p_valor_final,
+        p_observaciones,
+        'PREINSCRITO'
+    )
+    RETURNING id INTO v_inscripcion_id;
+
+    RETURN json_build_object(
+        'success', true,
+        'id', v_inscripcion_id,
+        'message', 'Inscripción retroactiva creada exitosamente',
+        'cupos_disponibles', v_reserva.cupos_disponibles
+    );
+EXCEPTION
+    WHEN unique_violation THEN
+        RETURN json_build_object(
+            'success', false,
+            'message', 'El estudiante ya está inscrito en este programa'
+        );
+    WHEN OTHERS THEN
+        RETURN json_build_object(
+            'success', false,
+            'message', SQLERRM
+        );
+END;
+$$ LANGUAGE plpgsql;
+
+-- ==================== 3. INSCRIPCIÓN DESDE EL FORMULARIO DE ESTUDIANTE =====
+CREATE OR REPLACE FUNCTION fn_inscribir_estudiante_programa(p_programa_id integer, p_estudiante_id integer)
+RETURNS TABLE(exito boolean, mensaje character varying, cupos_disponibles integer) AS $$
+DECLARE
+    v_reserva RECORD;
+    v_cupos_maximos INTEGER;
+BEGIN
+    -- Cualquier estado salvo CANCELADO (regla original de esta función)
+    SELECT * INTO v_reserva
+    FROM fn_reservar_cupos(p_programa_id, 1, ARRAY['PLANIFICADO', 'INSCRIPCIONES', 'EN_CURSO', 'CONCLUIDO']);
+
+    IF NOT v_reserva.reservado THEN
+        RETURN QUERY SELECT FALSE,
+            CASE v_reserva.mensaje
+                WHEN 'Programa no encontrado' THEN 'El programa no existe'
+                WHEN 'Cupos agotados' THEN 'No hay cupos disponibles en el programa'
+                ELSE 'El programa está cancelado'
+            END::VARCHAR,
+            0;
+        RETURN;
+    END IF;
+
+    SELECT p.cupos_maximos INTO v_cupos_maximos FROM programas p WHERE p.id = p_programa_id;
+
+    RETURN QUERY SELECT TRUE,
+        'Estudiante inscrito exitosamente'::VARCHAR,
+        CASE WHEN v_cupos_maximos IS NULL THEN -1 ELSE v_reserva.cupos_disponibles END;
+EXCEPTION
+    WHEN OTHERS THEN
+        RETURN QUERY SELECT FALSE, ('Error al inscribir estudiante: ' || SQLERRM)::VARCHAR, 0;
+END;
+$$ LANGUAGE plpgsql;
+
+COMMIT;
+
+DO $$
+BEGIN
+    RAISE NOTICE '✅ Reserva atómica de cupos instalada';
+END $$;
@@ -0,0 +1,388 @@
+-- ============================================================================
+-- SCRIPT DE ACTUALIZACIÓN: SALDOS PRECALCULADOS EN INSCRIPCIONES
+-- Versión: 1.0.0
+-- Descripción: Agrega total_pagado, saldo_pendiente y ultimo_pago a
+--              inscripciones, mantenidos por triggers sobre transacciones
+--              (alta, cambio de estado/monto, anulación y eliminación). Los
+--              listados y resúmenes financieros leen estas columnas en lugar
+--              de sumar transacciones en cada llamada.
+--              Sólo cuentan las transacciones CONFIRMADAS y el saldo se
+--              calcula sobre COALESCE(valor_final, costo_total).
+-- ============================================================================
+
+BEGIN;
+
+-- ==================== 1. COLUMNAS ==========================================
+ALTER TABLE inscripciones
+    ADD COLUMN IF NOT EXISTS total_pagado NUMERIC(12,2) NOT NULL DEFAULT 0,
+    ADD COLUMN IF NOT EXISTS saldo_pendiente NUMERIC(12,2) NOT NULL DEFAULT 0,
+    ADD COLUMN IF NOT EXISTS ultimo_pago DATE;
+
+-- Pagos confirmados por inscripción (triggers, verificación y listados)
+CREATE INDEX IF NOT EXISTS idx_transacciones_inscripcion_confirmadas
+    ON transacciones(estudiante_id, programa_id)
+    INCLUDE (monto_final, fecha_pago)
+    WHERE estado = 'CONFIRMADO';
+
+-- ==================== 2. RECÁLCULO POR PARES ===============================
+CREATE OR REPLACE FUNCTION fn_recalcular_saldos_inscripciones(
+    p_estudiante_ids INTEGER[],
+    p_programa_ids INTEGER[]
+)
+RETURNS INTEGER AS $$
+DECLARE
+    v_actualizadas INTEGER;
+BEGIN
+    -- Bloquear primero las inscripciones (en orden de id para no generar
+    -- interbloqueos): en READ COMMITTED la suma siguiente se calcula con una
+    -- instantánea nueva y ve los pagos que otra sesión confirmó mientras se
+    -- esperaba el bloqueo.
+    PERFORM 1
+    FROM inscripciones i
+    JOIN UNNEST(p_estudiante_ids, p_programa_ids) AS k(estudiante_id, programa_id)
+        ON k.estudiante_id = i.estudiante_id
+       AND k.programa_id = i.programa_id
+    ORDER BY i.id
+    FOR UPDATE OF i;
+
+    UPDATE inscripciones i
+    SET total_pagado = s.total_pagado,
+        saldo_pendiente = GREATEST(COALESCE(i.valor_final, p.costo_total, 0) - s.total_pagado, 0),
+        ultimo_pago = s.ultimo_pago
+    FROM (
+        SELECT
+            k.estudiante_id,
+            k.programa_id,
+            COALESCE(SUM(t.monto_final), 0) AS total_pagado,
+            MAX(t.fecha_pago) AS ultimo_pago
+        FROM (
+            SELECT DISTINCT u.estudiante_id, u.programa_id
+            FROM UNNEST(p_estudiante_ids, p_programa_ids) AS u(estudiante_id, programa_id)
+        ) k
+        LEFT JOIN transacciones t
+            ON t.estudiante_id = k.estudiante_id
+           AND t.programa_id = k.programa_id
+           AND t.estado = 'CONFIRMADO'
+        GROUP BY k.estudiante_id, k.programa_id
+    ) s, programas p
+    WHERE i.estudiante_id = s.estudiante_id
+      AND i.programa_id = s.programa_id
+      AND p.id = i.programa_id;
+
+    GET DIAGNOSTICS v_actualizadas = ROW_COUNT;
+    RETURN v_actualizadas;
+END;
+$$ LANGUAGE plpgsql;
+
+-- ==================== 3. TRIGGERS SOBRE TRANSACCIONES ======================
+CREATE OR REPLACE FUNCTION fn_actualizar_saldos_inscripciones()
+RETURNS TRIGGER AS $$
+DECLARE
+    v_estudiante_ids INTEGER[];
+    v_programa_ids INTEGER[];
+BEGIN
+    -- Trigger por sentencia: cada inscripción afectada se recalcula una sola
+    -- vez. Sólo interesan las filas que son o eran CONFIRMADAS.
+    IF TG_OP = 'INSERT' THEN
+        SELECT ARRAY_AGG(a.estudiante_id), ARRAY_AGG(a.programa_id)
+        INTO v_estudiante_ids, v_programa_ids
+        FROM (
+            SELECT DISTINCT n.estudiante_id, n.programa_id
+            FROM transacciones_nuevas n
+            WHERE n.estado = 'CONFIRMADO'
+        ) a;
+    ELSIF TG_OP = 'UPDATE' THEN
+        -- Cambios de estado (incluida la anulación), monto, fecha o inscripción
+        WITH cambios AS (
+            SELECT n.estudiante_id AS est_nuevo, n.programa_id AS prog_nuevo,
+                   o.estudiante_id AS est_anterior, o.programa_id AS prog_anterior
+            FROM transacciones_nuevas n
+            JOIN transacciones_anteriores o ON o.id = n.id
+            WHERE (n.estado = 'CONFIRMADO' OR o.estado = 'CONFIRMADO')
+              AND (n.estado, n.monto_final, n.fecha_pago, n.estudiante_id, n.programa_id)
+                  IS DISTINCT FROM
+                  (o.estado, o.monto_final, o.fecha_pago, o.estudiante_id, o.programa_id)
+        )
+        SELECT ARRAY_AGG(a.estudiante_id), ARRAY_AGG(a.programa_id)
+        INTO v_estudiante_ids, v_programa_ids
+        FROM (
+            SELECT est_nuevo AS estudiante_id, prog_nuevo AS programa_id FROM cambios
+            UNION
+            SELECT est_anterior, prog_anterior FROM cambios
+        ) a;
+    ELSIF TG_OP = 'DELETE' THEN
+        SELECT ARRAY_AGG(a.estudiante_id), ARRAY_AGG(a.programa_id)
+        INTO v_estudiante_ids, v_programa_ids
+        FROM (
+            SELECT DISTINCT o.estudiante_id, o.programa_id
+            FROM transacciones_anteriores o
+            WHERE o.estado = 'CONFIRMADO'
+        ) a;
+    END IF;
+
+    IF v_estudiante_ids IS NOT NULL THEN
+        PERFORM fn_recalcular_saldos_inscripciones(v_estudiante_ids, v_programa_ids);
+    END IF;
+
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS tr_saldos_inscripciones_ins ON transacciones;
+DROP TRIGGER IF EXISTS tr_saldos_inscripciones_upd ON transacciones;
+DROP TRIGGER IF EXISTS tr_saldos_inscripciones_del ON transacciones;
+
+-- Un trigger por operación (las tablas de transición no admiten varios eventos)
+CREATE TRIGGER tr_saldos_inscripciones_ins
+    AFTER INSERT ON transacciones
+    REFERENCING NEW TABLE AS transacciones_nuevas
+    FOR EACH STATEMENT
+    EXECUTE FUNCTION fn_actualizar_saldos_inscripciones();
+
+CREATE TRIGGER tr_saldos_inscripciones_upd
+    AFTER UPDATE ON transacciones
+    REFERENCING OLD TABLE AS transacciones_anteriores NEW TABLE AS transacciones_nuevas
+    FOR EACH STATEMENT
+    EXECUTE FUNCTION fn_actualizar_saldos_inscripciones();
+
+CREATE TRIGGER tr_saldos_inscripciones_del
+    AFTER DELETE ON transacciones
+    REFERENCING OLD TABLE AS transacciones_anteriores
+    FOR EACH STATEMENT
+    EXECUTE FUNCTION fn_actualizar_saldos_inscripciones();
+
+-- ==================== 4. TRIGGER SOBRE INSCRIPCIONES =======================
+CREATE OR REPLACE FUNCTION fn_calcular_saldo_inscripcion()
+RETURNS TRIGGER AS $$
+DECLARE
+    v_costo_total NUMERIC(10,2);
+BEGIN
+    -- Alta de inscripción o cambio de valor_final / estudiante / programa
+    SELECT COALESCE(SUM(t.monto_final), 0), MAX(t.fecha_pago)
+    INTO NEW.total_pagado, NEW.ultimo_pago
+    FROM transacciones t
+    WHERE t.estudiante_id = NEW.estudiante_id
+      AND t.programa_id = NEW.programa_id
+      AND t.estado = 'CONFIRMADO';
+
+    SELECT costo_total INTO v_costo_total FROM programas WHERE id = NEW.programa_id;
+
+    NEW.saldo_pendiente := GREATEST(COALESCE(NEW.valor_final, v_costo_total, 0) - NEW.total_pagado, 0);
+    RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS tr_calcular_saldo_inscripcion ON inscripciones;
+
+CREATE TRIGGER tr_calcular_saldo_inscripcion
+    BEFORE INSERT OR UPDATE OF valor_final, estudiante_id, programa_id ON inscripciones
+    FOR EACH ROW
+    EXECUTE FUNCTION fn_calcular_saldo_inscripcion();
+
+-- ==================== 5. VERIFICACIÓN DE CONSISTENCIA ======================
+CREATE OR REPLACE FUNCTION fn_verificar_saldos_inscripciones(p_corregir BOOLEAN DEFAULT FALSE)
+RETURNS TABLE (
+    inscripcion_id INTEGER,
+    total_pagado_registrado NUMERIC(12,2),
+    total_pagado_real NUMERIC(12,2),
+    saldo_registrado NUMERIC(12,2),
+    saldo_real NUMERIC(12,2),
+    ultimo_pago_registrado DATE,
+    ultimo_pago_real DATE,
+    corregido BOOLEAN
+) AS $$
+BEGIN
+    RETURN QUERY
+    WITH pagos AS (
+        SELECT t.estudiante_id, t.programa_id,
+               SUM(t.monto_final) AS total,
+               MAX(t.fecha_pago) AS ultimo
+        FROM transacciones t
+        WHERE t.estado = 'CONFIRMADO'
+        GROUP BY t.estudiante_id, t.programa_id
+    ),
+    desviadas AS (
+        SELECT
+            i.id,
+            i.total_pagado AS pagado_reg,
+            COALESCE(pg.total, 0)::NUMERIC(12,2) AS pagado_real,
+            i.saldo_pendiente AS saldo_reg,
+            GREATEST(COALESCE(i.valor_final, p.costo_total, 0) - COALESCE(pg.total, 0), 0)::NUMERIC(12,2) AS saldo_calc,
+            i.ultimo_pago AS ultimo_reg,
+            pg.ultimo AS ultimo_calc
+        FROM inscripciones i
+        JOIN programas p ON p.id = i.programa_id
+        LEFT JOIN pagos pg
+            ON pg.estudiante_id = i.estudiante_id
+           AND pg.programa_id = i.programa_id
+        WHERE (i.total_pagado, i.saldo_pendiente, i.ultimo_pago)
+              IS DISTINCT FROM
+              (COALESCE(pg.total, 0),
+               GREATEST(COALESCE(i.valor_final, p.costo_total, 0) - COALESCE(pg.total, 0), 0),
+               pg.ultimo)
+    ),
+    corregidas AS (
+        UPDATE inscripciones i
+        SET total_pagado = d.pagado_real,
+            saldo_pendiente = d.saldo_calc,
+            ultimo_pago = d.ultimo_calc
+        FROM desviadas d
+        WHERE p_corregir
+          AND i.id = d.id
+        RETURNING i.id
+    )
+    SELECT d.id, d.pagado_reg, d.pagado_real, d.saldo_reg, d.saldo_calc,
+           d.ultimo_reg, d.ultimo_calc, (c.id IS NOT NULL)
+    FROM desviadas d
+    LEFT JOIN corregidas c ON c.id = d.id
+    ORDER BY d.id;
+END;
+$$ LANGUAGE plpgsql;
+
+-- ==================== 6. LECTURAS DESDE LAS COLUMNAS =======================
+DROP FUNCTION IF EXISTS fn_obtener_inscripciones(d_estado_academico, INTEGER, DATE, DATE);
+
+CREATE OR REPLACE FUNCTION fn_obtener_inscripciones(
+    p_filtro_estado d_estado_academico DEFAULT NULL,
+    p_filtro_programa INTEGER DEFAULT NULL,
+    p_filtro_fecha_desde DATE DEFAULT NULL,
+    p_filtro_fecha_hasta DATE DEFAULT NULL
+)
+RETURNS TABLE (
+    inscripcion_id INTEGER,
+    estudiante_id INTEGER,
+    estudiante_nombre TEXT,
+    estudiante_ci VARCHAR(15),
+    programa_id INTEGER,
+    programa_nombre VARCHAR(200),
+    programa_codigo VARCHAR(20),
+    fecha_inscripcion DATE,
+    estado d_estado_academico,
+    valor_final NUMERIC(10,2),
+    cupos_disponibles INTEGER,
+    pagos_realizados NUMERIC(12,2),
+    saldo_pendiente NUMERIC(12,2)
+) AS $$
+BEGIN
+    RETURN QUERY
+    SELECT
+        i.id,
+        e.id,
+        CONCAT(e.nombres, ' ', e.apellido_paterno, ' ', COALESCE(e.apellido_materno, '')),
+        e.ci_numero,
+        p.id,
+        p.nombre,
+        p.codigo,
+        i.fecha_inscripcion,
+        i.estado,
+        COALESCE(i.valor_final, p.costo_total),
+        COALESCE(p.cupos_maximos - p.cupos_inscritos, 0),
+        i.total_pagado,
+        i.saldo_pendiente
+    FROM inscripciones i
+    JOIN estudiantes e ON i.estudiante_id = e.id
+    JOIN programas p ON i.programa_id = p.id
+    WHERE (p_filtro_estado IS NULL OR i.estado = p_filtro_estado)
+        AND (p_filtro_programa IS NULL OR p.id = p_filtro_programa)
+        AND (p_filtro_fecha_desde IS NULL OR i.fecha_inscripcion >= p_filtro_fecha_desde)
+        AND (p_filtro_fecha_hasta IS NULL OR i.fecha_inscripcion <= p_filtro_fecha_hasta)
+    ORDER BY i.fecha_inscripcion DESC, e.apellido_paterno, e.nombres;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION fn_saldo_pendiente_estudiante(p_estudiante_id INTEGER)
+RETURNS TABLE(
+    programa_id INTEGER,
+    programa_nombre VARCHAR(200),
+    total_debe DECIMAL(10,2),
+    total_pagado DECIMAL(10,2),
+    saldo_pendiente DECIMAL(10,2)
+) AS $$
+BEGIN
+    RETURN QUERY
+    SELECT
+        p.id,
+        p.nombre,
+        COALESCE(i.valor_final, p.costo_total),
+        i.total_pagado,
+        i.saldo_pendiente
+    FROM inscripciones i
+    JOIN programas p ON i.programa_id = p.id
+    WHERE i.estudiante_id = p_estudiante_id;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION fn_resumen_financiero_estudiante(p_estudiante_id INTEGER)
+RETURNS TABLE(
+    total_programas INTEGER,
+    total_inscrito DECIMAL(12,2),
+    total_pagado DECIMAL(12,2),
+    total_deuda DECIMAL(12,2),
+    promedio_pagado DECIMAL(5,2),
+    transacciones_totales INTEGER,
+    ultimo_pago DATE,
+    proximo_vencimiento DATE,
+    estado_financiero VARCHAR(20)
+)
+LANGUAGE plpgsql
+AS $$
+BEGIN
+    RETURN QUERY
+    WITH programas_estudiante AS (
+        SELECT
+            COALESCE(i.valor_final, p.costo_total) AS costo,
+            i.total_pagado AS pagado,
+            i.saldo_pendiente AS deuda,
+            i.ultimo_pago AS ultima_fecha
+        FROM inscripciones i
+        INNER JOIN programas p ON i.programa_id = p.id
+        WHERE i.estudiante_id = p_estudiante_id
+    )
+    SELECT
+        COUNT(*)::INTEGER AS total_programas,
+        COALESCE(SUM(pe.costo), 0)::DECIMAL(12,2) AS total_inscrito,
+        COALESCE(SUM(pe.pagado), 0)::DECIMAL(12,2) AS total_pagado,
+        COALESCE(SUM(pe.deuda), 0)::DECIMAL(12,2) AS total_deuda,
+        CASE
+            WHEN SUM(pe.costo) > 0 THEN
+                ROUND((SUM(pe.pagado) * 100.0 / SUM(pe.costo)), 2)
+            ELSE 0
+        END::DECIMAL(5,2) AS promedio_pagado,
+        (
+            SELECT COUNT(*)
+            FROM transacciones t
+            WHERE t.estudiante_id = p_estudiante_id
+              AND t.estado = 'CONFIRMADO'
+        )::INTEGER AS transacciones_totales,
+        MAX(pe.ultima_fecha) AS ultimo_pago,
+        NULL::DATE AS proximo_vencimiento,
+        CASE
+            WHEN COALESCE(SUM(pe.costo), 0) = 0 THEN 'SIN_PROGRAMAS'
+            WHEN SUM(pe.pagado) >= SUM(pe.costo) THEN 'AL_DIA'
+            WHEN SUM(pe.pagado) >= (SUM(pe.costo) * 0.5) THEN 'PARCIAL'
+            ELSE 'MOROSO'
+        END::VARCHAR(20) AS estado_financiero
+    FROM programas_estudiante pe;
+END;
+$$;
+
+-- ==================== 7. CARGA INICIAL =====================================
+-- Sin pagos concurrentes mientras se calculan los valores iniciales
+LOCK TABLE transacciones IN SHARE ROW EXCLUSIVE MODE;
+
+DO $$
+DECLARE
+    v_corregidas INTEGER;
+BEGIN
+    SELECT COUNT(*) INTO v_corregidas
+    FROM fn_verificar_saldos_inscripciones(TRUE);
+
+    RAISE NOTICE '📝 Saldos iniciales calculados para % inscripciones', v_corregidas;
+END $$;
+
+COMMIT;
+
+DO $$
+BEGIN
+    RAISE NOTICE '✅ Saldos precalculados de inscripciones instalados';
+END $$;
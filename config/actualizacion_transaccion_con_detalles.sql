@@ -0,0 +1,149 @@
+-- ============================================================================
+-- SCRIPT DE ACTUALIZACIÓN: TRANSACCIÓN CON DETALLES EN UNA SOLA LLAMADA
+-- Versión: 1.0.0
+-- Descripción: fn_registrar_transaccion_con_detalles inserta la cabecera y
+--              todos sus detalles (con orden calculado) en una transacción y
+--              un solo viaje al servidor, y devuelve el comprobante completo.
+--              sp_registrar_transaccion_completa pasa a delegar en ella (antes
+--              insertaba la cabecera sin montos, violando NOT NULL).
+-- ============================================================================
+
+-- ==================== 1. FUNCIÓN PRINCIPAL =================================
+CREATE OR REPLACE FUNCTION fn_registrar_transaccion_con_detalles(
+    p_transaccion JSONB,
+    p_detalles JSONB
+)
+RETURNS JSONB
+LANGUAGE plpgsql
+AS $$
+DECLARE
+    v_transaccion transacciones%ROWTYPE;
+    v_total DECIMAL(10,2);
+    v_descuento DECIMAL(10,2);
+    v_detalles JSONB;
+BEGIN
+    -- Validar que haya detalles
+    IF p_detalles IS NULL OR jsonb_typeof(p_detalles) <> 'array' OR jsonb_array_length(p_detalles) = 0 THEN
+        RAISE EXCEPTION 'Debe proporcionar al menos un detalle para la transacción';
+    END IF;
+    
+    -- Validar conceptos y cálculos de todos los detalles en una sola pasada
+    IF EXISTS (
+        SELECT 1
+        FROM jsonb_array_elements(p_detalles) d
+        LEFT JOIN conceptos_pago c ON c.id = (d->>'concepto_pago_id')::INTEGER
+        WHERE c.id IS NULL
+    ) THEN
+        RAISE EXCEPTION 'Uno o más conceptos de pago no existen';
+    END IF;
+    
+    IF EXISTS (
+        SELECT 1
+        FROM jsonb_array_elements(p_detalles) d
+        WHERE (d->>'subtotal')::DECIMAL(10,2) <>
+              COALESCE((d->>'cantidad')::INTEGER, 1) * (d->>'precio_unitario')::DECIMAL(10,2)
+    ) THEN
+        RAISE EXCEPTION 'El subtotal no coincide con cantidad * precio unitario';
+    END IF;
+    
+    -- Totales calculados a partir de los detalles
+    SELECT COALESCE(SUM((d->>'subtotal')::DECIMAL(10,2)), 0)
+    INTO v_total
+    FROM jsonb_array_elements(p_detalles) d;
+    
+    v_descuento := COALESCE((p_transaccion->>'descuento_total')::DECIMAL(10,2), 0);
+    
+    -- Insertar transacción principal (el número lo genera el trigger)
+    INSERT INTO transacciones (
+        estudiante_id, programa_id, fecha_pago,
+        monto_total, descuento_total, monto_final,
+        forma_pago, estado, numero_comprobante, banco_origen, cuenta_origen,
+        observaciones, registrado_por
+    ) VALUES (
+        (p_transaccion->>'estudiante_id')::INTEGER,
+        (p_transaccion->>'programa_id')::INTEGER,
+        COALESCE((p_transaccion->>'fecha_pago')::DATE, CURRENT_DATE),
+        v_total, v_descuento, v_total - v_descuento,
+        p_transaccion->>'forma_pago',
+        COALESCE(p_transaccion->>'estado', 'REGISTRADO'),
+        p_transaccion->>'numero_comprobante',
+        p_transaccion->>'banco_origen',
+        p_transaccion->>'cuenta_origen',
+        p_transaccion->>'observaciones',
+        (p_transaccion->>'registrado_por')::INTEGER
+    )
+    RETURNING * INTO v_transaccion;
+    
+    -- Insertar todos los detalles en una sentencia; el orden por defecto es
+    -- la posición del detalle en el arreglo
+    WITH nuevos AS (
+        INSERT INTO detalles_transaccion (
+            transaccion_id, concepto_pago_id, descripcion,
+            cantidad, precio_unitario, subtotal, orden
+        )
+        SELECT
+            v_transaccion.id,
+            (x.d->>'concepto_pago_id')::INTEGER,
+            x.d->>'descripcion',
+            COALESCE((x.d->>'cantidad')::INTEGER, 1),
+            (x.d->>'precio_unitario')::DECIMAL(10,2),
+            (x.d->>'subtotal')::DECIMAL(10,2),
+            COALESCE(NULLIF((x.d->>'orden')::INTEGER, 0), x.n::INTEGER)
+        FROM jsonb_array_elements(p_detalles) WITH ORDINALITY AS x(d, n)
+        RETURNING *
+    )
+    SELECT COALESCE(jsonb_agg(to_jsonb(nuevos) ORDER BY nuevos.orden), '[]'::JSONB)
+    INTO v_detalles
+    FROM nuevos;
+    
+    RETURN jsonb_build_object(
+        'transaccion', to_jsonb(v_transaccion),
+        'detalles', v_detalles
+    );
+END;
+$$;
+
+-- ==================== 2. PROCEDIMIENTO COMPATIBLE ===========================
+CREATE OR REPLACE PROCEDURE sp_registrar_transaccion_completa(
+    p_estudiante_id INTEGER,
+    p_programa_id INTEGER,
+    p_fecha_pago DATE,
+    p_forma_pago d_forma_pago,
+    p_registrado_por INTEGER,
+    p_detalles JSONB,
+    p_descuento_total DECIMAL(10,2) DEFAULT 0,
+    p_numero_comprobante VARCHAR(50) DEFAULT NULL,
+    p_banco_origen VARCHAR(100) DEFAULT NULL,
+    p_cuenta_origen VARCHAR(50) DEFAULT NULL,
+    p_observaciones TEXT DEFAULT NULL
+)
+LANGUAGE plpgsql
+AS $$
+DECLARE
+    v_resultado JSONB;
+BEGIN
+    v_resultado := fn_registrar_transaccion_con_detalles(
+        jsonb_build_object(
+            'estudiante_id', p_estudiante_id,
+            'programa_id', p_programa_id,
+            'fecha_pago', p_fecha_pago,
+            'forma_pago', p_forma_pago,
+            'registrado_por', p_registrado_por,
+            'descuento_total', p_descuento_total,
+            'numero_comprobante', p_numero_comprobante,
+            'banco_origen', p_banco_origen,
+            'cuenta_origen', p_cuenta_origen,
+            'observaciones', p_observaciones,
+            'estado', 'CONFIRMADO'
+        ),
+        p_detalles
+    );
+    
+    RAISE NOTICE 'Transacción % registrada exitosamente', v_resultado->'transaccion'->>'id';
+END;
+$$;
+
+DO $$
+BEGIN
+    RAISE NOTICE '✅ fn_registrar_transaccion_con_detalles disponible';
+END $$;
@@ -0,0 +1,92 @@
+-- ============================================================================
+-- SCRIPT DE ACTUALIZACIÓN: RECÁLCULO DE MONTOS POR SENTENCIA
+-- Versión: 1.0.0
+-- Descripción: Reemplaza el trigger FOR EACH ROW tr_actualizar_monto_transaccion
+--              por triggers FOR EACH STATEMENT con tablas de transición. Un
+--              INSERT/UPDATE/DELETE masivo de detalles recalcula cada
+--              transacción afectada una sola vez.
+-- ============================================================================
+
+BEGIN;
+
+-- ==================== 1. ELIMINAR TRIGGER POR FILA =========================
+DROP TRIGGER IF EXISTS tr_actualizar_monto_transaccion ON detalles_transaccion;
+DROP TRIGGER IF EXISTS tr_actualizar_monto_transaccion_ins ON detalles_transaccion;
+DROP TRIGGER IF EXISTS tr_actualizar_monto_transaccion_upd ON detalles_transaccion;
+DROP TRIGGER IF EXISTS tr_actualizar_monto_transaccion_del ON detalles_transaccion;
+
+-- ==================== 2. FUNCIONES =========================================
+CREATE OR REPLACE FUNCTION fn_recalcular_montos_transacciones(p_transaccion_ids INTEGER[])
+RETURNS VOID AS $$
+BEGIN
+    -- Un único UPDATE para todas las transacciones afectadas
+    UPDATE transacciones t
+    SET monto_total = s.total,
+        monto_final = s.total - COALESCE(t.descuento_total, 0)
+    FROM (
+        SELECT ids.id AS transaccion_id, COALESCE(SUM(d.subtotal), 0) AS total
+        FROM UNNEST(p_transaccion_ids) AS ids(id)
+        LEFT JOIN detalles_transaccion d ON d.transaccion_id = ids.id
+        GROUP BY ids.id
+    ) s
+    WHERE t.id = s.transaccion_id;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION fn_actualizar_monto_transaccion()
+RETURNS TRIGGER AS $$
+DECLARE
+    v_transaccion_ids INTEGER[];
+BEGIN
+    -- Trigger por sentencia: recalcula cada transacción afectada una sola vez
+    -- usando las tablas de transición (detalles_nuevos / detalles_anteriores)
+    IF TG_OP = 'INSERT' THEN
+        SELECT ARRAY_AGG(DISTINCT transaccion_id) INTO v_transaccion_ids
+        FROM detalles_nuevos;
+    ELSIF TG_OP = 'UPDATE' THEN
+        SELECT ARRAY_AGG(DISTINCT transaccion_id) INTO v_transaccion_ids
+        FROM (
+            SELECT transaccion_id FROM detalles_nuevos
+            UNION
+            SELECT transaccion_id FROM detalles_anteriores
+        ) afectados;
+    ELSIF TG_OP = 'DELETE' THEN
+        SELECT ARRAY_AGG(DISTINCT transaccion_id) INTO v_transaccion_ids
+        FROM detalles_anteriores;
+    END IF;
+    
+    IF v_transaccion_ids IS NOT NULL THEN
+        PERFORM fn_recalcular_montos_transacciones(v_transaccion_ids);
+    END IF;
+    
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+-- ==================== 3. TRIGGERS POR SENTENCIA ============================
+-- Triggers por sentencia (PostgreSQL no admite tablas de transición en un
+-- trigger con varios eventos, por eso se define uno por operación)
+CREATE TRIGGER tr_actualizar_monto_transaccion_ins
+    AFTER INSERT ON detalles_transaccion
+    REFERENCING NEW TABLE AS detalles_nuevos
+    FOR EACH STATEMENT
+    EXECUTE FUNCTION fn_actualizar_monto_transaccion();
+
+CREATE TRIGGER tr_actualizar_monto_transaccion_upd
+    AFTER UPDATE ON detalles_transaccion
+    REFERENCING OLD TABLE AS detalles_anteriores NEW TABLE AS detalles_nuevos
+    FOR EACH STATEMENT
+    EXECUTE FUNCTION fn_actualizar_monto_transaccion();
+
+CREATE TRIGGER tr_actualizar_monto_transaccion_del
+    AFTER DELETE ON detalles_transaccion
+    REFERENCING OLD TABLE AS detalles_anteriores
+    FOR EACH STATEMENT
+    EXECUTE FUNCTION fn_actualizar_monto_transaccion();
+
+COMMIT;
+
+DO $$
+BEGIN
+    RAISE NOTICE '✅ Triggers por sentencia de montos de transacción instalados';
+END $$;
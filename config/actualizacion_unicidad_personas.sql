@@ -0,0 +1,293 @@
+-- ============================================================================
+-- SCRIPT DE ACTUALIZACIÓN: UNICIDAD DE ESTUDIANTES Y DOCENTES
+-- Versión: 1.0.0
+-- Descripción: Índices únicos sobre CI normalizado + expedición y email en
+--              minúsculas, validación de unicidad en una sola consulta e
+--              inserción de estudiantes con ON CONFLICT (sin verificación
+--              previa que compita con el INSERT). Las restricciones de CI
+--              pasan a ser (ci_numero, ci_expedicion).
+-- ============================================================================
+
+-- ==================== 1. ÍNDICES ÚNICOS NORMALIZADOS =======================
+-- Se crean sólo si los datos existentes no tienen duplicados; en caso
+-- contrario se informa para depurarlos manualmente.
+DO $$
+DECLARE
+    v_duplicados INTEGER;
+BEGIN
+    -- ---------- Estudiantes: CI normalizado + expedición ----------
+    SELECT COUNT(*) INTO v_duplicados FROM (
+        SELECT 1 FROM estudiantes
+        GROUP BY UPPER(BTRIM(ci_numero)), ci_expedicion
+        HAVING COUNT(*) > 1
+    ) d;
+
+    IF v_duplicados = 0 THEN
+        CREATE UNIQUE INDEX IF NOT EXISTS ux_estudiantes_ci_norm
+            ON estudiantes (UPPER(BTRIM(ci_numero)), ci_expedicion);
+        RAISE NOTICE '✅ Índice ux_estudiantes_ci_norm disponible';
+    ELSE
+        RAISE WARNING '⚠️ % CI de estudiantes duplicados, no se creó ux_estudiantes_ci_norm', v_duplicados;
+    END IF;
+
+    -- ---------- Estudiantes: email en minúsculas ----------
+    SELECT COUNT(*) INTO v_duplicados FROM (
+        SELECT 1 FROM estudiantes
+        WHERE email IS NOT NULL
+        GROUP BY LOWER(BTRIM(email))
+        HAVING COUNT(*) > 1
+    ) d;
+
+    IF v_duplicados = 0 THEN
+        CREATE UNIQUE INDEX IF NOT EXISTS ux_estudiantes_email_lower
+            ON estudiantes (LOWER(BTRIM(email)))
+            WHERE email IS NOT NULL;
+        RAISE NOTICE '✅ Índice ux_estudiantes_email_lower disponible';
+    ELSE
+        RAISE WARNING '⚠️ % emails de estudiantes duplicados, no se creó ux_estudiantes_email_lower', v_duplicados;
+    END IF;
+
+    -- ---------- Docentes: CI normalizado + expedición ----------
+    SELECT COUNT(*) INTO v_duplicados FROM (
+        SELECT 1 FROM docentes
+        GROUP BY UPPER(BTRIM(ci_numero)), ci_expedicion
+        HAVING COUNT(*) > 1
+    ) d;
+
+    IF v_duplicados = 0 THEN
+        CREATE UNIQUE INDEX IF NOT EXISTS ux_docentes_ci_norm
+            ON docentes (UPPER(BTRIM(ci_numero)), ci_expedicion);
+        RAISE NOTICE '✅ Índice ux_docentes_ci_norm disponible';
+    ELSE
+        RAISE WARNING '⚠️ % CI de docentes duplicados, no se creó ux_docentes_ci_norm', v_duplicados;
+    END IF;
+
+    -- ---------- Docentes: email en minúsculas ----------
+    SELECT COUNT(*) INTO v_duplicados FROM (
+        SELECT 1 FROM docentes
+        WHERE email IS NOT NULL
+        GROUP BY LOWER(BTRIM(email))
+        HAVING COUNT(*) > 1
+    ) d;
+
+    IF v_duplicados = 0 THEN
+        CREATE UNIQUE INDEX IF NOT EXISTS ux_docentes_email_lower
+            ON docentes (LOWER(BTRIM(email)))
+            WHERE email IS NOT NULL;
+        RAISE NOTICE '✅ Índice ux_docentes_email_lower disponible';
+    ELSE
+        RAISE WARNING '⚠️ % emails de docentes duplicados, no se creó ux_docentes_email_lower', v_duplicados;
+    END IF;
+END $$;
+
+-- ==================== 1.1 RESTRICCIONES CI + EXPEDICIÓN ====================
+-- Las restricciones originales sólo sobre ci_numero rechazaban a otra persona
+-- con el mismo número y distinta expedición; se reemplazan por el par
+-- (ci_numero, ci_expedicion), el mismo criterio que los índices normalizados.
+ALTER TABLE estudiantes DROP CONSTRAINT IF EXISTS uk_estudiante_ci;
+ALTER TABLE docentes DROP CONSTRAINT IF EXISTS uk_docente_ci;
+
+DO $$
+BEGIN
+    IF NOT EXISTS (SELECT 1 FROM pg_constraint WHERE conname = 'uk_estudiante_ci_expedicion') THEN
+        ALTER TABLE estudiantes
+            ADD CONSTRAINT uk_estudiante_ci_expedicion UNIQUE (ci_numero, ci_expedicion);
+    END IF;
+
+    IF NOT EXISTS (SELECT 1 FROM pg_constraint WHERE conname = 'uk_docente_ci_expedicion') THEN
+        ALTER TABLE docentes
+            ADD CONSTRAINT uk_docente_ci_expedicion UNIQUE (ci_numero, ci_expedicion);
+    END IF;
+END $$;
+
+-- ==================== 2. VALIDACIÓN DE UNICIDAD EN UNA CONSULTA ============
+-- Mismo criterio que ux_estudiantes_ci_norm: el mismo número con otra
+-- expedición es otra persona.
+DROP FUNCTION IF EXISTS fn_validar_unicidad_estudiante(VARCHAR, VARCHAR, INTEGER);
+
+CREATE OR REPLACE FUNCTION fn_validar_unicidad_estudiante(
+    p_ci_numero VARCHAR,
+    p_ci_expedicion VARCHAR,
+    p_email VARCHAR DEFAULT NULL,
+    p_excluir_id INTEGER DEFAULT NULL
+)
+RETURNS TABLE(ci_duplicado BOOLEAN, email_duplicado BOOLEAN) AS $$
+BEGIN
+    RETURN QUERY
+    SELECT
+        EXISTS(
+            SELECT 1 FROM estudiantes
+            WHERE UPPER(BTRIM(ci_numero)) = UPPER(BTRIM(p_ci_numero))
+            AND ci_expedicion = p_ci_expedicion
+            AND (p_excluir_id IS NULL OR id != p_excluir_id)
+        ),
+        (p_email IS NOT NULL AND EXISTS(
+            SELECT 1 FROM estudiantes
+            WHERE email IS NOT NULL
+            AND LOWER(BTRIM(email)) = LOWER(BTRIM(p_email))
+            AND (p_excluir_id IS NULL OR id != p_excluir_id)
+        ));
+END;
+$$ LANGUAGE plpgsql STABLE;
+
+-- ==================== 3. INSERCIÓN DE ESTUDIANTE CON ON CONFLICT ===========
+-- Misma firma y resultado que la versión de estudiante_CRUD.sql; la
+-- unicidad la garantizan las restricciones y sólo ante conflicto se consulta
+-- qué campo lo provocó.
+CREATE OR REPLACE FUNCTION fn_insertar_estudiante(
+    p_ci_numero VARCHAR,
+    p_ci_expedicion d_expedicion_ci,
+    p_nombres VARCHAR,
+    p_apellido_paterno VARCHAR,
+    p_apellido_materno VARCHAR,
+    p_fecha_nacimiento DATE DEFAULT NULL,
+    p_telefono VARCHAR DEFAULT NULL,
+    p_email VARCHAR DEFAULT NULL,
+    p_direccion TEXT DEFAULT NULL,
+    p_profesion VARCHAR DEFAULT NULL,
+    p_universidad VARCHAR DEFAULT NULL,
+    p_fotografia_url TEXT DEFAULT NULL,
+    p_activo BOOLEAN DEFAULT TRUE
+)
+RETURNS TABLE(nuevo_id INTEGER, mensaje VARCHAR, exito BOOLEAN)
+LANGUAGE plpgsql
+AS $$
+DECLARE
+    v_nuevo_id INTEGER;
+    v_ci_duplicado BOOLEAN;
+    v_email_duplicado BOOLEAN;
+BEGIN
+    INSERT INTO estudiantes (
+        ci_numero, ci_expedicion, nombres, apellido_paterno, apellido_materno,
+        fecha_nacimiento, telefono, email, direccion, profesion, universidad,
+        fotografia_url, activo
+    ) VALUES (
+        BTRIM(p_ci_numero), p_ci_expedicion, p_nombres, p_apellido_paterno, p_apellido_materno,
+        p_fecha_nacimiento, p_telefono, NULLIF(BTRIM(p_email), ''), p_direccion, p_profesion, p_universidad,
+        p_fotografia_url, p_activo
+    )
+    ON CONFLICT DO NOTHING
+    RETURNING id INTO v_nuevo_id;
+
+    IF v_nuevo_id IS NOT NULL THEN
+        RETURN QUERY SELECT v_nuevo_id,
+            ('Estudiante creado exitosamente con ID: ' || v_nuevo_id)::VARCHAR, TRUE;
+        RETURN;
+    END IF;
+
+    -- Conflicto: identificar el campo duplicado
+    SELECT u.ci_duplicado, u.email_duplicado
+    INTO v_ci_duplicado, v_email_duplicado
+    FROM fn_validar_unicidad_estudiante(p_ci_numero, p_ci_expedicion, p_email) u;
+
+    RETURN QUERY SELECT NULL::INTEGER,
+        (CASE
+            WHEN v_ci_duplicado THEN 'El número de CI ya está registrado en el sistema'
+            WHEN v_email_duplicado THEN 'El email ya está registrado en el sistema'
+            ELSE 'El estudiante ya está registrado en el sistema'
+        END)::VARCHAR,
+        FALSE;
+
+EXCEPTION
+    WHEN OTHERS THEN
+        RETURN QUERY SELECT NULL::INTEGER,
+            ('Error al crear estudiante: ' || SQLERRM)::VARCHAR, FALSE;
+END;
+$$;
+
+-- ==================== 4. ACTUALIZACIÓN DE ESTUDIANTE =======================
+-- Misma firma que la versión de estudiante_CRUD.sql; valida con
+-- fn_validar_unicidad_estudiante en lugar de fn_verificar_ci_existente
+-- (sólo el número de CI).
+CREATE OR REPLACE FUNCTION fn_actualizar_estudiante(
+    p_id INTEGER,
+    p_ci_numero VARCHAR,
+    p_ci_expedicion d_expedicion_ci,
+    p_nombres VARCHAR,
+    p_apellido_paterno VARCHAR,
+    p_apellido_materno VARCHAR,
+    p_fecha_nacimiento DATE DEFAULT NULL,
+    p_telefono VARCHAR DEFAULT NULL,
+    p_email VARCHAR DEFAULT NULL,
+    p_direccion TEXT DEFAULT NULL,
+    p_profesion VARCHAR DEFAULT NULL,
+    p_universidad VARCHAR DEFAULT NULL,
+    p_fotografia_url TEXT DEFAULT NULL,
+    p_activo BOOLEAN DEFAULT NULL
+)
+RETURNS TABLE(filas_afectadas INTEGER, mensaje VARCHAR, exito BOOLEAN) 
+LANGUAGE plpgsql
+AS $$
+DECLARE
+    v_filas_afectadas INTEGER;
+    v_mensaje VARCHAR;
+    v_exito BOOLEAN;
+    v_ci_duplicado BOOLEAN;
+    v_email_duplicado BOOLEAN;
+BEGIN
+    -- Inicializar variables
+    v_filas_afectadas := 0;
+    v_mensaje := '';
+    v_exito := FALSE;
+    
+    -- Validar que el estudiante exista
+    IF NOT EXISTS(SELECT 1 FROM estudiantes WHERE id = p_id) THEN
+        v_mensaje := 'El estudiante con ID ' || p_id || ' no existe';
+        RETURN QUERY SELECT v_filas_afectadas, v_mensaje, v_exito;
+        RETURN;
+    END IF;
+    
+    -- Validar CI (junto con su expedición) y email únicos, excluyendo el registro actual
+    SELECT u.ci_duplicado, u.email_duplicado
+    INTO v_ci_duplicado, v_email_duplicado
+    FROM fn_validar_unicidad_estudiante(p_ci_numero, p_ci_expedicion, p_email, p_id) u;
+    
+    IF v_ci_duplicado THEN
+        v_mensaje := 'El número de CI ya está registrado en otro estudiante';
+        RETURN QUERY SELECT v_filas_afectadas, v_mensaje, v_exito;
+        RETURN;
+    END IF;
+    
+    IF v_email_duplicado THEN
+        v_mensaje := 'El email ya está registrado en otro estudiante';
+        RETURN QUERY SELECT v_filas_afectadas, v_mensaje, v_exito;
+        RETURN;
+    END IF;
+    
+    -- Actualizar estudiante
+    UPDATE estudiantes
+    SET 
+        ci_numero = p_ci_numero,
+        ci_expedicion = p_ci_expedicion,
+        nombres = p_nombres,
+        apellido_paterno = p_apellido_paterno,
+        apellido_materno = p_apellido_materno,
+        fecha_nacimiento = p_fecha_nacimiento,
+        telefono = p_telefono,
+        email = p_email,
+        direccion = p_direccion,
+        profesion = p_profesion,
+        universidad = p_universidad,
+        fotografia_url = p_fotografia_url,
+        activo = COALESCE(p_activo, activo)
+    WHERE id = p_id;
+    
+    GET DIAGNOSTICS v_filas_afectadas = ROW_COUNT;
+    
+    IF v_filas_afectadas > 0 THEN
+        v_mensaje := 'Estudiante actualizado exitosamente';
+        v_exito := TRUE;
+    ELSE
+        v_mensaje := 'No se realizaron cambios en el estudiante';
+        v_exito := FALSE;
+    END IF;
+    
+    RETURN QUERY SELECT v_filas_afectadas, v_mensaje, v_exito;
+    
+EXCEPTION
+    WHEN OTHERS THEN
+        v_mensaje := 'Error al actualizar estudiante: ' || SQLERRM;
+        v_exito := FALSE;
+        RETURN QUERY SELECT v_filas_afectadas, v_mensaje, v_exito;
+END;
+$$;
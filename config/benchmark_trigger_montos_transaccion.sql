@@ -0,0 +1,104 @@
+-- ============================================================================
+-- BENCHMARK: RECÁLCULO DE MONTOS POR FILA VS. POR SENTENCIA
+-- Versión: 1.0.0
+-- Descripción: Mide un INSERT y un DELETE masivo de detalles_transaccion con
+--              el trigger FOR EACH ROW original y con los triggers FOR EACH
+--              STATEMENT de actualizacion_trigger_montos_transaccion.sql.
+--              Todo ocurre dentro de una transacción que termina en ROLLBACK:
+--              no deja datos, funciones ni triggers. Ejecutar sólo en una base
+--              de prueba (ALTER TABLE bloquea detalles_transaccion):
+--
+--                  psql -d formagestpro_test -f config/benchmark_trigger_montos_transaccion.sql
+-- ============================================================================
+
+BEGIN;
+
+-- ==================== 1. TRIGGER POR FILA ORIGINAL =========================
+CREATE FUNCTION fn_benchmark_monto_por_fila()
+RETURNS TRIGGER AS $$
+DECLARE
+    total_transaccion DECIMAL(10,2);
+BEGIN
+    SELECT COALESCE(SUM(subtotal), 0)
+    INTO total_transaccion
+    FROM detalles_transaccion
+    WHERE transaccion_id = COALESCE(NEW.transaccion_id, OLD.transaccion_id);
+
+    UPDATE transacciones
+    SET monto_total = total_transaccion,
+        monto_final = total_transaccion - COALESCE(descuento_total, 0)
+    WHERE id = COALESCE(NEW.transaccion_id, OLD.transaccion_id);
+
+    RETURN COALESCE(NEW, OLD);
+END;
+$$ LANGUAGE plpgsql;
+
+-- ==================== 2. MEDICIÓN ==========================================
+DO $$
+DECLARE
+    c_transacciones CONSTANT INTEGER := 200;
+    c_detalles CONSTANT INTEGER := 50;
+    v_concepto_id INTEGER;
+    v_ids INTEGER[];
+    v_modo TEXT;
+    v_inicio TIMESTAMP;
+    v_insert INTERVAL;
+    v_delete INTERVAL;
+    v_incorrectas INTEGER;
+BEGIN
+    SELECT MIN(id) INTO v_concepto_id FROM conceptos_pago;
+    IF v_concepto_id IS NULL THEN
+        RAISE EXCEPTION 'No hay conceptos de pago para el benchmark';
+    END IF;
+
+    WITH nuevas AS (
+        INSERT INTO transacciones (
+            fecha_pago, monto_total, descuento_total, monto_final,
+            forma_pago, estado, observaciones
+        )
+        SELECT CURRENT_DATE, 0, 0, 0, 'EFECTIVO', 'REGISTRADO', 'benchmark'
+        FROM generate_series(1, c_transacciones)
+        RETURNING id
+    )
+    SELECT ARRAY_AGG(id) INTO v_ids FROM nuevas;
+
+    FOREACH v_modo IN ARRAY ARRAY['POR_SENTENCIA', 'POR_FILA'] LOOP
+        IF v_modo = 'POR_FILA' THEN
+            ALTER TABLE detalles_transaccion DISABLE TRIGGER tr_actualizar_monto_transaccion_ins;
+            ALTER TABLE detalles_transaccion DISABLE TRIGGER tr_actualizar_monto_transaccion_upd;
+            ALTER TABLE detalles_transaccion DISABLE TRIGGER tr_actualizar_monto_transaccion_del;
+            CREATE TRIGGER tr_benchmark_monto_por_fila
+                AFTER INSERT OR UPDATE OR DELETE ON detalles_transaccion
+                FOR EACH ROW
+                EXECUTE FUNCTION fn_benchmark_monto_por_fila();
+        END IF;
+
+        -- INSERT masivo: c_detalles detalles por transacción en una sentencia
+        v_inicio := clock_timestamp();
+        INSERT INTO detalles_transaccion (
+            transaccion_id, concepto_pago_id, descripcion, cantidad,
+            precio_unitario, subtotal, orden
+        )
+        SELECT t.id, v_concepto_id, 'benchmark', 1, 10, 10, d
+        FROM UNNEST(v_ids) AS t(id)
+        CROSS JOIN generate_series(1, c_detalles) AS d;
+        v_insert := clock_timestamp() - v_inicio;
+
+        SELECT COUNT(*) INTO v_incorrectas
+        FROM transacciones
+        WHERE id = ANY(v_ids) AND monto_total <> c_detalles * 10;
+        IF v_incorrectas > 0 THEN
+            RAISE EXCEPTION '% transacciones con monto incorrecto (%)', v_incorrectas, v_modo;
+        END IF;
+
+        -- DELETE masivo, como DetalleTransaccionModel.eliminar_por_transaccion
+        v_inicio := clock_timestamp();
+        DELETE FROM detalles_transaccion WHERE transaccion_id = ANY(v_ids);
+        v_delete := clock_timestamp() - v_inicio;
+
+        RAISE NOTICE '📊 % - INSERT de % detalles: %, DELETE: %',
+            v_modo, c_transacciones * c_detalles, v_insert, v_delete;
+    END LOOP;
+END $$;
+
+ROLLBACK;
@@ -20,6 +20,7 @@ class Database:
     _connection_pool: Optional[psycopg2.pool.SimpleConnectionPool] = None
     _lock = threading.Lock()  # Para sincronización de hilos
     _active_connections: Dict[int, Dict[str, Any]] = {}  # Para rastrear conexiones activas
+    _idle_since: Dict[int, float] = {}  # Momento en que cada conexión libre volvió al pool
     
     _config = {
         'host': 'localhost',
@@ -242,6 +243,7 @@ class Database:
                 
                 # Devolver al pool
                 pool.putconn(connection)
+                cls._idle_since[id(connection)] = time.time()
                 logger.debug(f"🔙 Conexión devuelta al pool")
                     
             except (psycopg2.InterfaceError, psycopg2.OperationalError) as e:
@@ -267,6 +269,7 @@ class Database:
                 except:
                     pass
             cls._active_connections.clear()
+            cls._idle_since.clear()
             
             # Cerrar el pool
             pool = cls._connection_pool
@@ -388,6 +391,54 @@ class Database:
         except Exception as e:
             logger.warning(f"⚠️  Error en limpieza general: {e}")
     
+    @classmethod
+    def close_idle_pooled_connections(cls, max_idle_seconds: int = 600) -> int:
+        """
+        Cerrar conexiones libres del pool que están dañadas o sin uso hace tiempo
+        
+        Solo recorre la lista de conexiones libres del pool, bajo el lock: las
+        conexiones prestadas a un hilo nunca se tocan. Se conservan al menos
+        POOL_MIN conexiones libres sanas.
+        
+        Returns:
+            Cantidad de conexiones cerradas
+        """
+        with cls._lock:
+            pool = cls._connection_pool
+            if pool is None or pool.closed:
+                return 0
+            
+            now = time.time()
+            free = getattr(pool, '_pool', [])
+            closed = 0
+            
+            # Primero las dañadas, luego las inactivas más antiguas
+            for conn in [c for c in free if c.closed]:
+                free.remove(conn)
+                cls._idle_since.pop(id(conn), None)
+                closed += 1
+            
+            # Las conexiones abiertas por el propio pool empiezan a contar desde ahora
+            for conn in free:
+                cls._idle_since.setdefault(id(conn), now)
+            
+            idle = sorted(
+                (c for c in free if now - cls._idle_since[id(c)] > max_idle_seconds),
+                key=lambda c: cls._idle_since[id(c)]
+            )
+            for conn in idle[:max(0, len(free) - cls.POOL_MIN)]:
+                free.remove(conn)
+                cls._idle_since.pop(id(conn), None)
+                try:
+                    conn.close()
+                except Exception:
+                    pass
+                closed += 1
+            
+            if closed:
+                logger.debug(f"🔒 {closed} conexiones libres cerradas ({len(free)} quedan en el pool)")
+            return closed
+    
     @classmethod
     def get_pool_status(cls) -> Dict[str, Any]:
         """Obtener estado del pool de conexiones"""
@@ -127,7 +127,37 @@ BEGIN
 END;
 $$ LANGUAGE plpgsql;
 
+-- 1.4.1 Validación de unicidad (CI + expedición y email) en una consulta
+-- Mismo criterio que ux_estudiantes_ci_norm: el mismo número con otra
+-- expedición es otra persona.
+CREATE OR REPLACE FUNCTION fn_validar_unicidad_estudiante(
+    p_ci_numero VARCHAR,
+    p_ci_expedicion VARCHAR,
+    p_email VARCHAR DEFAULT NULL,
+    p_excluir_id INTEGER DEFAULT NULL
+)
+RETURNS TABLE(ci_duplicado BOOLEAN, email_duplicado BOOLEAN) AS $$
+BEGIN
+    RETURN QUERY
+    SELECT
+        EXISTS(
+            SELECT 1 FROM estudiantes
+            WHERE UPPER(BTRIM(ci_numero)) = UPPER(BTRIM(p_ci_numero))
+            AND ci_expedicion = p_ci_expedicion
+            AND (p_excluir_id IS NULL OR id != p_excluir_id)
+        ),
+        (p_email IS NOT NULL AND EXISTS(
+            SELECT 1 FROM estudiantes
+            WHERE email IS NOT NULL
+            AND LOWER(BTRIM(email)) = LOWER(BTRIM(p_email))
+            AND (p_excluir_id IS NULL OR id != p_excluir_id)
+        ));
+END;
+$$ LANGUAGE plpgsql STABLE;
+
 -- 1.5 Procedimiento para insertar nuevo estudiante
+-- La unicidad la garantizan las restricciones (ON CONFLICT); sólo ante
+-- conflicto se consulta qué campo lo provocó.
 CREATE OR REPLACE FUNCTION fn_insertar_estudiante(
     p_ci_numero VARCHAR,
     p_ci_expedicion d_expedicion_ci,
@@ -148,51 +178,44 @@ LANGUAGE plpgsql
 AS $$
 DECLARE
     v_nuevo_id INTEGER;
-    v_mensaje VARCHAR;
-    v_exito BOOLEAN;
+    v_ci_duplicado BOOLEAN;
+    v_email_duplicado BOOLEAN;
 BEGIN
-    -- Inicializar variables
-    v_nuevo_id := NULL;
-    v_mensaje := '';
-    v_exito := FALSE;
-    
-    -- Validar CI único
-    IF fn_verificar_ci_existente(p_ci_numero) THEN
-        v_mensaje := 'El número de CI ya está registrado en el sistema';
-        RETURN QUERY SELECT v_nuevo_id, v_mensaje, v_exito;
-        RETURN;
-    END IF;
-    
-    -- Validar email único si se proporciona
-    IF p_email IS NOT NULL AND EXISTS(
-        SELECT 1 FROM estudiantes WHERE email = p_email
-    ) THEN
-        v_mensaje := 'El email ya está registrado en el sistema';
-        RETURN QUERY SELECT v_nuevo_id, v_mensaje, v_exito;
-        RETURN;
-    END IF;
-    
-    -- Insertar estudiante
     INSERT INTO estudiantes (
         ci_numero, ci_expedicion, nombres, apellido_paterno, apellido_materno,
         fecha_nacimiento, telefono, email, direccion, profesion, universidad,
         fotografia_url, activo
     ) VALUES (
-        p_ci_numero, p_ci_expedicion, p_nombres, p_apellido_paterno, p_apellido_materno,
-        p_fecha_nacimiento, p_telefono, p_email, p_direccion, p_profesion, p_universidad,
+        BTRIM(p_ci_numero), p_ci_expedicion, p_nombres, p_apellido_paterno, p_apellido_materno,
+        p_fecha_nacimiento, p_telefono, NULLIF(BTRIM(p_email), ''), p_direccion, p_profesion, p_universidad,
         p_fotografia_url, p_activo
-    ) RETURNING id INTO v_nuevo_id;
-    
-    v_mensaje := 'Estudiante creado exitosamente con ID: ' || v_nuevo_id;
-    v_exito := TRUE;
-    
-    RETURN QUERY SELECT v_nuevo_id, v_mensaje, v_exito;
-    
+    )
+    ON CONFLICT DO NOTHING
+    RETURNING id INTO v_nuevo_id;
+
+    IF v_nuevo_id IS NOT NULL THEN
+        RETURN QUERY SELECT v_nuevo_id,
+            ('Estudiante creado exitosamente con ID: ' || v_nuevo_id)::VARCHAR, TRUE;
+        RETURN;
+    END IF;
+
+    -- Conflicto: identificar el campo duplicado
+    SELECT u.ci_duplicado, u.email_duplicado
+    INTO v_ci_duplicado, v_email_duplicado
+    FROM fn_validar_unicidad_estudiante(p_ci_numero, p_ci_expedicion, p_email) u;
+
+    RETURN QUERY SELECT NULL::INTEGER,
+        (CASE
+            WHEN v_ci_duplicado THEN 'El número de CI ya está registrado en el sistema'
+            WHEN v_email_duplicado THEN 'El email ya está registrado en el sistema'
+            ELSE 'El estudiante ya está registrado en el sistema'
+        END)::VARCHAR,
+        FALSE;
+
 EXCEPTION
     WHEN OTHERS THEN
-        v_mensaje := 'Error al crear estudiante: ' || SQLERRM;
-        v_exito := FALSE;
-        RETURN QUERY SELECT v_nuevo_id, v_mensaje, v_exito;
+        RETURN QUERY SELECT NULL::INTEGER,
+            ('Error al crear estudiante: ' || SQLERRM)::VARCHAR, FALSE;
 END;
 $$;
 
@@ -425,6 +448,8 @@ DECLARE
     v_filas_afectadas INTEGER;
     v_mensaje VARCHAR;
     v_exito BOOLEAN;
+    v_ci_duplicado BOOLEAN;
+    v_email_duplicado BOOLEAN;
 BEGIN
     -- Inicializar variables
     v_filas_afectadas := 0;
@@ -438,17 +463,18 @@ BEGIN
         RETURN;
     END IF;
     
-    -- Validar CI único (excluyendo el registro actual)
-    IF fn_verificar_ci_existente(p_ci_numero, p_id) THEN
+    -- Validar CI (junto con su expedición) y email únicos, excluyendo el registro actual
+    SELECT u.ci_duplicado, u.email_duplicado
+    INTO v_ci_duplicado, v_email_duplicado
+    FROM fn_validar_unicidad_estudiante(p_ci_numero, p_ci_expedicion, p_email, p_id) u;
+    
+    IF v_ci_duplicado THEN
         v_mensaje := 'El número de CI ya está registrado en otro estudiante';
         RETURN QUERY SELECT v_filas_afectadas, v_mensaje, v_exito;
         RETURN;
     END IF;
     
-    -- Validar email único si se proporciona
-    IF p_email IS NOT NULL AND EXISTS(
-        SELECT 1 FROM estudiantes WHERE email = p_email AND id != p_id
-    ) THEN
+    IF v_email_duplicado THEN
         v_mensaje := 'El email ya está registrado en otro estudiante';
         RETURN QUERY SELECT v_filas_afectadas, v_mensaje, v_exito;
         RETURN;
@@ -873,61 +899,57 @@ RETURNS TABLE(
     ultimo_pago DATE,
     proximo_vencimiento DATE,
     estado_financiero VARCHAR(20)
-) 
+)
 LANGUAGE plpgsql
 AS $$
-DECLARE
-    v_ultimo_pago DATE;
-    v_proximo_vencimiento DATE;
 BEGIN
-    -- Obtener datos básicos
     RETURN QUERY
     WITH programas_estudiante AS (
-        SELECT 
-            i.programa_id,
-            p.costo_total,
-            COALESCE(SUM(t.monto_final), 0) AS pagado
+        SELECT
+            COALESCE(i.valor_final, p.costo_total) AS costo,
+            i.total_pagado AS pagado,
+            i.saldo_pendiente AS deuda,
+            i.ultimo_pago AS ultima_fecha
         FROM inscripciones i
         INNER JOIN programas p ON i.programa_id = p.id
-        LEFT JOIN transacciones t ON i.estudiante_id = t.estudiante_id 
-            AND i.programa_id = t.programa_id
-            AND t.estado = 'CONFIRMADO'
         WHERE i.estudiante_id = p_estudiante_id
-        GROUP BY i.programa_id, p.costo_total
-    ),
-    transacciones_estudiante AS (
-        SELECT 
-            COUNT(*) AS total,
-            MAX(fecha_pago) AS ultima_fecha
-        FROM transacciones
-        WHERE estudiante_id = p_estudiante_id
-            AND estado = 'CONFIRMADO'
     )
-    SELECT 
+    SELECT
         COUNT(*)::INTEGER AS total_programas,
-        SUM(costo_total)::DECIMAL(12,2) AS total_inscrito,
-        SUM(pagado)::DECIMAL(12,2) AS total_pagado,
-        SUM(GREATEST(costo_total - pagado, 0))::DECIMAL(12,2) AS total_deuda,
-        CASE 
-            WHEN SUM(costo_total) > 0 THEN 
-                ROUND((SUM(pagado) * 100.0 / SUM(costo_total)), 2)
-            ELSE 0 
-        END AS promedio_pagado,
-        COALESCE(te.total, 0)::INTEGER AS transacciones_totales,
-        te.ultima_fecha AS ultimo_pago,
-        NULL::DATE AS proximo_vencimiento,
-        CASE 
-            WHEN SUM(costo_total) = 0 THEN 'SIN_PROGRAMAS'
-            WHEN SUM(pagado) >= SUM(costo_total) THEN 'AL_DIA'
-            WHEN SUM(pagado) >= (SUM(costo_total) * 0.5) THEN 'PARCIAL'
+        COALESCE(SUM(pe.costo), 0)::DECIMAL(12,2) AS total_inscrito,
+        COALESCE(SUM(pe.pagado), 0)::DECIMAL(12,2) AS total_pagado,
+        COALESCE(SUM(pe.deuda), 0)::DECIMAL(12,2) AS total_deuda,
+        CASE
+            WHEN SUM(pe.costo) > 0 THEN
+                ROUND((SUM(pe.pagado) * 100.0 / SUM(pe.costo)), 2)
+            ELSE 0
+        END::DECIMAL(5,2) AS promedio_pagado,
+        (
+            SELECT COUNT(*)
+            FROM transacciones t
+            WHERE t.estudiante_id = p_estudiante_id
+              AND t.estado = 'CONFIRMADO'
+        )::INTEGER AS transacciones_totales,
+        MAX(pe.ultima_fecha) AS ultimo_pago,
+        (
+            SELECT MIN(c.fecha_vencimiento)
+            FROM cuotas_inscripcion c
+            JOIN inscripciones i ON i.id = c.inscripcion_id
+            WHERE i.estudiante_id = p_estudiante_id
+              AND i.estado <> 'RETIRADO'
+              AND c.monto_pagado < c.monto
+        ) AS proximo_vencimiento,
+        CASE
+            WHEN COALESCE(SUM(pe.costo), 0) = 0 THEN 'SIN_PROGRAMAS'
+            WHEN SUM(pe.pagado) >= SUM(pe.costo) THEN 'AL_DIA'
+            WHEN SUM(pe.pagado) >= (SUM(pe.costo) * 0.5) THEN 'PARCIAL'
             ELSE 'MOROSO'
         END::VARCHAR(20) AS estado_financiero
-    FROM programas_estudiante pe
-    CROSS JOIN transacciones_estudiante te;
+    FROM programas_estudiante pe;
 END;
 $$;
 
--- Función para obtener cronograma de pagos sugerido
+-- Función para obtener cronograma de pagos (cuotas pendientes de cuotas_inscripcion)
 CREATE OR REPLACE FUNCTION fn_cronograma_pagos_estudiante(p_estudiante_id INTEGER)
 RETURNS TABLE(
     programa_id INTEGER,
@@ -937,44 +959,29 @@ RETURNS TABLE(
     monto_sugerido DECIMAL(10,2),
     fecha_sugerida DATE,
     estado VARCHAR(20)
-) 
+)
 LANGUAGE plpgsql
 AS $$
 BEGIN
     RETURN QUERY
-    WITH programas_deuda AS (
-        SELECT 
-            i.programa_id,
-            p.nombre AS programa_nombre,
-            p.costo_total,
-            p.numero_cuotas,
-            p.fecha_inicio,
-            COALESCE(SUM(t.monto_final), 0) AS pagado,
-            GREATEST(p.costo_total - COALESCE(SUM(t.monto_final), 0), 0) AS saldo_pendiente
-        FROM inscripciones i
-        INNER JOIN programas p ON i.programa_id = p.id
-        LEFT JOIN transacciones t ON i.estudiante_id = t.estudiante_id 
-            AND i.programa_id = t.programa_id
-            AND t.estado = 'CONFIRMADO'
-        WHERE i.estudiante_id = p_estudiante_id
-            AND p.costo_total > COALESCE(SUM(t.monto_final), 0)
-        GROUP BY i.programa_id, p.nombre, p.costo_total, p.numero_cuotas, p.fecha_inicio
-    )
-    SELECT 
-        pd.programa_id,
-        pd.programa_nombre,
-        gs.mes AS mes_pago,
-        CONCAT('Cuota ', gs.mes, ' - ', pd.programa_nombre) AS concepto,
-        ROUND(pd.saldo_pendiente / pd.numero_cuotas, 2) AS monto_sugerido,
-        (pd.fecha_inicio + (gs.mes - 1) * INTERVAL '1 month')::DATE AS fecha_sugerida,
-        CASE 
-            WHEN (pd.fecha_inicio + (gs.mes - 1) * INTERVAL '1 month') < CURRENT_DATE THEN 'VENCIDO'
+    SELECT
+        p.id,
+        p.nombre,
+        c.numero_cuota,
+        c.concepto,
+        c.saldo::DECIMAL(10,2),
+        c.fecha_vencimiento,
+        (CASE
+            WHEN c.fecha_vencimiento < CURRENT_DATE THEN 'VENCIDO'
             ELSE 'PENDIENTE'
-        END AS estado
-    FROM programas_deuda pd
-    CROSS JOIN generate_series(1, pd.numero_cuotas) AS gs(mes)
-    WHERE (pd.fecha_inicio + (gs.mes - 1) * INTERVAL '1 month') >= CURRENT_DATE - INTERVAL '1 month'
-    ORDER BY pd.programa_id, gs.mes;
+        END)::VARCHAR(20)
+    FROM inscripciones i
+    JOIN programas p ON p.id = i.programa_id
+    JOIN cuotas_inscripcion c ON c.inscripcion_id = i.id
+    WHERE i.estudiante_id = p_estudiante_id
+      AND i.estado <> 'RETIRADO'
+      AND c.monto_pagado < c.monto
+    ORDER BY p.id, c.numero_cuota;
 END;
 $$;
 
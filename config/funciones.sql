@@ -319,6 +319,8 @@ DECLARE
     v_filas_afectadas INTEGER;
     v_mensaje VARCHAR;
     v_exito BOOLEAN;
+    v_ci_duplicado BOOLEAN;
+    v_email_duplicado BOOLEAN;
 BEGIN
     -- Inicializar variables
     v_filas_afectadas := 0;
@@ -332,17 +334,18 @@ BEGIN
         RETURN;
     END IF;
     
-    -- Validar CI único (excluyendo el registro actual)
-    IF fn_verificar_ci_existente(p_ci_numero, p_id) THEN
+    -- Validar CI (junto con su expedición) y email únicos, excluyendo el registro actual
+    SELECT u.ci_duplicado, u.email_duplicado
+    INTO v_ci_duplicado, v_email_duplicado
+    FROM fn_validar_unicidad_estudiante(p_ci_numero, p_ci_expedicion, p_email, p_id) u;
+    
+    IF v_ci_duplicado THEN
         v_mensaje := 'El número de CI ya está registrado en otro estudiante';
         RETURN QUERY SELECT v_filas_afectadas, v_mensaje, v_exito;
         RETURN;
     END IF;
     
-    -- Validar email único si se proporciona
-    IF p_email IS NOT NULL AND EXISTS(
-        SELECT 1 FROM estudiantes WHERE email = p_email AND id != p_id
-    ) THEN
+    IF v_email_duplicado THEN
         v_mensaje := 'El email ya está registrado en otro estudiante';
         RETURN QUERY SELECT v_filas_afectadas, v_mensaje, v_exito;
         RETURN;
@@ -389,31 +392,52 @@ $function$
 
 -- DROP FUNCTION public.fn_actualizar_monto_transaccion();
 
+CREATE OR REPLACE FUNCTION public.fn_recalcular_montos_transacciones(p_transaccion_ids INTEGER[])
+RETURNS VOID AS $$
+BEGIN
+    -- Un único UPDATE para todas las transacciones afectadas
+    UPDATE transacciones t
+    SET monto_total = s.total,
+        monto_final = s.total - COALESCE(t.descuento_total, 0)
+    FROM (
+        SELECT ids.id AS transaccion_id, COALESCE(SUM(d.subtotal), 0) AS total
+        FROM UNNEST(p_transaccion_ids) AS ids(id)
+        LEFT JOIN detalles_transaccion d ON d.transaccion_id = ids.id
+        GROUP BY ids.id
+    ) s
+    WHERE t.id = s.transaccion_id;
+END;
+$$ LANGUAGE plpgsql;
+
 CREATE OR REPLACE FUNCTION public.fn_actualizar_monto_transaccion()
- RETURNS trigger
- LANGUAGE plpgsql
-AS $function$
+RETURNS TRIGGER AS $$
 DECLARE
-    total_transaccion DECIMAL(10,2);
+    v_transaccion_ids INTEGER[];
 BEGIN
-    IF TG_OP = 'INSERT' OR TG_OP = 'UPDATE' OR TG_OP = 'DELETE' THEN
-        -- Calcular nuevo total
-        SELECT COALESCE(SUM(subtotal), 0)
-        INTO total_transaccion
-        FROM detalles_transaccion
-        WHERE transaccion_id = COALESCE(NEW.transaccion_id, OLD.transaccion_id);
-        
-        -- Actualizar transacción
-        UPDATE transacciones
-        SET monto_total = total_transaccion,
-            monto_final = total_transaccion - COALESCE(descuento_total, 0)
-        WHERE id = COALESCE(NEW.transaccion_id, OLD.transaccion_id);
+    -- Trigger por sentencia: recalcula cada transacción afectada una sola vez
+    -- usando las tablas de transición (detalles_nuevos / detalles_anteriores)
+    IF TG_OP = 'INSERT' THEN
+        SELECT ARRAY_AGG(DISTINCT transaccion_id) INTO v_transaccion_ids
+        FROM detalles_nuevos;
+    ELSIF TG_OP = 'UPDATE' THEN
+        SELECT ARRAY_AGG(DISTINCT transaccion_id) INTO v_transaccion_ids
+        FROM (
+            SELECT transaccion_id FROM detalles_nuevos
+            UNION
+            SELECT transaccion_id FROM detalles_anteriores
+        ) afectados;
+    ELSIF TG_OP = 'DELETE' THEN
+        SELECT ARRAY_AGG(DISTINCT transaccion_id) INTO v_transaccion_ids
+        FROM detalles_anteriores;
     END IF;
     
-    RETURN COALESCE(NEW, OLD);
+    IF v_transaccion_ids IS NOT NULL THEN
+        PERFORM fn_recalcular_montos_transacciones(v_transaccion_ids);
+    END IF;
+    
+    RETURN NULL;
 END;
-$function$
-;
+$$ LANGUAGE plpgsql;
 
 -- DROP FUNCTION public.fn_actualizar_programa(int4, varchar, varchar, int4, int4, numeric, numeric, text, numeric, numeric, int4, int4, int4, d_estado_programa, date, date, int4, numeric, text, date);
 
@@ -563,6 +587,61 @@ END;
 $function$
 ;
 
+-- DROP FUNCTION public.fn_actualizar_saldos_inscripciones();
+
+CREATE OR REPLACE FUNCTION public.fn_actualizar_saldos_inscripciones()
+RETURNS TRIGGER AS $$
+DECLARE
+    v_estudiante_ids INTEGER[];
+    v_programa_ids INTEGER[];
+BEGIN
+    -- Trigger por sentencia: cada inscripción afectada se recalcula una sola
+    -- vez. Sólo interesan las filas que son o eran CONFIRMADAS.
+    IF TG_OP = 'INSERT' THEN
+        SELECT ARRAY_AGG(a.estudiante_id), ARRAY_AGG(a.programa_id)
+        INTO v_estudiante_ids, v_programa_ids
+        FROM (
+            SELECT DISTINCT n.estudiante_id, n.programa_id
+            FROM transacciones_nuevas n
+            WHERE n.estado = 'CONFIRMADO'
+        ) a;
+    ELSIF TG_OP = 'UPDATE' THEN
+        -- Cambios de estado (incluida la anulación), monto, fecha o inscripción
+        WITH cambios AS (
+            SELECT n.estudiante_id AS est_nuevo, n.programa_id AS prog_nuevo,
+                   o.estudiante_id AS est_anterior, o.programa_id AS prog_anterior
+            FROM transacciones_nuevas n
+            JOIN transacciones_anteriores o ON o.id = n.id
+            WHERE (n.estado = 'CONFIRMADO' OR o.estado = 'CONFIRMADO')
+              AND (n.estado, n.monto_final, n.fecha_pago, n.estudiante_id, n.programa_id)
+                  IS DISTINCT FROM
+                  (o.estado, o.monto_final, o.fecha_pago, o.estudiante_id, o.programa_id)
+        )
+        SELECT ARRAY_AGG(a.estudiante_id), ARRAY_AGG(a.programa_id)
+        INTO v_estudiante_ids, v_programa_ids
+        FROM (
+            SELECT est_nuevo AS estudiante_id, prog_nuevo AS programa_id FROM cambios
+            UNION
+            SELECT est_anterior, prog_anterior FROM cambios
+        ) a;
+    ELSIF TG_OP = 'DELETE' THEN
+        SELECT ARRAY_AGG(a.estudiante_id), ARRAY_AGG(a.programa_id)
+        INTO v_estudiante_ids, v_programa_ids
+        FROM (
+            SELECT DISTINCT o.estudiante_id, o.programa_id
+            FROM transacciones_anteriores o
+            WHERE o.estado = 'CONFIRMADO'
+        ) a;
+    END IF;
+
+    IF v_estudiante_ids IS NOT NULL THEN
+        PERFORM fn_recalcular_saldos_inscripciones(v_estudiante_ids, v_programa_ids);
+    END IF;
+
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
 -- DROP FUNCTION public.fn_actualizar_timestamp();
 
 CREATE OR REPLACE FUNCTION public.fn_actualizar_timestamp()
@@ -656,6 +735,133 @@ END;
 $function$
 ;
 
+-- DROP FUNCTION public.fn_aplicar_pagos_cuotas(int4);
+
+CREATE OR REPLACE FUNCTION public.fn_aplicar_pagos_cuotas(p_inscripcion_id INTEGER)
+RETURNS INTEGER AS $$
+DECLARE
+    v_actualizadas INTEGER;
+BEGIN
+    -- El total pagado de la inscripción cubre las cuotas en orden; sólo se
+    -- escriben las cuotas cuyo monto_pagado cambia.
+    UPDATE cuotas_inscripcion c
+    SET monto_pagado = d.monto_pagado
+    FROM (
+        SELECT
+            c2.id,
+            LEAST(c2.monto, GREATEST(i.total_pagado - COALESCE(SUM(c2.monto) OVER (
+                ORDER BY c2.numero_cuota
+                ROWS BETWEEN UNBOUNDED PRECEDING AND 1 PRECEDING
+            ), 0), 0)) AS monto_pagado
+        FROM cuotas_inscripcion c2
+        JOIN inscripciones i ON i.id = c2.inscripcion_id
+        WHERE c2.inscripcion_id = p_inscripcion_id
+    ) d
+    WHERE c.id = d.id
+      AND c.monto_pagado IS DISTINCT FROM d.monto_pagado;
+
+    GET DIAGNOSTICS v_actualizadas = ROW_COUNT;
+    RETURN v_actualizadas;
+END;
+$$ LANGUAGE plpgsql;
+
+-- DROP FUNCTION public.fn_archivar_programas(int4, int4);
+
+CREATE OR REPLACE FUNCTION public.fn_archivar_programas(
+    p_anios INTEGER DEFAULT 5,
+    p_limite INTEGER DEFAULT 50
+)
+RETURNS TABLE (
+    programa_id INTEGER,
+    codigo VARCHAR,
+    estado TEXT,
+    fecha_fin DATE,
+    inscripciones_archivadas INTEGER,
+    transacciones_archivadas INTEGER
+) AS $$
+DECLARE
+    v_programas INTEGER[];
+    v_transacciones INTEGER[];
+BEGIN
+    IF p_anios IS NULL OR p_anios < 1 THEN
+        RAISE EXCEPTION 'La antigüedad mínima para archivar es de 1 año';
+    END IF;
+
+    -- Programas cerrados hace más de p_anios años y sin pagos en trámite;
+    -- SKIP LOCKED: un programa que se está editando queda para la próxima vez
+    v_programas := ARRAY(
+        SELECT p.id
+        FROM programas p
+        WHERE p.estado IN ('CONCLUIDO', 'CANCELADO')
+          AND COALESCE(p.fecha_fin, p.updated_at::DATE) < CURRENT_DATE - make_interval(years => p_anios)
+          AND NOT EXISTS (
+              SELECT 1 FROM transacciones t
+              WHERE t.programa_id = p.id
+                AND t.estado IN ('REGISTRADO', 'PENDIENTE')
+          )
+        ORDER BY p.fecha_fin, p.id
+        LIMIT p_limite
+        FOR UPDATE SKIP LOCKED
+    );
+
+    IF cardinality(v_programas) = 0 THEN
+        RETURN;
+    END IF;
+
+    v_transacciones := ARRAY(
+        SELECT t.id
+        FROM transacciones t
+        WHERE t.programa_id = ANY(v_programas)
+        FOR UPDATE
+    );
+
+    RETURN QUERY
+    SELECT
+        p.id,
+        p.codigo,
+        p.estado::TEXT,
+        p.fecha_fin,
+        (SELECT COUNT(*)::INTEGER FROM inscripciones i WHERE i.programa_id = p.id),
+        (SELECT COUNT(*)::INTEGER FROM transacciones t WHERE t.programa_id = p.id)
+    FROM programas p
+    WHERE p.id = ANY(v_programas)
+    ORDER BY p.fecha_fin, p.id;
+
+    -- Copias con los mismos IDs
+    INSERT INTO programas_archivo
+    SELECT p.*, CURRENT_TIMESTAMP FROM programas p WHERE p.id = ANY(v_programas);
+
+    INSERT INTO inscripciones_archivo
+    SELECT i.*, CURRENT_TIMESTAMP FROM inscripciones i WHERE i.programa_id = ANY(v_programas);
+
+    -- El saldo (columna generada en cuotas_inscripcion) se guarda como valor
+    INSERT INTO cuotas_inscripcion_archivo
+    SELECT c.*, CURRENT_TIMESTAMP
+    FROM cuotas_inscripcion c
+    JOIN inscripciones i ON i.id = c.inscripcion_id
+    WHERE i.programa_id = ANY(v_programas);
+
+    INSERT INTO transacciones_archivo
+    SELECT t.*, CURRENT_TIMESTAMP FROM transacciones t WHERE t.id = ANY(v_transacciones);
+
+    INSERT INTO detalles_transaccion_archivo
+    SELECT d.*, CURRENT_TIMESTAMP FROM detalles_transaccion d WHERE d.transaccion_id = ANY(v_transacciones);
+
+    INSERT INTO documentos_respaldo_archivo
+    SELECT dr.*, CURRENT_TIMESTAMP FROM documentos_respaldo dr WHERE dr.transaccion_id = ANY(v_transacciones);
+
+    -- Inscripciones primero (sus cuotas, ya copiadas, se van en cascada) para que los
+    -- triggers de saldos no recalculen inscripciones que se están archivando
+    DELETE FROM inscripciones i WHERE i.programa_id = ANY(v_programas);
+
+    -- Detalles, documentos y claves de idempotencia se van en cascada;
+    -- movimientos de caja y facturas quedan con transaccion_id en NULL
+    DELETE FROM transacciones t WHERE t.id = ANY(v_transacciones);
+
+    DELETE FROM programas p WHERE p.id = ANY(v_programas);
+END;
+$$ LANGUAGE plpgsql;
+
 -- DROP FUNCTION public.fn_buscar_configuraciones(varchar, varchar, varchar, bool);
 
 CREATE OR REPLACE FUNCTION public.fn_buscar_configuraciones(p_clave character varying DEFAULT NULL::character varying, p_categoria character varying DEFAULT NULL::character varying, p_tipo character varying DEFAULT NULL::character varying, p_editable boolean DEFAULT NULL::boolean)
@@ -1086,6 +1292,28 @@ END;
 $function$
 ;
 
+-- DROP FUNCTION public.fn_calcular_saldo_inscripcion();
+
+CREATE OR REPLACE FUNCTION public.fn_calcular_saldo_inscripcion()
+RETURNS TRIGGER AS $$
+DECLARE
+    v_costo_total NUMERIC(10,2);
+BEGIN
+    -- Alta de inscripción o cambio de valor_final / estudiante / programa
+    SELECT COALESCE(SUM(t.monto_final), 0), MAX(t.fecha_pago)
+    INTO NEW.total_pagado, NEW.ultimo_pago
+    FROM transacciones t
+    WHERE t.estudiante_id = NEW.estudiante_id
+      AND t.programa_id = NEW.programa_id
+      AND t.estado = 'CONFIRMADO';
+
+    SELECT costo_total INTO v_costo_total FROM programas WHERE id = NEW.programa_id;
+
+    NEW.saldo_pendiente := GREATEST(COALESCE(NEW.valor_final, v_costo_total, 0) - NEW.total_pagado, 0);
+    RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+
 -- DROP FUNCTION public.fn_cambiar_rol_usuario(int4, d_rol_usuario);
 
 CREATE OR REPLACE FUNCTION public.fn_cambiar_rol_usuario(p_id integer, p_nuevo_rol d_rol_usuario)
@@ -1204,48 +1432,40 @@ $function$
 
 -- DROP FUNCTION public.fn_cronograma_pagos_estudiante(int4);
 
-CREATE OR REPLACE FUNCTION public.fn_cronograma_pagos_estudiante(p_estudiante_id integer)
- RETURNS TABLE(programa_id integer, programa_nombre character varying, mes_pago integer, concepto character varying, monto_sugerido numeric, fecha_sugerida date, estado character varying)
- LANGUAGE plpgsql
-AS $function$
+CREATE OR REPLACE FUNCTION public.fn_cronograma_pagos_estudiante(p_estudiante_id INTEGER)
+RETURNS TABLE(
+    programa_id INTEGER,
+    programa_nombre VARCHAR,
+    mes_pago INTEGER,
+    concepto VARCHAR,
+    monto_sugerido DECIMAL(10,2),
+    fecha_sugerida DATE,
+    estado VARCHAR(20)
+)
+LANGUAGE plpgsql
+AS $$
 BEGIN
     RETURN QUERY
-    WITH programas_deuda AS (
-        SELECT 
-            i.programa_id,
-            p.nombre AS programa_nombre,
-            p.costo_total,
-            p.numero_cuotas,
-            p.fecha_inicio,
-            COALESCE(SUM(t.monto_final), 0) AS pagado,
-            GREATEST(p.costo_total - COALESCE(SUM(t.monto_final), 0), 0) AS saldo_pendiente
-        FROM inscripciones i
-        INNER JOIN programas p ON i.programa_id = p.id
-        LEFT JOIN transacciones t ON i.estudiante_id = t.estudiante_id 
-            AND i.programa_id = t.programa_id
-            AND t.estado = 'CONFIRMADO'
-        WHERE i.estudiante_id = p_estudiante_id
-            AND p.costo_total > COALESCE(SUM(t.monto_final), 0)
-        GROUP BY i.programa_id, p.nombre, p.costo_total, p.numero_cuotas, p.fecha_inicio
-    )
-    SELECT 
-        pd.programa_id,
-        pd.programa_nombre,
-        gs.mes AS mes_pago,
-        CONCAT('Cuota ', gs.mes, ' - ', pd.programa_nombre) AS concepto,
-        ROUND(pd.saldo_pendiente / pd.numero_cuotas, 2) AS monto_sugerido,
-        (pd.fecha_inicio + (gs.mes - 1) * INTERVAL '1 month')::DATE AS fecha_sugerida,
-        CASE 
-            WHEN (pd.fecha_inicio + (gs.mes - 1) * INTERVAL '1 month') < CURRENT_DATE THEN 'VENCIDO'
+    SELECT
+        p.id,
+        p.nombre,
+        c.numero_cuota,
+        c.concepto,
+        c.saldo::DECIMAL(10,2),
+        c.fecha_vencimiento,
+        (CASE
+            WHEN c.fecha_vencimiento < CURRENT_DATE THEN 'VENCIDO'
             ELSE 'PENDIENTE'
-        END AS estado
-    FROM programas_deuda pd
-    CROSS JOIN generate_series(1, pd.numero_cuotas) AS gs(mes)
-    WHERE (pd.fecha_inicio + (gs.mes - 1) * INTERVAL '1 month') >= CURRENT_DATE - INTERVAL '1 month'
-    ORDER BY pd.programa_id, gs.mes;
+        END)::VARCHAR(20)
+    FROM inscripciones i
+    JOIN programas p ON p.id = i.programa_id
+    JOIN cuotas_inscripcion c ON c.inscripcion_id = i.id
+    WHERE i.estudiante_id = p_estudiante_id
+      AND i.estado <> 'RETIRADO'
+      AND c.monto_pagado < c.monto
+    ORDER BY p.id, c.numero_cuota;
 END;
-$function$
-;
+$$;
 
 -- DROP FUNCTION public.fn_editar_empresa(int4, varchar, varchar, varchar, varchar, varchar, text);
 
@@ -1618,6 +1838,204 @@ END;
 $function$
 ;
 
+-- DROP FUNCTION public.fn_estudiantes_disponibles_programa_paginado(int4, text, int4, varchar, varchar, int4);
+
+CREATE OR REPLACE FUNCTION public.fn_estudiantes_disponibles_programa_paginado(
+    p_programa_id INTEGER,
+    p_criterios TEXT DEFAULT NULL,
+    p_limite INTEGER DEFAULT 50,
+    p_despues_apellido VARCHAR DEFAULT NULL,
+    p_despues_nombres VARCHAR DEFAULT NULL,
+    p_despues_id INTEGER DEFAULT NULL
+)
+RETURNS TABLE (
+    estudiante_id INTEGER,
+    ci_numero VARCHAR,
+    ci_expedicion VARCHAR,
+    ci_completo TEXT,
+    estudiante_nombre TEXT,
+    nombres VARCHAR,
+    apellido_paterno VARCHAR,
+    apellido_materno VARCHAR,
+    email VARCHAR,
+    telefono VARCHAR,
+    profesion VARCHAR,
+    universidad VARCHAR
+)
+LANGUAGE sql
+STABLE
+AS $function$
+    WITH patrones AS (
+        SELECT COALESCE(ARRAY_AGG(DISTINCT '%' || t || '%'), '{}'::TEXT[]) AS lista
+        FROM UNNEST(STRING_TO_ARRAY(LOWER(BTRIM(COALESCE(p_criterios, ''))), ' ')) AS t
+        WHERE t <> ''
+    )
+    SELECT
+        e.id,
+        e.ci_numero::VARCHAR,
+        e.ci_expedicion::VARCHAR,
+        CONCAT(e.ci_numero, '-', e.ci_expedicion),
+        TRIM(CONCAT(e.apellido_paterno, ' ', COALESCE(e.apellido_materno, ''), ' ', e.nombres)),
+        e.nombres::VARCHAR,
+        e.apellido_paterno::VARCHAR,
+        e.apellido_materno::VARCHAR,
+        e.email::VARCHAR,
+        e.telefono::VARCHAR,
+        e.profesion::VARCHAR,
+        e.universidad::VARCHAR
+    FROM estudiantes e
+    CROSS JOIN patrones p
+    WHERE e.activo = TRUE
+        AND (
+            p_despues_id IS NULL
+            OR (e.apellido_paterno, e.nombres, e.id)
+                > (p_despues_apellido, p_despues_nombres, p_despues_id)
+        )
+        AND NOT EXISTS (
+            SELECT 1
+            FROM inscripciones i
+            WHERE i.programa_id = p_programa_id
+                AND i.estudiante_id = e.id
+                AND i.estado <> 'RETIRADO'
+        )
+        AND (
+            CARDINALITY(p.lista) = 0
+            OR LOWER(
+                COALESCE(e.ci_numero, '') || '-' || COALESCE(e.ci_expedicion::TEXT, '') || ' ' ||
+                COALESCE(e.nombres, '') || ' ' ||
+                COALESCE(e.apellido_paterno, '') || ' ' ||
+                COALESCE(e.apellido_materno, '') || ' ' ||
+                COALESCE(e.email, '') || ' ' ||
+                COALESCE(e.telefono, '') || ' ' ||
+                COALESCE(e.profesion, '') || ' ' ||
+                COALESCE(e.universidad, '')
+            ) LIKE ALL (p.lista)
+        )
+    ORDER BY e.apellido_paterno, e.nombres, e.id
+    LIMIT p_limite;
+$function$
+;
+
+-- DROP FUNCTION public.fn_finalizar_transaccion(uuid, int4, jsonb, jsonb);
+
+CREATE OR REPLACE FUNCTION public.fn_finalizar_transaccion(
+    p_clave UUID,
+    p_transaccion_id INTEGER,
+    p_datos JSONB,
+    p_detalles JSONB DEFAULT '[]'::JSONB
+)
+RETURNS JSONB AS $$
+DECLARE
+    v_transaccion transacciones%ROWTYPE;
+    v_ultimo_orden INTEGER;
+BEGIN
+    -- La clave se registra en la misma transacción que los cambios: o se
+    -- aplica todo, o el reintento la vuelve a encontrar libre
+    INSERT INTO operaciones_aplicadas (clave_idempotencia, transaccion_id, tipo)
+    VALUES (p_clave, p_transaccion_id, 'FINALIZAR')
+    ON CONFLICT (clave_idempotencia) DO NOTHING;
+
+    IF NOT FOUND THEN
+        SELECT * INTO v_transaccion FROM transacciones WHERE id = p_transaccion_id;
+        RETURN jsonb_build_object(
+            'aplicado', FALSE,
+            'duplicado', TRUE,
+            'transaccion', to_jsonb(v_transaccion)
+        );
+    END IF;
+
+    SELECT * INTO v_transaccion
+    FROM transacciones
+    WHERE id = p_transaccion_id
+    FOR UPDATE;
+
+    IF NOT FOUND THEN
+        RAISE EXCEPTION 'La transacción % no existe', p_transaccion_id;
+    END IF;
+
+    IF v_transaccion.estado = 'ANULADO' THEN
+        RAISE EXCEPTION 'La transacción % está anulada', v_transaccion.numero_transaccion;
+    END IF;
+
+    -- Detalles pendientes en un único INSERT
+    IF jsonb_array_length(p_detalles) > 0 THEN
+        SELECT COALESCE(MAX(orden), 0) INTO v_ultimo_orden
+        FROM detalles_transaccion
+        WHERE transaccion_id = p_transaccion_id;
+
+        INSERT INTO detalles_transaccion (
+            transaccion_id, concepto_pago_id, descripcion,
+            cantidad, precio_unitario, subtotal, orden
+        )
+        SELECT
+            p_transaccion_id,
+            (d.value->>'concepto_pago_id')::INTEGER,
+            d.value->>'descripcion',
+            COALESCE((d.value->>'cantidad')::INTEGER, 1),
+            (d.value->>'precio_unitario')::DECIMAL(10,2),
+            (d.value->>'subtotal')::DECIMAL(10,2),
+            COALESCE((d.value->>'orden')::INTEGER, v_ultimo_orden + d.posicion::INTEGER)
+        FROM jsonb_array_elements(p_detalles) WITH ORDINALITY AS d(value, posicion);
+    END IF;
+
+    -- Confirmar con los datos capturados en caja
+    UPDATE transacciones
+    SET fecha_pago = COALESCE((p_datos->>'fecha_pago')::DATE, fecha_pago),
+        forma_pago = COALESCE(p_datos->>'forma_pago', forma_pago),
+        numero_comprobante = COALESCE(p_datos->>'numero_comprobante', numero_comprobante),
+        banco_origen = COALESCE(p_datos->>'banco_origen', banco_origen),
+        cuenta_origen = COALESCE(p_datos->>'cuenta_origen', cuenta_origen),
+        observaciones = COALESCE(p_datos->>'observaciones', observaciones),
+        monto_total = COALESCE((p_datos->>'monto_total')::DECIMAL(10,2), monto_total),
+        monto_final = COALESCE((p_datos->>'monto_final')::DECIMAL(10,2), monto_final),
+        estado = 'CONFIRMADO'
+    WHERE id = p_transaccion_id
+    RETURNING * INTO v_transaccion;
+
+    RETURN jsonb_build_object(
+        'aplicado', TRUE,
+        'duplicado', FALSE,
+        'transaccion', to_jsonb(v_transaccion)
+    );
+END;
+$$ LANGUAGE plpgsql;
+
+-- DROP FUNCTION public.fn_generar_cuotas_inscripcion(int4);
+
+CREATE OR REPLACE FUNCTION public.fn_generar_cuotas_inscripcion(p_inscripcion_id INTEGER)
+RETURNS INTEGER AS $$
+DECLARE
+    v_cuotas INTEGER;
+BEGIN
+    DELETE FROM cuotas_inscripcion WHERE inscripcion_id = p_inscripcion_id;
+
+    -- Mismo plan que sugería fn_cronograma_pagos_estudiante: numero_cuotas
+    -- mensualidades iguales desde el inicio del programa; la última absorbe
+    -- el redondeo.
+    INSERT INTO cuotas_inscripcion (inscripcion_id, numero_cuota, concepto, fecha_vencimiento, monto)
+    SELECT
+        i.id,
+        gs.n,
+        CONCAT('Cuota ', gs.n, ' - ', p.nombre)::VARCHAR(100),
+        (COALESCE(p.fecha_inicio, i.fecha_inscripcion, CURRENT_DATE) + (gs.n - 1) * INTERVAL '1 month')::DATE,
+        CASE
+            WHEN gs.n < p.numero_cuotas
+                THEN TRUNC(COALESCE(i.valor_final, p.costo_total, 0) / p.numero_cuotas, 2)
+            ELSE COALESCE(i.valor_final, p.costo_total, 0)
+                 - TRUNC(COALESCE(i.valor_final, p.costo_total, 0) / p.numero_cuotas, 2) * (p.numero_cuotas - 1)
+        END
+    FROM inscripciones i
+    JOIN programas p ON p.id = i.programa_id
+    CROSS JOIN generate_series(1, GREATEST(p.numero_cuotas, 1)) AS gs(n)
+    WHERE i.id = p_inscripcion_id;
+
+    GET DIAGNOSTICS v_cuotas = ROW_COUNT;
+
+    PERFORM fn_aplicar_pagos_cuotas(p_inscripcion_id);
+    RETURN v_cuotas;
+END;
+$$ LANGUAGE plpgsql;
+
 -- DROP FUNCTION public.fn_generar_numero_transaccion();
 
 CREATE OR REPLACE FUNCTION public.fn_generar_numero_transaccion()
@@ -1633,11 +2051,14 @@ BEGIN
     -- Formato: T-YYYY-000001
     SELECT TO_CHAR(CURRENT_DATE, 'YYYY') INTO anio;
     
-    -- Obtener último consecutivo del año
-    SELECT COALESCE(MAX(SUBSTRING(numero_transaccion FROM '^T-\d{4}-(\d+)$')::INTEGER), 0) + 1
-    INTO consecutivo
-    FROM transacciones
-    WHERE numero_transaccion LIKE 'T-' || anio || '-%';
+    -- Incrementar el contador del año de forma atómica (el bloqueo de fila
+    -- serializa a los cajeros concurrentes sin recorrer transacciones)
+    INSERT INTO contadores_transaccion (anio, ultimo_numero)
+    VALUES (anio::INTEGER, 1)
+    ON CONFLICT ON CONSTRAINT contadores_transaccion_pkey DO UPDATE
+        SET ultimo_numero = contadores_transaccion.ultimo_numero + 1,
+            updated_at = CURRENT_TIMESTAMP
+    RETURNING ultimo_numero INTO consecutivo;
     
     nuevo_numero := 'T-' || anio || '-' || LPAD(consecutivo::TEXT, 6, '0');
     
@@ -1650,79 +2071,36 @@ $function$
 -- DROP FUNCTION public.fn_inscribir_estudiante_programa(int4, int4);
 
 CREATE OR REPLACE FUNCTION public.fn_inscribir_estudiante_programa(p_programa_id integer, p_estudiante_id integer)
- RETURNS TABLE(exito boolean, mensaje character varying, cupos_disponibles integer)
- LANGUAGE plpgsql
-AS $function$
+RETURNS TABLE(exito boolean, mensaje character varying, cupos_disponibles integer) AS $$
 DECLARE
-    v_exito BOOLEAN;
-    v_mensaje VARCHAR;
+    v_reserva RECORD;
     v_cupos_maximos INTEGER;
-    v_cupos_inscritos INTEGER;
-    v_cupos_disponibles INTEGER;
 BEGIN
-    -- Inicializar variables
-    v_exito := FALSE;
-    v_mensaje := '';
-    v_cupos_disponibles := 0;
-    
-    -- Obtener datos del programa
-    SELECT cupos_maximos, cupos_inscritos 
-    INTO v_cupos_maximos, v_cupos_inscritos
-    FROM programas WHERE id = p_programa_id;
-    
-    IF NOT FOUND THEN
-        v_mensaje := 'El programa no existe';
-        RETURN QUERY SELECT v_exito, v_mensaje, v_cupos_disponibles;
-        RETURN;
-    END IF;
-    
-    -- Verificar que el programa no esté cancelado
-    IF EXISTS(SELECT 1 FROM programas WHERE id = p_programa_id AND estado = 'CANCELADO') THEN
-        v_mensaje := 'El programa está cancelado';
-        RETURN QUERY SELECT v_exito, v_mensaje, v_cupos_disponibles;
-        RETURN;
-    END IF;
-    
-    -- Verificar que haya cupos disponibles (si hay límite)
-    IF v_cupos_maximos IS NOT NULL AND v_cupos_inscritos >= v_cupos_maximos THEN
-        v_mensaje := 'No hay cupos disponibles en el programa';
-        v_cupos_disponibles := 0;
-        RETURN QUERY SELECT v_exito, v_mensaje, v_cupos_disponibles;
+    -- Cualquier estado salvo CANCELADO (regla original de esta función)
+    SELECT * INTO v_reserva
+    FROM fn_reservar_cupos(p_programa_id, 1, ARRAY['PLANIFICADO', 'INSCRIPCIONES', 'EN_CURSO', 'CONCLUIDO']);
+
+    IF NOT v_reserva.reservado THEN
+        RETURN QUERY SELECT FALSE,
+            CASE v_reserva.mensaje
+                WHEN 'Programa no encontrado' THEN 'El programa no existe'
+                WHEN 'Cupos agotados' THEN 'No hay cupos disponibles en el programa'
+                ELSE 'El programa está cancelado'
+            END::VARCHAR,
+            0;
         RETURN;
     END IF;
-    
-    -- Verificar que el estudiante no esté ya inscrito (esto depende de otra tabla de inscripciones)
-    -- Por ahora solo incrementamos cupos
-    UPDATE programas
-    SET cupos_inscritos = cupos_inscritos + 1,
-        updated_at = CURRENT_TIMESTAMP
-    WHERE id = p_programa_id;
-    
-    GET DIAGNOSTICS v_cupos_disponibles = ROW_COUNT;
-    
-    IF v_cupos_disponibles > 0 THEN
-        v_mensaje := 'Estudiante inscrito exitosamente';
-        v_exito := TRUE;
-        
-        -- Calcular cupos disponibles restantes
-        IF v_cupos_maximos IS NOT NULL THEN
-            v_cupos_disponibles := v_cupos_maximos - (v_cupos_inscritos + 1);
-        ELSE
-            v_cupos_disponibles := -1; -- Indica que no hay límite
-        END IF;
-    ELSE
-        v_mensaje := 'No se pudo inscribir al estudiante';
-    END IF;
-    
-    RETURN QUERY SELECT v_exito, v_mensaje, v_cupos_disponibles;
-    
+
+    SELECT p.cupos_maximos INTO v_cupos_maximos FROM programas p WHERE p.id = p_programa_id;
+
+    RETURN QUERY SELECT TRUE,
+        'Estudiante inscrito exitosamente'::VARCHAR,
+        CASE WHEN v_cupos_maximos IS NULL THEN -1 ELSE v_reserva.cupos_disponibles END;
 EXCEPTION
     WHEN OTHERS THEN
-        v_mensaje := 'Error al inscribir estudiante: ' || SQLERRM;
-        RETURN QUERY SELECT v_exito, v_mensaje, v_cupos_disponibles;
+        RETURN QUERY SELECT FALSE, ('Error al inscribir estudiante: ' || SQLERRM)::VARCHAR, 0;
 END;
-$function$
-;
+$$ LANGUAGE plpgsql;
 
 -- DROP FUNCTION public.fn_inscripcion_completa(jsonb, int4);
 
@@ -1967,51 +2345,44 @@ CREATE OR REPLACE FUNCTION public.fn_insertar_estudiante(p_ci_numero character v
 AS $function$
 DECLARE
     v_nuevo_id INTEGER;
-    v_mensaje VARCHAR;
-    v_exito BOOLEAN;
+    v_ci_duplicado BOOLEAN;
+    v_email_duplicado BOOLEAN;
 BEGIN
-    -- Inicializar variables
-    v_nuevo_id := NULL;
-    v_mensaje := '';
-    v_exito := FALSE;
-    
-    -- Validar CI único
-    IF fn_verificar_ci_existente(p_ci_numero) THEN
-        v_mensaje := 'El número de CI ya está registrado en el sistema';
-        RETURN QUERY SELECT v_nuevo_id, v_mensaje, v_exito;
-        RETURN;
-    END IF;
-    
-    -- Validar email único si se proporciona
-    IF p_email IS NOT NULL AND EXISTS(
-        SELECT 1 FROM estudiantes WHERE email = p_email
-    ) THEN
-        v_mensaje := 'El email ya está registrado en el sistema';
-        RETURN QUERY SELECT v_nuevo_id, v_mensaje, v_exito;
-        RETURN;
-    END IF;
-    
-    -- Insertar estudiante
     INSERT INTO estudiantes (
         ci_numero, ci_expedicion, nombres, apellido_paterno, apellido_materno,
         fecha_nacimiento, telefono, email, direccion, profesion, universidad,
         fotografia_url, activo
     ) VALUES (
-        p_ci_numero, p_ci_expedicion, p_nombres, p_apellido_paterno, p_apellido_materno,
-        p_fecha_nacimiento, p_telefono, p_email, p_direccion, p_profesion, p_universidad,
+        BTRIM(p_ci_numero), p_ci_expedicion, p_nombres, p_apellido_paterno, p_apellido_materno,
+        p_fecha_nacimiento, p_telefono, NULLIF(BTRIM(p_email), ''), p_direccion, p_profesion, p_universidad,
         p_fotografia_url, p_activo
-    ) RETURNING id INTO v_nuevo_id;
-    
-    v_mensaje := 'Estudiante creado exitosamente con ID: ' || v_nuevo_id;
-    v_exito := TRUE;
-    
-    RETURN QUERY SELECT v_nuevo_id, v_mensaje, v_exito;
-    
+    )
+    ON CONFLICT DO NOTHING
+    RETURNING id INTO v_nuevo_id;
+
+    IF v_nuevo_id IS NOT NULL THEN
+        RETURN QUERY SELECT v_nuevo_id,
+            ('Estudiante creado exitosamente con ID: ' || v_nuevo_id)::VARCHAR, TRUE;
+        RETURN;
+    END IF;
+
+    -- Conflicto: identificar el campo duplicado
+    SELECT u.ci_duplicado, u.email_duplicado
+    INTO v_ci_duplicado, v_email_duplicado
+    FROM fn_validar_unicidad_estudiante(p_ci_numero, p_ci_expedicion, p_email) u;
+
+    RETURN QUERY SELECT NULL::INTEGER,
+        (CASE
+            WHEN v_ci_duplicado THEN 'El número de CI ya está registrado en el sistema'
+            WHEN v_email_duplicado THEN 'El email ya está registrado en el sistema'
+            ELSE 'El estudiante ya está registrado en el sistema'
+        END)::VARCHAR,
+        FALSE;
+
 EXCEPTION
     WHEN OTHERS THEN
-        v_mensaje := 'Error al crear estudiante: ' || SQLERRM;
-        v_exito := FALSE;
-        RETURN QUERY SELECT v_nuevo_id, v_mensaje, v_exito;
+        RETURN QUERY SELECT NULL::INTEGER,
+            ('Error al crear estudiante: ' || SQLERRM)::VARCHAR, FALSE;
 END;
 $function$
 ;
@@ -2181,6 +2552,25 @@ END;
 $function$
 ;
 
+-- DROP FUNCTION public.fn_liberar_cupos(int4, int4);
+
+CREATE OR REPLACE FUNCTION public.fn_liberar_cupos(
+    p_programa_id INTEGER,
+    p_cantidad INTEGER DEFAULT 1
+)
+RETURNS INTEGER AS $$
+DECLARE
+    v_inscritos INTEGER;
+BEGIN
+    UPDATE programas
+    SET cupos_inscritos = GREATEST(cupos_inscritos - p_cantidad, 0)
+    WHERE id = p_programa_id
+    RETURNING cupos_inscritos INTO v_inscritos;
+
+    RETURN v_inscritos;
+END;
+$$ LANGUAGE plpgsql;
+
 -- DROP FUNCTION public.fn_listar_configuraciones();
 
 CREATE OR REPLACE FUNCTION public.fn_listar_configuraciones()
@@ -2362,6 +2752,20 @@ BEGIN
         p.created_at, p.updated_at
     FROM programas p
     WHERE p.id = p_id;
+
+    -- Si no está vigente, buscarlo en el archivo histórico
+    IF NOT FOUND THEN
+        RETURN QUERY
+        SELECT 
+            p.id, p.codigo, p.nombre, p.descripcion, p.duracion_meses, p.horas_totales,
+            p.costo_total, p.costo_matricula, p.costo_inscripcion, p.costo_mensualidad,
+            p.numero_cuotas, p.cupos_maximos, p.cupos_inscritos, p.estado,
+            p.fecha_inicio, p.fecha_fin, p.docente_coordinador_id,
+            p.promocion_descuento, p.promocion_descripcion, p.promocion_valido_hasta,
+            p.created_at, p.updated_at
+        FROM programas_archivo p
+        WHERE p.id = p_id;
+    END IF;
 END;
 $function$
 ;
@@ -2473,14 +2877,84 @@ END;
 $function$
 ;
 
+-- DROP FUNCTION public.fn_recalcular_saldos_inscripciones(_int4, _int4);
+
+CREATE OR REPLACE FUNCTION public.fn_recalcular_saldos_inscripciones(
+    p_estudiante_ids INTEGER[],
+    p_programa_ids INTEGER[]
+)
+RETURNS INTEGER AS $$
+DECLARE
+    v_actualizadas INTEGER;
+BEGIN
+    -- Bloquear primero las inscripciones (en orden de id para no generar
+    -- interbloqueos): en READ COMMITTED la suma siguiente se calcula con una
+    -- instantánea nueva y ve los pagos que otra sesión confirmó mientras se
+    -- esperaba el bloqueo.
+    PERFORM 1
+    FROM inscripciones i
+    JOIN UNNEST(p_estudiante_ids, p_programa_ids) AS k(estudiante_id, programa_id)
+        ON k.estudiante_id = i.estudiante_id
+       AND k.programa_id = i.programa_id
+    ORDER BY i.id
+    FOR UPDATE OF i;
+
+    UPDATE inscripciones i
+    SET total_pagado = s.total_pagado,
+        saldo_pendiente = GREATEST(COALESCE(i.valor_final, p.costo_total, 0) - s.total_pagado, 0),
+        ultimo_pago = s.ultimo_pago
+    FROM (
+        SELECT
+            k.estudiante_id,
+            k.programa_id,
+            COALESCE(SUM(t.monto_final), 0) AS total_pagado,
+            MAX(t.fecha_pago) AS ultimo_pago
+        FROM (
+            SELECT DISTINCT u.estudiante_id, u.programa_id
+            FROM UNNEST(p_estudiante_ids, p_programa_ids) AS u(estudiante_id, programa_id)
+        ) k
+        LEFT JOIN transacciones t
+            ON t.estudiante_id = k.estudiante_id
+           AND t.programa_id = k.programa_id
+           AND t.estado = 'CONFIRMADO'
+        GROUP BY k.estudiante_id, k.programa_id
+    ) s, programas p
+    WHERE i.estudiante_id = s.estudiante_id
+      AND i.programa_id = s.programa_id
+      AND p.id = i.programa_id;
+
+    GET DIAGNOSTICS v_actualizadas = ROW_COUNT;
+    RETURN v_actualizadas;
+END;
+$$ LANGUAGE plpgsql;
+
+-- DROP FUNCTION public.fn_regenerar_cuotas_programa();
+
+CREATE OR REPLACE FUNCTION public.fn_regenerar_cuotas_programa()
+RETURNS TRIGGER AS $$
+BEGIN
+    -- Cambio del plan del programa: regenerar las cuotas de sus inscripciones
+    PERFORM fn_generar_cuotas_inscripcion(i.id)
+    FROM inscripciones i
+    WHERE i.programa_id = NEW.id;
+
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
 -- DROP FUNCTION public.fn_registrar_movimiento_caja();
 
 CREATE OR REPLACE FUNCTION public.fn_registrar_movimiento_caja()
  RETURNS trigger
  LANGUAGE plpgsql
 AS $function$
+DECLARE
+    v_neto NUMERIC(12,2);
 BEGIN
-    IF TG_OP = 'INSERT' AND NEW.estado = 'CONFIRMADO' THEN
+    -- El pago entra a caja al registrarse ya confirmado o al confirmarse
+    -- después (TransaccionOverlay y fn_finalizar_transaccion usan UPDATE)
+    IF (TG_OP = 'INSERT' AND NEW.estado = 'CONFIRMADO')
+       OR (TG_OP = 'UPDATE' AND OLD.estado IS DISTINCT FROM 'CONFIRMADO' AND NEW.estado = 'CONFIRMADO') THEN
         INSERT INTO movimientos_caja (fecha, tipo, transaccion_id, monto, forma_pago, descripcion, usuario_id)
         VALUES (
             NEW.fecha_pago,
@@ -2491,89 +2965,434 @@ BEGIN
             'Pago transacción ' || NEW.numero_transaccion,
             NEW.registrado_por
         );
+
+    -- Pago confirmado que se anula: sus movimientos de días abiertos se
+    -- eliminan; si el ingreso ya quedó en un cierre se compensa con un
+    -- egreso en la fecha de la anulación
+    ELSIF TG_OP = 'UPDATE' AND OLD.estado = 'CONFIRMADO' AND NEW.estado IS DISTINCT FROM 'CONFIRMADO' THEN
+        DELETE FROM movimientos_caja m
+        WHERE m.transaccion_id = NEW.id
+        AND NOT EXISTS (SELECT 1 FROM cierres_caja cc WHERE cc.fecha = m.fecha);
+
+        SELECT COALESCE(SUM(CASE WHEN m.tipo = 'INGRESO' THEN m.monto ELSE -m.monto END), 0)
+        INTO v_neto
+        FROM movimientos_caja m
+        WHERE m.transaccion_id = NEW.id;
+
+        IF v_neto > 0 THEN
+            INSERT INTO movimientos_caja (fecha, tipo, transaccion_id, monto, forma_pago, descripcion, usuario_id)
+            VALUES (
+                CURRENT_DATE,
+                'EGRESO',
+                NEW.id,
+                v_neto,
+                NEW.forma_pago,
+                'Anulación transacción ' || NEW.numero_transaccion,
+                NEW.registrado_por
+            );
+        END IF;
     END IF;
     RETURN NEW;
 END;
 $function$
 ;
 
--- DROP FUNCTION public.fn_resumen_financiero_estudiante(int4);
+-- DROP FUNCTION public.fn_acumular_movimientos_caja();
 
-CREATE OR REPLACE FUNCTION public.fn_resumen_financiero_estudiante(p_estudiante_id integer)
- RETURNS TABLE(total_programas integer, total_inscrito numeric, total_pagado numeric, total_deuda numeric, promedio_pagado numeric, transacciones_totales integer, ultimo_pago date, proximo_vencimiento date, estado_financiero character varying)
- LANGUAGE plpgsql
-AS $function$
+CREATE OR REPLACE FUNCTION public.fn_acumular_movimientos_caja()
+RETURNS TRIGGER AS $$
+DECLARE
+    v_cambios JSONB;
+    v_fecha_cerrada DATE;
+BEGIN
+    -- Variación por (fecha, forma_pago) de la sentencia completa; las filas
+    -- anteriores restan y las nuevas suman
+    IF TG_OP = 'INSERT' THEN
+        SELECT jsonb_agg(c) INTO v_cambios FROM (
+            SELECT fecha, forma_pago,
+                SUM(monto) FILTER (WHERE tipo = 'INGRESO') AS ingresos,
+                SUM(monto) FILTER (WHERE tipo = 'EGRESO') AS egresos,
+                COUNT(*) FILTER (WHERE tipo = 'INGRESO') AS cantidad_ingresos,
+                COUNT(*) FILTER (WHERE tipo = 'EGRESO') AS cantidad_egresos
+            FROM movimientos_nuevos
+            GROUP BY fecha, forma_pago
+        ) c;
+    ELSIF TG_OP = 'UPDATE' THEN
+        SELECT jsonb_agg(c) INTO v_cambios FROM (
+            SELECT fecha, forma_pago,
+                SUM(signo * monto) FILTER (WHERE tipo = 'INGRESO') AS ingresos,
+                SUM(signo * monto) FILTER (WHERE tipo = 'EGRESO') AS egresos,
+                SUM(signo) FILTER (WHERE tipo = 'INGRESO') AS cantidad_ingresos,
+                SUM(signo) FILTER (WHERE tipo = 'EGRESO') AS cantidad_egresos
+            FROM (
+                SELECT fecha, forma_pago, tipo, monto, 1 AS signo FROM movimientos_nuevos
+                UNION ALL
+                SELECT fecha, forma_pago, tipo, monto, -1 AS signo FROM movimientos_anteriores
+            ) m
+            GROUP BY fecha, forma_pago
+            -- Sólo los grupos cuyos totales cambian: actualizar columnas que no
+            -- los afectan (p. ej. transaccion_id al archivar) no toca días cerrados
+            HAVING SUM(signo * monto) FILTER (WHERE tipo = 'INGRESO') <> 0
+                OR SUM(signo * monto) FILTER (WHERE tipo = 'EGRESO') <> 0
+                OR SUM(signo) FILTER (WHERE tipo = 'INGRESO') <> 0
+                OR SUM(signo) FILTER (WHERE tipo = 'EGRESO') <> 0
+        ) c;
+    ELSIF TG_OP = 'DELETE' THEN
+        SELECT jsonb_agg(c) INTO v_cambios FROM (
+            SELECT fecha, forma_pago,
+                -SUM(monto) FILTER (WHERE tipo = 'INGRESO') AS ingresos,
+                -SUM(monto) FILTER (WHERE tipo = 'EGRESO') AS egresos,
+                -COUNT(*) FILTER (WHERE tipo = 'INGRESO') AS cantidad_ingresos,
+                -COUNT(*) FILTER (WHERE tipo = 'EGRESO') AS cantidad_egresos
+            FROM movimientos_anteriores
+            GROUP BY fecha, forma_pago
+        ) c;
+    END IF;
+
+    IF v_cambios IS NULL THEN
+        RETURN NULL;
+    END IF;
+
+    -- Bloqueo compartido por día: excluye un cierre concurrente del mismo día
+    PERFORM pg_advisory_xact_lock_shared(hashtext('cierre_caja'), d.fecha - DATE '2000-01-01')
+    FROM (
+        SELECT DISTINCT c.fecha
+        FROM jsonb_to_recordset(v_cambios) AS c(fecha DATE)
+        ORDER BY c.fecha
+    ) d;
+
+    SELECT cc.fecha INTO v_fecha_cerrada
+    FROM jsonb_to_recordset(v_cambios) AS c(fecha DATE)
+    JOIN cierres_caja cc ON cc.fecha = c.fecha
+    LIMIT 1;
+
+    IF v_fecha_cerrada IS NOT NULL THEN
+        RAISE EXCEPTION 'La caja del % ya está cerrada; no se pueden modificar sus movimientos', v_fecha_cerrada;
+    END IF;
+
+    INSERT INTO caja_resumen_diario AS r (
+        fecha, forma_pago, ingresos, egresos, cantidad_ingresos, cantidad_egresos
+    )
+    SELECT c.fecha, c.forma_pago,
+        COALESCE(c.ingresos, 0), COALESCE(c.egresos, 0),
+        COALESCE(c.cantidad_ingresos, 0), COALESCE(c.cantidad_egresos, 0)
+    FROM jsonb_to_recordset(v_cambios) AS c(
+        fecha DATE, forma_pago TEXT, ingresos NUMERIC, egresos NUMERIC,
+        cantidad_ingresos INTEGER, cantidad_egresos INTEGER
+    )
+    ON CONFLICT ON CONSTRAINT pk_caja_resumen_diario DO UPDATE
+    SET ingresos = r.ingresos + EXCLUDED.ingresos,
+        egresos = r.egresos + EXCLUDED.egresos,
+        cantidad_ingresos = r.cantidad_ingresos + EXCLUDED.cantidad_ingresos,
+        cantidad_egresos = r.cantidad_egresos + EXCLUDED.cantidad_egresos,
+        updated_at = CURRENT_TIMESTAMP;
+
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+-- DROP FUNCTION public.fn_cerrar_caja(date, int4, text);
+
+CREATE OR REPLACE FUNCTION public.fn_cerrar_caja(
+    p_fecha DATE,
+    p_usuario_id INTEGER,
+    p_observaciones TEXT DEFAULT NULL
+)
+RETURNS SETOF cierres_caja AS $$
+DECLARE
+    v_ultimo_cierre cierres_caja%ROWTYPE;
+    v_saldo_anterior NUMERIC(14,2);
+BEGIN
+    -- Bloqueo exclusivo del día: espera a los movimientos en curso y bloquea
+    -- los nuevos hasta confirmar el cierre
+    PERFORM pg_advisory_xact_lock(hashtext('cierre_caja'), p_fecha - DATE '2000-01-01');
+
+    IF EXISTS (SELECT 1 FROM cierres_caja WHERE fecha = p_fecha) THEN
+        RAISE EXCEPTION 'La caja del % ya está cerrada', p_fecha;
+    END IF;
+
+    -- Saldo anterior: último cierre más los días intermedios sin cerrar
+    SELECT * INTO v_ultimo_cierre
+    FROM cierres_caja
+    WHERE fecha < p_fecha
+    ORDER BY fecha DESC
+    LIMIT 1;
+
+    SELECT COALESCE(v_ultimo_cierre.saldo_final, 0) + COALESCE(SUM(r.ingresos - r.egresos), 0)
+    INTO v_saldo_anterior
+    FROM caja_resumen_diario r
+    WHERE r.fecha < p_fecha
+    AND (v_ultimo_cierre.fecha IS NULL OR r.fecha > v_ultimo_cierre.fecha);
+
+    RETURN QUERY
+    WITH cierre AS (
+        INSERT INTO cierres_caja (
+            fecha, total_ingresos, total_egresos, saldo_anterior, saldo_final,
+            cantidad_movimientos, detalle_formas_pago, cerrado_por, observaciones
+        )
+        SELECT
+            p_fecha,
+            COALESCE(SUM(r.ingresos), 0),
+            COALESCE(SUM(r.egresos), 0),
+            v_saldo_anterior,
+            v_saldo_anterior + COALESCE(SUM(r.ingresos - r.egresos), 0),
+            COALESCE(SUM(r.cantidad_ingresos + r.cantidad_egresos), 0),
+            COALESCE(
+                jsonb_agg(jsonb_build_object(
+                    'forma_pago', r.forma_pago,
+                    'ingresos', r.ingresos,
+                    'egresos', r.egresos,
+                    'neto', r.ingresos - r.egresos,
+                    'cantidad', r.cantidad_ingresos + r.cantidad_egresos
+                ) ORDER BY r.forma_pago) FILTER (WHERE r.forma_pago IS NOT NULL),
+                '[]'::JSONB
+            ),
+            p_usuario_id,
+            p_observaciones
+        FROM caja_resumen_diario r
+        WHERE r.fecha = p_fecha
+        RETURNING *
+    )
+    SELECT * FROM cierre;
+END;
+$$ LANGUAGE plpgsql;
+
+-- DROP FUNCTION public.fn_reabrir_caja(date);
+
+CREATE OR REPLACE FUNCTION public.fn_reabrir_caja(p_fecha DATE)
+RETURNS BOOLEAN AS $$
+BEGIN
+    -- Sólo se puede reabrir el último cierre para no invalidar los saldos
+    -- congelados de los días siguientes
+    PERFORM pg_advisory_xact_lock(hashtext('cierre_caja'), p_fecha - DATE '2000-01-01');
+
+    IF EXISTS (SELECT 1 FROM cierres_caja WHERE fecha > p_fecha) THEN
+        RAISE EXCEPTION 'No se puede reabrir la caja del %: existen cierres posteriores', p_fecha;
+    END IF;
+
+    DELETE FROM cierres_caja WHERE fecha = p_fecha;
+    RETURN FOUND;
+END;
+$$ LANGUAGE plpgsql;
+
+-- DROP FUNCTION public.fn_reporte_caja(date, date);
+
+CREATE OR REPLACE FUNCTION public.fn_reporte_caja(p_desde DATE, p_hasta DATE)
+RETURNS TABLE(
+    fecha DATE,
+    forma_pago TEXT,
+    ingresos NUMERIC,
+    egresos NUMERIC,
+    neto NUMERIC,
+    cantidad INTEGER,
+    saldo_acumulado NUMERIC,
+    cerrado BOOLEAN
+) AS $$
+    SELECT
+        r.fecha,
+        r.forma_pago::TEXT,
+        r.ingresos,
+        r.egresos,
+        r.ingresos - r.egresos,
+        r.cantidad_ingresos + r.cantidad_egresos,
+        COALESCE(b.saldo, 0)
+            + SUM(r.ingresos - r.egresos) OVER (PARTITION BY r.forma_pago ORDER BY r.fecha),
+        cc.fecha IS NOT NULL
+    FROM caja_resumen_diario r
+    LEFT JOIN (
+        SELECT forma_pago, SUM(ingresos - egresos) AS saldo
+        FROM caja_resumen_diario
+        WHERE fecha < p_desde
+        GROUP BY forma_pago
+    ) b ON b.forma_pago = r.forma_pago
+    LEFT JOIN cierres_caja cc ON cc.fecha = r.fecha
+    WHERE r.fecha BETWEEN p_desde AND p_hasta
+    ORDER BY r.fecha, r.forma_pago;
+$$ LANGUAGE sql STABLE;
+
+-- DROP FUNCTION public.fn_reservar_cupos(int4, int4, _text);
+
+CREATE OR REPLACE FUNCTION public.fn_reservar_cupos(
+    p_programa_id INTEGER,
+    p_cantidad INTEGER DEFAULT 1,
+    p_estados_permitidos TEXT[] DEFAULT ARRAY['INSCRIPCIONES', 'EN_CURSO']
+)
+RETURNS TABLE (
+    reservado BOOLEAN,
+    cupos_disponibles INTEGER,
+    mensaje TEXT
+) AS $$
 DECLARE
-    v_ultimo_pago DATE;
-    v_proximo_vencimiento DATE;
+    v_programa programas%ROWTYPE;
+    v_restantes INTEGER;
+BEGIN
+    IF p_cantidad IS NULL OR p_cantidad <= 0 THEN
+        RETURN QUERY SELECT FALSE, 0, 'La cantidad de cupos a reservar debe ser mayor a 0'::TEXT;
+        RETURN;
+    END IF;
+
+    -- UPDATE condicional: si otra sesión modificó la fila, PostgreSQL espera
+    -- su confirmación y vuelve a evaluar la condición sobre la versión nueva,
+    -- así dos reservas simultáneas nunca superan cupos_maximos. El bloqueo
+    -- de la fila se mantiene hasta el final de la transacción.
+    UPDATE programas p
+    SET cupos_inscritos = p.cupos_inscritos + p_cantidad
+    WHERE p.id = p_programa_id
+      AND (p_estados_permitidos IS NULL OR p.estado = ANY(p_estados_permitidos))
+      AND (p.cupos_maximos IS NULL OR p.cupos_inscritos + p_cantidad <= p.cupos_maximos)
+    RETURNING COALESCE(p.cupos_maximos - p.cupos_inscritos, 9999) INTO v_restantes;
+
+    IF FOUND THEN
+        RETURN QUERY SELECT TRUE, v_restantes, format('%s cupo(s) reservado(s)', p_cantidad);
+        RETURN;
+    END IF;
+
+    -- Sin reserva: explicar el motivo
+    SELECT * INTO v_programa FROM programas WHERE id = p_programa_id;
+
+    IF NOT FOUND THEN
+        RETURN QUERY SELECT FALSE, 0, 'Programa no encontrado'::TEXT;
+    ELSIF p_estados_permitidos IS NOT NULL AND NOT (v_programa.estado = ANY(p_estados_permitidos)) THEN
+        RETURN QUERY SELECT FALSE, 0,
+            ('Programa no está en periodo de inscripciones. Estado: ' || v_programa.estado)::TEXT;
+    ELSE
+        v_restantes := GREATEST(v_programa.cupos_maximos - v_programa.cupos_inscritos, 0);
+        RETURN QUERY SELECT FALSE, v_restantes,
+            CASE WHEN v_restantes = 0 THEN 'Cupos agotados'
+                 ELSE format('Cupos insuficientes: se solicitaron %s y quedan %s', p_cantidad, v_restantes)
+            END;
+    END IF;
+END;
+$$ LANGUAGE plpgsql;
+
+-- DROP FUNCTION public.fn_resumen_financiero_estudiante(int4);
+
+CREATE OR REPLACE FUNCTION public.fn_resumen_financiero_estudiante(p_estudiante_id INTEGER)
+RETURNS TABLE(
+    total_programas INTEGER,
+    total_inscrito DECIMAL(12,2),
+    total_pagado DECIMAL(12,2),
+    total_deuda DECIMAL(12,2),
+    promedio_pagado DECIMAL(5,2),
+    transacciones_totales INTEGER,
+    ultimo_pago DATE,
+    proximo_vencimiento DATE,
+    estado_financiero VARCHAR(20)
+)
+LANGUAGE plpgsql
+AS $$
 BEGIN
-    -- Obtener datos básicos
     RETURN QUERY
     WITH programas_estudiante AS (
-        SELECT 
-            i.programa_id,
-            p.costo_total,
-            COALESCE(SUM(t.monto_final), 0) AS pagado
+        SELECT
+            COALESCE(i.valor_final, p.costo_total) AS costo,
+            i.total_pagado AS pagado,
+            i.saldo_pendiente AS deuda,
+            i.ultimo_pago AS ultima_fecha
         FROM inscripciones i
         INNER JOIN programas p ON i.programa_id = p.id
-        LEFT JOIN transacciones t ON i.estudiante_id = t.estudiante_id 
-            AND i.programa_id = t.programa_id
-            AND t.estado = 'CONFIRMADO'
         WHERE i.estudiante_id = p_estudiante_id
-        GROUP BY i.programa_id, p.costo_total
-    ),
-    transacciones_estudiante AS (
-        SELECT 
-            COUNT(*) AS total,
-            MAX(fecha_pago) AS ultima_fecha
-        FROM transacciones
-        WHERE estudiante_id = p_estudiante_id
-            AND estado = 'CONFIRMADO'
     )
-    SELECT 
+    SELECT
         COUNT(*)::INTEGER AS total_programas,
-        SUM(costo_total)::DECIMAL(12,2) AS total_inscrito,
-        SUM(pagado)::DECIMAL(12,2) AS total_pagado,
-        SUM(GREATEST(costo_total - pagado, 0))::DECIMAL(12,2) AS total_deuda,
-        CASE 
-            WHEN SUM(costo_total) > 0 THEN 
-                ROUND((SUM(pagado) * 100.0 / SUM(costo_total)), 2)
-            ELSE 0 
-        END AS promedio_pagado,
-        COALESCE(te.total, 0)::INTEGER AS transacciones_totales,
-        te.ultima_fecha AS ultimo_pago,
-        NULL::DATE AS proximo_vencimiento,
-        CASE 
-            WHEN SUM(costo_total) = 0 THEN 'SIN_PROGRAMAS'
-            WHEN SUM(pagado) >= SUM(costo_total) THEN 'AL_DIA'
-            WHEN SUM(pagado) >= (SUM(costo_total) * 0.5) THEN 'PARCIAL'
+        COALESCE(SUM(pe.costo), 0)::DECIMAL(12,2) AS total_inscrito,
+        COALESCE(SUM(pe.pagado), 0)::DECIMAL(12,2) AS total_pagado,
+        COALESCE(SUM(pe.deuda), 0)::DECIMAL(12,2) AS total_deuda,
+        CASE
+            WHEN SUM(pe.costo) > 0 THEN
+                ROUND((SUM(pe.pagado) * 100.0 / SUM(pe.costo)), 2)
+            ELSE 0
+        END::DECIMAL(5,2) AS promedio_pagado,
+        (
+            SELECT COUNT(*)
+            FROM transacciones t
+            WHERE t.estudiante_id = p_estudiante_id
+              AND t.estado = 'CONFIRMADO'
+        )::INTEGER AS transacciones_totales,
+        MAX(pe.ultima_fecha) AS ultimo_pago,
+        (
+            SELECT MIN(c.fecha_vencimiento)
+            FROM cuotas_inscripcion c
+            JOIN inscripciones i ON i.id = c.inscripcion_id
+            WHERE i.estudiante_id = p_estudiante_id
+              AND i.estado <> 'RETIRADO'
+              AND c.monto_pagado < c.monto
+        ) AS proximo_vencimiento,
+        CASE
+            WHEN COALESCE(SUM(pe.costo), 0) = 0 THEN 'SIN_PROGRAMAS'
+            WHEN SUM(pe.pagado) >= SUM(pe.costo) THEN 'AL_DIA'
+            WHEN SUM(pe.pagado) >= (SUM(pe.costo) * 0.5) THEN 'PARCIAL'
             ELSE 'MOROSO'
         END::VARCHAR(20) AS estado_financiero
-    FROM programas_estudiante pe
-    CROSS JOIN transacciones_estudiante te;
+    FROM programas_estudiante pe;
 END;
-$function$
-;
+$$;
 
 -- DROP FUNCTION public.fn_saldo_pendiente_estudiante(int4);
 
-CREATE OR REPLACE FUNCTION public.fn_saldo_pendiente_estudiante(p_estudiante_id integer)
- RETURNS TABLE(programa_id integer, programa_nombre character varying, total_debe numeric, total_pagado numeric, saldo_pendiente numeric)
- LANGUAGE plpgsql
-AS $function$
+CREATE OR REPLACE FUNCTION public.fn_saldo_pendiente_estudiante(p_estudiante_id INTEGER)
+RETURNS TABLE(
+    programa_id INTEGER,
+    programa_nombre VARCHAR(200),
+    total_debe DECIMAL(10,2),
+    total_pagado DECIMAL(10,2),
+    saldo_pendiente DECIMAL(10,2)
+) AS $$
 BEGIN
     RETURN QUERY
-    SELECT 
+    SELECT
         p.id,
         p.nombre,
-        p.costo_total,
-        COALESCE(SUM(t.monto_final), 0),
-        p.costo_total - COALESCE(SUM(t.monto_final), 0)
+        COALESCE(i.valor_final, p.costo_total),
+        i.total_pagado,
+        i.saldo_pendiente
     FROM inscripciones i
     JOIN programas p ON i.programa_id = p.id
-    LEFT JOIN transacciones t ON i.estudiante_id = t.estudiante_id AND i.programa_id = t.programa_id AND t.estado = 'CONFIRMADO'
-    WHERE i.estudiante_id = p_estudiante_id
-    GROUP BY p.id, p.nombre, p.costo_total;
+    WHERE i.estudiante_id = p_estudiante_id;
+END;
+$$ LANGUAGE plpgsql;
+
+-- DROP FUNCTION public.fn_sincronizar_cuotas_inscripcion();
+
+CREATE OR REPLACE FUNCTION public.fn_sincronizar_cuotas_inscripcion()
+RETURNS TRIGGER AS $$
+BEGIN
+    -- AFTER: total_pagado ya fue recalculado por tr_calcular_saldo_inscripcion
+    -- o por los triggers de saldos sobre transacciones.
+    IF TG_OP = 'INSERT'
+       OR NEW.valor_final IS DISTINCT FROM OLD.valor_final
+       OR NEW.programa_id IS DISTINCT FROM OLD.programa_id THEN
+        PERFORM fn_generar_cuotas_inscripcion(NEW.id);
+    ELSIF NEW.total_pagado IS DISTINCT FROM OLD.total_pagado THEN
+        PERFORM fn_aplicar_pagos_cuotas(NEW.id);
+    END IF;
+
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+-- DROP FUNCTION public.fn_validar_unicidad_estudiante(varchar, varchar, varchar, int4);
+
+CREATE OR REPLACE FUNCTION public.fn_validar_unicidad_estudiante(p_ci_numero character varying, p_ci_expedicion character varying, p_email character varying DEFAULT NULL::character varying, p_excluir_id integer DEFAULT NULL::integer)
+ RETURNS TABLE(ci_duplicado boolean, email_duplicado boolean)
+ LANGUAGE plpgsql
+ STABLE
+AS $function$
+BEGIN
+    RETURN QUERY
+    SELECT
+        EXISTS(
+            SELECT 1 FROM estudiantes
+            WHERE UPPER(BTRIM(ci_numero)) = UPPER(BTRIM(p_ci_numero))
+            AND ci_expedicion = p_ci_expedicion
+            AND (p_excluir_id IS NULL OR id != p_excluir_id)
+        ),
+        (p_email IS NOT NULL AND EXISTS(
+            SELECT 1 FROM estudiantes
+            WHERE email IS NOT NULL
+            AND LOWER(BTRIM(email)) = LOWER(BTRIM(p_email))
+            AND (p_excluir_id IS NULL OR id != p_excluir_id)
+        ));
 END;
 $function$
 ;
@@ -2681,6 +3500,67 @@ END;
 $function$
 ;
 
+-- DROP FUNCTION public.fn_verificar_saldos_inscripciones(bool);
+
+CREATE OR REPLACE FUNCTION public.fn_verificar_saldos_inscripciones(p_corregir BOOLEAN DEFAULT FALSE)
+RETURNS TABLE (
+    inscripcion_id INTEGER,
+    total_pagado_registrado NUMERIC(12,2),
+    total_pagado_real NUMERIC(12,2),
+    saldo_registrado NUMERIC(12,2),
+    saldo_real NUMERIC(12,2),
+    ultimo_pago_registrado DATE,
+    ultimo_pago_real DATE,
+    corregido BOOLEAN
+) AS $$
+BEGIN
+    RETURN QUERY
+    WITH pagos AS (
+        SELECT t.estudiante_id, t.programa_id,
+               SUM(t.monto_final) AS total,
+               MAX(t.fecha_pago) AS ultimo
+        FROM transacciones t
+        WHERE t.estado = 'CONFIRMADO'
+        GROUP BY t.estudiante_id, t.programa_id
+    ),
+    desviadas AS (
+        SELECT
+            i.id,
+            i.total_pagado AS pagado_reg,
+            COALESCE(pg.total, 0)::NUMERIC(12,2) AS pagado_real,
+            i.saldo_pendiente AS saldo_reg,
+            GREATEST(COALESCE(i.valor_final, p.costo_total, 0) - COALESCE(pg.total, 0), 0)::NUMERIC(12,2) AS saldo_calc,
+            i.ultimo_pago AS ultimo_reg,
+            pg.ultimo AS ultimo_calc
+        FROM inscripciones i
+        JOIN programas p ON p.id = i.programa_id
+        LEFT JOIN pagos pg
+            ON pg.estudiante_id = i.estudiante_id
+           AND pg.programa_id = i.programa_id
+        WHERE (i.total_pagado, i.saldo_pendiente, i.ultimo_pago)
+              IS DISTINCT FROM
+              (COALESCE(pg.total, 0),
+               GREATEST(COALESCE(i.valor_final, p.costo_total, 0) - COALESCE(pg.total, 0), 0),
+               pg.ultimo)
+    ),
+    corregidas AS (
+        UPDATE inscripciones i
+        SET total_pagado = d.pagado_real,
+            saldo_pendiente = d.saldo_calc,
+            ultimo_pago = d.ultimo_calc
+        FROM desviadas d
+        WHERE p_corregir
+          AND i.id = d.id
+        RETURNING i.id
+    )
+    SELECT d.id, d.pagado_reg, d.pagado_real, d.saldo_reg, d.saldo_calc,
+           d.ultimo_reg, d.ultimo_calc, (c.id IS NOT NULL)
+    FROM desviadas d
+    LEFT JOIN corregidas c ON c.id = d.id
+    ORDER BY d.id;
+END;
+$$ LANGUAGE plpgsql;
+
 -- DROP PROCEDURE public.sp_activar_estudiante(in int4, out int4, out varchar, out bool);
 
 CREATE OR REPLACE PROCEDURE public.sp_activar_estudiante(IN p_id integer, OUT p_filas_afectadas integer, OUT p_mensaje character varying, OUT p_exito boolean)
@@ -2842,75 +3722,138 @@ $procedure$
 
 -- DROP PROCEDURE public.sp_registrar_transaccion_completa(int4, int4, date, d_forma_pago, int4, jsonb, numeric, varchar, varchar, varchar, text);
 
-CREATE OR REPLACE PROCEDURE public.sp_registrar_transaccion_completa(IN p_estudiante_id integer, IN p_programa_id integer, IN p_fecha_pago date, IN p_forma_pago d_forma_pago, IN p_registrado_por integer, IN p_detalles jsonb, IN p_descuento_total numeric DEFAULT 0, IN p_numero_comprobante character varying DEFAULT NULL::character varying, IN p_banco_origen character varying DEFAULT NULL::character varying, IN p_cuenta_origen character varying DEFAULT NULL::character varying, IN p_observaciones text DEFAULT NULL::text)
- LANGUAGE plpgsql
-AS $procedure$
+CREATE OR REPLACE FUNCTION public.fn_registrar_transaccion_con_detalles(
+    p_transaccion JSONB,
+    p_detalles JSONB
+)
+RETURNS JSONB
+LANGUAGE plpgsql
+AS $$
 DECLARE
-    v_transaccion_id INTEGER;
-    v_detalle JSONB;
-    v_concepto_id INTEGER;
-    v_descripcion TEXT;
-    v_cantidad INTEGER;
-    v_precio_unitario DECIMAL(10,2);
-    v_subtotal DECIMAL(10,2);
-    v_orden INTEGER;
+    v_transaccion transacciones%ROWTYPE;
+    v_total DECIMAL(10,2);
+    v_descuento DECIMAL(10,2);
+    v_detalles JSONB;
 BEGIN
     -- Validar que haya detalles
-    IF p_detalles IS NULL OR jsonb_array_length(p_detalles) = 0 THEN
+    IF p_detalles IS NULL OR jsonb_typeof(p_detalles) <> 'array' OR jsonb_array_length(p_detalles) = 0 THEN
         RAISE EXCEPTION 'Debe proporcionar al menos un detalle para la transacción';
     END IF;
     
-    -- Insertar transacción principal (sin número de transacción, se genera automáticamente)
+    -- Validar conceptos y cálculos de todos los detalles en una sola pasada
+    IF EXISTS (
+        SELECT 1
+        FROM jsonb_array_elements(p_detalles) d
+        LEFT JOIN conceptos_pago c ON c.id = (d->>'concepto_pago_id')::INTEGER
+        WHERE c.id IS NULL
+    ) THEN
+        RAISE EXCEPTION 'Uno o más conceptos de pago no existen';
+    END IF;
+    
+    IF EXISTS (
+        SELECT 1
+        FROM jsonb_array_elements(p_detalles) d
+        WHERE (d->>'subtotal')::DECIMAL(10,2) <>
+              COALESCE((d->>'cantidad')::INTEGER, 1) * (d->>'precio_unitario')::DECIMAL(10,2)
+    ) THEN
+        RAISE EXCEPTION 'El subtotal no coincide con cantidad * precio unitario';
+    END IF;
+    
+    -- Totales calculados a partir de los detalles
+    SELECT COALESCE(SUM((d->>'subtotal')::DECIMAL(10,2)), 0)
+    INTO v_total
+    FROM jsonb_array_elements(p_detalles) d;
+    
+    v_descuento := COALESCE((p_transaccion->>'descuento_total')::DECIMAL(10,2), 0);
+    
+    -- Insertar transacción principal (el número lo genera el trigger)
     INSERT INTO transacciones (
-        estudiante_id, programa_id, fecha_pago, forma_pago, descuento_total,
-        numero_comprobante, banco_origen, cuenta_origen, observaciones, registrado_por,
-        estado
+        estudiante_id, programa_id, fecha_pago,
+        monto_total, descuento_total, monto_final,
+        forma_pago, estado, numero_comprobante, banco_origen, cuenta_origen,
+        observaciones, registrado_por
     ) VALUES (
-        p_estudiante_id, p_programa_id, p_fecha_pago, p_forma_pago, p_descuento_total,
-        p_numero_comprobante, p_banco_origen, p_cuenta_origen, p_observaciones, p_registrado_por,
-        'CONFIRMADO'
-    ) RETURNING id INTO v_transaccion_id;
-    
-    -- Insertar detalles
-    FOR v_detalle IN SELECT * FROM jsonb_array_elements(p_detalles)
-    LOOP
-        -- Extraer valores del JSON
-        v_concepto_id := (v_detalle->>'concepto_pago_id')::INTEGER;
-        v_descripcion := v_detalle->>'descripcion';
-        v_cantidad := COALESCE((v_detalle->>'cantidad')::INTEGER, 1);
-        v_precio_unitario := (v_detalle->>'precio_unitario')::DECIMAL(10,2);
-        v_subtotal := (v_detalle->>'subtotal')::DECIMAL(10,2);
-        v_orden := COALESCE((v_detalle->>'orden')::INTEGER, 0);
-        
-        -- Validar que el concepto existe
-        IF NOT EXISTS (SELECT 1 FROM conceptos_pago WHERE id = v_concepto_id) THEN
-            RAISE EXCEPTION 'Concepto de pago con ID % no existe', v_concepto_id;
-        END IF;
-        
-        -- Validar cálculos
-        IF v_subtotal != (v_cantidad * v_precio_unitario) THEN
-            RAISE EXCEPTION 'El subtotal no coincide con cantidad * precio unitario';
-        END IF;
-        
-        -- Insertar detalle
+        (p_transaccion->>'estudiante_id')::INTEGER,
+        (p_transaccion->>'programa_id')::INTEGER,
+        COALESCE((p_transaccion->>'fecha_pago')::DATE, CURRENT_DATE),
+        v_total, v_descuento, v_total - v_descuento,
+        p_transaccion->>'forma_pago',
+        COALESCE(p_transaccion->>'estado', 'REGISTRADO'),
+        p_transaccion->>'numero_comprobante',
+        p_transaccion->>'banco_origen',
+        p_transaccion->>'cuenta_origen',
+        p_transaccion->>'observaciones',
+        (p_transaccion->>'registrado_por')::INTEGER
+    )
+    RETURNING * INTO v_transaccion;
+    
+    -- Insertar todos los detalles en una sentencia; el orden por defecto es
+    -- la posición del detalle en el arreglo
+    WITH nuevos AS (
         INSERT INTO detalles_transaccion (
-            transaccion_id, concepto_pago_id, descripcion, 
+            transaccion_id, concepto_pago_id, descripcion,
             cantidad, precio_unitario, subtotal, orden
-        ) VALUES (
-            v_transaccion_id,
-            v_concepto_id,
-            v_descripcion,
-            v_cantidad,
-            v_precio_unitario,
-            v_subtotal,
-            v_orden
-        );
-    END LOOP;
+        )
+        SELECT
+            v_transaccion.id,
+            (x.d->>'concepto_pago_id')::INTEGER,
+            x.d->>'descripcion',
+            COALESCE((x.d->>'cantidad')::INTEGER, 1),
+            (x.d->>'precio_unitario')::DECIMAL(10,2),
+            (x.d->>'subtotal')::DECIMAL(10,2),
+            COALESCE(NULLIF((x.d->>'orden')::INTEGER, 0), x.n::INTEGER)
+        FROM jsonb_array_elements(p_detalles) WITH ORDINALITY AS x(d, n)
+        RETURNING *
+    )
+    SELECT COALESCE(jsonb_agg(to_jsonb(nuevos) ORDER BY nuevos.orden), '[]'::JSONB)
+    INTO v_detalles
+    FROM nuevos;
     
-    RAISE NOTICE 'Transacción % registrada exitosamente', v_transaccion_id;
+    RETURN jsonb_build_object(
+        'transaccion', to_jsonb(v_transaccion),
+        'detalles', v_detalles
+    );
 END;
-$procedure$
-;
+$$;
+
+CREATE OR REPLACE PROCEDURE public.sp_registrar_transaccion_completa(
+    p_estudiante_id INTEGER,
+    p_programa_id INTEGER,
+    p_fecha_pago DATE,
+    p_forma_pago d_forma_pago,
+    p_registrado_por INTEGER,
+    p_detalles JSONB,
+    p_descuento_total DECIMAL(10,2) DEFAULT 0,
+    p_numero_comprobante VARCHAR(50) DEFAULT NULL,
+    p_banco_origen VARCHAR(100) DEFAULT NULL,
+    p_cuenta_origen VARCHAR(50) DEFAULT NULL,
+    p_observaciones TEXT DEFAULT NULL
+)
+LANGUAGE plpgsql
+AS $$
+DECLARE
+    v_resultado JSONB;
+BEGIN
+    v_resultado := fn_registrar_transaccion_con_detalles(
+        jsonb_build_object(
+            'estudiante_id', p_estudiante_id,
+            'programa_id', p_programa_id,
+            'fecha_pago', p_fecha_pago,
+            'forma_pago', p_forma_pago,
+            'registrado_por', p_registrado_por,
+            'descuento_total', p_descuento_total,
+            'numero_comprobante', p_numero_comprobante,
+            'banco_origen', p_banco_origen,
+            'cuenta_origen', p_cuenta_origen,
+            'observaciones', p_observaciones,
+            'estado', 'CONFIRMADO'
+        ),
+        p_detalles
+    );
+    
+    RAISE NOTICE 'Transacción % registrada exitosamente', v_resultado->'transaccion'->>'id';
+END;
+$$;
 
 -- Función para obtener estudiantes disponibles para un programa específico
 CREATE OR REPLACE FUNCTION fn_estudiantes_disponibles_programa(p_programa_id INTEGER)
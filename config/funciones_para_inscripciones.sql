@@ -587,6 +587,8 @@ $$ LANGUAGE plpgsql;
 -- ============================================
 -- 6. FUNCIÓN PARA OBTENER INSCRIPCIONES
 -- ============================================
+DROP FUNCTION IF EXISTS fn_obtener_inscripciones(d_estado_academico, INTEGER, DATE, DATE);
+
 CREATE OR REPLACE FUNCTION fn_obtener_inscripciones(
     p_filtro_estado d_estado_academico DEFAULT NULL,
     p_filtro_programa INTEGER DEFAULT NULL,
@@ -603,14 +605,14 @@ RETURNS TABLE (
     programa_codigo VARCHAR(20),
     fecha_inscripcion DATE,
     estado d_estado_academico,
-    descuento_aplicado DECIMAL(10,2),
+    valor_final NUMERIC(10,2),
     cupos_disponibles INTEGER,
-    pagos_realizados DECIMAL(10,2),
-    saldo_pendiente DECIMAL(10,2)
+    pagos_realizados NUMERIC(12,2),
+    saldo_pendiente NUMERIC(12,2)
 ) AS $$
 BEGIN
     RETURN QUERY
-    SELECT 
+    SELECT
         i.id,
         e.id,
         CONCAT(e.nombres, ' ', e.apellido_paterno, ' ', COALESCE(e.apellido_materno, '')),
@@ -620,21 +622,17 @@ BEGIN
         p.codigo,
         i.fecha_inscripcion,
         i.estado,
-        COALESCE(i.descuento_aplicado, 0),
+        COALESCE(i.valor_final, p.costo_total),
         COALESCE(p.cupos_maximos - p.cupos_inscritos, 0),
-        COALESCE(SUM(t.monto_final), 0),
-        COALESCE(p.costo_total - SUM(t.monto_final), p.costo_total) - COALESCE(i.descuento_aplicado, 0)
+        i.total_pagado,
+        i.saldo_pendiente
     FROM inscripciones i
     JOIN estudiantes e ON i.estudiante_id = e.id
     JOIN programas p ON i.programa_id = p.id
-    LEFT JOIN transacciones t ON i.estudiante_id = t.estudiante_id 
-        AND i.programa_id = t.programa_id
-        AND t.estado = 'CONFIRMADO'
     WHERE (p_filtro_estado IS NULL OR i.estado = p_filtro_estado)
         AND (p_filtro_programa IS NULL OR p.id = p_filtro_programa)
         AND (p_filtro_fecha_desde IS NULL OR i.fecha_inscripcion >= p_filtro_fecha_desde)
         AND (p_filtro_fecha_hasta IS NULL OR i.fecha_inscripcion <= p_filtro_fecha_hasta)
-    GROUP BY i.id, e.id, p.id
     ORDER BY i.fecha_inscripcion DESC, e.apellido_paterno, e.nombres;
 END;
 $$ LANGUAGE plpgsql;
@@ -124,6 +124,20 @@ BEGIN
         p.created_at, p.updated_at
     FROM programas p
     WHERE p.id = p_id;
+
+    -- Si no está vigente, buscarlo en el archivo histórico
+    IF NOT FOUND THEN
+        RETURN QUERY
+        SELECT 
+            p.id, p.codigo, p.nombre, p.descripcion, p.duracion_meses, p.horas_totales,
+            p.costo_total, p.costo_matricula, p.costo_inscripcion, p.costo_mensualidad,
+            p.numero_cuotas, p.cupos_maximos, p.cupos_inscritos, p.estado,
+            p.fecha_inicio, p.fecha_fin, p.docente_coordinador_id,
+            p.promocion_descuento, p.promocion_descripcion, p.promocion_valido_hasta,
+            p.created_at, p.updated_at
+        FROM programas_archivo p
+        WHERE p.id = p_id;
+    END IF;
 END;
 $$ LANGUAGE plpgsql;
 
@@ -328,24 +328,10 @@ class DocenteController:
                     'errors': validacion['errores']
                 }
             
-            # Verificar si el CI ya existe
             ci_numero = validacion['datos_limpios'].get('ci_numero')
-            if DocenteModel.verificar_ci_existente(ci_numero):
-                return {
-                    'success': False,
-                    'message': f'El CI {ci_numero} ya está registrado en el sistema'
-                }
-            
-            # Verificar si el email ya existe (si se proporciona)
-            email = validacion['datos_limpios'].get('email')
-            if email:
-                if DocenteModel.verificar_email_existente(email):
-                    return {
-                        'success': False,
-                        'message': f'El email {email} ya está registrado en el sistema'
-                    }
             
-            # Crear docente usando el modelo
+            # Crear docente usando el modelo; CI y email duplicados se
+            # detectan en el propio INSERT (ON CONFLICT)
             resultado = DocenteModel.crear_docente(validacion['datos_limpios'])
             
             if resultado['exito']:
@@ -408,24 +394,25 @@ class DocenteController:
                     'errors': validacion['errores']
                 }
             
-            # Verificar unicidad del CI (si se está actualizando)
-            if 'ci_numero' in validacion['datos_limpios']:
-                ci_numero = validacion['datos_limpios']['ci_numero']
-                if DocenteModel.verificar_ci_existente(ci_numero, docente_id):
+            # Verificar unicidad de CI y email en una sola consulta
+            ci_numero = validacion['datos_limpios'].get('ci_numero')
+            if not ci_numero and 'ci_expedicion' in validacion['datos_limpios']:
+                # Cambió sólo la expedición: el CI completo sigue siendo otro
+                ci_numero = docente.get('ci_numero')
+            ci_expedicion = validacion['datos_limpios'].get('ci_expedicion') or docente.get('ci_expedicion')
+            email = validacion['datos_limpios'].get('email')
+            if ci_numero or email:
+                unicidad = DocenteModel.verificar_unicidad(ci_numero, ci_expedicion, email, docente_id)
+                if unicidad['ci_duplicado']:
                     return {
                         'success': False,
                         'message': f'El CI {ci_numero} ya está registrado en otro docente'
                     }
-            
-            # Verificar unicidad del email (si se está actualizando)
-            if 'email' in validacion['datos_limpios']:
-                email = validacion['datos_limpios']['email']
-                if email:
-                    if DocenteModel.verificar_email_existente(email, docente_id):
-                        return {
-                            'success': False,
-                            'message': f'El email {email} ya está registrado en otro docente'
-                        }
+                if unicidad['email_duplicado']:
+                    return {
+                        'success': False,
+                        'message': f'El email {email} ya está registrado en otro docente'
+                    }
             
             # Actualizar docente usando el modelo
             resultado = DocenteModel.actualizar_docente(docente_id, validacion['datos_limpios'])
@@ -39,24 +39,9 @@ class EstudianteController(BaseController):
             logger.info(f"DEBUG - Datos limpios: {datos_limpios}")
             logger.info(f"DEBUG - ¿Tiene fotografia_url?: {'fotografia_url' in datos_limpios}")
             
-            # 2. Verificar CI único
-            ci_numero = datos_limpios['ci_numero']
-            if EstudianteModel.verificar_ci_existente(ci_numero):
-                return {
-                    'success': False,
-                    'message': f"El CI {ci_numero} ya está registrado"
-                }
-            
-            # 3. Verificar email único (si se proporcionó)
-            email = datos_limpios.get('email')
-            if email:
-                if EstudianteModel.verificar_email_existente(email):
-                    return {
-                        'success': False,
-                        'message': f"El email {email} ya está registrado"
-                    }
-            
-            # 4. Crear estudiante en la base de datos
+            # 2. Crear estudiante en la base de datos
+            # La unicidad de CI y email la resuelve el INSERT (ON CONFLICT),
+            # que informa el campo duplicado sin una verificación previa
             logger.info("DEBUG - Llamando a EstudianteModel.crear_estudiante")
             resultado_modelo = EstudianteModel.crear_estudiante(datos_limpios)
             
@@ -129,45 +114,44 @@ class EstudianteController(BaseController):
                     'message': f'Estudiante con ID {estudiante_id} no encontrado'
                 }
                 
-            # 3. Verificar CI único si cambió
-            if 'ci_numero' in datos_limpios and datos_limpios['ci_numero']:
-                ci_actual = estudiante_actual.get('ci_numero')
-                ci_nuevo = datos_limpios['ci_numero']
-                
-                # Extraer valor si es diccionario
-                if isinstance(ci_nuevo, dict):
-                    ci_nuevo = ci_nuevo.get('value') if isinstance(ci_nuevo.get('value'), str) else str(ci_nuevo)
-                    
-                # Asegurar que ci_nuevo no sea None o vacío
-                if ci_nuevo and str(ci_nuevo).strip():
-                    if ci_nuevo != ci_actual:
-                        # Ahora ci_nuevo está garantizado como string no vacío
-                        if EstudianteModel.verificar_ci_existente(str(ci_nuevo).strip(), excluir_id=estudiante_id): # <-- Línea 142 corregida
-                            return {
-                                'success': False,
-                                'message': f"El CI {ci_nuevo} ya está registrado por otro estudiante"
-                            }
-                
-            # 4. Verificar email único si cambió
-            if 'email' in datos_limpios and datos_limpios['email']:
-                email_actual = estudiante_actual.get('email', '')
-                email_nuevo = datos_limpios['email']
-                
-                # Extraer valor si es diccionario
-                if isinstance(email_nuevo, dict):
-                    email_nuevo = email_nuevo.get('value') if isinstance(email_nuevo.get('value'), str) else str(email_nuevo)
-                
-                # Asegurar que email_nuevo no sea None o vacío
-                if email_nuevo and str(email_nuevo).strip():
-                    if email_nuevo != email_actual:
-                        # Ahora email_nuevo está garantizado como string no vacío
-                        if EstudianteModel.verificar_email_existente(str(email_nuevo).strip(), excluir_id=estudiante_id): # <-- Línea 158 corregida
-                            return {
-                                'success': False,
-                                'message': f"El email {email_nuevo} ya está registrado por otro estudiante"
-                            }
+            # 3. Verificar CI y email únicos (una sola consulta) si cambiaron
+            ci_nuevo = datos_limpios.get('ci_numero')
+            email_nuevo = datos_limpios.get('email')
+            
+            # Extraer valor si es diccionario
+            if isinstance(ci_nuevo, dict):
+                ci_nuevo = ci_nuevo.get('value') if isinstance(ci_nuevo.get('value'), str) else str(ci_nuevo)
+            if isinstance(email_nuevo, dict):
+                email_nuevo = email_nuevo.get('value') if isinstance(email_nuevo.get('value'), str) else str(email_nuevo)
+            
+            ci_nuevo = str(ci_nuevo).strip() if ci_nuevo and str(ci_nuevo).strip() else None
+            email_nuevo = str(email_nuevo).strip() if email_nuevo and str(email_nuevo).strip() else None
+            expedicion_nueva = datos_limpios.get('ci_expedicion') or estudiante_actual.get('ci_expedicion')
+            
+            # Sólo verificar los valores que realmente cambiaron (CI = número + expedición)
+            ci_nuevo = ci_nuevo or estudiante_actual.get('ci_numero')
+            if (ci_nuevo == estudiante_actual.get('ci_numero')
+                    and expedicion_nueva == estudiante_actual.get('ci_expedicion')):
+                ci_nuevo = None
+            if email_nuevo == (estudiante_actual.get('email') or ''):
+                email_nuevo = None
+            
+            if ci_nuevo or email_nuevo:
+                unicidad = EstudianteModel.verificar_unicidad(
+                    ci_nuevo, expedicion_nueva, email_nuevo, excluir_id=estudiante_id
+                )
+                if unicidad['ci_duplicado']:
+                    return {
+                        'success': False,
+                        'message': f"El CI {ci_nuevo} ya está registrado por otro estudiante"
+                    }
+                if unicidad['email_duplicado']:
+                    return {
+                        'success': False,
+                        'message': f"El email {email_nuevo} ya está registrado por otro estudiante"
+                    }
             
-            # 5. Actualizar en la base de datos
+            # 4. Actualizar en la base de datos
             # Ahora pasamos directamente el diccionario al modelo
             resultado_modelo = EstudianteModel.actualizar_estudiante(estudiante_id, datos_limpios)
             
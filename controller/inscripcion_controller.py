@@ -293,6 +293,134 @@ class InscripcionController(BaseController):
                 'message': f'Error procesando inscripción: {str(e)}'
             }
     
+    @staticmethod
+    def procesar_inscripcion_masiva(
+        programa_id: int,
+        estudiante_ids: List[int],
+        valor_final: Optional[float] = None,
+        observaciones: Optional[str] = None,
+        usuario_id: Optional[int] = None
+    ) -> Dict[str, Any]:
+        """
+        Inscribe a un grupo de estudiantes en un programa en una sola operación
+        
+        Args:
+            programa_id: ID del programa
+            estudiante_ids: IDs de los estudiantes a inscribir
+            valor_final: Valor final común (por defecto el valor real del programa)
+            observaciones: Observaciones comunes (obligatorias con formato si hay descuento)
+            usuario_id: Usuario que registra la operación
+            
+        Returns:
+            Dict con resultado global y 'resultados' por estudiante
+        """
+        try:
+            if not estudiante_ids:
+                return {
+                    'success': False,
+                    'message': 'Seleccione al menos un estudiante'
+                }
+            
+            resultado_programa = ProgramaModel.obtener_programa(programa_id)
+            if not resultado_programa.get('success'):
+                return {
+                    'success': False,
+                    'message': f'Programa con ID {programa_id} no encontrado'
+                }
+            
+            valor_real = float(resultado_programa['data'].get('costo_total', 0) or 0)
+            if valor_final is None:
+                valor_final = valor_real
+            
+            if not observaciones and abs(valor_final - valor_real) < 0.01:
+                observaciones = InscripcionController.generar_observaciones_automaticas(
+                    valor_real, valor_final
+                )
+            
+            # Mismas reglas de valor final y observaciones que la inscripción individual
+            valido, error = InscripcionController.validar_observaciones_con_descuento(
+                valor_real, valor_final, observaciones or ""
+            )
+            if not valido:
+                return {
+                    'success': False,
+                    'message': error
+                }
+            
+            resultado = InscripcionModel.inscribir_en_lote(
+                programa_id=programa_id,
+                estudiante_ids=estudiante_ids,
+                valor_final=valor_final,
+                observaciones=observaciones,
+                usuario_id=usuario_id
+            )
+            
+            logger.info(
+                f"📊 Inscripción masiva en programa {programa_id}: "
+                f"{resultado.get('inscritos', 0)} inscritos, {resultado.get('omitidos', 0)} omitidos"
+            )
+            return resultado
+            
+        except Exception as e:
+            logger.error(f"Error procesando inscripción masiva: {e}")
+            return {
+                'success': False,
+                'message': f'Error procesando inscripción masiva: {str(e)}'
+            }
+    
+    @staticmethod
+    def importar_inscripciones_retroactivas(
+        ruta_archivo: str,
+        usuario_id: Optional[int] = None,
+        aplicar: bool = True
+    ) -> Dict[str, Any]:
+        """
+        Importa inscripciones históricas con sus pagos desde una planilla CSV
+        
+        Args:
+            ruta_archivo: Ruta del archivo CSV
+            usuario_id: Usuario que registra los pagos históricos
+            aplicar: Si es False sólo se valida y se genera el reporte de errores
+            
+        Returns:
+            Dict con 'success', 'message' y 'data' (resumen, filas y reporte_path)
+        """
+        try:
+            from service.importacion_inscripciones_service import ImportacionInscripcionesService
+            
+            resultado = ImportacionInscripcionesService.importar_planilla(
+                ruta_archivo, usuario_id=usuario_id, aplicar=aplicar
+            )
+            
+            if not resultado['success']:
+                return {
+                    'success': False,
+                    'message': f"Error importando inscripciones: {resultado.get('error', 'Error desconocido')}"
+                }
+            
+            resumen = resultado['resumen']
+            if aplicar:
+                mensaje = (f"{resumen['inscripciones_creadas']} inscripciones y "
+                           f"{resumen['pagos_registrados']} pagos importados")
+            else:
+                mensaje = f"{resumen['aceptadas']} de {resumen['total_filas']} filas válidas (simulación)"
+            if resumen['rechazadas']:
+                mensaje += f"; {resumen['rechazadas']} filas rechazadas"
+            
+            logger.info(f"📊 Importación retroactiva de inscripciones: {mensaje}")
+            return {
+                'success': True,
+                'message': mensaje,
+                'data': resultado
+            }
+            
+        except Exception as e:
+            logger.error(f"Error importando inscripciones retroactivas: {e}")
+            return {
+                'success': False,
+                'message': f'Error importando inscripciones: {str(e)}'
+            }
+    
     @staticmethod
     def actualizar_inscripcion(
         inscripcion_id: int,
@@ -742,32 +870,33 @@ class InscripcionController(BaseController):
     def generar_reporte_inscripciones(
         fecha_inicio: date,
         fecha_fin: date,
-        programa_id: Optional[int] = None
+        programa_id: Optional[int] = None,
+        incluir_detalle: bool = False,
+        estado: Optional[str] = None
     ) -> Dict[str, Any]:
         """
-        Genera reporte detallado de inscripciones en un periodo
+        Genera reporte de inscripciones en un periodo
+        
+        Los totales, la distribución por estado y el detalle por programa se
+        calculan en la base de datos con una sola consulta. Las inscripciones
+        individuales sólo se incluyen si se piden, como un iterador que las
+        trae por lotes (consumirlo por completo o cerrarlo con close()).
         
         Args:
             fecha_inicio: Fecha de inicio del reporte
             fecha_fin: Fecha de fin del reporte
             programa_id: ID del programa (opcional)
+            incluir_detalle: Incluir 'inscripciones_detalladas' (iterador)
+            estado: Filtrar por estado de la inscripción (opcional)
             
         Returns:
             Dict con reporte detallado
         """
         try:
-            # Obtener inscripciones del periodo
-            resultado = InscripcionController.obtener_inscripciones_con_filtros(
-                programa_id=programa_id,
-                fecha_desde=fecha_inicio,
-                fecha_hasta=fecha_fin
+            resumen = InscripcionModel.resumen_inscripciones_periodo(
+                fecha_inicio, fecha_fin, programa_id=programa_id, estado=estado
             )
             
-            if not resultado['success']:
-                return resultado
-            
-            data = resultado['data']
-            
             # Obtener información adicional si hay programa específico
             info_programa = None
             if programa_id:
@@ -777,10 +906,10 @@ class InscripcionController(BaseController):
                     info_programa = programa
             
             # Calcular promedios
-            total_inscripciones = data['estadisticas']['total']
+            total_inscripciones = resumen['total']
             if total_inscripciones > 0:
-                promedio_recaudado = data['estadisticas']['recaudado'] / total_inscripciones
-                promedio_saldo = data['estadisticas']['saldo_pendiente'] / total_inscripciones
+                promedio_recaudado = resumen['recaudado'] / total_inscripciones
+                promedio_saldo = resumen['saldo_pendiente'] / total_inscripciones
             else:
                 promedio_recaudado = promedio_saldo = 0
             
@@ -793,16 +922,20 @@ class InscripcionController(BaseController):
                 'programa': info_programa,
                 'resumen': {
                     'total_inscripciones': total_inscripciones,
-                    'total_recaudado': data['estadisticas']['recaudado'],
-                    'total_saldo_pendiente': data['estadisticas']['saldo_pendiente'],
+                    'total_recaudado': resumen['recaudado'],
+                    'total_saldo_pendiente': resumen['saldo_pendiente'],
                     'promedio_recaudado_por_inscripcion': promedio_recaudado,
                     'promedio_saldo_por_inscripcion': promedio_saldo,
-                    'distribucion_por_estado': data['estadisticas']['por_estado']
+                    'distribucion_por_estado': resumen['por_estado']
                 },
-                'detalle_por_programa': data['agrupados_por_programa'],
-                'inscripciones_detalladas': data['inscripciones']
+                'detalle_por_programa': resumen['por_programa']
             }
             
+            if incluir_detalle:
+                reporte['inscripciones_detalladas'] = InscripcionModel.iterar_inscripciones_periodo(
+                    fecha_inicio, fecha_fin, programa_id=programa_id, estado=estado
+                )
+            
             return {
                 'success': True,
                 'data': reporte
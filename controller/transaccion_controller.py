@@ -9,7 +9,10 @@ from datetime import datetime
 import logging
 
 from controller.base_controller import BaseController
+from model.caja_model import CajaModel
 from model.transaccion_model import TransaccionModel
+from service.diario_pagos_service import DiarioPagos
+from service.importacion_pagos_service import ImportacionPagosService
 from config.constants import EstadoTransaccion, FormaPago
 
 logger = logging.getLogger(__name__)
@@ -718,7 +721,133 @@ class TransaccionController(BaseController):
                 message='Error al obtener pagos del día',
                 error=str(e)
             )
-    
+
+    def cerrar_caja(self, fecha: str, usuario_id: int,
+                    observaciones: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Cerrar la caja de un día
+
+        Args:
+            fecha: Día a cerrar (YYYY-MM-DD)
+            usuario_id: Usuario que realiza el cierre
+            observaciones: Observaciones del cierre
+
+        Returns:
+            Respuesta formateada con el cierre registrado
+        """
+        try:
+            # fn_cerrar_caja no ve el diario local: los pagos de esta estación que aún
+            # no llegaron a la base de datos dejarían el cierre incompleto
+            if DiarioPagos.HABILITADO:
+                sin_aplicar = DiarioPagos.sin_aplicar(hasta_fecha=str(fecha)[:10])
+                if sin_aplicar:
+                    con_error = sum(1 for op in sin_aplicar if op['estado'] == 'ERROR')
+                    return self.formatear_respuesta(
+                        success=False,
+                        message='No se puede cerrar la caja',
+                        error=(f'{len(sin_aplicar)} pagos del diario local sin registrar en la base de datos '
+                               f'({con_error} con error). Reintente desde el diario de pagos.')
+                    )
+
+            resultado = CajaModel.cerrar_caja(fecha, usuario_id, observaciones)
+
+            if resultado['success']:
+                return self.formatear_respuesta(
+                    success=True,
+                    message=f'Caja del {fecha} cerrada',
+                    data=resultado['data']
+                )
+            else:
+                return self.formatear_respuesta(
+                    success=False,
+                    message='Error al cerrar caja',
+                    error=resultado.get('error', 'Error desconocido')
+                )
+
+        except Exception as e:
+            logger.error(f"Error cerrando caja: {e}")
+            return self.formatear_respuesta(
+                success=False,
+                message='Error al cerrar caja',
+                error=str(e)
+            )
+
+    def obtener_reporte_caja(self, fecha_inicio: str, fecha_fin: str) -> Dict[str, Any]:
+        """
+        Obtener el reporte de caja por día y forma de pago
+
+        Args:
+            fecha_inicio: Fecha de inicio (YYYY-MM-DD)
+            fecha_fin: Fecha de fin (YYYY-MM-DD)
+
+        Returns:
+            Respuesta formateada con filas diarias y cierres del período
+        """
+        try:
+            resultado = CajaModel.obtener_reporte(fecha_inicio, fecha_fin)
+
+            if resultado['success']:
+                return self.formatear_respuesta(
+                    success=True,
+                    message=f'Reporte de caja: {resultado["count"]} registros',
+                    data=resultado
+                )
+            else:
+                return self.formatear_respuesta(
+                    success=False,
+                    message='Error al obtener reporte de caja',
+                    error=resultado.get('error', 'Error desconocido')
+                )
+
+        except Exception as e:
+            logger.error(f"Error obteniendo reporte de caja: {e}")
+            return self.formatear_respuesta(
+                success=False,
+                message='Error al obtener reporte de caja',
+                error=str(e)
+            )
+
+    def importar_extracto_bancario(self, ruta_archivo: str, usuario_id: Optional[int] = None,
+                                   aplicar: bool = True) -> Dict[str, Any]:
+        """
+        Importar pagos por transferencia desde un extracto bancario (CSV)
+
+        Args:
+            ruta_archivo: Ruta del archivo CSV del banco
+            usuario_id: Usuario que registra los pagos
+            aplicar: Si es False sólo se genera el reporte de conciliación
+
+        Returns:
+            Respuesta formateada con el resumen y el reporte por fila
+        """
+        try:
+            resultado = ImportacionPagosService.importar_extracto(
+                ruta_archivo, usuario_id=usuario_id, aplicar=aplicar
+            )
+
+            if resultado['success']:
+                resumen = resultado['resumen']
+                accion = 'registrados' if aplicar else 'conciliables (simulación)'
+                return self.formatear_respuesta(
+                    success=True,
+                    message=f'{resumen["conciliados"]} de {resumen["total_filas"]} pagos {accion}',
+                    data=resultado
+                )
+            else:
+                return self.formatear_respuesta(
+                    success=False,
+                    message='Error al importar extracto bancario',
+                    error=resultado.get('error', 'Error desconocido')
+                )
+
+        except Exception as e:
+            logger.error(f"Error importando extracto bancario: {e}")
+            return self.formatear_respuesta(
+                success=False,
+                message='Error al importar extracto bancario',
+                error=str(e)
+            )
+
     def buscar(self, termino: str, limite: int = 20) -> Dict[str, Any]:
         """
         Buscar transacciones
@@ -977,8 +1106,13 @@ class TransaccionController(BaseController):
         )
     
     def _formatear_datos_para_presentacion(self, transaccion: Dict[str, Any]) -> Dict[str, Any]:
-        """Formatear datos de transacción para presentación en UI"""
-        datos = transaccion.copy()
+        """
+        Formatear datos de transacción para presentación en UI
+
+        Los campos formateados se agregan sobre el mismo registro devuelto por
+        el modelo (recién creado por consulta) para evitar copiar cada fila.
+        """
+        datos = transaccion
         
         # Formatear montos
         if 'monto_total' in datos:
@@ -22,8 +22,8 @@ from controller.main_controller import MainController
 
 # Importar servicios de verificación
 from service.programa_estado_service import ProgramaEstadoService
-from utils.verificacion_inicio import ejecutar_verificacion_inicial
 from utils.scheduler import ProgramaScheduler
+from service.diario_pagos_service import DiarioPagos
 
 logger = logging.getLogger(__name__)
 
@@ -40,32 +40,15 @@ class ApplicationManager:
         self.app.setApplicationName("FormaGestPro")
         self.app.setOrganizationName("DespachaNet")
         
-        # Ejecutar verificaciones al inicio (sin necesidad de login)
-        self._ejecutar_verificaciones_iniciales()
-    
-    def _ejecutar_verificaciones_iniciales(self):
-        """Ejecuta verificaciones automáticas al iniciar la aplicación"""
-        try:
-            logger.info("🚀 Iniciando verificaciones automáticas del sistema...")
-            
-            # Verificar programas que deben ser concluidos
-            resultado = ejecutar_verificacion_inicial()
-            
-            if resultado.get('success'):
-                if resultado.get('actualizados', 0) > 0:
-                    logger.info(f"✅ {resultado.get('actualizados')} programas concluidos automáticamente")
-                else:
-                    logger.info("✅ No hay programas pendientes de concluir")
-            else:
-                logger.error(f"❌ Error en verificación inicial: {resultado.get('mensaje')}")
-                
-        except Exception as e:
-            logger.error(f"Error ejecutando verificaciones iniciales: {e}")
+        # Tareas automáticas en segundo plano (sin necesidad de login); la
+        # verificación de estados de programas se ejecuta apenas arranca
+        self._iniciar_scheduler()
+        self.app.aboutToQuit.connect(self._on_app_quit)
     
     def _iniciar_scheduler(self):
-        """Inicia el scheduler para verificaciones periódicas (solo después de login)"""
+        """Inicia el planificador de tareas periódicas en segundo plano"""
         try:
-            # Iniciar scheduler para verificar cada hora
+            # Verificar estados cada hora (ver ProgramaScheduler para el resto de tareas)
             self.scheduler = ProgramaScheduler(interval_minutos=60)
             self.scheduler.start()
             logger.info("🕒 Scheduler de verificaciones iniciado")
@@ -86,11 +69,14 @@ class ApplicationManager:
         self.main_controller = MainController(user_data=user_data)
         self.main_controller.show_window()
         
-        # Iniciar verificaciones periódicas después del login
-        self._iniciar_scheduler()
+        # Aplicar en segundo plano los pagos del diario local
+        DiarioPagos.iniciar_replicador()
         
-        # Conectar señal de cierre de aplicación
-        self.app.aboutToQuit.connect(self._on_app_quit)
+        # Precargar en segundo plano las cachés de páginas de las pestañas
+        if self.scheduler and self.main_controller.main_window:
+            for funcion in self.main_controller.main_window.precalentadores_cache():
+                self.scheduler.registrar_precalentador(funcion)
+            self.scheduler.precalentar_caches()
         
         # Cerrar ventana de login
         if self.login_window:
@@ -104,6 +90,9 @@ class ApplicationManager:
         if self.scheduler:
             self.scheduler.stop()
             logger.info("✅ Scheduler detenido correctamente")
+        
+        # Detener el replicador del diario de pagos (lo pendiente se aplica al reiniciar)
+        DiarioPagos.detener_replicador()
     
     def run(self):
         """Ejecutar la aplicación"""
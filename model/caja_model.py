@@ -0,0 +1,163 @@
+# Archivo: model/caja_model.py
+"""
+Modelo para el cierre de caja diario.
+
+Los reportes se leen de caja_resumen_diario (acumulados por día y forma de
+pago que mantiene un trigger sobre movimientos_caja) y de cierres_caja
+(totales congelados al cerrar el día), sin volver a recorrer transacciones.
+"""
+
+import logging
+from datetime import date
+from typing import Any, Dict, Optional, Union
+
+from config.database import Database
+from model.registro import registros_desde_cursor
+
+logger = logging.getLogger(__name__)
+
+Fecha = Union[date, str]
+
+
+class CajaModel:
+    """Acumulados, cierres y reportes de caja"""
+
+    @classmethod
+    def obtener_resumen_dia(cls, fecha: Optional[Fecha] = None) -> Dict[str, Any]:
+        """
+        Resumen de caja de un día (por defecto hoy) desde los acumulados
+
+        Args:
+            fecha: Día a consultar
+
+        Returns:
+            Dict con 'formas_pago', 'totales' y 'cierre' (None si está abierto)
+        """
+        fecha = fecha or date.today()
+        try:
+            with Database.get_cursor() as cursor:
+                cursor.execute("""
+                    SELECT forma_pago, ingresos, egresos,
+                           ingresos - egresos AS neto,
+                           cantidad_ingresos, cantidad_egresos
+                    FROM caja_resumen_diario
+                    WHERE fecha = %s
+                    ORDER BY forma_pago
+                """, (fecha,))
+                formas_pago = [r.to_dict() for r in registros_desde_cursor(cursor)]
+
+                cursor.execute("SELECT * FROM cierres_caja WHERE fecha = %s", (fecha,))
+                cierres = registros_desde_cursor(cursor)
+
+            totales = {
+                'ingresos': sum(f['ingresos'] for f in formas_pago),
+                'egresos': sum(f['egresos'] for f in formas_pago),
+                'cantidad_ingresos': sum(f['cantidad_ingresos'] for f in formas_pago),
+                'cantidad_egresos': sum(f['cantidad_egresos'] for f in formas_pago),
+            }
+            totales['neto'] = totales['ingresos'] - totales['egresos']
+
+            return {
+                'success': True,
+                'fecha': str(fecha),
+                'formas_pago': formas_pago,
+                'totales': totales,
+                'cierre': cierres[0].to_dict() if cierres else None
+            }
+
+        except Exception as e:
+            logger.error(f"❌ Error obteniendo resumen de caja del {fecha}: {e}")
+            return {'success': False, 'error': str(e)}
+
+    @classmethod
+    def cerrar_caja(cls, fecha: Fecha, usuario_id: int,
+                    observaciones: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Cerrar la caja de un día congelando sus totales y saldo acumulado
+
+        Args:
+            fecha: Día a cerrar
+            usuario_id: Usuario que realiza el cierre
+            observaciones: Observaciones del cierre
+
+        Returns:
+            Dict con el cierre registrado en 'data'
+        """
+        try:
+            with Database.get_cursor() as cursor:
+                cursor.execute(
+                    "SELECT * FROM fn_cerrar_caja(%s, %s, %s)",
+                    (fecha, usuario_id, observaciones)
+                )
+                cierre = registros_desde_cursor(cursor)
+
+            logger.info(f"✅ Caja del {fecha} cerrada por usuario {usuario_id}")
+            return {'success': True, 'data': cierre[0].to_dict() if cierre else None}
+
+        except Exception as e:
+            logger.error(f"❌ Error cerrando caja del {fecha}: {e}")
+            return {'success': False, 'error': str(e)}
+
+    @classmethod
+    def reabrir_caja(cls, fecha: Fecha) -> Dict[str, Any]:
+        """
+        Reabrir el último cierre de caja (p. ej. para registrar una corrección)
+
+        Args:
+            fecha: Día a reabrir
+
+        Returns:
+            Dict con 'success'
+        """
+        try:
+            resultado = Database.execute_query(
+                "SELECT fn_reabrir_caja(%s)", (fecha,), fetch_one=True, commit=True
+            )
+            if not resultado or not resultado[0]:
+                return {'success': False, 'error': f'La caja del {fecha} no está cerrada'}
+
+            logger.info(f"↩️ Caja del {fecha} reabierta")
+            return {'success': True}
+
+        except Exception as e:
+            logger.error(f"❌ Error reabriendo caja del {fecha}: {e}")
+            return {'success': False, 'error': str(e)}
+
+    @classmethod
+    def obtener_reporte(cls, fecha_inicio: Fecha, fecha_fin: Fecha) -> Dict[str, Any]:
+        """
+        Reporte de caja por día y forma de pago con saldo acumulado
+
+        Args:
+            fecha_inicio: Primer día del reporte
+            fecha_fin: Último día del reporte
+
+        Returns:
+            Dict con filas en 'data' y cierres del período en 'cierres'
+        """
+        try:
+            with Database.get_cursor() as cursor:
+                cursor.execute(
+                    "SELECT * FROM fn_reporte_caja(%s, %s)", (fecha_inicio, fecha_fin)
+                )
+                filas = registros_desde_cursor(cursor)
+
+                cursor.execute("""
+                    SELECT fecha, total_ingresos, total_egresos, saldo_anterior,
+                           saldo_final, cantidad_movimientos, cerrado_por, cerrado_en
+                    FROM cierres_caja
+                    WHERE fecha BETWEEN %s AND %s
+                    ORDER BY fecha
+                """, (fecha_inicio, fecha_fin))
+                cierres = registros_desde_cursor(cursor)
+
+            return {
+                'success': True,
+                'data': filas,
+                'cierres': cierres,
+                'count': len(filas)
+            }
+
+        except Exception as e:
+            logger.error(f"❌ Error obteniendo reporte de caja: {e}")
+            return {'success': False, 'error': str(e)}
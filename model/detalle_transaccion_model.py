@@ -8,9 +8,11 @@ Maneja operaciones CRUD para la tabla detalles_transaccion
 import logging
 from typing import Optional, Dict, List, Any
 from datetime import datetime
+from decimal import Decimal
 
 from config.database import Database
-from psycopg2.extras import RealDictCursor
+from psycopg2.extras import execute_values
+from model.registro import registros_desde_cursor
 
 logger = logging.getLogger(__name__)
 
@@ -46,7 +48,7 @@ class DetalleTransaccionModel:
             datos: Diccionario con los datos del detalle
             
         Returns:
-            Dict con resultado y ID creado
+            Dict con resultado, ID creado y la fila completa en 'data'
         """
         try:
             # Validar datos obligatorios
@@ -67,22 +69,30 @@ class DetalleTransaccionModel:
             # Filtrar solo columnas válidas
             datos_filtrados = {k: v for k, v in datos.items() if k in cls.COLUMNS}
             
-            # Establecer orden si no se proporciona
-            if 'orden' not in datos_filtrados:
-                # Obtener el último orden para esta transacción
-                ultimo_orden = cls._obtener_ultimo_orden(datos['transaccion_id'])
-                datos_filtrados['orden'] = ultimo_orden + 1
-            
             # Preparar query
             columns = list(datos_filtrados.keys())
             placeholders = ['%s'] * len(columns)
             values = [datos_filtrados[col] for col in columns]
             
+            # Si no se proporciona orden, calcularlo dentro del mismo INSERT
+            if datos_filtrados.get('orden') is None:
+                if 'orden' not in columns:
+                    columns.append('orden')
+                    placeholders.append('%s')
+                    values.append(None)
+                idx = columns.index('orden')
+                placeholders[idx] = f"""(
+                    SELECT COALESCE(MAX(orden), 0) + 1
+                    FROM {cls.TABLE_NAME}
+                    WHERE transaccion_id = %s
+                )"""
+                values[idx] = datos['transaccion_id']
+            
             query = f"""
                 INSERT INTO {cls.TABLE_NAME} 
                 ({', '.join(columns)})
                 VALUES ({', '.join(placeholders)})
-                RETURNING id
+                RETURNING *
             """
             
             connection = None
@@ -95,9 +105,10 @@ class DetalleTransaccionModel:
                 cursor = connection.cursor()
                 cursor.execute(query, values)
                 
-                # Obtener ID insertado
+                # La fila creada viene en el propio INSERT
                 result = cursor.fetchone()
-                new_id = result[0] if result else None
+                detalle = registros_desde_cursor(cursor, [result])[0] if result else None
+                new_id = detalle.get('id') if detalle else None
                 
                 connection.commit()
                 logger.info(f"✅ Detalle de transacción creado con ID: {new_id}")
@@ -105,6 +116,7 @@ class DetalleTransaccionModel:
                 return {
                     'success': True, 
                     'id': new_id,
+                    'data': detalle,
                     'message': 'Detalle registrado exitosamente'
                 }
                 
@@ -125,37 +137,92 @@ class DetalleTransaccionModel:
             return {'success': False, 'error': str(e)}
     
     @classmethod
-    def _obtener_ultimo_orden(cls, transaccion_id: int) -> int:
-        """Obtener el último orden para una transacción"""
+    def crear_lote(cls, transaccion_id: int, detalles: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """
+        Crear varios detalles de una transacción con un único INSERT
+        
+        El orden de los detalles que no lo traen se calcula en la misma
+        sentencia a continuación del último orden existente.
+        
+        Args:
+            transaccion_id: ID de la transacción
+            detalles: Lista de detalles (concepto_pago_id, descripcion,
+                cantidad, precio_unitario, subtotal y opcionalmente orden)
+            
+        Returns:
+            Dict con las filas creadas en 'data'
+        """
+        if not detalles:
+            return {'success': True, 'data': [], 'count': 0}
+        
+        filas = []
+        for posicion, datos in enumerate(detalles, start=1):
+            for campo in ['concepto_pago_id', 'descripcion', 'precio_unitario', 'subtotal']:
+                if datos.get(campo) is None:
+                    return {'success': False, 'error': f'El campo {campo} es obligatorio'}
+            
+            # Los montos llegan como Decimal (BD) o float (formulario): comparar en Decimal
+            cantidad = datos.get('cantidad', 1)
+            precio = Decimal(str(datos['precio_unitario']))
+            subtotal = Decimal(str(datos['subtotal']))
+            if abs(cantidad * precio - subtotal) > Decimal('0.01'):
+                return {'success': False, 'error': 'El subtotal no coincide con cantidad * precio'}
+            
+            filas.append((
+                transaccion_id, datos['concepto_pago_id'], datos['descripcion'], cantidad,
+                datos['precio_unitario'], datos['subtotal'], datos.get('orden'), posicion
+            ))
+        
+        query = f"""
+            INSERT INTO {cls.TABLE_NAME}
+            (transaccion_id, concepto_pago_id, descripcion, cantidad, precio_unitario, subtotal, orden)
+            SELECT v.transaccion_id, v.concepto_pago_id, v.descripcion, v.cantidad,
+                   v.precio_unitario, v.subtotal,
+                   COALESCE(v.orden, (
+                       SELECT COALESCE(MAX(d.orden), 0)
+                       FROM {cls.TABLE_NAME} d
+                       WHERE d.transaccion_id = v.transaccion_id
+                   ) + v.posicion)
+            FROM (VALUES %s) AS v(transaccion_id, concepto_pago_id, descripcion, cantidad,
+                                  precio_unitario, subtotal, orden, posicion)
+            RETURNING *
+        """
+        plantilla = ("(%s::INTEGER, %s::INTEGER, %s::VARCHAR, %s::INTEGER, "
+                     "%s::NUMERIC, %s::NUMERIC, %s::INTEGER, %s::INTEGER)")
+        
+        connection = None
+        cursor = None
         try:
-            query = f"""
-                SELECT COALESCE(MAX(orden), 0) as ultimo_orden
-                FROM {cls.TABLE_NAME}
-                WHERE transaccion_id = %s
-            """
+            connection = cls._get_connection()
+            if not connection:
+                return {'success': False, 'error': 'No se pudo conectar a la base de datos'}
+            
+            cursor = connection.cursor()
+            resultado = execute_values(cursor, query, filas, template=plantilla,
+                                       page_size=len(filas), fetch=True)
+            creados = registros_desde_cursor(cursor, resultado)
+            
+            connection.commit()
+            logger.info(f"✅ {len(creados)} detalles creados para transacción {transaccion_id}")
+            
+            return {
+                'success': True,
+                'data': creados,
+                'count': len(creados),
+                'message': 'Detalles registrados exitosamente'
+            }
             
-            connection = None
-            cursor = None
-            try:
-                connection = cls._get_connection()
-                if not connection:
-                    return 0
-                
-                cursor = connection.cursor()
-                cursor.execute(query, (transaccion_id,))
-                result = cursor.fetchone()
-                
-                return result[0] if result else 0
-                
-            finally:
-                if cursor:
-                    cursor.close()
-                if connection:
-                    cls._return_connection(connection)
-                    
         except Exception as e:
-            logger.error(f"Error obteniendo último orden: {e}")
-            return 0
+            if connection:
+                connection.rollback()
+            logger.error(f"❌ Error creando detalles de transacción {transaccion_id}: {e}")
+            return {'success': False, 'error': str(e)}
+            
+        finally:
+            if cursor:
+                cursor.close()
+            if connection:
+                cls._return_connection(connection)
     
     @classmethod
     def listar_por_transaccion(cls, transaccion_id: int) -> Dict[str, Any]:
@@ -187,11 +254,9 @@ class DetalleTransaccionModel:
                 if not connection:
                     return {'success': False, 'error': 'No se pudo conectar a la base de datos'}
                 
-                cursor = connection.cursor(cursor_factory=RealDictCursor)
+                cursor = connection.cursor()
                 cursor.execute(query, (transaccion_id,))
-                results = cursor.fetchall()
-                
-                detalles = [dict(row) for row in results]
+                detalles = registros_desde_cursor(cursor)
                 
                 logger.info(f"✅ {len(detalles)} detalles encontrados para transacción {transaccion_id}")
                 
@@ -347,7 +412,7 @@ class DetalleTransaccionModel:
                 UPDATE {cls.TABLE_NAME}
                 SET {set_clause}
                 WHERE id = %s
-                RETURNING id
+                RETURNING *
             """
             
             connection = None
@@ -371,6 +436,7 @@ class DetalleTransaccionModel:
                 return {
                     'success': True,
                     'id': detalle_id,
+                    'data': registros_desde_cursor(cursor, [result])[0],
                     'message': 'Detalle actualizado exitosamente'
                 }
                 
@@ -1,5 +1,6 @@
 # Archivo: model/docente_model.py - VERSIÓN OPTIMIZADA Y REORGANIZADA
 from config.database import Database
+from .registro import crear_tipo_registro
 from typing import List, Dict, Optional, Tuple, Any
 import logging
 
@@ -19,6 +20,9 @@ class DocenteModel:
         'curriculum_url', 'honorario_hora', 'activo', 'fecha_registro'
     ]
     
+    # Tipo de registro compacto (acceso tipo diccionario)
+    REGISTRO = crear_tipo_registro('DocenteRegistro', COLUMNAS)
+    
     # ===== MÉTODOS CRUD BÁSICOS =====
     
     @staticmethod
@@ -41,6 +45,7 @@ class DocenteModel:
                 titulo_profesional, especialidad, telefono, email, 
                 curriculum_url, honorario_hora, activo
             ) VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
+            ON CONFLICT DO NOTHING
             RETURNING id
             """
             
@@ -76,9 +81,20 @@ class DocenteModel:
                     'exito': True
                 }
             
+            # Sin fila insertada: conflicto con un índice único
+            unicidad = DocenteModel.verificar_unicidad(
+                data.get('ci_numero'), data.get('ci_expedicion'), data.get('email')
+            )
+            if unicidad['ci_duplicado']:
+                mensaje = f"El CI {data.get('ci_numero')} ya está registrado en el sistema"
+            elif unicidad['email_duplicado']:
+                mensaje = f"El email {data.get('email')} ya está registrado en el sistema"
+            else:
+                mensaje = 'No se pudo crear el docente'
+            
             return {
                 'nuevo_id': None,
-                'mensaje': 'No se pudo crear el docente',
+                'mensaje': mensaje,
                 'exito': False
             }
             
@@ -206,7 +222,7 @@ class DocenteModel:
             Database.return_connection(connection)
             
             if result:
-                docente = dict(zip(DocenteModel.COLUMNAS, result))
+                docente = DocenteModel.REGISTRO(result)
                 logger.debug(f"Docente encontrado: ID {docente_id}")
                 return docente
             
@@ -278,7 +294,7 @@ class DocenteModel:
             results = Database.execute_query(query, tuple(params))
             
             if results:
-                docentes = [dict(zip(DocenteModel.COLUMNAS, row)) for row in results]
+                docentes = [DocenteModel.REGISTRO(row) for row in results]
                 logger.debug(f"Búsqueda encontrada: {len(docentes)} docentes")
                 return docentes
             
@@ -357,7 +373,7 @@ class DocenteModel:
             results = Database.execute_query(query, tuple(params))
             
             if results:
-                docentes = [dict(zip(DocenteModel.COLUMNAS, row)) for row in results]
+                docentes = [DocenteModel.REGISTRO(row) for row in results]
                 logger.debug(f"Búsqueda completa: {len(docentes)} docentes")
                 return docentes
             
@@ -601,6 +617,54 @@ class DocenteModel:
             logger.error(f"Error verificando email: {e}")
             return False
     
+    @staticmethod
+    def verificar_unicidad(ci_numero: Optional[str], ci_expedicion: Optional[str],
+                            email: Optional[str] = None,
+                            excluir_id: Optional[int] = None) -> Dict[str, bool]:
+        """
+        Verificar CI y email duplicados en una sola consulta
+        
+        Usa los índices ux_docentes_ci_norm y ux_docentes_email_lower; el CI
+        se compara junto con su expedición, igual que el índice.
+        
+        Args:
+            ci_numero: Número de CI a verificar
+            ci_expedicion: Expedición del CI
+            email: Email a verificar (opcional)
+            excluir_id: ID a excluir de la verificación (para actualizaciones)
+            
+        Returns:
+            Dict con 'ci_duplicado' y 'email_duplicado'
+        """
+        try:
+            query = """
+            SELECT
+                EXISTS(
+                    SELECT 1 FROM public.docentes
+                    WHERE UPPER(BTRIM(ci_numero)) = UPPER(BTRIM(%s))
+                    AND ci_expedicion = %s
+                    AND (%s::INTEGER IS NULL OR id != %s)
+                ),
+                (%s::VARCHAR IS NOT NULL AND EXISTS(
+                    SELECT 1 FROM public.docentes
+                    WHERE email IS NOT NULL
+                    AND LOWER(BTRIM(email)) = LOWER(BTRIM(%s))
+                    AND (%s::INTEGER IS NULL OR id != %s)
+                ))
+            """
+            excluir = excluir_id or None
+            email = email or None
+            params = (ci_numero, ci_expedicion, excluir, excluir, email, email, excluir, excluir)
+            
+            result = Database.execute_query(query, params, fetch_one=True)
+            if result:
+                return {'ci_duplicado': bool(result[0]), 'email_duplicado': bool(result[1])}
+            
+        except Exception as e:
+            logger.error(f"Error verificando unicidad de docente: {e}")
+        
+        return {'ci_duplicado': False, 'email_duplicado': False}
+    
     # ===== MÉTODOS DE ESTADÍSTICAS =====
     
     @staticmethod
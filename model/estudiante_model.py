@@ -1,6 +1,7 @@
 # Archivo: model/estudiante_model.py - VERSIÓN OPTIMIZADA Y REORGANIZADA
 from config.database import Database
 from .base_model import BaseModel
+from .registro import crear_tipo_registro, registros_desde_cursor
 from typing import List, Dict, Optional, Any, Tuple, Union
 from datetime import date
 import logging
@@ -27,6 +28,10 @@ class EstudianteModel(BaseModel):
         'total_programas', 'programas_activos', 'total_pagado', 'total_deuda'
     ]
     
+    # Tipos de registro compactos (acceso tipo diccionario)
+    REGISTRO = crear_tipo_registro('EstudianteRegistro', COLUMNAS_BASICAS)
+    REGISTRO_CON_DETALLES = crear_tipo_registro('EstudianteDetalleRegistro', COLUMNAS_CON_DETALLES)
+    
     # ===== MÉTODOS CRUD BÁSICOS =====
     
     @staticmethod
@@ -311,7 +316,7 @@ class EstudianteModel(BaseModel):
             result = Database.execute_query(query, (estudiante_id,), fetch_one=True)
             
             if result:
-                estudiante = dict(zip(EstudianteModel.COLUMNAS_BASICAS, result))
+                estudiante = EstudianteModel.REGISTRO(result)
                 logger.debug(f"Estudiante encontrado: ID {estudiante_id}")
                 return estudiante
             
@@ -341,7 +346,7 @@ class EstudianteModel(BaseModel):
             result = Database.execute_query(query, params, fetch_one=True)
             
             if result:
-                estudiante = dict(zip(EstudianteModel.COLUMNAS_CON_DETALLES, result))
+                estudiante = EstudianteModel.REGISTRO_CON_DETALLES(result)
                 logger.debug(f"Estudiante con detalles encontrado: ID {estudiante_id}")
                 return estudiante
             
@@ -382,7 +387,7 @@ class EstudianteModel(BaseModel):
             results = Database.execute_query(query, params)
             
             if results:
-                estudiantes = [dict(zip(EstudianteModel.COLUMNAS_BASICAS, row)) for row in results]
+                estudiantes = [EstudianteModel.REGISTRO(row) for row in results]
                 logger.debug(f"Búsqueda encontrada: {len(estudiantes)} estudiantes")
                 return estudiantes
             
@@ -465,7 +470,7 @@ class EstudianteModel(BaseModel):
             results = Database.execute_query(query, tuple(params))
             
             if results:
-                estudiantes = [dict(zip(EstudianteModel.COLUMNAS_BASICAS, row)) for row in results]
+                estudiantes = [EstudianteModel.REGISTRO(row) for row in results]
                 logger.debug(f"Búsqueda completa: {len(estudiantes)} estudiantes")
                 return estudiantes
             
@@ -564,7 +569,7 @@ class EstudianteModel(BaseModel):
             results = Database.execute_query(query, (limit, offset))
             
             if results:
-                return [dict(zip(EstudianteModel.COLUMNAS_BASICAS, row)) for row in results]
+                return [EstudianteModel.REGISTRO(row) for row in results]
             
             return []
             
@@ -747,6 +752,37 @@ class EstudianteModel(BaseModel):
             logger.error(f"Error verificando email: {e}")
             return False
     
+    @staticmethod
+    def verificar_unicidad(ci_numero: Optional[str], ci_expedicion: Optional[str],
+                            email: Optional[str] = None,
+                            excluir_id: Optional[int] = None) -> Dict[str, bool]:
+        """
+        Verificar CI y email duplicados en una sola consulta
+        
+        El CI se compara junto con su expedición, igual que ux_estudiantes_ci_norm.
+        
+        Args:
+            ci_numero: Número de CI a verificar
+            ci_expedicion: Expedición del CI
+            email: Email a verificar (opcional)
+            excluir_id: ID a excluir de la verificación (para actualizaciones)
+            
+        Returns:
+            Dict con 'ci_duplicado' y 'email_duplicado'
+        """
+        try:
+            query = "SELECT * FROM fn_validar_unicidad_estudiante(%s, %s, %s, %s)"
+            params = (ci_numero, ci_expedicion, email or None, excluir_id or None)
+            
+            result = Database.execute_query(query, params, fetch_one=True)
+            if result:
+                return {'ci_duplicado': bool(result[0]), 'email_duplicado': bool(result[1])}
+            
+        except Exception as e:
+            logger.error(f"Error verificando unicidad de estudiante: {e}")
+        
+        return {'ci_duplicado': False, 'email_duplicado': False}
+    
     @staticmethod
     def validar_datos_estudiante(data: Dict[str, Any], excluir_id: Optional[int] = None) -> Dict[str, Any]:
         """
@@ -761,17 +797,20 @@ class EstudianteModel(BaseModel):
         """
         errores = []
         
-        # Validar CI
         ci_numero = data.get('ci_numero')
+        email = data.get('email')
+        
+        # Validar CI y email únicos en una sola consulta
         if not ci_numero:
             errores.append('El número de CI es obligatorio')
-        elif EstudianteModel.verificar_ci_existente(ci_numero, excluir_id):
-            errores.append('El número de CI ya está registrado')
-        
-        # Validar email si se proporciona
-        email = data.get('email')
-        if email and EstudianteModel.verificar_email_existente(email, excluir_id):
-            errores.append('El email ya está registrado')
+        else:
+            unicidad = EstudianteModel.verificar_unicidad(
+                ci_numero, data.get('ci_expedicion'), email, excluir_id
+            )
+            if unicidad['ci_duplicado']:
+                errores.append('El número de CI ya está registrado')
+            if unicidad['email_duplicado']:
+                errores.append('El email ya está registrado')
         
         # Validar nombres y apellidos
         if not data.get('nombres'):
@@ -1214,15 +1253,26 @@ class EstudianteModel(BaseModel):
         return EstudianteModel.obtener_estudiantes_activos()
     
     @staticmethod
-    def obtener_estudiantes_disponibles_programa(programa_id: int) -> Dict[str, Any]:
+    def obtener_estudiantes_disponibles_paginado(programa_id: int, criterios: Optional[str] = None,
+                                                 limite: Optional[int] = 50,
+                                                 despues: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
         """
-        Obtiene estudiantes disponibles para un programa específico
+        Obtiene una página de estudiantes activos no inscritos en un programa
+        
+        Usa fn_estudiantes_disponibles_programa_paginado (anti-join indexado);
+        los criterios se filtran en el servidor y sólo viaja la página pedida.
+        La paginación es por clave: inscribir estudiantes entre una página y
+        otra no hace saltar filas.
         
         Args:
             programa_id: ID del programa
+            criterios: Términos de búsqueda separados por espacios (todos deben coincidir)
+            limite: Tamaño de la página (None para todos)
+            despues: Clave 'siguiente' devuelta por la página anterior (None para la primera)
             
         Returns:
-            Dict con los datos de los estudiantes disponibles
+            Dict con 'data', 'count', 'hay_mas' (si existen más páginas) y
+            'siguiente' (clave para pedir la página siguiente)
         """
         connection = None
         cursor = None
@@ -1233,27 +1283,40 @@ class EstudianteModel(BaseModel):
             
             cursor = connection.cursor()
             
-            # Llamar a la función de la base de datos
-            cursor.execute("SELECT * FROM fn_estudiantes_disponibles_programa(%s)", (programa_id,))
-            estudiantes = cursor.fetchall()
+            # Pedir una fila extra para saber si hay más páginas
+            limite_consulta = limite + 1 if limite else None
+            despues = despues or {}
+            cursor.execute(
+                "SELECT * FROM fn_estudiantes_disponibles_programa_paginado(%s, %s, %s, %s, %s, %s)",
+                (
+                    programa_id, (criterios or '').strip() or None, limite_consulta,
+                    despues.get('apellido_paterno'), despues.get('nombres'), despues.get('estudiante_id')
+                )
+            )
+            filas = cursor.fetchall()
             
-            if cursor.description:
-                column_names = [desc[0] for desc in cursor.description]
-                estudiantes_list = []
-                for estudiante in estudiantes:
-                    estudiantes_list.append(dict(zip(column_names, estudiante)))
-                
-                return {
-                    'success': True,
-                    'data': estudiantes_list,
-                    'count': len(estudiantes_list)
-                }
-            else:
-                return {
-                    'success': True,
-                    'data': [],
-                    'count': 0
+            hay_mas = bool(limite) and len(filas) > limite
+            if hay_mas:
+                filas = filas[:limite]
+            
+            estudiantes_list = registros_desde_cursor(cursor, filas)
+            
+            siguiente = None
+            if estudiantes_list:
+                ultimo = estudiantes_list[-1]
+                siguiente = {
+                    'apellido_paterno': ultimo['apellido_paterno'],
+                    'nombres': ultimo['nombres'],
+                    'estudiante_id': ultimo['estudiante_id']
                 }
+            
+            return {
+                'success': True,
+                'data': estudiantes_list,
+                'count': len(estudiantes_list),
+                'hay_mas': hay_mas,
+                'siguiente': siguiente
+            }
                 
         except Exception as e:
             logger.error(f"Error al obtener estudiantes disponibles para programa {programa_id}: {e}")
@@ -1271,6 +1334,19 @@ class EstudianteModel(BaseModel):
             if connection:
                 Database.return_connection(connection)
     
+    @staticmethod
+    def obtener_estudiantes_disponibles_programa(programa_id: int) -> Dict[str, Any]:
+        """
+        Obtiene estudiantes disponibles para un programa específico
+        
+        Args:
+            programa_id: ID del programa
+            
+        Returns:
+            Dict con los datos de los estudiantes disponibles
+        """
+        return EstudianteModel.obtener_estudiantes_disponibles_paginado(programa_id, limite=None)
+    
     @staticmethod
     def buscar_estudiantes_disponibles_programa_criterios(programa_id: int, criterios: Optional[str] = None) -> Dict[str, Any]:
         """
@@ -1283,59 +1359,4 @@ class EstudianteModel(BaseModel):
         Returns:
             Dict con los datos de los estudiantes encontrados
         """
-        connection = None
-        cursor = None
-        try:
-            connection = Database.get_connection()
-            if not connection:
-                return {'success': False, 'message': 'Error de conexión a la base de datos'}
-            
-            cursor = connection.cursor()
-            
-            # Llamar a la función de búsqueda de la base de datos
-            if criterios and criterios.strip():
-                cursor.execute(
-                    "SELECT * FROM fn_buscar_estudiantes_disponibles_programa_criterios(%s, %s)",
-                    (programa_id, criterios.strip())
-                )
-            else:
-                cursor.execute(
-                    "SELECT * FROM fn_estudiantes_disponibles_programa(%s)",
-                    (programa_id,)
-                )
-            
-            estudiantes = cursor.fetchall()
-            
-            if cursor.description:
-                column_names = [desc[0] for desc in cursor.description]
-                estudiantes_list = []
-                for estudiante in estudiantes:
-                    estudiantes_list.append(dict(zip(column_names, estudiante)))
-                
-                return {
-                    'success': True,
-                    'data': estudiantes_list,
-                    'count': len(estudiantes_list)
-                }
-            else:
-                return {
-                    'success': True,
-                    'data': [],
-                    'count': 0
-                }
-                
-        except Exception as e:
-            logger.error(f"Error al buscar estudiantes para programa {programa_id}: {e}")
-            return {
-                'success': False,
-                'message': f'Error al buscar estudiantes: {str(e)}'
-            }
-        finally:
-            try:
-                if cursor:
-                    cursor.close()
-            except:
-                pass
-            
-            if connection:
-                Database.return_connection(connection)
\ No newline at end of file
+        return EstudianteModel.obtener_estudiantes_disponibles_paginado(programa_id, criterios, limite=None)
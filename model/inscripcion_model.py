@@ -6,8 +6,9 @@ Siguiendo el patrón establecido en usuarios_model.py
 import logging
 import json
 from typing import Dict, List, Optional, Any, Tuple, Union
-from datetime import date, datetime
+from datetime import date, datetime, timedelta
 from config.database import Database
+from model.programa_model import ProgramaModel
 
 logger = logging.getLogger(__name__)
 
@@ -68,6 +69,41 @@ class InscripcionModel:
             if connection:
                 Database.return_connection(connection)
     
+    @staticmethod
+    def reservar_cupos(cursor, programa_id: int, cantidad: int = 1,
+                       estados_permitidos: Optional[List[str]] = None) -> Dict[str, Any]:
+        """
+        Reservar cupos de un programa dentro de la transacción del cursor recibido
+
+        La reserva (fn_reservar_cupos) es un UPDATE condicional sobre
+        programas.cupos_inscritos: nunca supera cupos_maximos aunque varias
+        estaciones inscriban a la vez, y bloquea la fila del programa hasta el
+        commit. Si la transacción se revierte, la reserva se revierte con ella.
+
+        Args:
+            cursor: Cursor de la transacción de inscripción (no se confirma aquí)
+            programa_id: ID del programa
+            cantidad: Cupos a reservar
+            estados_permitidos: Estados del programa que admiten la reserva
+                (por defecto INSCRIPCIONES y EN_CURSO)
+
+        Returns:
+            Dict con 'reservado', 'cupos_disponibles' y 'mensaje'
+        """
+        if estados_permitidos is None:
+            cursor.execute("SELECT * FROM fn_reservar_cupos(%s, %s)", (programa_id, cantidad))
+        else:
+            cursor.execute(
+                "SELECT * FROM fn_reservar_cupos(%s, %s, %s::TEXT[])",
+                (programa_id, cantidad, list(estados_permitidos))
+            )
+        reservado, cupos_disponibles, mensaje = cursor.fetchone()
+        return {
+            'reservado': bool(reservado),
+            'cupos_disponibles': cupos_disponibles,
+            'mensaje': mensaje
+        }
+    
     @staticmethod
     def crear_inscripcion(
         estudiante_id: int,
@@ -123,6 +159,7 @@ class InscripcionModel:
             result = cursor.fetchone()[0] # type: ignore
 
             connection.commit()
+            ProgramaModel.invalidar_expediente(programa_id)
 
             if isinstance(result, str):
                 return json.loads(result)
@@ -193,6 +230,7 @@ class InscripcionModel:
             result = cursor.fetchone()[0] # type: ignore
             
             connection.commit()
+            ProgramaModel.invalidar_expediente(programa_id)
             
             if isinstance(result, str):
                 return json.loads(result)
@@ -216,6 +254,231 @@ class InscripcionModel:
             if connection:
                 Database.return_connection(connection)
     
+    @staticmethod
+    def inscribir_en_lote(
+        programa_id: int,
+        estudiante_ids: List[int],
+        valor_final: Optional[float] = None,
+        observaciones: Optional[str] = None,
+        fecha_inscripcion: Union[str, date, None] = None,
+        usuario_id: Optional[int] = None,
+        crear_transaccion_inicial: bool = True
+    ) -> Dict[str, Any]:
+        """
+        Inscribe a varios estudiantes en un programa dentro de una sola transacción
+
+        Los cupos se reservan una sola vez para todo el grupo y las inscripciones
+        y sus transacciones iniciales se insertan con una sentencia cada una.
+        Los estudiantes inexistentes o ya inscritos se omiten sin detener el
+        resto; si no hay cupos para todos los demás no se inscribe a ninguno.
+
+        Args:
+            programa_id: ID del programa
+            estudiante_ids: IDs de los estudiantes (los repetidos se ignoran)
+            valor_final: Valor final para todos (por defecto el costo total del programa)
+            observaciones: Observaciones de las inscripciones
+            fecha_inscripcion: Fecha de inscripción (por defecto CURRENT_DATE)
+            usuario_id: Usuario que registra las transacciones iniciales
+            crear_transaccion_inicial: Registrar la transacción inicial de cada inscripción
+
+        Returns:
+            Dict con 'success', 'message', 'inscritos', 'omitidos' y 'resultados'
+            (uno por estudiante, en el orden recibido: estudiante_id, exito,
+            mensaje, inscripcion_id y numero_transaccion)
+        """
+        ids = list(dict.fromkeys(int(e) for e in estudiante_ids or [] if e not in (None, '', 'None')))
+        if not ids:
+            return {
+                'success': False,
+                'message': 'No se indicaron estudiantes para inscribir',
+                'inscritos': 0,
+                'omitidos': 0,
+                'resultados': []
+            }
+
+        resultados = {
+            eid: {
+                'estudiante_id': eid,
+                'exito': False,
+                'mensaje': '',
+                'inscripcion_id': None,
+                'numero_transaccion': None
+            }
+            for eid in ids
+        }
+
+        def _respuesta(success: bool, message: str) -> Dict[str, Any]:
+            inscritos = sum(1 for r in resultados.values() if r['exito'])
+            return {
+                'success': success,
+                'message': message,
+                'inscritos': inscritos,
+                'omitidos': len(ids) - inscritos,
+                'resultados': [resultados[eid] for eid in ids]
+            }
+
+        if isinstance(fecha_inscripcion, (datetime, date)):
+            fecha_inscripcion = fecha_inscripcion.strftime('%Y-%m-%d')
+
+        connection = None
+        cursor = None
+        try:
+            from psycopg2.extras import execute_values
+            from model.transaccion_model import TransaccionModel
+
+            connection = Database.get_connection()
+            if not connection:
+                raise Exception("No se pudo obtener conexión a la base de datos")
+
+            cursor = connection.cursor()
+
+            # 1. Programa y valor final común
+            cursor.execute(
+                "SELECT costo_total, codigo, nombre FROM programas WHERE id = %s",
+                (programa_id,)
+            )
+            programa = cursor.fetchone()
+            if not programa:
+                for r in resultados.values():
+                    r['mensaje'] = 'Programa no encontrado'
+                return _respuesta(False, 'Programa no encontrado')
+
+            costo_total = float(programa[0] or 0)
+            nombre_programa = f"{programa[1]} - {programa[2]}"
+            monto = costo_total if valor_final is None else float(valor_final)
+
+            if monto <= 0 or monto > costo_total:
+                mensaje = f'El valor final ({monto:.2f}) debe ser mayor a 0 y no superar el costo total ({costo_total:.2f})'
+                for r in resultados.values():
+                    r['mensaje'] = mensaje
+                return _respuesta(False, mensaje)
+
+            # 2. Estudiantes existentes y ya inscritos, en una consulta
+            cursor.execute("""
+                SELECT e.id, e.nombres, e.apellido_paterno, e.apellido_materno, i.id
+                FROM estudiantes e
+                LEFT JOIN inscripciones i
+                    ON i.estudiante_id = e.id
+                   AND i.programa_id = %s
+                WHERE e.id = ANY(%s)
+            """, (programa_id, ids))
+
+            nombres = {}
+            for eid, nombre, apellido_p, apellido_m, inscripcion_existente in cursor.fetchall():
+                if inscripcion_existente:
+                    resultados[eid]['mensaje'] = 'El estudiante ya está inscrito en este programa'
+                    resultados[eid]['inscripcion_id'] = inscripcion_existente
+                else:
+                    nombres[eid] = f"{nombre or ''} {apellido_p or ''} {apellido_m or ''}".strip()
+
+            candidatos = [eid for eid in ids if eid in nombres]
+            for eid in ids:
+                if not resultados[eid]['mensaje'] and eid not in nombres:
+                    resultados[eid]['mensaje'] = f'Estudiante con ID {eid} no encontrado'
+
+            if not candidatos:
+                return _respuesta(False, 'Ningún estudiante de la lista puede inscribirse')
+
+            # 3. Reservar los cupos de todo el grupo de una vez
+            reserva = InscripcionModel.reservar_cupos(cursor, programa_id, len(candidatos))
+            if not reserva['reservado']:
+                connection.rollback()
+                for eid in candidatos:
+                    resultados[eid]['mensaje'] = reserva['mensaje']
+                return _respuesta(False, reserva['mensaje'])
+
+            # 4. Insertar las inscripciones; una inscripción concurrente del mismo
+            # estudiante no aborta el lote, sólo se omite y se libera su cupo
+            insertadas = execute_values(
+                cursor,
+                """
+                INSERT INTO inscripciones (
+                    estudiante_id, programa_id, fecha_inscripcion,
+                    valor_final, observaciones, estado
+                )
+                VALUES %s
+                ON CONFLICT ON CONSTRAINT uk_inscripcion_unica DO NOTHING
+                RETURNING id, estudiante_id
+                """,
+                [(eid, programa_id, fecha_inscripcion, monto, observaciones) for eid in candidatos],
+                template="(%s, %s, COALESCE(%s::DATE, CURRENT_DATE), %s, %s, 'PREINSCRITO')",
+                page_size=len(candidatos),
+                fetch=True
+            )
+
+            inscripciones = {eid: iid for iid, eid in insertadas}
+            for eid in candidatos:
+                if eid in inscripciones:
+                    resultados[eid]['exito'] = True
+                    resultados[eid]['inscripcion_id'] = inscripciones[eid]
+                    resultados[eid]['mensaje'] = 'Inscripción creada exitosamente'
+                else:
+                    resultados[eid]['mensaje'] = 'El estudiante ya está inscrito en este programa'
+
+            sobrantes = len(candidatos) - len(inscripciones)
+            if sobrantes:
+                cursor.execute("SELECT fn_liberar_cupos(%s, %s)", (programa_id, sobrantes))
+
+            # 5. Transacciones iniciales (el número lo asigna el trigger)
+            if crear_transaccion_inicial and inscripciones:
+                fecha_pago = date.today()
+                transacciones = execute_values(
+                    cursor,
+                    """
+                    INSERT INTO transacciones (
+                        estudiante_id, programa_id, fecha_pago,
+                        monto_total, descuento_total, monto_final,
+                        forma_pago, estado, observaciones, registrado_por
+                    )
+                    VALUES %s
+                    RETURNING estudiante_id, numero_transaccion
+                    """,
+                    [
+                        (
+                            eid, programa_id, fecha_pago,
+                            TransaccionModel.observaciones_transaccion_inicial(
+                                iid, nombres[eid] or f"Estudiante ID: {eid}", nombre_programa, monto
+                            ),
+                            usuario_id
+                        )
+                        for eid, iid in inscripciones.items()
+                    ],
+                    template="(%s, %s, %s, 0, 0, 0, 'EFECTIVO', 'REGISTRADO', %s, %s)",
+                    page_size=len(inscripciones),
+                    fetch=True
+                )
+                for eid, numero in transacciones:
+                    resultados[eid]['numero_transaccion'] = numero
+
+            connection.commit()
+            ProgramaModel.invalidar_expediente(programa_id)
+
+            mensaje = f"{len(inscripciones)} de {len(ids)} estudiantes inscritos"
+            logger.info(f"✅ Inscripción en lote en programa {programa_id}: {mensaje}")
+            return _respuesta(bool(inscripciones), mensaje)
+
+        except Exception as e:
+            logger.error(f"Error en inscripción en lote: {e}")
+            import traceback
+            logger.error(traceback.format_exc())
+            if connection:
+                connection.rollback()
+            # El rollback deshace todo el lote, incluidas las filas ya marcadas
+            for r in resultados.values():
+                if r['exito'] or not r['mensaje']:
+                    r.update(exito=False, inscripcion_id=None, numero_transaccion=None,
+                             mensaje=f'Error en inscripción en lote: {str(e)}')
+            return _respuesta(False, f'Error en inscripción en lote: {str(e)}')
+        finally:
+            try:
+                if cursor:
+                    cursor.close()
+            except:
+                pass
+            
+            if connection:
+                Database.return_connection(connection)
+    
     @staticmethod
     def registrar_pago_inscripcion(
         inscripcion_id: int,
@@ -274,6 +537,7 @@ class InscripcionModel:
             result = cursor.fetchone()[0] # type: ignore
             
             connection.commit()
+            ProgramaModel.invalidar_expediente()
             
             if isinstance(result, str):
                 return json.loads(result)
@@ -361,6 +625,7 @@ class InscripcionModel:
             result = cursor.fetchone()[0] # type: ignore
             
             connection.commit()
+            ProgramaModel.invalidar_expediente()
             
             if isinstance(result, str):
                 return json.loads(result)
@@ -537,10 +802,191 @@ class InscripcionModel:
             if connection:
                 Database.return_connection(connection)
     
+    # ===== REPORTE DE INSCRIPCIONES POR PERIODO =====
+
+    # Filtros comunes del reporte (parámetros con nombre)
+    _FILTROS_REPORTE = """
+        WHERE i.fecha_inscripcion BETWEEN %(desde)s AND %(hasta)s
+          AND (%(programa_id)s::INTEGER IS NULL OR i.programa_id = %(programa_id)s)
+          AND (%(estado)s::TEXT IS NULL OR i.estado::TEXT = %(estado)s)
+    """
+
+    @staticmethod
+    def resumen_inscripciones_periodo(
+        fecha_desde: date,
+        fecha_hasta: date,
+        programa_id: Optional[int] = None,
+        estado: Optional[str] = None
+    ) -> Dict[str, Any]:
+        """
+        Totales, distribución por estado y agregados por programa de un periodo
+        en una sola consulta (GROUPING SETS), sin traer las inscripciones
+
+        Los montos salen de las columnas precalculadas total_pagado y
+        saldo_pendiente, igual que fn_obtener_inscripciones.
+
+        Args:
+            fecha_desde: Primer día del periodo (fecha de inscripción)
+            fecha_hasta: Último día del periodo
+            programa_id: Filtrar por programa (opcional)
+            estado: Filtrar por estado de la inscripción (opcional)
+
+        Returns:
+            Dict con 'total', 'recaudado', 'saldo_pendiente', 'por_estado'
+            {estado: cantidad} y 'por_programa' {"CODIGO - Nombre": {count, recaudado, saldo}}
+        """
+        query = f"""
+            SELECT
+                GROUPING(i.estado) AS sin_estado,
+                GROUPING(p.id) AS sin_programa,
+                i.estado::TEXT AS estado,
+                p.codigo AS programa_codigo,
+                p.nombre AS programa_nombre,
+                COUNT(*) AS cantidad,
+                COALESCE(SUM(i.total_pagado), 0) AS recaudado,
+                COALESCE(SUM(i.saldo_pendiente), 0) AS saldo
+            FROM inscripciones i
+            JOIN programas p ON p.id = i.programa_id
+            {InscripcionModel._FILTROS_REPORTE}
+            GROUP BY GROUPING SETS ((), (i.estado), (p.id, p.codigo, p.nombre))
+        """
+        params = {
+            'desde': fecha_desde,
+            'hasta': fecha_hasta,
+            'programa_id': programa_id,
+            'estado': estado
+        }
+
+        resumen = {
+            'total': 0,
+            'recaudado': 0.0,
+            'saldo_pendiente': 0.0,
+            'por_estado': {},
+            'por_programa': {}
+        }
+
+        with Database.get_cursor() as cursor:
+            cursor.execute(query, params)
+            filas = cursor.fetchall()
+
+        for (sin_estado, sin_programa, estado_fila, codigo, nombre,
+             cantidad, recaudado, saldo) in filas:
+            if sin_estado and sin_programa:
+                # Total general (siempre presente, aun sin inscripciones)
+                resumen['total'] = int(cantidad)
+                resumen['recaudado'] = float(recaudado)
+                resumen['saldo_pendiente'] = float(saldo)
+            elif sin_programa:
+                resumen['por_estado'][estado_fila] = int(cantidad)
+            else:
+                resumen['por_programa'][f"{codigo} - {nombre}"] = {
+                    'count': int(cantidad),
+                    'recaudado': float(recaudado),
+                    'saldo': float(saldo)
+                }
+
+        return resumen
+
+    @staticmethod
+    def iterar_inscripciones_periodo(
+        fecha_desde: date,
+        fecha_hasta: date,
+        programa_id: Optional[int] = None,
+        estado: Optional[str] = None,
+        tamano_lote: int = 500
+    ):
+        """
+        Recorrer las inscripciones de un periodo por lotes desde un cursor del
+        servidor, sin cargar el periodo completo en memoria
+
+        La conexión se devuelve al pool cuando el generador se agota o se
+        cierra (close() o fin del bloque for).
+
+        Args:
+            fecha_desde: Primer día del periodo (fecha de inscripción)
+            fecha_hasta: Último día del periodo
+            programa_id: Filtrar por programa (opcional)
+            estado: Filtrar por estado de la inscripción (opcional)
+            tamano_lote: Filas traídas del servidor por viaje
+
+        Yields:
+            Dict por inscripción con las mismas claves que obtener_inscripciones
+        """
+        query = f"""
+            SELECT
+                i.id,
+                e.id,
+                CONCAT(e.nombres, ' ', e.apellido_paterno, ' ', COALESCE(e.apellido_materno, '')),
+                e.ci_numero,
+                p.id,
+                p.nombre,
+                p.codigo,
+                i.fecha_inscripcion,
+                i.estado::TEXT,
+                COALESCE(i.valor_final, p.costo_total),
+                COALESCE(p.cupos_maximos - p.cupos_inscritos, 0),
+                i.total_pagado,
+                i.saldo_pendiente
+            FROM inscripciones i
+            JOIN estudiantes e ON i.estudiante_id = e.id
+            JOIN programas p ON i.programa_id = p.id
+            {InscripcionModel._FILTROS_REPORTE}
+            ORDER BY i.fecha_inscripcion DESC, e.apellido_paterno, e.nombres
+        """
+        params = {
+            'desde': fecha_desde,
+            'hasta': fecha_hasta,
+            'programa_id': programa_id,
+            'estado': estado
+        }
+        columns = [
+            'inscripcion_id', 'estudiante_id', 'estudiante_nombre',
+            'estudiante_ci', 'programa_id', 'programa_nombre',
+            'programa_codigo', 'fecha_inscripcion', 'estado',
+            'valor_final', 'cupos_disponibles',
+            'pagos_realizados', 'saldo_pendiente'
+        ]
+
+        connection = Database.get_connection()
+        if not connection:
+            raise Exception("No se pudo obtener conexión a la base de datos")
+
+        cursor = None
+        try:
+            # Cursor con nombre: las filas quedan en el servidor y se traen por lotes
+            cursor = connection.cursor(name='reporte_inscripciones_periodo')
+            cursor.itersize = tamano_lote
+            cursor.execute(query, params)
+
+            while True:
+                filas = cursor.fetchmany(tamano_lote)
+                if not filas:
+                    break
+
+                for fila in filas:
+                    inscripcion = dict(zip(columns, fila))
+                    inscripcion['valor_final'] = float(inscripcion['valor_final'] or 0)
+                    inscripcion['pagos_realizados'] = float(inscripcion['pagos_realizados'] or 0)
+                    inscripcion['saldo_pendiente'] = float(inscripcion['saldo_pendiente'] or 0)
+                    yield inscripcion
+        finally:
+            if cursor:
+                try:
+                    cursor.close()
+                except Exception:
+                    pass
+            # Sólo lectura: terminar la transacción del cursor con nombre
+            try:
+                connection.rollback()
+            except Exception:
+                pass
+            Database.return_connection(connection)
+
     @staticmethod
     def obtener_inscripciones_por_estudiante(estudiante_id: int) -> List[Dict[str, Any]]:
         """
-        Obtiene todas las inscripciones de un estudiante
+        Obtiene todas las inscripciones de un estudiante, incluidas las de
+        programas archivados (vistas vw_*_historico)
         
         Args:
             estudiante_id: ID del estudiante
@@ -568,13 +1014,14 @@ class InscripcionModel:
                 p.costo_total,
                 COALESCE(SUM(t.monto_final), 0) as pagado,
                 (p.costo_total - COALESCE(SUM(t.monto_final), 0)) - COALESCE(i.valor_final, 0) as saldo
-            FROM inscripciones i
-            JOIN programas p ON i.programa_id = p.id
-            LEFT JOIN transacciones t ON i.estudiante_id = t.estudiante_id 
+            FROM vw_inscripciones_historico i
+            JOIN vw_programas_historico p ON i.programa_id = p.id
+            LEFT JOIN vw_transacciones_historico t ON i.estudiante_id = t.estudiante_id 
                 AND i.programa_id = t.programa_id
                 AND t.estado = 'CONFIRMADO'
             WHERE i.estudiante_id = %s
-            GROUP BY i.id, p.id
+            GROUP BY i.id, i.fecha_inscripcion, i.estado, i.valor_final,
+                     p.codigo, p.nombre, p.costo_total
             ORDER BY i.fecha_inscripcion DESC
             """
             
@@ -790,65 +1237,410 @@ class InscripcionModel:
             return []
     
     @staticmethod
-    def obtener_saldo_pendiente_inscripcion(inscripcion_id: int) -> Dict[str, Any]:
+    def saldos_por_inscripciones(inscripcion_ids: List[int]) -> Dict[int, Dict[str, Any]]:
         """
-        Obtener el saldo pendiente de una inscripción basado en valor_final
-        
+        Obtener pagado, saldo y descuento de varias inscripciones en una sola consulta
+
+        Pagado, saldo y último pago se leen de las columnas precalculadas de
+        inscripciones (sólo transacciones CONFIRMADAS, mantenidas por triggers);
+        sólo la cantidad de transacciones confirmadas se cuenta aquí.
+
         Args:
-            inscripcion_id: ID de la inscripción
-            
+            inscripcion_ids: IDs de las inscripciones
+
         Returns:
-            Dict con saldo_pendiente, monto_total y total_pagado
+            Dict {inscripcion_id: {...}} con total_pagado, saldo_pendiente,
+            valor_final, costo_total, descuento, descuento_implicito (%),
+            cantidad_transacciones y ultimo_pago. Las inscripciones que no
+            existen no aparecen en el resultado.
         """
-        try:
-            from config.database import Database
-            connection = Database.get_connection()
-            if not connection:
-                return {
-                    'exito': False,
-                    'error': 'No hay conexión a la base de datos',
-                    'saldo_pendiente': 0.0,
-                    'monto_total': 0.0,
-                    'total_pagado': 0.0
-                }
-            
-            cursor = connection.cursor()
-            
-            # Verificar el esquema de la tabla transacciones
-            cursor.execute("""
-                SELECT column_name 
-                FROM information_schema.columns 
-                WHERE table_name = 'transacciones' 
-                AND column_name IN ('inscripcion_id', 'estudiante_id', 'programa_id')
-            """)
-            columnas_transacciones = [row[0] for row in cursor.fetchall()]
-            
-            logger.debug(f"Columnas disponibles en transacciones: {columnas_transacciones}")
-            
-            # Obtener información básica de la inscripción con valor_final
-            query_inscripcion = """
-            SELECT 
+        ids = sorted({int(i) for i in inscripcion_ids or [] if i not in (None, '', 'None')})
+        if not ids:
+            return {}
+
+        query = """
+            WITH insc AS (
+                SELECT
+                    i.id,
+                    i.estudiante_id,
+                    i.programa_id,
+                    p.costo_total,
+                    COALESCE(i.valor_final, p.costo_total) AS valor_final,
+                    i.total_pagado,
+                    i.saldo_pendiente,
+                    i.ultimo_pago,
+                    p.codigo AS programa_codigo,
+                    p.nombre AS programa_nombre,
+                    e.nombres,
+                    e.apellido_paterno,
+                    e.apellido_materno
+                FROM inscripciones i
+                JOIN programas p ON i.programa_id = p.id
+                JOIN estudiantes e ON i.estudiante_id = e.id
+                WHERE i.id = ANY(%s)
+            ),
+            pagos AS (
+                SELECT
+                    t.estudiante_id,
+                    t.programa_id,
+                    COUNT(t.id) AS cantidad_transacciones
+                FROM transacciones t
+                JOIN (SELECT DISTINCT estudiante_id, programa_id FROM insc) k
+                    ON k.estudiante_id = t.estudiante_id
+                   AND k.programa_id = t.programa_id
+                WHERE t.estado = 'CONFIRMADO'
+                GROUP BY t.estudiante_id, t.programa_id
+            )
+            SELECT
+                insc.*,
+                COALESCE(pagos.cantidad_transacciones, 0) AS cantidad_transacciones
+            FROM insc
+            LEFT JOIN pagos
+                ON pagos.estudiante_id = insc.estudiante_id
+               AND pagos.programa_id = insc.programa_id
+        """
+
+        saldos = {}
+        with Database.get_cursor() as cursor:
+            cursor.execute(query, (ids,))
+            columnas = [desc[0] for desc in cursor.description]
+            for fila in cursor.fetchall():
+                registro = dict(zip(columnas, fila))
+                saldos[registro['id']] = InscripcionModel._construir_saldo(registro)
+
+        logger.debug(f"Saldos calculados para {len(saldos)} de {len(ids)} inscripciones")
+        return saldos
+
+    @staticmethod
+    def _construir_saldo(registro: Dict[str, Any]) -> Dict[str, Any]:
+        """Armar el dict de saldo de una inscripción a partir de una fila con sus saldos precalculados"""
+        costo_total = float(registro['costo_total'] or 0)
+        valor_final = float(registro['valor_final'] or costo_total)
+        total_pagado = float(registro['total_pagado'] or 0)
+        descuento = max(0.0, costo_total - valor_final)
+
+        return {
+            'inscripcion_id': registro['id'],
+            'estudiante_id': registro['estudiante_id'],
+            'programa_id': registro['programa_id'],
+            'costo_total': costo_total,
+            'valor_final': valor_final,
+            'descuento': descuento,
+            'descuento_implicito': (descuento / costo_total * 100) if costo_total > 0 else 0.0,
+            'total_pagado': total_pagado,
+            'saldo_pendiente': float(registro['saldo_pendiente'] or 0),
+            'cantidad_transacciones': int(registro['cantidad_transacciones'] or 0),
+            'ultimo_pago': registro['ultimo_pago'],
+            'programa': {
+                'codigo': registro['programa_codigo'],
+                'nombre': registro['programa_nombre']
+            },
+            'estudiante': {
+                'nombres': registro['nombres'],
+                'apellido_paterno': registro['apellido_paterno'],
+                'apellido_materno': registro['apellido_materno']
+            }
+        }
+
+    @staticmethod
+    def obtener_inscripciones_con_pagos(
+        estudiante_id: Optional[int] = None,
+        programa_id: Optional[int] = None
+    ) -> List[Dict[str, Any]]:
+        """
+        Obtener inscripciones con sus transacciones y saldo en una sola consulta
+
+        Las transacciones de cada inscripción llegan agregadas como arreglo JSON
+        (mismo orden que TransaccionModel.obtener_por_inscripcion) y el saldo se
+        lee de las columnas precalculadas, como en saldos_por_inscripciones.
+        Se excluyen las inscripciones RETIRADAS.
+
+        Args:
+            estudiante_id: Filtrar por estudiante (opcional)
+            programa_id: Filtrar por programa (opcional)
+
+        Returns:
+            Lista de inscripciones; cada una incluye 'transacciones' (lista de
+            dicts) y 'saldo' (dict como el de saldos_por_inscripciones)
+        """
+        if estudiante_id is None and programa_id is None:
+            return []
+
+        query = """
+            SELECT
+                i.id,
                 i.estudiante_id,
                 i.programa_id,
-                p.costo_total,
-                i.valor_final,  -- Cambiado
-                p.codigo,
-                p.nombre,
+                i.fecha_inscripcion,
+                i.estado,
+                COALESCE(i.valor_final, p.costo_total) AS valor_final,
+                i.observaciones,
+                CONCAT(e.apellido_paterno, ' ', e.apellido_materno, ' ', e.nombres) AS estudiante_nombre,
                 e.nombres,
                 e.apellido_paterno,
-                e.apellido_materno
+                e.apellido_materno,
+                e.ci_numero,
+                e.ci_expedicion,
+                p.codigo AS programa_codigo,
+                p.nombre AS programa_nombre,
+                p.costo_total,
+                p.costo_matricula,
+                p.costo_inscripcion,
+                p.costo_mensualidad,
+                p.numero_cuotas,
+                COALESCE(pagos.transacciones, '[]'::JSON) AS transacciones,
+                i.total_pagado,
+                i.saldo_pendiente,
+                COALESCE(pagos.cantidad_transacciones, 0) AS cantidad_transacciones,
+                i.ultimo_pago
             FROM inscripciones i
-            JOIN programas p ON i.programa_id = p.id
             JOIN estudiantes e ON i.estudiante_id = e.id
-            WHERE i.id = %s
-            """
-            
-            cursor.execute(query_inscripcion, (inscripcion_id,))
-            resultado_insc = cursor.fetchone()
+            JOIN programas p ON i.programa_id = p.id
+            LEFT JOIN LATERAL (
+                SELECT
+                    JSON_AGG(
+                        JSON_BUILD_OBJECT(
+                            'id', t.id,
+                            'numero_transaccion', t.numero_transaccion,
+                            'fecha_pago', t.fecha_pago,
+                            'monto_total', t.monto_total,
+                            'descuento_total', t.descuento_total,
+                            'monto_final', t.monto_final,
+                            'forma_pago', t.forma_pago,
+                            'estado', t.estado,
+                            'numero_comprobante', t.numero_comprobante
+                        )
+                        ORDER BY t.numero_transaccion DESC, t.fecha_pago DESC, t.fecha_registro DESC
+                    ) AS transacciones,
+                    COUNT(t.id) FILTER (WHERE t.estado = 'CONFIRMADO') AS cantidad_transacciones
+                FROM transacciones t
+                WHERE t.estudiante_id = i.estudiante_id
+                  AND t.programa_id = i.programa_id
+            ) pagos ON TRUE
+            WHERE (%(estudiante_id)s::INTEGER IS NULL OR i.estudiante_id = %(estudiante_id)s)
+              AND (%(programa_id)s::INTEGER IS NULL OR i.programa_id = %(programa_id)s)
+              AND i.estado != 'RETIRADO'
+            ORDER BY i.fecha_inscripcion DESC, i.id DESC
+        """
+
+        inscripciones = []
+        with Database.get_cursor() as cursor:
+            cursor.execute(query, {'estudiante_id': estudiante_id, 'programa_id': programa_id})
+            columnas = [desc[0] for desc in cursor.description]
+            for fila in cursor.fetchall():
+                registro = dict(zip(columnas, fila))
+                transacciones = registro.pop('transacciones') or []
+                if isinstance(transacciones, str):
+                    transacciones = json.loads(transacciones)
+                registro['saldo'] = InscripcionModel._construir_saldo(registro)
+                registro['transacciones'] = transacciones
+                for campo in ('total_pagado', 'saldo_pendiente', 'cantidad_transacciones', 'ultimo_pago',
+                              'nombres', 'apellido_paterno', 'apellido_materno'):
+                    registro.pop(campo, None)
+                inscripciones.append(registro)
+
+        logger.debug(f"Inscripciones con pagos obtenidas: {len(inscripciones)}")
+        return inscripciones
+
+    @staticmethod
+    def verificar_saldos_precalculados(corregir: bool = False) -> Dict[str, Any]:
+        """
+        Comparar total_pagado / saldo_pendiente / ultimo_pago de inscripciones
+        con lo que resulta de sumar las transacciones confirmadas
+
+        Args:
+            corregir: Si es True, las inscripciones desviadas se corrigen
+
+        Returns:
+            Dict con 'exito', 'desviaciones' (lista) y 'corregidas'
+        """
+        try:
+            with Database.get_cursor() as cursor:
+                cursor.execute("SELECT * FROM fn_verificar_saldos_inscripciones(%s)", (corregir,))
+                columnas = [desc[0] for desc in cursor.description]
+                desviaciones = [dict(zip(columnas, fila)) for fila in cursor.fetchall()]
+
+            corregidas = sum(1 for d in desviaciones if d['corregido'])
+            if desviaciones:
+                logger.warning(
+                    f"⚠️ {len(desviaciones)} inscripciones con saldo precalculado desviado "
+                    f"(corregidas: {corregidas}); ej. IDs {[d['inscripcion_id'] for d in desviaciones[:10]]}"
+                )
+            else:
+                logger.debug("✅ Saldos precalculados de inscripciones consistentes")
+
+            return {
+                'exito': True,
+                'desviaciones': desviaciones,
+                'corregidas': corregidas
+            }
+
+        except Exception as e:
+            logger.error(f"Error verificando saldos precalculados: {e}")
+            return {'exito': False, 'error': str(e), 'desviaciones': [], 'corregidas': 0}
+
+    # ===== CRONOGRAMA DE CUOTAS (tabla cuotas_inscripcion) =====
+
+    @staticmethod
+    def _consultar_cuotas(condicion: str, params: Tuple, orden: str,
+                            limite: Optional[int] = None) -> List[Dict[str, Any]]:
+        """
+        Leer cuotas de inscripciones vigentes con datos de estudiante y programa
+
+        Args:
+            condicion: Condición SQL adicional sobre la cuota (alias c)
+            params: Parámetros de la condición
+            orden: Cláusula ORDER BY
+            limite: Máximo de filas (None = sin límite)
+        """
+        query = f"""
+            SELECT
+                c.id AS cuota_id,
+                c.inscripcion_id,
+                c.numero_cuota,
+                c.concepto,
+                c.fecha_vencimiento,
+                c.monto,
+                c.monto_pagado,
+                c.saldo,
+                CASE
+                    WHEN c.saldo <= 0 THEN 'PAGADA'
+                    WHEN c.fecha_vencimiento < CURRENT_DATE THEN 'VENCIDA'
+                    ELSE 'PENDIENTE'
+                END AS estado,
+                i.estudiante_id,
+                i.programa_id,
+                CONCAT(e.apellido_paterno, ' ', e.nombres) AS estudiante,
+                p.codigo AS programa_codigo,
+                p.nombre AS programa_nombre
+            FROM cuotas_inscripcion c
+            JOIN inscripciones i ON i.id = c.inscripcion_id
+            JOIN estudiantes e ON e.id = i.estudiante_id
+            JOIN programas p ON p.id = i.programa_id
+            WHERE i.estado <> 'RETIRADO'
+              AND {condicion}
+            ORDER BY {orden}
+        """
+        if limite:
+            query += " LIMIT %s"
+            params = tuple(params) + (int(limite),)
+
+        with Database.get_cursor() as cursor:
+            cursor.execute(query, params)
+            columnas = [desc[0] for desc in cursor.description]
+            cuotas = [dict(zip(columnas, fila)) for fila in cursor.fetchall()]
+
+        for cuota in cuotas:
+            for campo in ('monto', 'monto_pagado', 'saldo'):
+                cuota[campo] = float(cuota[campo] or 0)
+        return cuotas
+
+    @staticmethod
+    def obtener_cuotas_inscripcion(inscripcion_id: int) -> List[Dict[str, Any]]:
+        """
+        Obtener el cronograma completo de cuotas de una inscripción
+
+        Args:
+            inscripcion_id: ID de la inscripción
+
+        Returns:
+            Lista de cuotas ordenadas por número (monto, monto_pagado, saldo, estado)
+        """
+        try:
+            return InscripcionModel._consultar_cuotas(
+                "c.inscripcion_id = %s", (inscripcion_id,), "c.numero_cuota"
+            )
+        except Exception as e:
+            logger.error(f"Error obteniendo cuotas de inscripción {inscripcion_id}: {e}")
+            return []
+
+    @staticmethod
+    def obtener_proxima_cuota(inscripcion_id: int) -> Optional[Dict[str, Any]]:
+        """
+        Obtener la primera cuota con saldo de una inscripción
+
+        Args:
+            inscripcion_id: ID de la inscripción
+
+        Returns:
+            Dict con la cuota o None si la inscripción no tiene cuotas pendientes
+        """
+        try:
+            cuotas = InscripcionModel._consultar_cuotas(
+                "c.inscripcion_id = %s AND c.monto_pagado < c.monto",
+                (inscripcion_id,), "c.numero_cuota", limite=1
+            )
+            return cuotas[0] if cuotas else None
+        except Exception as e:
+            logger.error(f"Error obteniendo próxima cuota de inscripción {inscripcion_id}: {e}")
+            return None
+
+    @staticmethod
+    def obtener_cuotas_vencidas(fecha_corte: Optional[date] = None,
+                                limite: Optional[int] = None) -> List[Dict[str, Any]]:
+        """
+        Obtener cuotas con saldo vencidas antes de una fecha
+
+        Usa el índice parcial de cuotas pendientes por fecha_vencimiento.
+
+        Args:
+            fecha_corte: Fecha de referencia (por defecto hoy)
+            limite: Máximo de cuotas a devolver
+
+        Returns:
+            Lista de cuotas, las más antiguas primero
+        """
+        try:
+            return InscripcionModel._consultar_cuotas(
+                "c.monto_pagado < c.monto AND c.fecha_vencimiento < %s",
+                (fecha_corte or date.today(),),
+                "c.fecha_vencimiento, c.inscripcion_id, c.numero_cuota",
+                limite
+            )
+        except Exception as e:
+            logger.error(f"Error obteniendo cuotas vencidas: {e}")
+            return []
+
+    @staticmethod
+    def obtener_cuotas_por_vencer(dias: int = 7, desde: Optional[date] = None,
+                                    limite: Optional[int] = None) -> List[Dict[str, Any]]:
+        """
+        Obtener cuotas con saldo que vencen en los próximos días
+
+        Args:
+            dias: Ventana en días a partir de 'desde' (inclusive)
+            desde: Fecha inicial (por defecto hoy)
+            limite: Máximo de cuotas a devolver
+
+        Returns:
+            Lista de cuotas ordenadas por fecha de vencimiento
+        """
+        try:
+            desde = desde or date.today()
+            return InscripcionModel._consultar_cuotas(
+                "c.monto_pagado < c.monto AND c.fecha_vencimiento BETWEEN %s AND %s",
+                (desde, desde + timedelta(days=int(dias))),
+                "c.fecha_vencimiento, c.inscripcion_id, c.numero_cuota",
+                limite
+            )
+        except Exception as e:
+            logger.error(f"Error obteniendo cuotas por vencer: {e}")
+            return []
+
+    @staticmethod
+    def obtener_saldo_pendiente_inscripcion(inscripcion_id: int) -> Dict[str, Any]:
+        """
+        Obtener el saldo pendiente de una inscripción basado en valor_final
+        
+        Args:
+            inscripcion_id: ID de la inscripción
             
-            if not resultado_insc:
-                cursor.close()
-                Database.return_connection(connection)
+        Returns:
+            Dict con saldo_pendiente, monto_total y total_pagado
+        """
+        try:
+            saldo = InscripcionModel.saldos_por_inscripciones([inscripcion_id]).get(int(inscripcion_id))
+            if not saldo:
                 return {
                     'exito': False,
                     'error': f'No se encontró la inscripción ID: {inscripcion_id}',
@@ -856,118 +1648,11 @@ class InscripcionModel:
                     'monto_total': 0.0,
                     'total_pagado': 0.0
                 }
-            
-            # Desempaquetar resultados
-            (estudiante_id, programa_id, costo_total, valor_final, codigo_programa, 
-            nombre_programa, nombres, apellido_paterno, apellido_materno) = resultado_insc
-            
-            # Calcular descuento implícito
-            costo_total_float = float(costo_total or 0)
-            valor_final_float = float(valor_final or costo_total_float)
-            descuento_implicito = 0.0
-            
-            if costo_total_float > 0:
-                descuento_implicito = ((costo_total_float - valor_final_float) / costo_total_float) * 100
-            
-            # Determinar cómo relacionar transacciones con la inscripción
-            if 'inscripcion_id' in columnas_transacciones:
-                query_transacciones = """
-                SELECT 
-                    COALESCE(SUM(t.monto_final), 0) as total_pagado,
-                    COUNT(t.id) as cantidad_transacciones
-                FROM transacciones t
-                WHERE t.inscripcion_id = %s
-                AND t.estado NOT IN ('ANULADO', 'RECHAZADO')
-                """
-                params = (inscripcion_id,)
-                
-            elif 'estudiante_id' in columnas_transacciones and 'programa_id' in columnas_transacciones:
-                query_transacciones = """
-                SELECT 
-                    COALESCE(SUM(t.monto_final), 0) as total_pagado,
-                    COUNT(t.id) as cantidad_transacciones
-                FROM transacciones t
-                WHERE t.estudiante_id = %s
-                AND t.programa_id = %s
-                AND t.estado NOT IN ('ANULADO', 'RECHAZADO')
-                """
-                params = (estudiante_id, programa_id)
-                
-            elif 'estudiante_id' in columnas_transacciones:
-                query_transacciones = """
-                SELECT 
-                    COALESCE(SUM(t.monto_final), 0) as total_pagado,
-                    COUNT(t.id) as cantidad_transacciones
-                FROM transacciones t
-                WHERE t.estudiante_id = %s
-                AND t.estado NOT IN ('ANULADO', 'RECHAZADO')
-                """
-                params = (estudiante_id,)
-                
-            else:
-                total_pagado = 0.0
-                cantidad_transacciones = 0
-                cursor.close()
-                Database.return_connection(connection)
-                
-                saldo_pendiente = max(0, valor_final_float)
-                
-                return {
-                    'exito': True,
-                    'saldo_pendiente': saldo_pendiente,
-                    'monto_total': valor_final_float,
-                    'total_pagado': total_pagado,
-                    'cantidad_transacciones': cantidad_transacciones,
-                    'costo_total': costo_total_float,
-                    'valor_final': valor_final_float,
-                    'descuento_implicito': descuento_implicito,
-                    'estudiante_id': estudiante_id,
-                    'programa_id': programa_id,
-                    'programa': {
-                        'codigo': codigo_programa,
-                        'nombre': nombre_programa
-                    },
-                    'estudiante': {
-                        'nombres': nombres,
-                        'apellido_paterno': apellido_paterno,
-                        'apellido_materno': apellido_materno
-                    },
-                    'advertencia': 'No se pudieron relacionar transacciones con esta inscripción'
-                }
-            
-            # Ejecutar consulta de transacciones
-            cursor.execute(query_transacciones, params)
-            resultado_pagos = cursor.fetchone()
-            
-            total_pagado = float(resultado_pagos[0] or 0) if resultado_pagos else 0.0
-            cantidad_transacciones = int(resultado_pagos[1] or 0) if resultado_pagos else 0
-            
-            cursor.close()
-            Database.return_connection(connection)
-            
-            saldo_pendiente = max(0, valor_final_float - total_pagado)
-            
-            return {
-                'exito': True,
-                'saldo_pendiente': saldo_pendiente,
-                'monto_total': valor_final_float,
-                'total_pagado': total_pagado,
-                'cantidad_transacciones': cantidad_transacciones,
-                'costo_total': costo_total_float,
-                'valor_final': valor_final_float,
-                'descuento_implicito': descuento_implicito,
-                'estudiante_id': estudiante_id,
-                'programa_id': programa_id,
-                'programa': {
-                    'codigo': codigo_programa,
-                    'nombre': nombre_programa
-                },
-                'estudiante': {
-                    'nombres': nombres,
-                    'apellido_paterno': apellido_paterno,
-                    'apellido_materno': apellido_materno
-                }
-            }
+
+            resultado = dict(saldo)
+            resultado['exito'] = True
+            resultado['monto_total'] = saldo['valor_final']
+            return resultado
             
         except Exception as e:
             logger.error(f"Error obteniendo saldo pendiente de inscripción {inscripcion_id}: {e}")
@@ -1199,6 +1884,7 @@ class InscripcionModel:
             result = cursor.fetchone()[0] # type: ignore
             
             connection.commit()
+            ProgramaModel.invalidar_expediente()
             
             if isinstance(result, str):
                 return json.loads(result)
@@ -1253,6 +1939,7 @@ class InscripcionModel:
             result = cursor.fetchone()[0] # type: ignore
             
             connection.commit()
+            ProgramaModel.invalidar_expediente()
             
             if isinstance(result, str):
                 return json.loads(result)
@@ -1,14 +1,28 @@
 # model/programa_model.py
 import logging
-from typing import Optional, Dict, Any, List
+import threading
+import time
+from typing import Optional, Dict, Any, List, Tuple
 from config.database import Database
 from .base_model import BaseModel
+from .registro import crear_tipo_registro
 
 logger = logging.getLogger(__name__)
 
 class ProgramaModel(BaseModel):
     """Modelo para programas académicos que hereda de BaseModel"""
     
+    # Columnas devueltas por fn_buscar_programas (sin campos de promoción)
+    COLUMNAS_BUSQUEDA = [
+        'id', 'codigo', 'nombre', 'descripcion', 'duracion_meses',
+        'horas_totales', 'costo_total', 'costo_matricula', 'costo_inscripcion',
+        'costo_mensualidad', 'numero_cuotas', 'cupos_maximos', 'cupos_inscritos',
+        'estado', 'fecha_inicio', 'fecha_fin', 'docente_coordinador_id'
+    ]
+    
+    # Tipo de registro compacto (acceso tipo diccionario)
+    REGISTRO = crear_tipo_registro('ProgramaRegistro', COLUMNAS_BUSQUEDA)
+    
     @staticmethod
     def crear_programa(datos: dict) -> dict:
         """Crear un nuevo programa académico usando la función fn_insertar_programa"""
@@ -153,6 +167,7 @@ class ProgramaModel(BaseModel):
             connection.commit()
             cursor.close()
             Database.return_connection(connection)
+            ProgramaModel.invalidar_expediente(programa_id)
             
             if result:
                 filas_afectadas = result[0]
@@ -221,6 +236,7 @@ class ProgramaModel(BaseModel):
             connection.commit()
             cursor.close()
             Database.return_connection(connection)
+            ProgramaModel.invalidar_expediente(programa_id)
             
             if result:
                 filas_afectadas = result[0]
@@ -354,29 +370,7 @@ class ProgramaModel(BaseModel):
             Database.return_connection(connection)
             
             if results:
-                programas = []
-                for row in results:
-                    programa = {
-                        'id': row[0],
-                        'codigo': row[1],
-                        'nombre': row[2],
-                        'descripcion': row[3],
-                        'duracion_meses': row[4],
-                        'horas_totales': row[5],
-                        'costo_total': row[6],
-                        'costo_matricula': row[7],
-                        'costo_inscripcion': row[8],
-                        'costo_mensualidad': row[9],
-                        'numero_cuotas': row[10],
-                        'cupos_maximos': row[11],
-                        'cupos_inscritos': row[12],
-                        'estado': row[13],
-                        'fecha_inicio': row[14],
-                        'fecha_fin': row[15],
-                        'docente_coordinador_id': row[16]
-                        # NOTA: Se eliminaron los campos de promoción del mapeo
-                    }
-                    programas.append(programa)
+                programas = [ProgramaModel.REGISTRO(row) for row in results]
                 
                 logger.info(f"✅ {len(programas)} programas encontrados")
                 return programas
@@ -667,7 +661,7 @@ class ProgramaModel(BaseModel):
         try:
             connection = Database.get_connection()
             if not connection:
-                return False
+                return []
             
             cursor = connection.cursor()
 
@@ -683,7 +677,7 @@ class ProgramaModel(BaseModel):
             resultados = cursor.fetchall()
 
             cursor.close()
-            connection.close()
+            Database.return_connection(connection)
 
             return resultados
 
@@ -691,6 +685,40 @@ class ProgramaModel(BaseModel):
             logger.error(f"Error obteniendo programas para concluir: {e}")
             return []
 
+    @staticmethod
+    def concluir_programas_vencidos(fecha_actual) -> List[Dict[str, Any]]:
+        """
+        Pasa a CONCLUIDO, en un único UPDATE, los programas cuya fecha_fin ya pasó.
+
+        La selección y el cambio de estado ocurren en la misma sentencia, así
+        que un programa cancelado entre ambos pasos nunca se concluye.
+
+        Args:
+            fecha_actual: Fecha de referencia (date object)
+
+        Returns:
+            Lista de dicts (id, codigo, nombre, fecha_fin) con los programas
+            concluidos, ordenada por fecha_fin
+        """
+        query = """
+        UPDATE programas
+        SET estado = 'CONCLUIDO',
+            updated_at = NOW()
+        WHERE fecha_fin <= %s
+          AND estado NOT IN ('CONCLUIDO', 'CANCELADO')
+        RETURNING id, codigo, nombre, fecha_fin
+        """
+
+        with Database.get_cursor() as cursor:
+            cursor.execute(query, (fecha_actual,))
+            columnas = [desc[0] for desc in cursor.description]
+            concluidos = [dict(zip(columnas, fila)) for fila in cursor.fetchall()]
+
+        for programa in concluidos:
+            ProgramaModel.invalidar_expediente(programa['id'])
+
+        return sorted(concluidos, key=lambda programa: (programa['fecha_fin'], programa['id']))
+
     @staticmethod
     def actualizar_estado(programa_id, nuevo_estado):
         """
@@ -721,6 +749,7 @@ class ProgramaModel(BaseModel):
 
             cursor.execute(query, (nuevo_estado, programa_id))
             conn.commit()
+            ProgramaModel.invalidar_expediente(programa_id)
 
             success = cursor.rowcount > 0
             message = "Estado actualizado" if success else "No se encontró el programa"
@@ -743,4 +772,257 @@ class ProgramaModel(BaseModel):
             return {
                 'success': False,
                 'message': str(e)
-            }
\ No newline at end of file
+            }
+
+    # ===== EXPEDIENTE DEL PROGRAMA (una consulta, caché por programa) =====
+
+    # Segundos de validez de un expediente en caché; cubre las escrituras de
+    # otras estaciones, que no pasan por invalidar_expediente de este proceso
+    EXPEDIENTE_TTL_SEGUNDOS = 120
+
+    _expedientes: Dict[int, Tuple[float, Dict[str, Any]]] = {}
+    _generacion_expedientes = 0
+    _lock_expedientes = threading.Lock()
+
+    QUERY_EXPEDIENTE = """
+        WITH prog AS (
+            SELECT * FROM programas WHERE id = %(programa_id)s
+        ),
+        tx AS (
+            SELECT t.id, t.estudiante_id, t.estado, t.monto_final, t.fecha_pago
+            FROM transacciones t
+            WHERE t.programa_id = %(programa_id)s
+              AND t.estado <> 'ANULADO'
+        ),
+        pagos_estudiante AS (
+            SELECT tx.estudiante_id, COUNT(*) AS cantidad_transacciones
+            FROM tx
+            WHERE tx.estado = 'CONFIRMADO'
+            GROUP BY tx.estudiante_id
+        ),
+        conceptos_estudiante AS (
+            SELECT tx.estudiante_id, cp.codigo, SUM(d.subtotal) AS total
+            FROM tx
+            JOIN detalles_transaccion d ON d.transaccion_id = tx.id
+            JOIN conceptos_pago cp ON cp.id = d.concepto_pago_id
+            WHERE tx.estado = 'CONFIRMADO'
+            GROUP BY tx.estudiante_id, cp.codigo
+        ),
+        inscritos AS (
+            SELECT
+                i.id,
+                i.estudiante_id,
+                i.programa_id,
+                i.fecha_inscripcion,
+                i.estado,
+                i.observaciones,
+                COALESCE(i.valor_final, p.costo_total) AS valor_final,
+                e.nombres,
+                e.apellido_paterno,
+                e.apellido_materno,
+                e.ci_numero || ' ' || e.ci_expedicion AS ci,
+                e.email,
+                e.telefono,
+                i.total_pagado,
+                i.saldo_pendiente,
+                COALESCE(pe.cantidad_transacciones, 0) AS cantidad_transacciones,
+                i.ultimo_pago,
+                COALESCE((
+                    SELECT json_object_agg(ce.codigo, ce.total)
+                    FROM conceptos_estudiante ce
+                    WHERE ce.estudiante_id = i.estudiante_id
+                ), '{}'::json) AS pagos_por_concepto
+            FROM inscripciones i
+            JOIN prog p ON p.id = i.programa_id
+            JOIN estudiantes e ON e.id = i.estudiante_id
+            LEFT JOIN pagos_estudiante pe ON pe.estudiante_id = i.estudiante_id
+        )
+        SELECT
+            (SELECT row_to_json(prog) FROM prog) AS programa,
+            (SELECT COALESCE(json_agg(row_to_json(inscritos)
+                    ORDER BY inscritos.apellido_paterno, inscritos.apellido_materno, inscritos.nombres),
+                    '[]'::json)
+             FROM inscritos) AS inscritos,
+            (SELECT json_build_object(
+                    'total', COALESCE(SUM(tx.monto_final) FILTER (WHERE tx.estado = 'CONFIRMADO'), 0),
+                    'cantidad_transacciones', COUNT(*) FILTER (WHERE tx.estado = 'CONFIRMADO'),
+                    'estudiantes_con_pagos', COUNT(DISTINCT tx.estudiante_id) FILTER (WHERE tx.estado = 'CONFIRMADO'),
+                    'primer_pago', MIN(tx.fecha_pago) FILTER (WHERE tx.estado = 'CONFIRMADO'),
+                    'ultimo_pago', MAX(tx.fecha_pago) FILTER (WHERE tx.estado = 'CONFIRMADO'),
+                    'por_estado', COALESCE((
+                        SELECT json_object_agg(e.estado, json_build_object('cantidad', e.cantidad, 'monto', e.monto))
+                        FROM (
+                            SELECT estado, COUNT(*) AS cantidad, SUM(monto_final) AS monto
+                            FROM tx
+                            GROUP BY estado
+                        ) e
+                    ), '{}'::json))
+             FROM tx) AS pagos,
+            (SELECT COALESCE(json_object_agg(c.codigo, c.total), '{}'::json)
+             FROM (
+                SELECT codigo, SUM(total) AS total
+                FROM conceptos_estudiante
+                GROUP BY codigo
+             ) c) AS pagos_por_concepto
+    """
+
+    @classmethod
+    def obtener_expediente(cls, programa_id: int, usar_cache: bool = True) -> dict:
+        """
+        Obtener en un solo viaje a la base de datos el programa, sus inscritos
+        con pagado/saldo, los totales de pagos confirmados (generales y por
+        concepto, más cantidad y monto por estado) y la ocupación de cupos
+
+        El resultado se guarda en caché por programa hasta que una escritura
+        relevante llama a invalidar_expediente (o vence EXPEDIENTE_TTL_SEGUNDOS).
+        El dict devuelto es compartido: no modificarlo.
+
+        Args:
+            programa_id: ID del programa
+            usar_cache: Si es False se consulta siempre la base de datos
+
+        Returns:
+            Dict con 'success', 'data' (programa, inscritos, pagos, ocupacion)
+            y 'message'
+        """
+        if usar_cache:
+            with cls._lock_expedientes:
+                entrada = cls._expedientes.get(programa_id)
+            if entrada and time.monotonic() - entrada[0] < cls.EXPEDIENTE_TTL_SEGUNDOS:
+                return {'success': True, 'data': entrada[1], 'message': 'Expediente en caché'}
+
+        with cls._lock_expedientes:
+            generacion = cls._generacion_expedientes
+
+        try:
+            with Database.get_cursor() as cursor:
+                cursor.execute(cls.QUERY_EXPEDIENTE, {'programa_id': programa_id})
+                programa, inscritos, pagos, pagos_por_concepto = cursor.fetchone()
+
+            if not programa:
+                return {'success': False, 'data': None, 'message': 'Programa no encontrado'}
+
+            # Pagado y saldo: columnas precalculadas de inscripciones (sólo CONFIRMADO)
+            vigentes = [i for i in inscritos if i.get('estado') != 'RETIRADO']
+            for inscrito in inscritos:
+                inscrito['estudiante'] = {
+                    'nombres': inscrito.get('nombres'),
+                    'apellido_paterno': inscrito.get('apellido_paterno'),
+                    'apellido_materno': inscrito.get('apellido_materno'),
+                    'ci': inscrito.get('ci'),
+                    'email': inscrito.get('email'),
+                    'telefono': inscrito.get('telefono')
+                }
+
+            pagos = dict(pagos)
+            pagos['por_concepto'] = pagos_por_concepto
+            pagos['matricula'] = float(pagos_por_concepto.get('MATRICULA', 0))
+            pagos['inscripcion'] = float(pagos_por_concepto.get('INSCRIPCION', 0))
+            pagos['mensualidad'] = float(pagos_por_concepto.get('MENSUALIDAD', 0))
+            pagos['saldo_pendiente'] = sum(float(i['saldo_pendiente']) for i in vigentes)
+
+            cupos_maximos = programa.get('cupos_maximos') or 0
+            cupos_inscritos = programa.get('cupos_inscritos') or 0
+            ocupacion = {
+                'cupos_maximos': cupos_maximos,
+                'cupos_inscritos': cupos_inscritos,
+                'inscritos_vigentes': len(vigentes),
+                'cupos_disponibles': max(cupos_maximos - cupos_inscritos, 0),
+                'porcentaje': round(cupos_inscritos / cupos_maximos * 100, 2) if cupos_maximos else 0.0
+            }
+
+            expediente = {
+                'programa': programa,
+                'inscritos': inscritos,
+                'pagos': pagos,
+                'ocupacion': ocupacion
+            }
+
+            with cls._lock_expedientes:
+                # Descartar si hubo una invalidación mientras se consultaba
+                if generacion == cls._generacion_expedientes:
+                    cls._expedientes[programa_id] = (time.monotonic(), expediente)
+
+            return {'success': True, 'data': expediente, 'message': 'Expediente obtenido exitosamente'}
+
+        except Exception as e:
+            logger.error(f"❌ Error obteniendo expediente del programa {programa_id}: {e}")
+            return {'success': False, 'data': None, 'message': f'Error al obtener expediente: {str(e)}'}
+
+    @classmethod
+    def invalidar_expediente(cls, programa_id: Optional[int] = None) -> None:
+        """
+        Descartar el expediente en caché de un programa (o de todos)
+
+        Llamar después de confirmar una escritura que cambie el programa, sus
+        inscripciones o sus transacciones.
+        """
+        with cls._lock_expedientes:
+            cls._generacion_expedientes += 1
+            if programa_id is None:
+                cls._expedientes.clear()
+            else:
+                cls._expedientes.pop(programa_id, None)
+        logger.debug(f"Expediente de programa invalidado: {programa_id or 'todos'}")
+
+    @classmethod
+    def precalentar_expedientes(cls, estados: Tuple[str, ...] = ('INSCRIPCIONES', 'EN_CURSO'),
+                                limite: int = 20) -> int:
+        """
+        Cargar en caché los expedientes de los programas vigentes más recientes
+
+        Args:
+            estados: Estados de programa a precargar
+            limite: Máximo de programas
+
+        Returns:
+            Cantidad de expedientes cargados
+        """
+        with Database.get_cursor() as cursor:
+            cursor.execute(
+                """
+                SELECT id FROM programas
+                WHERE estado = ANY(%s)
+                ORDER BY fecha_inicio DESC NULLS LAST, id DESC
+                LIMIT %s
+                """,
+                (list(estados), limite)
+            )
+            programa_ids = [fila[0] for fila in cursor.fetchall()]
+
+        return sum(1 for programa_id in programa_ids if cls.obtener_expediente(programa_id).get('success'))
+
+    # ===== ARCHIVO HISTÓRICO =====
+
+    # Antigüedad (en años desde fecha_fin) a partir de la cual un programa
+    # concluido o cancelado pasa al archivo
+    ANIOS_ARCHIVO = 5
+
+    @staticmethod
+    def archivar_programas_concluidos(anios: int = ANIOS_ARCHIVO, limite: int = 50) -> List[Dict[str, Any]]:
+        """
+        Mueve al archivo histórico, en una transacción, un lote de programas
+        concluidos o cancelados hace más de `anios` años junto con sus
+        inscripciones (y cuotas), transacciones, detalles y documentos
+        (fn_archivar_programas)
+
+        Los datos archivados se siguen leyendo con obtener_programa y con las
+        vistas vw_*_historico.
+
+        Args:
+            anios: Antigüedad mínima en años
+            limite: Máximo de programas por lote
+
+        Returns:
+            Lista de dicts (programa_id, codigo, estado, fecha_fin,
+            inscripciones_archivadas, transacciones_archivadas)
+        """
+        with Database.get_cursor() as cursor:
+            cursor.execute("SELECT * FROM fn_archivar_programas(%s, %s)", (anios, limite))
+            columnas = [desc[0] for desc in cursor.description]
+            archivados = [dict(zip(columnas, fila)) for fila in cursor.fetchall()]
+
+        for programa in archivados:
+            ProgramaModel.invalidar_expediente(programa['programa_id'])
+
+        return archivados
@@ -0,0 +1,144 @@
+# Archivo: model/registro.py
+"""
+Tipos de registro compactos para resultados de consultas.
+
+En lugar de construir un ``dict`` por fila, cada registro guarda la tupla
+devuelta por psycopg2 en un único slot y resuelve las claves mediante un
+índice compartido por clase. Los registros se comportan como diccionarios
+(``get``, ``[]``, ``items``, ``copy``, ``**registro``...) para mantener la
+compatibilidad con controladores y vistas existentes.
+"""
+
+from collections.abc import MutableMapping
+from functools import lru_cache
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple
+
+# Marca para columnas eliminadas con del/pop
+_AUSENTE = object()
+
+
+class Registro(MutableMapping):
+    """Fila de resultado con acceso tipo diccionario y memoria mínima"""
+
+    __slots__ = ('_valores', '_extra')
+
+    # Definidos por cada tipo generado con crear_tipo_registro
+    _campos: Tuple[str, ...] = ()
+    _indices: Dict[str, int] = {}
+
+    def __init__(self, valores: Sequence[Any]):
+        self._valores = valores
+        self._extra: Optional[Dict[str, Any]] = None
+
+    # ===== ACCESO =====
+
+    def __getitem__(self, clave: str) -> Any:
+        indice = self._indices.get(clave)
+        if indice is not None and indice < len(self._valores):
+            valor = self._valores[indice]
+            if valor is not _AUSENTE:
+                return valor
+        elif self._extra is not None and clave in self._extra:
+            return self._extra[clave]
+        raise KeyError(clave)
+
+    def get(self, clave: str, default: Any = None) -> Any:
+        try:
+            return self[clave]
+        except KeyError:
+            return default
+
+    def __contains__(self, clave: object) -> bool:
+        try:
+            self[clave]  # type: ignore[index]
+            return True
+        except KeyError:
+            return False
+
+    def __setitem__(self, clave: str, valor: Any) -> None:
+        indice = self._indices.get(clave)
+        if indice is not None and indice < len(self._valores):
+            # Copiar la tupla original sólo en la primera escritura
+            if not isinstance(self._valores, list):
+                self._valores = list(self._valores)
+            self._valores[indice] = valor
+        else:
+            if self._extra is None:
+                self._extra = {}
+            self._extra[clave] = valor
+
+    def __delitem__(self, clave: str) -> None:
+        if self._extra is not None and clave in self._extra:
+            del self._extra[clave]
+            return
+        if clave not in self:
+            raise KeyError(clave)
+        self[clave] = _AUSENTE
+
+    def __iter__(self) -> Iterator[str]:
+        valores = self._valores
+        for indice, campo in enumerate(self._campos[:len(valores)]):
+            if valores[indice] is not _AUSENTE:
+                yield campo
+        if self._extra:
+            yield from self._extra
+
+    def __len__(self) -> int:
+        return sum(1 for _ in self)
+
+    # ===== CONVERSIÓN =====
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Obtener un diccionario independiente con los mismos datos"""
+        return {campo: self[campo] for campo in self}
+
+    def copy(self) -> Dict[str, Any]:
+        """Compatibilidad con dict.copy()"""
+        return self.to_dict()
+
+    def __repr__(self) -> str:
+        return f"{type(self).__name__}({self.to_dict()!r})"
+
+
+def crear_tipo_registro(nombre: str, columnas: Sequence[str]) -> type:
+    """
+    Crear una clase de registro para una lista fija de columnas
+
+    Args:
+        nombre: Nombre de la clase generada
+        columnas: Nombres de columna en el orden de la consulta
+
+    Returns:
+        Subclase de Registro lista para envolver filas
+    """
+    campos = tuple(columnas)
+    return type(nombre, (Registro,), {
+        '__slots__': (),
+        '_campos': campos,
+        '_indices': {campo: i for i, campo in enumerate(campos)},
+    })
+
+
+@lru_cache(maxsize=128)
+def _tipo_para_columnas(columnas: Tuple[str, ...]) -> type:
+    """Tipo de registro reutilizable para un conjunto dinámico de columnas"""
+    return crear_tipo_registro('RegistroConsulta', columnas)
+
+
+def registros_desde_cursor(cursor, filas: Optional[List[Sequence[Any]]] = None) -> List[Registro]:
+    """
+    Envolver las filas de un cursor estándar en registros compactos
+
+    Args:
+        cursor: Cursor psycopg2 ya ejecutado (no RealDictCursor)
+        filas: Filas ya obtenidas; si se omite se llama a fetchall()
+
+    Returns:
+        Lista de registros con acceso tipo diccionario
+    """
+    if cursor.description is None:
+        return []
+    if filas is None:
+        filas = cursor.fetchall()
+    tipo = _tipo_para_columnas(tuple(desc[0] for desc in cursor.description))
+    return [tipo(fila) for fila in filas]
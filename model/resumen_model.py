@@ -533,21 +533,23 @@ class ResumenModel:
                     'fecha': datetime.now().isoformat()
                 })
             
-            # Alerta: Pagos atrasados (más de 30 días sin pago)
+            # Alerta: Cuotas vencidas con saldo (índice parcial de cuotas pendientes)
             cursor.execute("""
                 SELECT 
                     i.id,
                     CONCAT(e.apellido_paterno, ' ', e.nombres) as estudiante,
                     p.nombre as programa,
-                    i.fecha_inscripcion
-                FROM inscripciones i
+                    c.numero_cuota,
+                    c.fecha_vencimiento,
+                    c.saldo
+                FROM cuotas_inscripcion c
+                JOIN inscripciones i ON i.id = c.inscripcion_id
                 JOIN estudiantes e ON i.estudiante_id = e.id
                 JOIN programas p ON i.programa_id = p.id
-                LEFT JOIN transacciones t ON i.estudiante_id = t.estudiante_id 
-                    AND i.programa_id = t.programa_id
-                WHERE i.estado = 'INSCRITO'
-                    AND i.fecha_inscripcion < CURRENT_DATE - INTERVAL '30 days'
-                    AND t.id IS NULL
+                WHERE c.monto_pagado < c.monto
+                    AND c.fecha_vencimiento < CURRENT_DATE
+                    AND i.estado <> 'RETIRADO'
+                ORDER BY c.fecha_vencimiento
                 LIMIT 5
             """)
             
@@ -555,11 +557,39 @@ class ResumenModel:
             for pago in pagos_atrasados:
                 alertas.append({
                     'tipo': 'pago_atrasado',
-                    'mensaje': f"Estudiante {pago[1]} tiene pago pendiente en {pago[2]}",
+                    'mensaje': (f"Estudiante {pago[1]} tiene vencida la cuota {pago[3]} de {pago[2]} "
+                                f"desde el {pago[4].strftime('%d/%m/%Y')} (saldo {float(pago[5]):.2f} Bs.)"),
                     'nivel': 'critico',
                     'fecha': datetime.now().isoformat()
                 })
             
+            # Alerta: Cuotas que vencen pronto (próximos 7 días)
+            cursor.execute("""
+                SELECT 
+                    CONCAT(e.apellido_paterno, ' ', e.nombres) as estudiante,
+                    p.nombre as programa,
+                    c.numero_cuota,
+                    c.fecha_vencimiento - CURRENT_DATE as dias_restantes
+                FROM cuotas_inscripcion c
+                JOIN inscripciones i ON i.id = c.inscripcion_id
+                JOIN estudiantes e ON i.estudiante_id = e.id
+                JOIN programas p ON i.programa_id = p.id
+                WHERE c.monto_pagado < c.monto
+                    AND c.fecha_vencimiento BETWEEN CURRENT_DATE AND CURRENT_DATE + 7
+                    AND i.estado <> 'RETIRADO'
+                ORDER BY c.fecha_vencimiento
+                LIMIT 5
+            """)
+            
+            cuotas_proximas = cursor.fetchall()
+            for cuota in cuotas_proximas:
+                alertas.append({
+                    'tipo': 'cuota_por_vencer',
+                    'mensaje': f"Cuota {cuota[2]} de {cuota[0]} en {cuota[1]} vence en {int(cuota[3])} días",
+                    'nivel': 'advertencia',
+                    'fecha': datetime.now().isoformat()
+                })
+            
             # Alerta: Programas que inician pronto (próximos 7 días)
             cursor.execute("""
                 SELECT 
@@ -4,6 +4,7 @@ Modelo para la gestión de transacciones de pago
 Maneja operaciones CRUD con control de transacciones SQL
 """
 
+import json
 import logging
 from typing import Optional, Dict, List, Any, Tuple, Union
 from datetime import datetime
@@ -12,7 +13,10 @@ from psycopg2.extras import RealDictCursor
 
 from config.database import Database
 from config.constants import EstadoTransaccion, FormaPago
+from model.caja_model import CajaModel
 from model.inscripcion_model import InscripcionModel
+from model.programa_model import ProgramaModel
+from model.registro import registros_desde_cursor
 
 logger = logging.getLogger(__name__)
 
@@ -47,6 +51,13 @@ class TransaccionModel:
         """Devolver conexión al pool"""
         Database.return_connection(connection)
     
+    @classmethod
+    def _fila_retornada(cls, cursor, fila) -> Optional[Dict[str, Any]]:
+        """Convertir la fila de un RETURNING * en un registro con acceso por nombre"""
+        if not fila:
+            return None
+        return registros_desde_cursor(cursor, [fila])[0]
+    
     @classmethod
     def _execute_in_transaction(cls, queries_params, return_last_id=True):
         """
@@ -81,6 +92,7 @@ class TransaccionModel:
                         last_id = result[0]
             
             connection.commit()
+            ProgramaModel.invalidar_expediente()
             logger.info(f"✅ Transacción completada exitosamente")
             
             if return_last_id:
@@ -115,7 +127,8 @@ class TransaccionModel:
             datos: Diccionario con los datos de la transacción
             
         Returns:
-            Dict con resultado y ID creado
+            Dict con resultado, ID creado y la fila completa en 'data'
+            (incluye numero_transaccion y fecha_registro generados)
         """
         try:
             # Validar datos obligatorios
@@ -148,7 +161,7 @@ class TransaccionModel:
                 INSERT INTO {cls.TABLE_NAME} 
                 ({', '.join(columns)})
                 VALUES ({', '.join(placeholders)})
-                RETURNING id
+                RETURNING *
             """
             
             connection = None
@@ -161,21 +174,19 @@ class TransaccionModel:
                 cursor = connection.cursor()
                 cursor.execute(query, values)
                 
-                # Obtener ID insertado
-                result = cursor.fetchone()
-                new_id = result[0] if result else None
-                
-                # Obtener el número de transacción generado por el trigger
-                cursor.execute("SELECT numero_transaccion FROM transacciones WHERE id = %s", (new_id,))
-                transaccion = cursor.fetchone()
+                # La fila retornada ya trae los campos generados por el trigger
+                transaccion = cls._fila_retornada(cursor, cursor.fetchone())
+                new_id = transaccion.get('id') if transaccion else None
                 
                 connection.commit()
+                ProgramaModel.invalidar_expediente()
                 logger.info(f"✅ Transacción creada con ID: {new_id}")
                 
                 return {
                     'success': True, 
                     'id': new_id,
-                    'numero_transaccion': transaccion[0] if transaccion else None,
+                    'numero_transaccion': transaccion.get('numero_transaccion') if transaccion else None,
+                    'data': transaccion,
                     'message': 'Transacción registrada exitosamente'
                 }
                 
@@ -248,7 +259,7 @@ class TransaccionModel:
                 UPDATE {cls.TABLE_NAME}
                 SET {set_clause}
                 WHERE id = %s
-                RETURNING id
+                RETURNING *
             """
             
             connection = None
@@ -268,11 +279,13 @@ class TransaccionModel:
                     return {'success': False, 'error': 'No se pudo actualizar la transacción'}
                 
                 connection.commit()
+                ProgramaModel.invalidar_expediente()
                 logger.info(f"✅ Transacción {id_transaccion} actualizada")
                 
                 return {
                     'success': True,
                     'id': id_transaccion,
+                    'data': cls._fila_retornada(cursor, result),
                     'message': 'Transacción actualizada exitosamente'
                 }
                 
@@ -363,6 +376,10 @@ class TransaccionModel:
                 cursor.execute(query, (id_transaccion,))
                 result = cursor.fetchone()
                 
+                if not result:
+                    # Lectura transparente del archivo histórico
+                    result = cls._obtener_archivada(cursor, "t.id = %s", id_transaccion)
+                
                 if not result:
                     return {'success': False, 'error': f'Transacción con ID {id_transaccion} no encontrada'}
                 
@@ -378,6 +395,38 @@ class TransaccionModel:
             logger.error(f"❌ Error obteniendo transacción {id_transaccion}: {e}")
             return {'success': False, 'error': str(e)}
     
+    @staticmethod
+    def _obtener_archivada(cursor, condicion: str, valor: Any) -> Optional[Dict[str, Any]]:
+        """
+        Buscar una transacción en el archivo histórico (programas archivados)
+        
+        Args:
+            cursor: Cursor RealDictCursor abierto
+            condicion: Condición sobre el alias t, con un parámetro
+            valor: Valor del parámetro
+            
+        Returns:
+            La fila con los mismos campos que obtener_por_id más archivado_en,
+            o None
+        """
+        cursor.execute(f"""
+            SELECT 
+                t.*,
+                e.nombres as estudiante_nombre,
+                e.apellido_paterno as estudiante_apellido_paterno,
+                e.apellido_materno as estudiante_apellido_materno,
+                CONCAT(e.ci_numero, ' ', e.ci_expedicion) as estudiante_ci,
+                p.nombre as programa_nombre,
+                p.codigo as programa_codigo,
+                u.nombre_completo as registrado_por_nombre
+            FROM transacciones_archivo t
+            LEFT JOIN estudiantes e ON t.estudiante_id = e.id
+            LEFT JOIN programas_archivo p ON t.programa_id = p.id
+            LEFT JOIN usuarios u ON t.registrado_por = u.id
+            WHERE {condicion}
+        """, (valor,))
+        return cursor.fetchone()
+    
     @classmethod
     def obtener_por_numero(cls, numero_transaccion: str) -> Dict[str, Any]:
         """
@@ -418,6 +467,10 @@ class TransaccionModel:
                 cursor.execute(query, (numero_transaccion,))
                 result = cursor.fetchone()
                 
+                if not result:
+                    # Lectura transparente del archivo histórico
+                    result = cls._obtener_archivada(cursor, "t.numero_transaccion = %s", numero_transaccion)
+                
                 if not result:
                     return {'success': False, 'error': f'Transacción {numero_transaccion} no encontrada'}
                 
@@ -511,19 +564,19 @@ class TransaccionModel:
                 if not connection:
                     return {'success': False, 'error': 'No se pudo conectar a la base de datos'}
                 
-                cursor = connection.cursor(cursor_factory=RealDictCursor)
+                cursor = connection.cursor()
                 
                 # Obtener total
                 cursor.execute(count_query, params)
                 total_result = cursor.fetchone()
-                total = total_result['total'] if total_result else 0
+                total = total_result[0] if total_result else 0
                 
                 # Obtener datos paginados
                 query_params = params + [limite, offset]
                 cursor.execute(query, query_params)
                 results = cursor.fetchall()
                 
-                transacciones = [dict(row) for row in results]
+                transacciones = registros_desde_cursor(cursor, results)
                 
                 return {
                     'success': True,
@@ -665,18 +718,18 @@ class TransaccionModel:
                 if not connection:
                     return {'success': False, 'error': 'No se pudo conectar a la base de datos'}
                 
-                cursor = connection.cursor(cursor_factory=RealDictCursor)
+                cursor = connection.cursor()
                 
                 # Obtener total
                 cursor.execute(count_query, (fecha_inicio, fecha_fin))
                 total_result = cursor.fetchone()
-                total = total_result['total'] if total_result else 0
+                total = total_result[0] if total_result else 0
                 
                 # Obtener datos paginados
                 cursor.execute(query, (fecha_inicio, fecha_fin, limite, offset))
                 results = cursor.fetchall()
                 
-                transacciones = [dict(row) for row in results]
+                transacciones = registros_desde_cursor(cursor, results)
                 
                 return {
                     'success': True,
@@ -786,12 +839,9 @@ class TransaccionModel:
                 if not connection:
                     return {'success': False, 'error': 'No se pudo conectar a la base de datos'}
     
-                from psycopg2.extras import RealDictCursor
-                cursor = connection.cursor(cursor_factory=RealDictCursor)
+                cursor = connection.cursor()
                 cursor.execute(query, (estudiante_id, programa_id))
-                results = cursor.fetchall()
-    
-                transacciones = [dict(row) for row in results]
+                transacciones = registros_desde_cursor(cursor)
     
                 # Calcular totales
                 total_pagado = sum(t.get('monto_final', 0) for t in transacciones 
@@ -820,6 +870,70 @@ class TransaccionModel:
             logger.error(f"❌ Error en método obtener_por_inscripcion: {e}")
             return {'success': False, 'error': str(e), 'data': []}
     
+    @classmethod
+    def obtener_por_inscripciones(cls, pares: List[Tuple[int, int]]) -> Dict[Tuple[int, int], List[Dict[str, Any]]]:
+        """
+        Obtener las transacciones de varias inscripciones en una sola consulta
+    
+        Args:
+            pares: Lista de (estudiante_id, programa_id)
+    
+        Returns:
+            Dict {(estudiante_id, programa_id): [transacciones]} con el mismo
+            orden y columnas que obtener_por_inscripcion
+        """
+        pares = sorted({(int(e), int(p)) for e, p in pares or [] if e and p})
+        if not pares:
+            return {}
+    
+        query = """
+            SELECT 
+                t.id,
+                t.estudiante_id,
+                t.programa_id,
+                t.numero_transaccion,
+                t.fecha_pago,
+                t.monto_total,
+                t.descuento_total,
+                t.monto_final,
+                t.forma_pago,
+                t.estado,
+                t.fecha_registro,
+                t.numero_comprobante,
+                t.observaciones
+            FROM transacciones t
+            JOIN UNNEST(%s::INTEGER[], %s::INTEGER[]) AS k(estudiante_id, programa_id)
+                ON k.estudiante_id = t.estudiante_id
+               AND k.programa_id = t.programa_id
+            ORDER BY t.numero_transaccion DESC, t.fecha_pago DESC, t.fecha_registro DESC
+        """
+    
+        agrupadas: Dict[Tuple[int, int], List[Dict[str, Any]]] = {par: [] for par in pares}
+        connection = None
+        cursor = None
+        try:
+            connection = cls._get_connection()
+            if not connection:
+                return agrupadas
+    
+            cursor = connection.cursor()
+            cursor.execute(query, ([e for e, _ in pares], [p for _, p in pares]))
+            for transaccion in registros_desde_cursor(cursor):
+                agrupadas[(transaccion['estudiante_id'], transaccion['programa_id'])].append(transaccion)
+    
+            logger.debug(f"Transacciones cargadas para {len(pares)} inscripciones en una consulta")
+            return agrupadas
+    
+        except Exception as e:
+            logger.error(f"❌ Error obteniendo transacciones de inscripciones: {e}")
+            return agrupadas
+    
+        finally:
+            if cursor:
+                cursor.close()
+            if connection:
+                cls._return_connection(connection)
+    
     @classmethod
     def anular(cls, id_transaccion: int, motivo: str) -> Dict[str, Any]:
         """
@@ -935,6 +1049,7 @@ class TransaccionModel:
                     return {'success': False, 'error': 'No se pudo eliminar la transacción'}
                 
                 connection.commit()
+                ProgramaModel.invalidar_expediente()
                 logger.info(f"✅ Transacción {id_transaccion} eliminada")
                 
                 return {
@@ -1277,21 +1392,23 @@ class TransaccionModel:
         try:
             today = datetime.now().strftime('%Y-%m-%d')
             
-            query = """
-                SELECT 
-                    COUNT(*) as cantidad,
-                    COALESCE(SUM(monto_final), 0) as monto_total,
-                    COUNT(CASE WHEN estado = 'CONFIRMADO' THEN 1 END) as confirmados,
-                    COALESCE(SUM(CASE WHEN estado = 'CONFIRMADO' THEN monto_final ELSE 0 END), 0) as monto_confirmado,
-                    COUNT(CASE WHEN forma_pago = 'EFECTIVO' THEN 1 END) as efectivo,
-                    COALESCE(SUM(CASE WHEN forma_pago = 'EFECTIVO' THEN monto_final ELSE 0 END), 0) as monto_efectivo,
-                    COUNT(CASE WHEN forma_pago = 'TRANSFERENCIA' THEN 1 END) as transferencia,
-                    COALESCE(SUM(CASE WHEN forma_pago = 'TRANSFERENCIA' THEN monto_final ELSE 0 END), 0) as monto_transferencia,
-                    COUNT(CASE WHEN forma_pago = 'TARJETA' THEN 1 END) as tarjeta,
-                    COALESCE(SUM(CASE WHEN forma_pago = 'TARJETA' THEN monto_final ELSE 0 END), 0) as monto_tarjeta
-                FROM transacciones
-                WHERE fecha_pago = %s
-            """
+            # Pagos confirmados y totales por forma de pago desde los acumulados de caja
+            resumen_caja = CajaModel.obtener_resumen_dia(today)
+            if not resumen_caja['success']:
+                return resumen_caja
+            
+            por_forma = {f['forma_pago']: f for f in resumen_caja['formas_pago']}
+            totales = resumen_caja['totales']
+            result = {
+                'confirmados': totales['cantidad_ingresos'],
+                'monto_confirmado': totales['ingresos'],
+                'neto': totales['neto'],
+                'cerrado': resumen_caja['cierre'] is not None,
+            }
+            for forma in FormaPago:
+                fila = por_forma.get(forma.value, {})
+                result[forma.value.lower()] = fila.get('cantidad_ingresos', 0)
+                result[f'monto_{forma.value.lower()}'] = fila.get('ingresos', 0)
             
             connection = None
             cursor = None
@@ -1301,8 +1418,6 @@ class TransaccionModel:
                     return {'success': False, 'error': 'No se pudo conectar a la base de datos'}
                 
                 cursor = connection.cursor(cursor_factory=RealDictCursor)
-                cursor.execute(query, (today,))
-                result = cursor.fetchone()
                 
                 # Obtener lista de pagos del día
                 detalle_query = """
@@ -1321,10 +1436,14 @@ class TransaccionModel:
                 cursor.execute(detalle_query, (today,))
                 detalles = cursor.fetchall()
                 
+                # Cantidad y monto de todas las transacciones del día (cualquier estado)
+                result['cantidad'] = len(detalles)
+                result['monto_total'] = sum(row['monto_final'] or 0 for row in detalles)
+                
                 return {
                     'success': True,
                     'fecha': today,
-                    'resumen': dict(result) if result else {},
+                    'resumen': result,
                     'detalles': [dict(row) for row in detalles]
                 }
                 
@@ -1343,16 +1462,33 @@ class TransaccionModel:
     def crear_transaccion_con_detalles(cls, datos_transaccion: Dict[str, Any], 
                                         items_detalle: List[Dict[str, Any]]) -> Dict[str, Any]:
         """
-        Crear una transacción con sus detalles (función de ejemplo para transacciones complejas)
-        Esta función demuestra cómo manejar múltiples operaciones en una transacción
+        Crear una transacción con todos sus detalles en un solo viaje al servidor
+        
+        Usa fn_registrar_transaccion_con_detalles: la cabecera (con montos
+        calculados desde los detalles) y los N detalles (con orden calculado)
+        se insertan en la misma transacción SQL.
 
         Args:
             datos_transaccion: Datos de la transacción principal
-            items_detalle: Lista de items de detalle (ej: conceptos de pago)
+            items_detalle: Lista de detalles (concepto_pago_id, descripcion,
+                cantidad, precio_unitario, subtotal y opcionalmente orden)
 
         Returns:
-            Dict con resultado
+            Dict con la transacción creada en 'data' y sus detalles en 'detalles'
         """
+        if not items_detalle:
+            return {'success': False, 'error': 'Debe proporcionar al menos un detalle para la transacción'}
+        
+        for campo in ['estudiante_id', 'forma_pago']:
+            if datos_transaccion.get(campo) is None:
+                return {'success': False, 'error': f'El campo {campo} es obligatorio'}
+        
+        cabecera = {k: v for k, v in datos_transaccion.items()
+                    if k in cls.COLUMNS and k != 'numero_transaccion'}
+        detalle_columns = ['concepto_pago_id', 'descripcion', 'cantidad',
+                           'precio_unitario', 'subtotal', 'orden']
+        detalles = [{k: item[k] for k in detalle_columns if k in item} for item in items_detalle]
+        
         connection = None
         cursor = None
         try:
@@ -1361,67 +1497,122 @@ class TransaccionModel:
                 return {'success': False, 'error': 'No se pudo conectar a la base de datos'}
 
             cursor = connection.cursor()
+            cursor.execute(
+                "SELECT fn_registrar_transaccion_con_detalles(%s::jsonb, %s::jsonb)",
+                (json.dumps(cabecera, default=str), json.dumps(detalles, default=str))
+            )
+            result = cursor.fetchone()
+            comprobante = result[0] if result else None
+            if not comprobante:
+                raise Exception("No se obtuvo el comprobante de la transacción")
+            
+            connection.commit()
+            ProgramaModel.invalidar_expediente()
+            
+            transaccion = comprobante.get('transaccion', {})
+            transaccion_id = transaccion.get('id')
+            logger.info(f"✅ Transacción {transaccion.get('numero_transaccion')} creada con "
+                        f"{len(comprobante.get('detalles', []))} detalles (ID: {transaccion_id})")
 
-            # 1. Insertar transacción principal
-            transaccion_columns = TransaccionModel.COLUMNS.copy()
-            transaccion_values = []
-            for col in transaccion_columns:
-                if col in datos_transaccion:
-                    transaccion_values.append(datos_transaccion[col])
-                else:
-                    transaccion_values.append(None)
+            return {
+                'success': True,
+                'id': transaccion_id,
+                'numero_transaccion': transaccion.get('numero_transaccion'),
+                'data': transaccion,
+                'detalles': comprobante.get('detalles', []),
+                'message': 'Transacción creada exitosamente con sus detalles'
+            }
 
-            placeholders = ['%s'] * len(transaccion_columns)
-            transaccion_query = f"""
-                INSERT INTO transacciones ({', '.join(transaccion_columns)})
-                VALUES ({', '.join(placeholders)})
-                RETURNING id
-            """
+        except Exception as e:
+            if connection:
+                connection.rollback()
+                logger.warning("↩️ Rollback ejecutado por error en transacción compleja")
+            logger.error(f"❌ Error en transacción compleja: {e}")
+            return {'success': False, 'error': str(e)}
 
-            cursor.execute(transaccion_query, transaccion_values)
-            result = cursor.fetchone()
-            if not result:
-                raise Exception("No se pudo obtener el ID de la transacción")
-            transaccion_id = result[0]
+        finally:
+            if cursor:
+                cursor.close()
+            if connection:
+                Database.return_connection(connection)
 
-            # 2. Insertar detalles (ejemplo con tabla de conceptos)
-            if items_detalle:
-                for item in items_detalle:
-                    item['transaccion_id'] = transaccion_id
-                    detalle_columns = list(item.keys())
-                    detalle_values = list(item.values())
-                    detalle_placeholders = ['%s'] * len(detalle_columns)
+    @classmethod
+    def finalizar_idempotente(cls, clave: str, transaccion_id: int, datos: Dict[str, Any],
+                              detalles: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """
+        Guardar los detalles pendientes y confirmar una transacción de forma idempotente
 
-                    detalle_query = f"""
-                        INSERT INTO transaccion_conceptos ({', '.join(detalle_columns)})
-                        VALUES ({', '.join(detalle_placeholders)})
-                    """
+        Usa fn_finalizar_transaccion: si la clave ya fue aplicada no se
+        vuelve a insertar nada y se devuelve la transacción tal como está.
 
-                    cursor.execute(detalle_query, detalle_values)
+        Args:
+            clave: Clave de idempotencia (UUID) de la operación
+            transaccion_id: ID de la transacción a confirmar
+            datos: Datos de cabecera capturados en caja (forma de pago, montos...)
+            detalles: Detalles aún no guardados, en formato de detalles_transaccion
 
-            # 3. Commit si todo está bien
+        Returns:
+            Dict con la transacción en 'data' y 'duplicado'; 'conexion' es True
+            cuando el error se debe a que la base de datos no está disponible
+        """
+        connection = None
+        cursor = None
+        try:
+            connection = Database.get_connection_safe()
+            if not connection:
+                return {'success': False, 'conexion': True, 'error': 'No se pudo conectar a la base de datos'}
+
+            cursor = connection.cursor()
+            cursor.execute(
+                "SELECT fn_finalizar_transaccion(%s::uuid, %s, %s::jsonb, %s::jsonb)",
+                (clave, transaccion_id, json.dumps(datos, default=str), json.dumps(detalles, default=str))
+            )
+            result = cursor.fetchone()
             connection.commit()
-            logger.info(f"✅ Transacción compleja creada con ID: {transaccion_id}")
+            ProgramaModel.invalidar_expediente()
+
+            resultado = result[0] if result else {}
+            if resultado.get('duplicado'):
+                logger.info(f"↩️ Operación {clave} ya aplicada a la transacción {transaccion_id}")
 
             return {
                 'success': True,
-                'id': transaccion_id,
-                'message': 'Transacción creada exitosamente con sus detalles'
+                'data': resultado.get('transaccion'),
+                'duplicado': bool(resultado.get('duplicado'))
             }
 
+        except (psycopg2.OperationalError, psycopg2.InterfaceError) as e:
+            logger.warning(f"⚠️ Base de datos no disponible al finalizar transacción {transaccion_id}: {e}")
+            return {'success': False, 'conexion': True, 'error': str(e)}
+
         except Exception as e:
             if connection:
                 connection.rollback()
-                logger.warning("↩️ Rollback ejecutado por error en transacción compleja")
-            logger.error(f"❌ Error en transacción compleja: {e}")
+                logger.warning("↩️ Rollback ejecutado por error al finalizar transacción")
+            logger.error(f"❌ Error finalizando transacción {transaccion_id}: {e}")
             return {'success': False, 'error': str(e)}
 
         finally:
             if cursor:
-                cursor.close()
+                try:
+                    cursor.close()
+                except Exception:
+                    pass
             if connection:
                 Database.return_connection(connection)
-    
+
+    @staticmethod
+    def observaciones_transaccion_inicial(inscripcion_id: int, nombre_estudiante: str,
+                                          nombre_programa: str, monto_total: Any) -> str:
+        """Texto de observaciones de la transacción inicial de una inscripción"""
+        return (
+            f"✅ TRANSACCIÓN INICIAL\n"
+            f"📋 Inscripción #{inscripcion_id}\n"
+            f"👤 Estudiante: {nombre_estudiante}\n"
+            f"📚 Programa: {nombre_programa}\n"
+            f"💰 Monto total: {float(monto_total or 0):.2f} Bs."
+        )
+
     @classmethod
     def crear_transaccion_inicial_inscripcion(cls, inscripcion_id: int, usuario_id: int = 2) -> Dict[str, Any]:
         """
@@ -1521,12 +1712,8 @@ class TransaccionModel:
     
                 fecha_actual = datetime.now().strftime('%Y-%m-%d')
     
-                observaciones = (
-                    f"✅ TRANSACCIÓN INICIAL\n"
-                    f"📋 Inscripción #{inscripcion_id}\n"
-                    f"👤 Estudiante: {nombre_estudiante}\n"
-                    f"📚 Programa: {nombre_programa}\n"
-                    f"💰 Monto total: {datos.get('valor_final', 0):.2f} Bs."
+                observaciones = cls.observaciones_transaccion_inicial(
+                    inscripcion_id, nombre_estudiante, nombre_programa, datos.get('valor_final', 0)
                 )
     
                 # Preparar datos para nueva transacción
@@ -0,0 +1,321 @@
+# service/diario_pagos_service.py
+"""
+Diario local de pagos (write-behind) para que la caja no espere a PostgreSQL.
+
+Al finalizar un pago, la operación (detalles + confirmación) se escribe de
+inmediato en un SQLite local con una clave de idempotencia y la interfaz
+continúa. Un hilo de fondo reenvía las operaciones pendientes a PostgreSQL
+mediante TransaccionModel.finalizar_idempotente; si la base de datos no está
+disponible se reintenta con espera creciente, y como la clave se registra en
+el servidor junto con los cambios, un reenvío nunca duplica el pago.
+
+Las operaciones que fallan por otros motivos (transacción anulada, caja ya
+cerrada...) quedan en ERROR tras varios intentos: la ventana principal las
+muestra con resumen()/sin_aplicar() para reintentarlas, y el cierre de caja
+de la estación se rechaza mientras tenga operaciones sin aplicar.
+"""
+import json
+import logging
+import os
+import sqlite3
+import threading
+import uuid
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional
+
+from config.paths import Paths
+from model.transaccion_model import TransaccionModel
+
+logger = logging.getLogger(__name__)
+
+
+class DiarioPagos:
+    """Almacenamiento durable de operaciones de pago pendientes de aplicar"""
+
+    # Se puede desactivar con FORMAGESTPRO_DIARIO_PAGOS=0 (guardado síncrono)
+    HABILITADO = os.environ.get('FORMAGESTPRO_DIARIO_PAGOS', '1') != '0'
+
+    NOMBRE_ARCHIVO = 'diario_pagos.sqlite3'
+
+    _lock = threading.Lock()
+    _conexion: Optional[sqlite3.Connection] = None
+    _replicador: Optional['ReplicadorDiarioPagos'] = None
+
+    # ===== REPLICADOR =====
+
+    @classmethod
+    def iniciar_replicador(cls, al_aplicar: Optional[Callable[[Dict[str, Any], Dict[str, Any]], None]] = None) -> None:
+        """Iniciar el hilo que aplica las operaciones pendientes (una sola instancia)"""
+        if not cls.HABILITADO or (cls._replicador and cls._replicador.is_alive()):
+            return
+        cls._obtener_conexion()
+        cls._replicador = ReplicadorDiarioPagos(al_aplicar)
+        cls._replicador.start()
+
+    @classmethod
+    def detener_replicador(cls) -> None:
+        """Detener el replicador; lo pendiente queda en el diario para el próximo inicio"""
+        if cls._replicador:
+            cls._replicador.detener()
+            cls._replicador = None
+
+    # ===== CONEXIÓN =====
+
+    @classmethod
+    def _obtener_conexion(cls) -> sqlite3.Connection:
+        """Conexión SQLite compartida (los accesos se serializan con _lock)"""
+        if cls._conexion is None:
+            if Paths.ARCHIVOS_DIR is None:
+                Paths.initialize()
+            ruta = Paths.ARCHIVOS_DIR / cls.NOMBRE_ARCHIVO
+            conexion = sqlite3.connect(str(ruta), check_same_thread=False, isolation_level=None)
+            conexion.row_factory = sqlite3.Row
+            # WAL + FULL: cada operación queda en disco al confirmar
+            conexion.execute("PRAGMA journal_mode=WAL")
+            conexion.execute("PRAGMA synchronous=FULL")
+            conexion.execute("""
+                CREATE TABLE IF NOT EXISTS operaciones (
+                    clave TEXT PRIMARY KEY,
+                    tipo TEXT NOT NULL,
+                    transaccion_id INTEGER NOT NULL,
+                    datos TEXT NOT NULL,
+                    detalles TEXT NOT NULL,
+                    comprobante TEXT,
+                    estado TEXT NOT NULL DEFAULT 'PENDIENTE',
+                    intentos INTEGER NOT NULL DEFAULT 0,
+                    ultimo_error TEXT,
+                    creado_en TEXT NOT NULL,
+                    aplicado_en TEXT
+                )
+            """)
+            conexion.execute("""
+                CREATE INDEX IF NOT EXISTS idx_operaciones_estado
+                ON operaciones(estado, creado_en)
+            """)
+            conexion.execute("""
+                CREATE INDEX IF NOT EXISTS idx_operaciones_transaccion
+                ON operaciones(transaccion_id)
+            """)
+            cls._conexion = conexion
+            logger.info(f"✅ Diario local de pagos abierto en {ruta}")
+        return cls._conexion
+
+    @staticmethod
+    def _fila_a_dict(fila: sqlite3.Row) -> Dict[str, Any]:
+        operacion = dict(fila)
+        operacion['datos'] = json.loads(operacion['datos'])
+        operacion['detalles'] = json.loads(operacion['detalles'])
+        operacion['comprobante'] = json.loads(operacion['comprobante']) if operacion['comprobante'] else None
+        return operacion
+
+    # ===== ESCRITURA =====
+
+    @classmethod
+    def registrar_finalizacion(cls, transaccion_id: int, datos: Dict[str, Any],
+                               detalles: List[Dict[str, Any]],
+                               comprobante: Optional[Dict[str, Any]] = None) -> str:
+        """
+        Registrar la finalización de un pago en el diario local
+
+        Args:
+            transaccion_id: ID de la transacción a confirmar
+            datos: Datos de cabecera para fn_finalizar_transaccion
+            detalles: Detalles aún no guardados en la base de datos
+            comprobante: Datos para imprimir el comprobante sin consultar la BD
+                ({'transaccion': {...}, 'detalles': [...]})
+
+        Returns:
+            Clave de idempotencia de la operación
+        """
+        clave = str(uuid.uuid4())
+        with cls._lock:
+            cls._obtener_conexion().execute(
+                """
+                INSERT INTO operaciones (clave, tipo, transaccion_id, datos, detalles, comprobante, creado_en)
+                VALUES (?, 'FINALIZAR', ?, ?, ?, ?, ?)
+                """,
+                (
+                    clave, transaccion_id,
+                    json.dumps(datos, default=str),
+                    json.dumps(detalles, default=str),
+                    json.dumps(comprobante, default=str) if comprobante else None,
+                    datetime.now().isoformat(timespec='seconds')
+                )
+            )
+        logger.info(f"📝 Pago de la transacción {transaccion_id} registrado en el diario local ({clave})")
+
+        if cls._replicador:
+            cls._replicador.despertar()
+        return clave
+
+    @classmethod
+    def marcar_aplicada(cls, clave: str) -> None:
+        """Marcar una operación como aplicada en PostgreSQL"""
+        with cls._lock:
+            cls._obtener_conexion().execute(
+                "UPDATE operaciones SET estado = 'APLICADO', aplicado_en = ?, ultimo_error = NULL WHERE clave = ?",
+                (datetime.now().isoformat(timespec='seconds'), clave)
+            )
+
+    @classmethod
+    def registrar_fallo(cls, clave: str, error: str, definitivo: bool = False) -> None:
+        """Registrar un intento fallido (definitivo: no se vuelve a reintentar)"""
+        with cls._lock:
+            cls._obtener_conexion().execute(
+                """
+                UPDATE operaciones
+                SET intentos = intentos + 1,
+                    ultimo_error = ?,
+                    estado = CASE WHEN ? THEN 'ERROR' ELSE estado END
+                WHERE clave = ?
+                """,
+                (error, definitivo, clave)
+            )
+
+    @classmethod
+    def reintentar(cls, clave: str) -> None:
+        """Volver a poner en cola una operación marcada con error"""
+        with cls._lock:
+            cls._obtener_conexion().execute(
+                "UPDATE operaciones SET estado = 'PENDIENTE', intentos = 0 WHERE clave = ?", (clave,)
+            )
+        logger.info(f"🔄 Operación {clave} del diario puesta en cola nuevamente")
+
+        if cls._replicador:
+            cls._replicador.despertar()
+
+    # ===== LECTURA =====
+
+    @classmethod
+    def pendientes(cls, limite: int = 50) -> List[Dict[str, Any]]:
+        """Operaciones pendientes en orden de llegada"""
+        with cls._lock:
+            filas = cls._obtener_conexion().execute(
+                "SELECT * FROM operaciones WHERE estado = 'PENDIENTE' ORDER BY creado_en, rowid LIMIT ?",
+                (limite,)
+            ).fetchall()
+        return [cls._fila_a_dict(f) for f in filas]
+
+    @classmethod
+    def sin_aplicar(cls, hasta_fecha: Optional[str] = None) -> List[Dict[str, Any]]:
+        """
+        Operaciones PENDIENTE o ERROR, las de error primero
+
+        Args:
+            hasta_fecha: Sólo las registradas hasta ese día inclusive (YYYY-MM-DD)
+        """
+        with cls._lock:
+            filas = cls._obtener_conexion().execute(
+                """
+                SELECT * FROM operaciones
+                WHERE estado IN ('PENDIENTE', 'ERROR')
+                AND (? IS NULL OR substr(creado_en, 1, 10) <= ?)
+                ORDER BY estado = 'PENDIENTE', creado_en, rowid
+                """,
+                (hasta_fecha, hasta_fecha)
+            ).fetchall()
+        return [cls._fila_a_dict(f) for f in filas]
+
+    @classmethod
+    def obtener_por_transaccion(cls, transaccion_id: int) -> Optional[Dict[str, Any]]:
+        """Última operación registrada para una transacción (para el comprobante)"""
+        with cls._lock:
+            fila = cls._obtener_conexion().execute(
+                "SELECT * FROM operaciones WHERE transaccion_id = ? ORDER BY creado_en DESC, rowid DESC LIMIT 1",
+                (transaccion_id,)
+            ).fetchone()
+        return cls._fila_a_dict(fila) if fila else None
+
+    @classmethod
+    def resumen(cls) -> Dict[str, int]:
+        """Cantidad de operaciones por estado"""
+        with cls._lock:
+            filas = cls._obtener_conexion().execute(
+                "SELECT estado, COUNT(*) FROM operaciones GROUP BY estado"
+            ).fetchall()
+        return {estado: cantidad for estado, cantidad in filas}
+
+
+class ReplicadorDiarioPagos(threading.Thread):
+    """Hilo que aplica en PostgreSQL las operaciones pendientes del diario"""
+
+    INTERVALO_SEGUNDOS = 5
+    ESPERA_MAXIMA_SEGUNDOS = 120
+    MAX_INTENTOS = 5  # Errores que no son de conexión antes de marcar ERROR
+
+    def __init__(self, al_aplicar: Optional[Callable[[Dict[str, Any], Dict[str, Any]], None]] = None):
+        """
+        Args:
+            al_aplicar: Callback (operacion, resultado) llamado desde este hilo
+                cada vez que una operación se aplica en la base de datos
+        """
+        super().__init__(name="ReplicadorDiarioPagos", daemon=True)
+        self.al_aplicar = al_aplicar
+        self._detener = threading.Event()
+        self._despertar = threading.Event()
+
+    def despertar(self) -> None:
+        """Procesar los pendientes sin esperar al siguiente intervalo"""
+        self._despertar.set()
+
+    def detener(self, timeout: float = 5.0) -> None:
+        """Detener el hilo tras la operación en curso"""
+        self._detener.set()
+        self._despertar.set()
+        if self.is_alive():
+            self.join(timeout)
+
+    def run(self) -> None:
+        logger.info("🕒 Replicador del diario de pagos iniciado")
+        espera = self.INTERVALO_SEGUNDOS
+        while not self._detener.is_set():
+            try:
+                sin_conexion = self.procesar_pendientes()
+            except Exception as e:
+                logger.error(f"❌ Error en el replicador del diario de pagos: {e}")
+                sin_conexion = True
+
+            # Espera creciente mientras la base de datos no responda
+            espera = min(espera * 2, self.ESPERA_MAXIMA_SEGUNDOS) if sin_conexion else self.INTERVALO_SEGUNDOS
+            self._despertar.wait(espera)
+            self._despertar.clear()
+        logger.info("🛑 Replicador del diario de pagos detenido")
+
+    def procesar_pendientes(self) -> bool:
+        """
+        Aplicar las operaciones pendientes en orden
+
+        Returns:
+            True si se interrumpió porque la base de datos no está disponible
+        """
+        for operacion in DiarioPagos.pendientes():
+            if self._detener.is_set():
+                return False
+
+            resultado = TransaccionModel.finalizar_idempotente(
+                operacion['clave'],
+                operacion['transaccion_id'],
+                operacion['datos'],
+                operacion['detalles']
+            )
+
+            if resultado.get('success'):
+                DiarioPagos.marcar_aplicada(operacion['clave'])
+                logger.info(f"✅ Pago de la transacción {operacion['transaccion_id']} aplicado desde el diario")
+                if self.al_aplicar:
+                    try:
+                        self.al_aplicar(operacion, resultado)
+                    except Exception as e:
+                        logger.warning(f"⚠️ Error notificando operación aplicada: {e}")
+                continue
+
+            if resultado.get('conexion'):
+                DiarioPagos.registrar_fallo(operacion['clave'], resultado.get('error', ''))
+                return True
+
+            definitivo = operacion['intentos'] + 1 >= self.MAX_INTENTOS
+            DiarioPagos.registrar_fallo(operacion['clave'], resultado.get('error', ''), definitivo)
+            if definitivo:
+                logger.error(f"❌ Operación {operacion['clave']} marcada con error: {resultado.get('error')}")
+
+        return False
@@ -0,0 +1,277 @@
+# service/exportacion_libro_service.py
+"""
+Servicio de exportación del libro de transacciones (CSV / XLSX / Parquet).
+
+Las filas (una por detalle de transacción, con datos del estudiante y del
+programa) se leen con un cursor del lado del servidor y se escriben por
+lotes, de modo que la memoria usada no depende del tamaño del período.
+No depende de Qt: la interfaz lo ejecuta en un hilo de fondo y recibe el
+avance mediante el callback ``progreso``.
+"""
+import csv
+import logging
+import os
+from datetime import date, datetime
+from decimal import Decimal
+from typing import Any, Callable, Dict, List, Optional, Sequence
+
+from config.database import Database
+from config.paths import Paths
+
+logger = logging.getLogger(__name__)
+
+# progreso(filas_escritas, total_estimado)
+CallbackProgreso = Callable[[int, int], None]
+
+
+class ExportacionCancelada(Exception):
+    """La exportación fue cancelada por el usuario"""
+
+
+# ===== ESCRITORES POR FORMATO =====
+
+class _EscritorCSV:
+    """Escritor CSV (UTF-8 con BOM para que Excel respete las tildes)"""
+
+    extension = 'csv'
+
+    def __init__(self, ruta: str, columnas: Sequence[str]):
+        self._archivo = open(ruta, 'w', encoding='utf-8-sig', newline='')
+        self._escritor = csv.writer(self._archivo)
+        self._escritor.writerow(columnas)
+
+    def escribir(self, filas: List[tuple]) -> None:
+        self._escritor.writerows(filas)
+
+    def cerrar(self) -> None:
+        self._archivo.close()
+
+
+class _EscritorXLSX:
+    """Escritor XLSX en modo write-only de openpyxl (no retiene las filas)"""
+
+    extension = 'xlsx'
+
+    def __init__(self, ruta: str, columnas: Sequence[str]):
+        try:
+            from openpyxl import Workbook
+        except ImportError:
+            raise RuntimeError("Para exportar a XLSX instale openpyxl (pip install openpyxl)")
+
+        self._ruta = ruta
+        self._libro = Workbook(write_only=True)
+        self._hoja = self._libro.create_sheet('Libro')
+        self._hoja.append(list(columnas))
+
+    def escribir(self, filas: List[tuple]) -> None:
+        for fila in filas:
+            # openpyxl no acepta Decimal en todas las versiones
+            self._hoja.append([float(v) if isinstance(v, Decimal) else v for v in fila])
+
+    def cerrar(self) -> None:
+        self._libro.save(self._ruta)
+
+
+class _EscritorParquet:
+    """Escritor Parquet por grupos de filas con pyarrow"""
+
+    extension = 'parquet'
+
+    def __init__(self, ruta: str, columnas: Sequence[str]):
+        try:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+        except ImportError:
+            raise RuntimeError("Para exportar a Parquet instale pyarrow (pip install pyarrow)")
+
+        # Tipos de las columnas numéricas y de fecha; el resto se guarda como texto
+        decimal = pa.decimal128(12, 2)
+        tipos = {
+            'fecha_pago': pa.date32(),
+            'monto_total': decimal,
+            'descuento_total': decimal,
+            'monto_final': decimal,
+            'orden': pa.int32(),
+            'cantidad': pa.int32(),
+            'precio_unitario': decimal,
+            'subtotal': decimal,
+        }
+
+        self._pa = pa
+        self._columnas = list(columnas)
+        self._esquema = pa.schema([(nombre, tipos.get(nombre, pa.string())) for nombre in self._columnas])
+        self._escritor = pq.ParquetWriter(ruta, self._esquema)
+
+    def escribir(self, filas: List[tuple]) -> None:
+        columnas = list(zip(*filas)) if filas else [[] for _ in self._columnas]
+        tabla = self._pa.Table.from_arrays(
+            [self._pa.array(valores, type=campo.type) for valores, campo in zip(columnas, self._esquema)],
+            schema=self._esquema
+        )
+        self._escritor.write_table(tabla)
+
+    def cerrar(self) -> None:
+        self._escritor.close()
+
+
+class ExportacionLibroService:
+    """Exportación por lotes del libro de transacciones"""
+
+    ESCRITORES = {
+        'csv': _EscritorCSV,
+        'xlsx': _EscritorXLSX,
+        'parquet': _EscritorParquet,
+    }
+
+    TAMANO_LOTE = 2000
+
+    COLUMNAS = (
+        'numero_transaccion', 'fecha_pago', 'estado', 'forma_pago',
+        'numero_comprobante', 'banco_origen',
+        'estudiante_ci', 'estudiante', 'programa_codigo', 'programa',
+        'monto_total', 'descuento_total', 'monto_final',
+        'orden', 'concepto_codigo', 'concepto', 'descripcion',
+        'cantidad', 'precio_unitario', 'subtotal',
+    )
+
+    QUERY = """
+        SELECT
+            t.numero_transaccion,
+            t.fecha_pago,
+            t.estado,
+            t.forma_pago,
+            t.numero_comprobante,
+            t.banco_origen,
+            CONCAT(e.ci_numero, ' ', e.ci_expedicion) AS estudiante_ci,
+            CONCAT(e.apellido_paterno, ' ', COALESCE(e.apellido_materno, ''), ' ', e.nombres) AS estudiante,
+            p.codigo AS programa_codigo,
+            p.nombre AS programa,
+            t.monto_total,
+            t.descuento_total,
+            t.monto_final,
+            d.orden,
+            c.codigo AS concepto_codigo,
+            c.nombre AS concepto,
+            d.descripcion,
+            d.cantidad,
+            d.precio_unitario,
+            d.subtotal
+        FROM transacciones t
+        LEFT JOIN estudiantes e ON e.id = t.estudiante_id
+        LEFT JOIN programas p ON p.id = t.programa_id
+        LEFT JOIN detalles_transaccion d ON d.transaccion_id = t.id
+        LEFT JOIN conceptos_pago c ON c.id = d.concepto_pago_id
+        WHERE t.fecha_pago BETWEEN %s AND %s
+        ORDER BY t.fecha_pago, t.numero_transaccion, d.orden
+    """
+
+    @classmethod
+    def contar_filas(cls, cursor, fecha_inicio: date, fecha_fin: date) -> int:
+        """Total de filas del libro (para el avance), sin leerlas"""
+        cursor.execute("""
+            SELECT COUNT(*)
+            FROM transacciones t
+            LEFT JOIN detalles_transaccion d ON d.transaccion_id = t.id
+            WHERE t.fecha_pago BETWEEN %s AND %s
+        """, (fecha_inicio, fecha_fin))
+        resultado = cursor.fetchone()
+        return int(resultado[0]) if resultado else 0
+
+    @classmethod
+    def exportar(cls, fecha_inicio: date, fecha_fin: date, formato: str = 'csv',
+                 progreso: Optional[CallbackProgreso] = None,
+                 cancelado: Optional[Callable[[], bool]] = None,
+                 tamano_lote: Optional[int] = None) -> Dict[str, Any]:
+        """
+        Exportar el libro de transacciones de un período
+
+        Args:
+            fecha_inicio: Primer día del período
+            fecha_fin: Último día del período
+            formato: 'csv', 'xlsx' o 'parquet'
+            progreso: Callback (filas_escritas, total) llamado tras cada lote
+            cancelado: Función que devuelve True para interrumpir la exportación
+            tamano_lote: Filas por lote leídas del cursor del servidor
+
+        Returns:
+            Dict con 'ruta', 'filas' y 'segundos'
+        """
+        formato = (formato or '').lower()
+        clase_escritor = cls.ESCRITORES.get(formato)
+        if clase_escritor is None:
+            return {'success': False, 'error': f'Formato no soportado: {formato}'}
+
+        tamano_lote = tamano_lote or cls.TAMANO_LOTE
+        inicio = datetime.now()
+
+        ruta = None
+        connection = None
+        cursor = None
+        escritor = None
+        escritas = 0
+        try:
+            ruta = str(Paths.get_reporte_path(
+                f"libro_transacciones_{fecha_inicio}_{fecha_fin}", clase_escritor.extension
+            ))
+            escritor = clase_escritor(ruta, cls.COLUMNAS)
+
+            connection = Database.get_connection()
+            if not connection:
+                raise RuntimeError('No se pudo conectar a la base de datos')
+
+            with connection.cursor() as cursor_conteo:
+                total = cls.contar_filas(cursor_conteo, fecha_inicio, fecha_fin)
+
+            # Cursor con nombre: las filas quedan en el servidor y se traen por lotes
+            cursor = connection.cursor(name='exportacion_libro_transacciones')
+            cursor.itersize = tamano_lote
+            cursor.execute(cls.QUERY, (fecha_inicio, fecha_fin))
+
+            if progreso:
+                progreso(0, total)
+
+            while True:
+                if cancelado and cancelado():
+                    raise ExportacionCancelada()
+
+                filas = cursor.fetchmany(tamano_lote)
+                if not filas:
+                    break
+
+                escritor.escribir(filas)
+                escritas += len(filas)
+                if progreso:
+                    progreso(escritas, max(total, escritas))
+
+            escritor.cerrar()
+            escritor = None
+
+            segundos = round((datetime.now() - inicio).total_seconds(), 2)
+            logger.info(f"✅ Libro de transacciones exportado: {escritas} filas en {segundos} s -> {ruta}")
+            return {'success': True, 'ruta': ruta, 'filas': escritas, 'segundos': segundos}
+
+        except ExportacionCancelada:
+            logger.warning(f"⚠️ Exportación del libro cancelada tras {escritas} filas")
+            return {'success': False, 'cancelado': True, 'error': 'Exportación cancelada'}
+
+        except Exception as e:
+            logger.error(f"❌ Error exportando libro de transacciones: {e}")
+            return {'success': False, 'error': str(e)}
+
+        finally:
+            if escritor is not None:
+                # Exportación incompleta: cerrar y descartar el archivo
+                try:
+                    escritor.cerrar()
+                except Exception:
+                    pass
+                try:
+                    os.remove(ruta)
+                except OSError:
+                    pass
+            if cursor:
+                cursor.close()
+            if connection:
+                # Sólo lectura: terminar la transacción del cursor con nombre
+                connection.rollback()
+                Database.return_connection(connection)
@@ -0,0 +1,712 @@
+# service/importacion_inscripciones_service.py
+"""
+Servicio de importación masiva de inscripciones retroactivas (CSV).
+
+Pensado para migrar planillas históricas: cada fila es una inscripción y,
+opcionalmente, un pago realizado. Las filas siguientes con el mismo
+estudiante y programa sólo agregan pagos a la inscripción de la primera.
+
+Flujo:
+1. Leer el CSV y validar todas las filas en una pasada con Validators
+   (CI, expedición, fechas, montos, estado, forma de pago, observaciones),
+   acumulando todos los errores de cada fila
+2. Cargar las filas válidas con COPY en una tabla temporal
+3. Validar en SQL, por conjuntos: estudiante por CI, programa por código,
+   concepto de pago, comprobantes repetidos o ya registrados, días de caja
+   cerrados, inscripciones existentes, pagos que superan el valor final y
+   cupos (una reserva por programa)
+4. Insertar las inscripciones y los pagos históricos con una sentencia cada
+   uno dentro de la misma transacción, o hacer rollback en modo simulación,
+   y devolver el reporte por fila
+"""
+import csv
+import io
+import logging
+from datetime import date, datetime
+from decimal import Decimal
+from typing import Any, Dict, List, Optional, Tuple
+
+from config.constants import ExpedicionCI, FormaPago
+from config.database import Database
+from config.paths import Paths
+from model.programa_model import ProgramaModel
+from model.registro import registros_desde_cursor
+from service.importacion_pagos_service import ImportacionPagosService
+from utils.validators import Validators
+
+logger = logging.getLogger(__name__)
+
+
+class ImportacionInscripcionesService:
+    """
+    Importa inscripciones retroactivas con sus pagos históricos desde CSV.
+
+    Estados de cada fila:
+    - VALIDO: se importaría (modo simulación) / IMPORTADO: se registró
+    - INVALIDO: la fila no superó la validación de formato
+    - ESTUDIANTE_NO_ENCONTRADO / ESTUDIANTE_AMBIGUO
+    - PROGRAMA_NO_ENCONTRADO / PROGRAMA_CANCELADO / VALOR_FINAL_INVALIDO
+    - CONCEPTO_NO_ENCONTRADO / DUPLICADO_EN_ARCHIVO / COMPROBANTE_REGISTRADO
+    - CAJA_CERRADA / INSCRIPCION_EXISTENTE / INSCRIPCION_RECHAZADA
+    - PAGOS_EXCEDEN_VALOR / SIN_CUPOS
+    """
+
+    # Encabezados aceptados para cada campo (normalizados sin tildes)
+    ALIAS_COLUMNAS = {
+        'ci_numero': ('ci', 'ci_numero', 'carnet', 'documento', 'nro_documento', 'numero_documento'),
+        'ci_expedicion': ('expedicion', 'ci_expedicion', 'exp', 'expedido'),
+        'codigo_programa': ('programa', 'codigo_programa', 'codigo', 'cod_programa'),
+        'fecha_inscripcion': ('fecha_inscripcion', 'fecha'),
+        'valor_final': ('valor_final', 'valor', 'costo', 'costo_programa'),
+        'estado_inscripcion': ('estado', 'estado_inscripcion'),
+        'observaciones': ('observaciones', 'obs', 'observacion'),
+        'fecha_pago': ('fecha_pago',),
+        'monto_pagado': ('monto_pagado', 'pago', 'monto', 'importe'),
+        'concepto': ('concepto', 'concepto_pago'),
+        'forma_pago': ('forma_pago', 'medio_pago'),
+        'numero_comprobante': ('comprobante', 'numero_comprobante', 'nro_comprobante',
+                               'recibo', 'nro_recibo'),
+    }
+
+    CAMPOS_OBLIGATORIOS = ('ci_numero', 'codigo_programa', 'fecha_inscripcion')
+
+    ESTADOS_INSCRIPCION = ('PREINSCRITO', 'INSCRITO', 'EN_CURSO', 'CONCLUIDO', 'RETIRADO')
+
+    # Las inscripciones retroactivas se admiten en cualquier estado salvo
+    # CANCELADO (misma regla que fn_crear_inscripcion_retroactiva)
+    ESTADOS_PROGRAMA_PERMITIDOS = ['PLANIFICADO', 'INSCRIPCIONES', 'EN_CURSO', 'CONCLUIDO']
+
+    COLUMNAS_COPY = ('fila', 'ci_numero', 'ci_expedicion', 'codigo_programa', 'fecha_inscripcion',
+                     'valor_final', 'estado_inscripcion', 'observaciones', 'fecha_pago',
+                     'monto_pagado', 'concepto', 'forma_pago', 'numero_comprobante')
+
+    COLUMNAS_REPORTE = ['fila', 'ci_numero', 'codigo_programa', 'fecha_inscripcion', 'valor_final',
+                        'fecha_pago', 'monto_pagado', 'numero_comprobante', 'estudiante_id',
+                        'programa_id', 'inscripcion_id', 'transaccion_id', 'numero_transaccion',
+                        'estado', 'motivo']
+
+    # ===== LECTURA Y VALIDACIÓN DEL ARCHIVO =====
+
+    @classmethod
+    def _validar_fila(cls, valores: Dict[str, Optional[str]]) -> Tuple[Optional[Tuple], List[str]]:
+        """
+        Validar una fila completa acumulando todos sus errores
+
+        Returns:
+            Tupla (valores normalizados para COPY sin el número de fila o
+            None, lista de errores)
+        """
+        errores: List[str] = []
+        hoy = date.today()
+
+        valido, ci_numero = Validators.validar_ci(valores.get('ci_numero'))
+        if not valido:
+            errores.append(ci_numero)
+
+        ci_expedicion = (valores.get('ci_expedicion') or '').upper() or None
+        if ci_expedicion and ci_expedicion not in ExpedicionCI.__members__:
+            errores.append(f"Expedición inválida: {valores.get('ci_expedicion')}")
+
+        codigo_programa = (valores.get('codigo_programa') or '').upper()
+        if not codigo_programa:
+            errores.append('Código de programa vacío')
+
+        fecha_inscripcion = ImportacionPagosService._parsear_fecha(valores.get('fecha_inscripcion') or '')
+        if not fecha_inscripcion:
+            errores.append(f"Fecha de inscripción inválida: {valores.get('fecha_inscripcion')}")
+        elif fecha_inscripcion > hoy:
+            errores.append('La fecha de inscripción no puede ser futura')
+
+        valor_final = None
+        if valores.get('valor_final'):
+            valor_final = ImportacionPagosService._parsear_monto(valores['valor_final'])
+            if valor_final is None:
+                errores.append(f"Valor final inválido: {valores.get('valor_final')}")
+
+        estado_inscripcion = (valores.get('estado_inscripcion') or 'PREINSCRITO').upper()
+        if estado_inscripcion not in cls.ESTADOS_INSCRIPCION:
+            errores.append(f"Estado de inscripción inválido: {valores.get('estado_inscripcion')}")
+
+        valido, observaciones = Validators.validar_texto_opcional(
+            'observaciones', valores.get('observaciones') or '', max_length=500
+        )
+        if not valido:
+            errores.append(observaciones)
+
+        # Pago histórico opcional: fecha y monto van juntos
+        fecha_pago = monto_pagado = None
+        concepto = forma_pago = None
+        if valores.get('monto_pagado') or valores.get('fecha_pago'):
+            monto_pagado = ImportacionPagosService._parsear_monto(valores.get('monto_pagado') or '')
+            if monto_pagado is None:
+                errores.append(f"Monto pagado inválido: {valores.get('monto_pagado')}")
+
+            fecha_pago = ImportacionPagosService._parsear_fecha(valores.get('fecha_pago') or '')
+            if not fecha_pago:
+                errores.append(f"Fecha de pago inválida: {valores.get('fecha_pago')}")
+            elif fecha_pago > hoy:
+                errores.append('La fecha de pago no puede ser futura')
+
+            concepto = (valores.get('concepto') or 'MENSUALIDAD').upper()
+            forma_pago = (valores.get('forma_pago') or FormaPago.EFECTIVO.value).upper()
+            if forma_pago not in FormaPago.__members__:
+                errores.append(f"Forma de pago inválida: {valores.get('forma_pago')}")
+
+        if errores:
+            return None, errores
+
+        return (
+            ci_numero, ci_expedicion, codigo_programa, fecha_inscripcion.isoformat(),
+            str(valor_final) if valor_final is not None else None,
+            estado_inscripcion, observaciones or None,
+            fecha_pago.isoformat() if fecha_pago else None,
+            str(monto_pagado) if monto_pagado is not None else None,
+            concepto, forma_pago, valores.get('numero_comprobante')
+        ), []
+
+    @classmethod
+    def leer_planilla(cls, ruta_archivo: str) -> Tuple[List[Tuple], List[Dict[str, Any]]]:
+        """
+        Leer y validar una planilla de inscripciones históricas en CSV
+
+        Args:
+            ruta_archivo: Ruta del archivo CSV
+
+        Returns:
+            Tupla (filas válidas listas para COPY, filas inválidas con motivo)
+        """
+        with open(ruta_archivo, 'r', encoding='utf-8-sig', newline='') as archivo:
+            muestra = archivo.read(4096)
+            archivo.seek(0)
+            try:
+                dialecto = csv.Sniffer().sniff(muestra, delimiters=',;\t|')
+            except csv.Error:
+                dialecto = csv.excel
+
+            lector = csv.reader(archivo, dialecto)
+            encabezados = [ImportacionPagosService._normalizar_encabezado(h) for h in next(lector, [])]
+
+            # Posición de cada campo según los alias (un encabezado sirve a un solo campo)
+            posiciones: Dict[str, int] = {}
+            for campo, alias in cls.ALIAS_COLUMNAS.items():
+                for i, encabezado in enumerate(encabezados):
+                    if encabezado in alias and i not in posiciones.values():
+                        posiciones[campo] = i
+                        break
+
+            faltantes = [c for c in cls.CAMPOS_OBLIGATORIOS if c not in posiciones]
+            if faltantes:
+                raise ValueError(f"Columnas obligatorias no encontradas: {', '.join(faltantes)}")
+
+            validas: List[Tuple] = []
+            invalidas: List[Dict[str, Any]] = []
+
+            # La fila 1 es el encabezado
+            for numero_fila, fila in enumerate(lector, start=2):
+                if not any(celda.strip() for celda in fila):
+                    continue
+
+                valores = {
+                    campo: (fila[pos].strip() or None) if pos < len(fila) else None
+                    for campo, pos in posiciones.items()
+                }
+
+                normalizada, errores = cls._validar_fila(valores)
+                if errores:
+                    invalidas.append({
+                        'fila': numero_fila,
+                        'ci_numero': valores.get('ci_numero'),
+                        'codigo_programa': valores.get('codigo_programa'),
+                        'fecha_inscripcion': valores.get('fecha_inscripcion'),
+                        'valor_final': valores.get('valor_final'),
+                        'fecha_pago': valores.get('fecha_pago'),
+                        'monto_pagado': valores.get('monto_pagado'),
+                        'numero_comprobante': valores.get('numero_comprobante'),
+                        'estado': 'INVALIDO',
+                        'motivo': '; '.join(errores)
+                    })
+                    continue
+
+                validas.append((numero_fila,) + normalizada)
+
+        return validas, invalidas
+
+    # ===== VALIDACIÓN EN BASE DE DATOS =====
+
+    @classmethod
+    def _cargar_con_copy(cls, cursor, filas: List[Tuple]) -> None:
+        """Crear la tabla temporal de staging y cargarla con COPY"""
+        cursor.execute("""
+            CREATE TEMP TABLE tmp_inscripciones_retroactivas (
+                fila INTEGER PRIMARY KEY,
+                ci_numero VARCHAR(20) NOT NULL,
+                ci_expedicion VARCHAR(5),
+                codigo_programa VARCHAR(20) NOT NULL,
+                fecha_inscripcion DATE NOT NULL,
+                valor_final NUMERIC(10,2),
+                estado_inscripcion VARCHAR(20) NOT NULL,
+                observaciones TEXT,
+                fecha_pago DATE,
+                monto_pagado NUMERIC(10,2),
+                concepto VARCHAR(20),
+                forma_pago VARCHAR(20),
+                numero_comprobante VARCHAR(50),
+                estudiante_id INTEGER,
+                programa_id INTEGER,
+                concepto_pago_id INTEGER,
+                es_inscripcion BOOLEAN NOT NULL DEFAULT FALSE,
+                fila_inscripcion INTEGER,
+                inscripcion_id INTEGER,
+                transaccion_id INTEGER,
+                numero_transaccion VARCHAR(50),
+                estado VARCHAR(30),
+                motivo TEXT
+            ) ON COMMIT DROP
+        """)
+
+        buffer = io.StringIO()
+        escritor = csv.writer(buffer)
+        escritor.writerows(filas)
+        buffer.seek(0)
+
+        cursor.copy_expert(
+            f"COPY tmp_inscripciones_retroactivas ({', '.join(cls.COLUMNAS_COPY)}) FROM STDIN WITH (FORMAT csv)",
+            buffer
+        )
+        cursor.execute("ANALYZE tmp_inscripciones_retroactivas")
+
+    @classmethod
+    def _validar(cls, cursor) -> None:
+        """Clasificar todas las filas de staging con operaciones por conjuntos"""
+        # Estudiante por CI normalizado (y expedición si la planilla la trae)
+        cursor.execute("""
+            UPDATE tmp_inscripciones_retroactivas t
+            SET estudiante_id = CASE WHEN m.cantidad = 1 THEN m.estudiante_id END,
+                estado = CASE WHEN m.cantidad > 1 THEN 'ESTUDIANTE_AMBIGUO' END,
+                motivo = CASE WHEN m.cantidad > 1
+                    THEN 'Hay ' || m.cantidad || ' estudiantes con el CI ' || t.ci_numero
+                         || '; indique la expedición' END
+            FROM (
+                SELECT t.fila, MIN(e.id) AS estudiante_id, COUNT(*) AS cantidad
+                FROM tmp_inscripciones_retroactivas t
+                JOIN estudiantes e ON UPPER(BTRIM(e.ci_numero)) = t.ci_numero
+                    AND (t.ci_expedicion IS NULL OR e.ci_expedicion = t.ci_expedicion)
+                GROUP BY t.fila
+            ) m
+            WHERE m.fila = t.fila
+        """)
+        cursor.execute("""
+            UPDATE tmp_inscripciones_retroactivas
+            SET estado = 'ESTUDIANTE_NO_ENCONTRADO',
+                motivo = 'No existe un estudiante con el CI ' || ci_numero
+            WHERE estado IS NULL AND estudiante_id IS NULL
+        """)
+
+        # Programa por código; el valor final por defecto es el costo total
+        cursor.execute("""
+            UPDATE tmp_inscripciones_retroactivas t
+            SET programa_id = p.id,
+                valor_final = COALESCE(t.valor_final, p.costo_total),
+                estado = CASE
+                    WHEN p.estado = 'CANCELADO' THEN 'PROGRAMA_CANCELADO'
+                    WHEN t.valor_final > p.costo_total THEN 'VALOR_FINAL_INVALIDO'
+                END,
+                motivo = CASE
+                    WHEN p.estado = 'CANCELADO' THEN 'El programa ' || p.codigo || ' está cancelado'
+                    WHEN t.valor_final > p.costo_total
+                        THEN 'El valor final (' || t.valor_final || ') supera el costo total del programa ('
+                             || p.costo_total || ')'
+                END
+            FROM programas p
+            WHERE UPPER(p.codigo) = t.codigo_programa
+            AND t.estado IS NULL
+        """)
+        cursor.execute("""
+            UPDATE tmp_inscripciones_retroactivas
+            SET estado = 'PROGRAMA_NO_ENCONTRADO',
+                motivo = 'No existe un programa con el código ' || codigo_programa
+            WHERE estado IS NULL AND programa_id IS NULL
+        """)
+
+        # Concepto de los pagos
+        cursor.execute("""
+            UPDATE tmp_inscripciones_retroactivas t
+            SET concepto_pago_id = c.id
+            FROM conceptos_pago c
+            WHERE c.codigo = t.concepto
+            AND t.monto_pagado IS NOT NULL
+            AND t.estado IS NULL
+        """)
+        cursor.execute("""
+            UPDATE tmp_inscripciones_retroactivas
+            SET estado = 'CONCEPTO_NO_ENCONTRADO',
+                motivo = 'No existe el concepto de pago ' || concepto
+            WHERE estado IS NULL AND monto_pagado IS NOT NULL AND concepto_pago_id IS NULL
+        """)
+
+        # Comprobantes repetidos dentro del mismo archivo (se conserva el primero)
+        cursor.execute("""
+            UPDATE tmp_inscripciones_retroactivas t
+            SET estado = 'DUPLICADO_EN_ARCHIVO',
+                motivo = 'Comprobante repetido en el archivo (fila ' || d.primera || ')'
+            FROM (
+                SELECT fila, MIN(fila) OVER (PARTITION BY numero_comprobante) AS primera
+                FROM tmp_inscripciones_retroactivas
+                WHERE numero_comprobante IS NOT NULL AND monto_pagado IS NOT NULL
+            ) d
+            WHERE d.fila = t.fila AND d.primera <> t.fila AND t.estado IS NULL
+        """)
+
+        # Comprobantes ya registrados (anti-join contra transacciones)
+        cursor.execute("""
+            UPDATE tmp_inscripciones_retroactivas t
+            SET estado = 'COMPROBANTE_REGISTRADO',
+                motivo = 'Comprobante ya registrado en la transacción ' || tr.numero_transaccion
+            FROM transacciones tr
+            WHERE tr.numero_comprobante = t.numero_comprobante
+            AND t.monto_pagado IS NOT NULL
+            AND t.estado IS NULL
+        """)
+
+        # El pago genera un movimiento de caja en su fecha: no en días ya cerrados
+        cursor.execute("""
+            UPDATE tmp_inscripciones_retroactivas t
+            SET estado = 'CAJA_CERRADA',
+                motivo = 'La caja del ' || TO_CHAR(t.fecha_pago, 'DD/MM/YYYY') || ' ya está cerrada'
+            FROM cierres_caja cc
+            WHERE cc.fecha = t.fecha_pago
+            AND t.estado IS NULL
+        """)
+
+        # La primera fila de cada estudiante y programa crea la inscripción;
+        # las siguientes sólo agregan pagos
+        cursor.execute("""
+            UPDATE tmp_inscripciones_retroactivas t
+            SET fila_inscripcion = g.primera,
+                es_inscripcion = (g.primera = t.fila)
+            FROM (
+                SELECT fila, MIN(fila) OVER (PARTITION BY estudiante_id, programa_id) AS primera
+                FROM tmp_inscripciones_retroactivas
+                WHERE estudiante_id IS NOT NULL AND programa_id IS NOT NULL
+            ) g
+            WHERE g.fila = t.fila
+        """)
+
+        # Inscripciones ya registradas: la reimportación del archivo no duplica nada
+        cursor.execute("""
+            UPDATE tmp_inscripciones_retroactivas t
+            SET estado = 'INSCRIPCION_EXISTENTE',
+                motivo = 'El estudiante ya está inscrito en el programa (inscripción ' || i.id || ')',
+                inscripcion_id = i.id
+            FROM inscripciones i
+            WHERE i.estudiante_id = t.estudiante_id
+            AND i.programa_id = t.programa_id
+            AND t.estado IS NULL
+        """)
+        cursor.execute("""
+            UPDATE tmp_inscripciones_retroactivas
+            SET estado = 'DUPLICADO_EN_ARCHIVO',
+                motivo = 'Inscripción repetida sin pago (fila ' || fila_inscripcion || ')'
+            WHERE estado IS NULL AND NOT es_inscripcion AND monto_pagado IS NULL
+        """)
+
+        # Las filas de pago siguen a la fila que crea la inscripción
+        cursor.execute("""
+            UPDATE tmp_inscripciones_retroactivas t
+            SET estado = 'INSCRIPCION_RECHAZADA',
+                motivo = 'La fila ' || p.fila || ' de la inscripción fue rechazada (' || p.estado || ')'
+            FROM tmp_inscripciones_retroactivas p
+            WHERE p.fila = t.fila_inscripcion
+            AND p.estado IS NOT NULL
+            AND NOT t.es_inscripcion
+            AND t.estado IS NULL
+        """)
+
+        # Los pagos de una inscripción no pueden superar su valor final
+        cursor.execute("""
+            UPDATE tmp_inscripciones_retroactivas t
+            SET estado = 'PAGOS_EXCEDEN_VALOR',
+                motivo = 'Los pagos (' || s.pagado || ') superan el valor final (' || s.valor_final || ')'
+            FROM (
+                SELECT fila_inscripcion,
+                    SUM(monto_pagado) AS pagado,
+                    MAX(valor_final) FILTER (WHERE es_inscripcion) AS valor_final
+                FROM tmp_inscripciones_retroactivas
+                WHERE estado IS NULL
+                GROUP BY fila_inscripcion
+            ) s
+            WHERE s.fila_inscripcion = t.fila_inscripcion
+            AND s.pagado > s.valor_final
+            AND t.estado IS NULL
+        """)
+
+        # Cupos: una reserva por programa para todas sus inscripciones nuevas
+        # (en orden de programa para no bloquear en distinto orden que otra
+        # sesión). La tabla temporal garantiza una sola llamada por programa.
+        cursor.execute("""
+            CREATE TEMP TABLE tmp_reservas_retroactivas ON COMMIT DROP AS
+            SELECT g.programa_id, rc.reservado, rc.mensaje
+            FROM (
+                SELECT programa_id, COUNT(*)::INTEGER AS cantidad
+                FROM tmp_inscripciones_retroactivas
+                WHERE estado IS NULL AND es_inscripcion
+                GROUP BY programa_id
+                ORDER BY programa_id
+            ) g
+            CROSS JOIN LATERAL fn_reservar_cupos(g.programa_id, g.cantidad, %s) rc
+        """, (cls.ESTADOS_PROGRAMA_PERMITIDOS,))
+        cursor.execute("""
+            UPDATE tmp_inscripciones_retroactivas t
+            SET estado = 'SIN_CUPOS',
+                motivo = r.mensaje
+            FROM tmp_reservas_retroactivas r
+            WHERE r.programa_id = t.programa_id
+            AND NOT r.reservado
+            AND t.estado IS NULL
+        """)
+
+        cursor.execute("""
+            UPDATE tmp_inscripciones_retroactivas
+            SET estado = 'VALIDO', motivo = NULL
+            WHERE estado IS NULL
+        """)
+
+    @staticmethod
+    def _registrar_validas(cursor, nombre_archivo: str, usuario_id: Optional[int]) -> Tuple[int, int]:
+        """
+        Insertar las inscripciones y los pagos válidos (una sentencia cada uno)
+
+        Returns:
+            Tupla (inscripciones creadas, pagos registrados)
+        """
+        # 1. Inscripciones; una inscripción concurrente del mismo estudiante
+        # sólo se omite y se libera su cupo
+        cursor.execute("""
+            WITH nuevas AS (
+                INSERT INTO inscripciones (
+                    estudiante_id, programa_id, fecha_inscripcion,
+                    valor_final, observaciones, estado
+                )
+                SELECT
+                    t.estudiante_id, t.programa_id, t.fecha_inscripcion, t.valor_final,
+                    COALESCE(t.observaciones, CASE
+                        WHEN t.valor_final >= p.costo_total THEN 'No se aplicó ningún descuento'
+                        ELSE 'Se aplica un descuento de '
+                             || TO_CHAR((p.costo_total - t.valor_final) / p.costo_total * 100, 'FM990.00')
+                             || '% Justificación: Importación retroactiva ' || %s || ' (fila ' || t.fila || ')'
+                    END),
+                    t.estado_inscripcion
+                FROM tmp_inscripciones_retroactivas t
+                JOIN programas p ON p.id = t.programa_id
+                WHERE t.estado = 'VALIDO' AND t.es_inscripcion
+                ORDER BY t.fila
+                ON CONFLICT ON CONSTRAINT uk_inscripcion_unica DO NOTHING
+                RETURNING id, estudiante_id, programa_id
+            )
+            UPDATE tmp_inscripciones_retroactivas t
+            SET inscripcion_id = n.id
+            FROM nuevas n
+            WHERE n.estudiante_id = t.estudiante_id
+            AND n.programa_id = t.programa_id
+            AND t.estado = 'VALIDO'
+        """, (nombre_archivo,))
+
+        cursor.execute("""
+            SELECT fn_liberar_cupos(programa_id, COUNT(*)::INTEGER)
+            FROM tmp_inscripciones_retroactivas
+            WHERE estado = 'VALIDO' AND es_inscripcion AND inscripcion_id IS NULL
+            GROUP BY programa_id
+            ORDER BY programa_id
+        """)
+        cursor.execute("""
+            UPDATE tmp_inscripciones_retroactivas
+            SET estado = 'INSCRIPCION_EXISTENTE',
+                motivo = 'El estudiante fue inscrito en el programa durante la importación'
+            WHERE estado = 'VALIDO' AND inscripcion_id IS NULL
+        """)
+
+        cursor.execute("""
+            SELECT COUNT(*) FROM tmp_inscripciones_retroactivas
+            WHERE estado = 'VALIDO' AND es_inscripcion
+        """)
+        inscripciones = cursor.fetchone()[0]
+
+        # 2. Pagos históricos (cabecera y detalle); el ID se asigna antes para
+        # enlazar cada transacción con su fila aunque no tenga comprobante
+        cursor.execute("""
+            UPDATE tmp_inscripciones_retroactivas
+            SET transaccion_id = nextval('seq_transacciones_id')
+            WHERE estado = 'VALIDO' AND monto_pagado IS NOT NULL
+        """)
+        cursor.execute("""
+            WITH nuevas AS (
+                INSERT INTO transacciones (
+                    id, estudiante_id, programa_id, fecha_pago,
+                    monto_total, descuento_total, monto_final,
+                    forma_pago, estado, numero_comprobante,
+                    observaciones, registrado_por
+                )
+                SELECT
+                    transaccion_id, estudiante_id, programa_id, fecha_pago,
+                    monto_pagado, 0, monto_pagado,
+                    forma_pago, 'CONFIRMADO', numero_comprobante,
+                    'Pago histórico importado de ' || %s || ' (fila ' || fila || ')',
+                    %s
+                FROM tmp_inscripciones_retroactivas
+                WHERE estado = 'VALIDO' AND transaccion_id IS NOT NULL
+                ORDER BY fecha_pago, fila
+                RETURNING id, numero_transaccion
+            ),
+            detalles AS (
+                INSERT INTO detalles_transaccion (
+                    transaccion_id, concepto_pago_id, descripcion,
+                    cantidad, precio_unitario, subtotal, orden
+                )
+                SELECT n.id, t.concepto_pago_id, 'Pago histórico (importación retroactiva)',
+                    1, t.monto_pagado, t.monto_pagado, 1
+                FROM nuevas n
+                JOIN tmp_inscripciones_retroactivas t ON t.transaccion_id = n.id
+            )
+            UPDATE tmp_inscripciones_retroactivas t
+            SET numero_transaccion = n.numero_transaccion
+            FROM nuevas n
+            WHERE n.id = t.transaccion_id
+        """, (nombre_archivo, usuario_id))
+        pagos = cursor.rowcount
+
+        cursor.execute("""
+            UPDATE tmp_inscripciones_retroactivas
+            SET estado = 'IMPORTADO'
+            WHERE estado = 'VALIDO'
+        """)
+
+        return inscripciones, pagos
+
+    # ===== API PÚBLICA =====
+
+    @classmethod
+    def importar_planilla(cls, ruta_archivo: str, usuario_id: Optional[int] = None,
+                          aplicar: bool = True, guardar_reporte: bool = True) -> Dict[str, Any]:
+        """
+        Importar una planilla de inscripciones retroactivas con sus pagos
+
+        Args:
+            ruta_archivo: Ruta del CSV
+            usuario_id: Usuario que registra los pagos históricos
+            aplicar: Si es False sólo se valida (se hace rollback al final)
+            guardar_reporte: Guardar el reporte por fila en REPORTES_DIR
+
+        Returns:
+            Dict con 'resumen', 'filas' (reporte por fila) y 'reporte_path'
+        """
+        inicio = datetime.now()
+        try:
+            validas, invalidas = cls.leer_planilla(ruta_archivo)
+        except Exception as e:
+            logger.error(f"❌ Error leyendo planilla {ruta_archivo}: {e}")
+            return {'success': False, 'error': f'No se pudo leer el archivo: {e}'}
+
+        logger.info(f"📥 Planilla leída: {len(validas)} filas válidas, {len(invalidas)} inválidas")
+
+        filas_reporte: List[Dict[str, Any]] = []
+        inscripciones = pagos = 0
+        connection = None
+        cursor = None
+        try:
+            if validas:
+                connection = Database.get_connection()
+                if not connection:
+                    return {'success': False, 'error': 'No se pudo conectar a la base de datos'}
+
+                cursor = connection.cursor()
+                cls._cargar_con_copy(cursor, validas)
+                cls._validar(cursor)
+
+                if aplicar:
+                    nombre_archivo = ruta_archivo.replace('\\', '/').rsplit('/', 1)[-1]
+                    inscripciones, pagos = cls._registrar_validas(cursor, nombre_archivo, usuario_id)
+
+                cursor.execute(f"""
+                    SELECT {', '.join(cls.COLUMNAS_REPORTE)}
+                    FROM tmp_inscripciones_retroactivas
+                    ORDER BY fila
+                """)
+                filas_reporte = [r.to_dict() for r in registros_desde_cursor(cursor)]
+
+                if aplicar:
+                    connection.commit()
+                    ProgramaModel.invalidar_expediente()
+                else:
+                    # También libera los cupos reservados durante la validación
+                    connection.rollback()
+
+        except Exception as e:
+            if connection:
+                connection.rollback()
+                logger.warning("↩️ Rollback ejecutado por error en importación de inscripciones")
+            logger.error(f"❌ Error importando planilla {ruta_archivo}: {e}")
+            return {'success': False, 'error': str(e)}
+
+        finally:
+            if cursor:
+                cursor.close()
+            if connection:
+                Database.return_connection(connection)
+
+        filas_reporte = sorted(filas_reporte + invalidas, key=lambda f: f['fila'])
+        resumen = cls._resumir(filas_reporte)
+        resumen['inscripciones_creadas'] = inscripciones
+        resumen['pagos_registrados'] = pagos
+        resumen['simulacion'] = not aplicar
+        resumen['segundos'] = round((datetime.now() - inicio).total_seconds(), 2)
+
+        reporte_path = None
+        if guardar_reporte and filas_reporte:
+            reporte_path = cls.guardar_reporte(filas_reporte)
+
+        logger.info(f"✅ Planilla procesada: {resumen['por_estado']} "
+                    f"({inscripciones} inscripciones y {pagos} pagos registrados en {resumen['segundos']} s)")
+
+        return {
+            'success': True,
+            'resumen': resumen,
+            'filas': filas_reporte,
+            'reporte_path': reporte_path
+        }
+
+    @staticmethod
+    def _resumir(filas: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """Totales por estado de importación"""
+        por_estado: Dict[str, int] = {}
+        monto_pagos = Decimal('0')
+        for fila in filas:
+            estado = fila.get('estado') or 'SIN_ESTADO'
+            por_estado[estado] = por_estado.get(estado, 0) + 1
+            if estado in ('VALIDO', 'IMPORTADO'):
+                monto_pagos += Decimal(str(fila.get('monto_pagado') or 0))
+
+        aceptadas = por_estado.get('VALIDO', 0) + por_estado.get('IMPORTADO', 0)
+        return {
+            'total_filas': len(filas),
+            'por_estado': por_estado,
+            'aceptadas': aceptadas,
+            'rechazadas': len(filas) - aceptadas,
+            'monto_pagos': float(monto_pagos)
+        }
+
+    @classmethod
+    def guardar_reporte(cls, filas: List[Dict[str, Any]]) -> Optional[str]:
+        """Guardar el reporte de importación como CSV en el directorio de reportes"""
+        try:
+            ruta = Paths.get_reporte_path('importacion_inscripciones', 'csv')
+            with open(ruta, 'w', encoding='utf-8-sig', newline='') as archivo:
+                escritor = csv.DictWriter(archivo, fieldnames=cls.COLUMNAS_REPORTE, extrasaction='ignore')
+                escritor.writeheader()
+                escritor.writerows(filas)
+
+            logger.info(f"📄 Reporte de importación guardado en {ruta}")
+            return str(ruta)
+
+        except Exception as e:
+            logger.error(f"❌ Error guardando reporte de importación: {e}")
+            return None
@@ -0,0 +1,512 @@
+# service/importacion_pagos_service.py
+"""
+Servicio de importación masiva de pagos desde extractos bancarios (CSV).
+
+Flujo:
+1. Leer y normalizar el CSV del banco (fecha, CI, monto, comprobante...)
+2. Cargar las filas válidas con COPY en una tabla temporal
+3. Conciliar en SQL, por conjuntos: comprobantes repetidos o ya registrados
+   (anti-join contra transacciones), estudiante por CI e inscripción con
+   saldo pendiente suficiente para el acumulado de sus filas
+4. Registrar las filas conciliadas en un único INSERT dentro de la misma
+   transacción y devolver el reporte de conciliación
+"""
+import csv
+import io
+import logging
+import unicodedata
+from datetime import datetime, date
+from decimal import Decimal, InvalidOperation
+from typing import Any, Dict, List, Optional, Tuple
+
+from config.database import Database
+from config.paths import Paths
+from model.programa_model import ProgramaModel
+from model.registro import registros_desde_cursor
+
+logger = logging.getLogger(__name__)
+
+
+class ImportacionPagosService:
+    """
+    Importa pagos por transferencia desde extractos bancarios en CSV.
+
+    Estados de conciliación de cada fila:
+    - CONCILIADO: se registró (o se registraría en modo simulación)
+    - INVALIDO: la fila no se pudo interpretar
+    - SIN_COMPROBANTE / DUPLICADO_EN_ARCHIVO / COMPROBANTE_REGISTRADO
+    - ESTUDIANTE_NO_ENCONTRADO / SIN_INSCRIPCION / AMBIGUO
+    - SALDO_EXCEDIDO: con las filas anteriores de la misma inscripción el
+      acumulado supera su saldo pendiente
+    """
+
+    # Concepto con el que se registra el detalle de cada pago importado
+    CONCEPTO_PAGO = 'MENSUALIDAD'
+
+    # Encabezados aceptados para cada campo (normalizados sin tildes)
+    ALIAS_COLUMNAS = {
+        'fecha_pago': ('fecha', 'fecha_pago', 'fecha_operacion', 'fecha_transaccion'),
+        'ci_numero': ('ci', 'ci_numero', 'carnet', 'documento', 'nro_documento', 'numero_documento'),
+        'monto': ('monto', 'importe', 'abono', 'credito', 'haber'),
+        'numero_comprobante': ('comprobante', 'numero_comprobante', 'nro_comprobante',
+                               'referencia', 'nro_operacion', 'numero_operacion'),
+        'banco_origen': ('banco', 'banco_origen'),
+        'cuenta_origen': ('cuenta', 'cuenta_origen', 'nro_cuenta'),
+        'glosa': ('glosa', 'descripcion', 'concepto', 'detalle'),
+    }
+
+    CAMPOS_OBLIGATORIOS = ('fecha_pago', 'ci_numero', 'monto')
+
+    FORMATOS_FECHA = ('%d/%m/%Y', '%Y-%m-%d', '%d-%m-%Y', '%d/%m/%y')
+
+    COLUMNAS_COPY = ('fila', 'fecha_pago', 'ci_numero', 'monto', 'numero_comprobante',
+                     'banco_origen', 'cuenta_origen', 'glosa')
+
+    # ===== LECTURA DEL ARCHIVO =====
+
+    @staticmethod
+    def _normalizar_encabezado(texto: str) -> str:
+        """Encabezado en minúsculas, sin tildes y con guiones bajos"""
+        texto = unicodedata.normalize('NFKD', texto or '')
+        texto = ''.join(c for c in texto if not unicodedata.combining(c))
+        return '_'.join(texto.strip().lower().replace('.', ' ').split())
+
+    @staticmethod
+    def _parsear_monto(valor: str) -> Optional[Decimal]:
+        """Interpretar montos con separador decimal ',' o '.' (1.234,56 / 1,234.56)"""
+        texto = (valor or '').strip().replace(' ', '').replace('Bs', '').replace('$', '')
+        if not texto:
+            return None
+
+        if ',' in texto and '.' in texto:
+            # El último separador es el decimal
+            if texto.rfind(',') > texto.rfind('.'):
+                texto = texto.replace('.', '').replace(',', '.')
+            else:
+                texto = texto.replace(',', '')
+        elif ',' in texto:
+            entero, _, decimales = texto.rpartition(',')
+            texto = f"{entero.replace(',', '')}.{decimales}" if len(decimales) <= 2 else texto.replace(',', '')
+
+        try:
+            monto = Decimal(texto).quantize(Decimal('0.01'))
+        except InvalidOperation:
+            return None
+        return monto if monto > 0 else None
+
+    @classmethod
+    def _parsear_fecha(cls, valor: str) -> Optional[date]:
+        """Interpretar la fecha con los formatos habituales de los extractos"""
+        texto = (valor or '').strip()
+        for formato in cls.FORMATOS_FECHA:
+            try:
+                return datetime.strptime(texto, formato).date()
+            except ValueError:
+                continue
+        return None
+
+    @classmethod
+    def leer_extracto(cls, ruta_archivo: str) -> Tuple[List[Tuple], List[Dict[str, Any]]]:
+        """
+        Leer y normalizar un extracto bancario en CSV
+
+        Args:
+            ruta_archivo: Ruta del archivo CSV
+
+        Returns:
+            Tupla (filas válidas listas para COPY, filas inválidas con motivo)
+        """
+        with open(ruta_archivo, 'r', encoding='utf-8-sig', newline='') as archivo:
+            muestra = archivo.read(4096)
+            archivo.seek(0)
+            try:
+                dialecto = csv.Sniffer().sniff(muestra, delimiters=',;\t|')
+            except csv.Error:
+                dialecto = csv.excel
+
+            lector = csv.reader(archivo, dialecto)
+            encabezados = [cls._normalizar_encabezado(h) for h in next(lector, [])]
+
+            # Posición de cada campo según los alias
+            posiciones: Dict[str, int] = {}
+            for campo, alias in cls.ALIAS_COLUMNAS.items():
+                for i, encabezado in enumerate(encabezados):
+                    if encabezado in alias:
+                        posiciones[campo] = i
+                        break
+
+            faltantes = [c for c in cls.CAMPOS_OBLIGATORIOS if c not in posiciones]
+            if faltantes:
+                raise ValueError(f"Columnas obligatorias no encontradas: {', '.join(faltantes)}")
+
+            validas: List[Tuple] = []
+            invalidas: List[Dict[str, Any]] = []
+
+            # La fila 1 es el encabezado
+            for numero_fila, fila in enumerate(lector, start=2):
+                if not any(celda.strip() for celda in fila):
+                    continue
+
+                def valor(campo: str) -> Optional[str]:
+                    pos = posiciones.get(campo)
+                    if pos is None or pos >= len(fila):
+                        return None
+                    return fila[pos].strip() or None
+
+                fecha = cls._parsear_fecha(valor('fecha_pago') or '')
+                monto = cls._parsear_monto(valor('monto') or '')
+                ci_numero = valor('ci_numero')
+
+                motivo = None
+                if not fecha:
+                    motivo = f"Fecha inválida: {valor('fecha_pago')}"
+                elif monto is None:
+                    motivo = f"Monto inválido: {valor('monto')}"
+                elif not ci_numero:
+                    motivo = 'CI vacío'
+
+                if motivo:
+                    invalidas.append({
+                        'fila': numero_fila,
+                        'ci_numero': ci_numero,
+                        'monto': valor('monto'),
+                        'numero_comprobante': valor('numero_comprobante'),
+                        'estado': 'INVALIDO',
+                        'motivo': motivo
+                    })
+                    continue
+
+                validas.append((
+                    numero_fila, fecha.isoformat(), ci_numero, str(monto),
+                    valor('numero_comprobante'), valor('banco_origen'),
+                    valor('cuenta_origen'), valor('glosa')
+                ))
+
+        return validas, invalidas
+
+    # ===== CONCILIACIÓN EN BASE DE DATOS =====
+
+    @classmethod
+    def _cargar_con_copy(cls, cursor, filas: List[Tuple]) -> None:
+        """Crear la tabla temporal de staging y cargarla con COPY"""
+        cursor.execute("""
+            CREATE TEMP TABLE tmp_extracto_bancario (
+                fila INTEGER PRIMARY KEY,
+                fecha_pago DATE NOT NULL,
+                ci_numero VARCHAR(20) NOT NULL,
+                monto NUMERIC(10,2) NOT NULL,
+                numero_comprobante VARCHAR(50),
+                banco_origen VARCHAR(100),
+                cuenta_origen VARCHAR(50),
+                glosa TEXT,
+                estudiante_id INTEGER,
+                programa_id INTEGER,
+                inscripcion_id INTEGER,
+                transaccion_id INTEGER,
+                numero_transaccion VARCHAR(50),
+                estado VARCHAR(30),
+                motivo TEXT
+            ) ON COMMIT DROP
+        """)
+
+        buffer = io.StringIO()
+        escritor = csv.writer(buffer)
+        escritor.writerows(filas)
+        buffer.seek(0)
+
+        cursor.copy_expert(
+            f"COPY tmp_extracto_bancario ({', '.join(cls.COLUMNAS_COPY)}) FROM STDIN WITH (FORMAT csv)",
+            buffer
+        )
+        cursor.execute("ANALYZE tmp_extracto_bancario")
+
+    @staticmethod
+    def _conciliar(cursor) -> None:
+        """Clasificar todas las filas de staging con operaciones por conjuntos"""
+        # Comprobante obligatorio para transferencias
+        cursor.execute("""
+            UPDATE tmp_extracto_bancario
+            SET estado = 'SIN_COMPROBANTE', motivo = 'La fila no tiene número de comprobante'
+            WHERE numero_comprobante IS NULL
+        """)
+
+        # Comprobantes repetidos dentro del mismo archivo (se conserva el primero)
+        cursor.execute("""
+            UPDATE tmp_extracto_bancario t
+            SET estado = 'DUPLICADO_EN_ARCHIVO',
+                motivo = 'Comprobante repetido en el archivo (fila ' || d.primera || ')'
+            FROM (
+                SELECT fila, MIN(fila) OVER (PARTITION BY numero_comprobante) AS primera
+                FROM tmp_extracto_bancario
+                WHERE numero_comprobante IS NOT NULL
+            ) d
+            WHERE d.fila = t.fila AND d.primera <> t.fila AND t.estado IS NULL
+        """)
+
+        # Comprobantes ya registrados (anti-join contra transacciones)
+        cursor.execute("""
+            UPDATE tmp_extracto_bancario t
+            SET estado = 'COMPROBANTE_REGISTRADO',
+                motivo = 'Comprobante ya registrado en la transacción ' || tr.numero_transaccion
+            FROM transacciones tr
+            WHERE tr.numero_comprobante = t.numero_comprobante
+            AND t.estado IS NULL
+        """)
+
+        # Estudiante por CI normalizado
+        cursor.execute("""
+            UPDATE tmp_extracto_bancario t
+            SET estudiante_id = e.id
+            FROM estudiantes e
+            WHERE UPPER(BTRIM(e.ci_numero)) = UPPER(BTRIM(t.ci_numero))
+            AND t.estado IS NULL
+        """)
+        cursor.execute("""
+            UPDATE tmp_extracto_bancario
+            SET estado = 'ESTUDIANTE_NO_ENCONTRADO', motivo = 'No existe un estudiante con el CI ' || ci_numero
+            WHERE estado IS NULL AND estudiante_id IS NULL
+        """)
+
+        # Inscripciones vigentes con saldo suficiente para el monto; si hay
+        # varias se desempata por la que tiene la mensualidad igual al monto.
+        # El saldo es el precalculado (sólo pagos CONFIRMADO)
+        cursor.execute("""
+            CREATE TEMP TABLE tmp_candidatos_extracto ON COMMIT DROP AS
+            SELECT
+                t.fila,
+                i.id AS inscripcion_id,
+                i.programa_id,
+                (p.costo_mensualidad = t.monto) AS coincide_cuota,
+                COUNT(*) OVER (PARTITION BY t.fila) AS candidatos,
+                COUNT(*) FILTER (WHERE p.costo_mensualidad = t.monto) OVER (PARTITION BY t.fila) AS candidatos_cuota
+            FROM tmp_extracto_bancario t
+            JOIN inscripciones i ON i.estudiante_id = t.estudiante_id
+                AND i.estado NOT IN ('RETIRADO', 'CONCLUIDO')
+            JOIN programas p ON p.id = i.programa_id
+            WHERE t.estado IS NULL
+            AND i.saldo_pendiente >= t.monto
+        """)
+        cursor.execute("""
+            UPDATE tmp_extracto_bancario t
+            SET inscripcion_id = c.inscripcion_id,
+                programa_id = c.programa_id,
+                estado = 'CONCILIADO',
+                motivo = NULL
+            FROM tmp_candidatos_extracto c
+            WHERE c.fila = t.fila
+            AND t.estado IS NULL
+            AND (c.candidatos = 1 OR (c.candidatos_cuota = 1 AND c.coincide_cuota))
+        """)
+        cursor.execute("""
+            UPDATE tmp_extracto_bancario t
+            SET estado = CASE WHEN EXISTS (
+                    SELECT 1 FROM tmp_candidatos_extracto c WHERE c.fila = t.fila
+                ) THEN 'AMBIGUO' ELSE 'SIN_INSCRIPCION' END,
+                motivo = CASE WHEN EXISTS (
+                    SELECT 1 FROM tmp_candidatos_extracto c WHERE c.fila = t.fila
+                ) THEN 'Varias inscripciones con saldo para el monto'
+                  ELSE 'Sin inscripción vigente con saldo suficiente' END
+            WHERE t.estado IS NULL
+        """)
+
+        # Varias filas de la misma inscripción: cada una cabe en el saldo por
+        # separado, pero el acumulado en orden de archivo no debe superarlo
+        cursor.execute("""
+            UPDATE tmp_extracto_bancario t
+            SET estado = 'SALDO_EXCEDIDO',
+                motivo = 'Con las filas anteriores del archivo el monto supera el saldo pendiente ('
+                    || a.saldo_pendiente || ')'
+            FROM (
+                SELECT
+                    x.fila,
+                    i.saldo_pendiente,
+                    SUM(x.monto) OVER (PARTITION BY x.inscripcion_id ORDER BY x.fila) AS acumulado
+                FROM tmp_extracto_bancario x
+                JOIN inscripciones i ON i.id = x.inscripcion_id
+                WHERE x.estado = 'CONCILIADO'
+            ) a
+            WHERE a.fila = t.fila
+            AND a.acumulado > a.saldo_pendiente
+        """)
+
+    @classmethod
+    def _obtener_concepto_pago(cls, cursor) -> int:
+        """ID del concepto de los detalles importados; sin él no se importa nada"""
+        cursor.execute("SELECT id FROM conceptos_pago WHERE codigo = %s", (cls.CONCEPTO_PAGO,))
+        fila = cursor.fetchone()
+        if not fila:
+            raise ValueError(f"No existe el concepto de pago {cls.CONCEPTO_PAGO}")
+        return fila[0]
+
+    @staticmethod
+    def _registrar_conciliados(cursor, nombre_archivo: str, usuario_id: Optional[int],
+                               concepto_pago_id: int) -> int:
+        """Insertar todas las filas conciliadas (cabecera y detalle) en una sentencia"""
+        cursor.execute("""
+            WITH nuevas AS (
+                INSERT INTO transacciones (
+                    estudiante_id, programa_id, fecha_pago,
+                    monto_total, descuento_total, monto_final,
+                    forma_pago, estado, numero_comprobante, banco_origen, cuenta_origen,
+                    observaciones, registrado_por
+                )
+                SELECT
+                    estudiante_id, programa_id, fecha_pago,
+                    monto, 0, monto,
+                    'TRANSFERENCIA', 'CONFIRMADO', numero_comprobante, banco_origen, cuenta_origen,
+                    'Importado de extracto bancario ' || %s || ' (fila ' || fila || ')'
+                        || COALESCE(': ' || glosa, ''),
+                    %s
+                FROM tmp_extracto_bancario
+                WHERE estado = 'CONCILIADO'
+                ORDER BY fila
+                RETURNING id, numero_transaccion, numero_comprobante, monto_final
+            ),
+            detalles AS (
+                INSERT INTO detalles_transaccion (
+                    transaccion_id, concepto_pago_id, descripcion,
+                    cantidad, precio_unitario, subtotal, orden
+                )
+                SELECT n.id, %s, 'Pago por transferencia bancaria', 1, n.monto_final, n.monto_final, 1
+                FROM nuevas n
+            )
+            UPDATE tmp_extracto_bancario t
+            SET transaccion_id = n.id,
+                numero_transaccion = n.numero_transaccion
+            FROM nuevas n
+            WHERE n.numero_comprobante = t.numero_comprobante
+            AND t.estado = 'CONCILIADO'
+        """, (nombre_archivo, usuario_id, concepto_pago_id))
+        return cursor.rowcount
+
+    # ===== API PÚBLICA =====
+
+    @classmethod
+    def importar_extracto(cls, ruta_archivo: str, usuario_id: Optional[int] = None,
+                          aplicar: bool = True, guardar_reporte: bool = True) -> Dict[str, Any]:
+        """
+        Importar un extracto bancario y conciliarlo con las inscripciones
+
+        Args:
+            ruta_archivo: Ruta del CSV del banco
+            usuario_id: Usuario que registra los pagos
+            aplicar: Si es False sólo se simula (se hace rollback al final)
+            guardar_reporte: Guardar el reporte de conciliación en REPORTES_DIR
+
+        Returns:
+            Dict con 'resumen', 'filas' (reporte por fila) y 'reporte_path'
+        """
+        inicio = datetime.now()
+        try:
+            validas, invalidas = cls.leer_extracto(ruta_archivo)
+        except Exception as e:
+            logger.error(f"❌ Error leyendo extracto {ruta_archivo}: {e}")
+            return {'success': False, 'error': f'No se pudo leer el archivo: {e}'}
+
+        logger.info(f"📥 Extracto leído: {len(validas)} filas válidas, {len(invalidas)} inválidas")
+
+        filas_reporte: List[Dict[str, Any]] = []
+        registrados = 0
+        connection = None
+        cursor = None
+        try:
+            if validas:
+                connection = Database.get_connection()
+                if not connection:
+                    return {'success': False, 'error': 'No se pudo conectar a la base de datos'}
+
+                cursor = connection.cursor()
+                concepto_pago_id = cls._obtener_concepto_pago(cursor)
+                cls._cargar_con_copy(cursor, validas)
+                cls._conciliar(cursor)
+
+                if aplicar:
+                    nombre_archivo = ruta_archivo.replace('\\', '/').rsplit('/', 1)[-1]
+                    registrados = cls._registrar_conciliados(cursor, nombre_archivo, usuario_id,
+                                                             concepto_pago_id)
+
+                cursor.execute("""
+                    SELECT fila, fecha_pago, ci_numero, monto, numero_comprobante,
+                           estudiante_id, inscripcion_id, transaccion_id, numero_transaccion,
+                           estado, motivo
+                    FROM tmp_extracto_bancario
+                    ORDER BY fila
+                """)
+                filas_reporte = [r.to_dict() for r in registros_desde_cursor(cursor)]
+
+                if aplicar:
+                    connection.commit()
+                    ProgramaModel.invalidar_expediente()
+                else:
+                    connection.rollback()
+
+        except Exception as e:
+            if connection:
+                connection.rollback()
+                logger.warning("↩️ Rollback ejecutado por error en importación de extracto")
+            logger.error(f"❌ Error importando extracto {ruta_archivo}: {e}")
+            return {'success': False, 'error': str(e)}
+
+        finally:
+            if cursor:
+                cursor.close()
+            if connection:
+                Database.return_connection(connection)
+
+        filas_reporte = sorted(filas_reporte + invalidas, key=lambda f: f['fila'])
+        resumen = cls._resumir(filas_reporte)
+        resumen['registrados'] = registrados
+        resumen['simulacion'] = not aplicar
+        resumen['segundos'] = round((datetime.now() - inicio).total_seconds(), 2)
+
+        reporte_path = None
+        if guardar_reporte and filas_reporte:
+            reporte_path = cls.guardar_reporte(filas_reporte)
+
+        logger.info(f"✅ Extracto conciliado: {resumen['por_estado']} "
+                    f"({registrados} pagos registrados en {resumen['segundos']} s)")
+
+        return {
+            'success': True,
+            'resumen': resumen,
+            'filas': filas_reporte,
+            'reporte_path': reporte_path
+        }
+
+    @staticmethod
+    def _resumir(filas: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """Totales por estado de conciliación"""
+        por_estado: Dict[str, int] = {}
+        monto_conciliado = Decimal('0')
+        for fila in filas:
+            estado = fila.get('estado') or 'SIN_ESTADO'
+            por_estado[estado] = por_estado.get(estado, 0) + 1
+            if estado == 'CONCILIADO':
+                monto_conciliado += Decimal(str(fila.get('monto') or 0))
+
+        return {
+            'total_filas': len(filas),
+            'por_estado': por_estado,
+            'conciliados': por_estado.get('CONCILIADO', 0),
+            'monto_conciliado': float(monto_conciliado)
+        }
+
+    @staticmethod
+    def guardar_reporte(filas: List[Dict[str, Any]]) -> Optional[str]:
+        """Guardar el reporte de conciliación como CSV en el directorio de reportes"""
+        try:
+            ruta = Paths.get_reporte_path('conciliacion_extracto', 'csv')
+            columnas = ['fila', 'fecha_pago', 'ci_numero', 'monto', 'numero_comprobante',
+                        'estudiante_id', 'inscripcion_id', 'transaccion_id',
+                        'numero_transaccion', 'estado', 'motivo']
+            with open(ruta, 'w', encoding='utf-8-sig', newline='') as archivo:
+                escritor = csv.DictWriter(archivo, fieldnames=columnas, extrasaction='ignore')
+                escritor.writeheader()
+                escritor.writerows(filas)
+
+            logger.info(f"📄 Reporte de conciliación guardado en {ruta}")
+            return str(ruta)
+
+        except Exception as e:
+            logger.error(f"❌ Error guardando reporte de conciliación: {e}")
+            return None
@@ -34,91 +34,38 @@ class ProgramaEstadoService:
             fecha_actual = date.today()
             logger.info(f"🔄 Iniciando verificación de estados de programas - Fecha sistema: {fecha_actual}")
             
-            # Obtener todos los programas que NO estén en estado CONCLUIDO o CANCELADO
-            # y cuya fecha_fin sea <= fecha_actual
-            programas_a_actualizar = ProgramaModel.obtener_programas_para_concluir(fecha_actual)
+            # Un solo UPDATE ... RETURNING: selección y cambio de estado atómicos
+            # (programas que NO estén CONCLUIDOS o CANCELADOS y con fecha_fin <= fecha_actual)
+            concluidos = ProgramaModel.concluir_programas_vencidos(fecha_actual)
             
-            # Validar que programas_a_actualizar sea una lista
-            if not isinstance(programas_a_actualizar, list):
-                logger.error(f"Error: ProgramaModel.obtener_programas_para_concluir retornó {type(programas_a_actualizar)}")
-                return {
-                    'success': False,
-                    'actualizados': 0,
-                    'mensaje': 'Error en formato de datos retornados por el modelo'
-                }
-            
-            if not programas_a_actualizar:
+            if not concluidos:
                 logger.info("✅ No hay programas pendientes de concluir")
                 return {
                     'success': True,
                     'actualizados': 0,
+                    'programas': [],
                     'mensaje': 'No hay programas pendientes de concluir'
                 }
             
-            logger.info(f"📊 Se encontraron {len(programas_a_actualizar)} programas para concluir")
+            # Registro por programa a partir de las filas devueltas
+            for programa in concluidos:
+                logger.info(
+                    f"✅ Programa concluido: {programa.get('codigo', 'SIN CÓDIGO')} - "
+                    f"{programa.get('nombre', 'SIN NOMBRE')} (ID: {programa.get('id')})"
+                )
             
-            actualizados = 0
-            errores = []
+            logger.info(f"🎯 {len(concluidos)} programas concluidos automáticamente")
             
-            for programa in programas_a_actualizar:
-                try:
-                    # Manejar diferentes formatos de retorno (tupla o diccionario)
-                    programa_dict = ProgramaEstadoService._convertir_a_diccionario(programa)
-                    
-                    if not programa_dict:
-                        error_msg = "Formato de programa no válido"
-                        logger.error(error_msg)
-                        errores.append(error_msg)
-                        continue
-                    
-                    programa_id = programa_dict.get('id')
-                    codigo = programa_dict.get('codigo', 'SIN CÓDIGO')
-                    nombre = programa_dict.get('nombre', 'SIN NOMBRE')
-                    fecha_fin = programa_dict.get('fecha_fin')
-                    
-                    # Verificar nuevamente la fecha (doble validación)
-                    if fecha_fin:
-                        fecha_fin_date = ProgramaEstadoService._convertir_a_fecha(fecha_fin)
-                        
-                        if fecha_fin_date and fecha_fin_date <= fecha_actual:
-                            # Actualizar el estado a CONCLUIDO
-                            resultado = ProgramaModel.actualizar_estado(programa_id, 'CONCLUIDO')
-                            
-                            if resultado and resultado.get('success'):
-                                actualizados += 1
-                                logger.info(f"✅ Programa concluido: {codigo} - {nombre} (ID: {programa_id})")
-                                
-                                # Ya no intentamos registrar en bitácora
-                                # Simplemente hacemos log del cambio
-                                logger.debug(f"Cambio de estado registrado para programa {programa_id}: {nombre} -> CONCLUIDO")
-                            else:
-                                error_msg = f"Error actualizando programa {codigo}: {resultado.get('message', 'Error desconocido') if resultado else 'Resultado nulo'}"
-                                logger.error(error_msg)
-                                errores.append(error_msg)
-                    
-                except Exception as e:
-                    error_msg = f"Error procesando programa: {str(e)}"
-                    logger.error(error_msg)
-                    errores.append(error_msg)
-            
-            # Resumen final
-            resumen = {
-                'success': len(errores) == 0,
-                'actualizados': actualizados,
-                'errores': errores,
-                'total_procesados': len(programas_a_actualizar),
+            return {
+                'success': True,
+                'actualizados': len(concluidos),
+                'errores': [],
+                'programas': concluidos,
+                'total_procesados': len(concluidos),
                 'fecha_verificacion': fecha_actual.isoformat(),
-                'mensaje': f"Procesados: {len(programas_a_actualizar)}, Actualizados: {actualizados}, Errores: {len(errores)}"
+                'mensaje': f"Procesados: {len(concluidos)}, Actualizados: {len(concluidos)}, Errores: 0"
             }
             
-            if actualizados > 0:
-                logger.info(f"🎯 {actualizados} programas concluidos automáticamente")
-            
-            if errores:
-                logger.warning(f"⚠️ {len(errores)} errores durante la actualización")
-            
-            return resumen
-            
         except Exception as e:
             logger.error(f"Error en verificación de estados: {e}", exc_info=True)
             return {
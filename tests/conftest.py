@@ -0,0 +1,64 @@
+# Archivo: tests/conftest.py
+# -*- coding: utf-8 -*-
+"""
+Configuración común de las pruebas de concurrencia contra PostgreSQL.
+
+Las pruebas necesitan una base de datos de prueba con el esquema y los scripts
+de config/ aplicados; se omiten salvo que FORMAGESTPRO_TEST_DSN contenga su
+cadena de conexión, por ejemplo:
+
+    FORMAGESTPRO_TEST_DSN="dbname=formagestpro_test user=postgres" python -m pytest tests
+"""
+
+import os
+
+import pytest
+
+VARIABLE_DSN = 'FORMAGESTPRO_TEST_DSN'
+
+
+@pytest.fixture(scope='session')
+def dsn() -> str:
+    """Cadena de conexión a la base de datos de prueba (omite si no está definida)"""
+    valor = os.environ.get(VARIABLE_DSN)
+    if not valor:
+        pytest.skip(f"{VARIABLE_DSN} no definida: se omiten las pruebas contra PostgreSQL")
+    return valor
+
+
+@pytest.fixture
+def conectar(dsn):
+    """Abrir conexiones psycopg2 independientes y cerrarlas al terminar la prueba"""
+    psycopg2 = pytest.importorskip('psycopg2')
+    conexiones = []
+
+    def _conectar():
+        conexion = psycopg2.connect(dsn)
+        conexiones.append(conexion)
+        return conexion
+
+    yield _conectar
+
+    for conexion in conexiones:
+        conexion.close()
+
+
+@pytest.fixture
+def database(dsn, monkeypatch):
+    """Apuntar el pool de config.database.Database a la base de datos de prueba"""
+    psycopg2 = pytest.importorskip('psycopg2')
+    from config.database import Database
+
+    parametros = psycopg2.extensions.parse_dsn(dsn)
+    monkeypatch.setattr(Database, '_config', {
+        'host': parametros.get('host'),
+        'port': parametros.get('port'),
+        'database': parametros.get('dbname'),
+        'user': parametros.get('user'),
+        'password': parametros.get('password')
+    })
+    monkeypatch.setattr(Database, '_connection_pool', None)
+
+    yield Database
+
+    Database.close_all_connections()
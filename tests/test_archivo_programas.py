@@ -0,0 +1,125 @@
+# Archivo: tests/test_archivo_programas.py
+# -*- coding: utf-8 -*-
+"""
+Archivo histórico de programas (actualizacion_archivo_programas.sql).
+
+Un programa concluido hace años se mueve a las tablas *_archivo con sus
+inscripciones, cuotas y transacciones; después se sigue leyendo con
+ProgramaModel.obtener_programa y TransaccionModel.obtener_por_id.
+"""
+
+import uuid
+
+import pytest
+
+ANIOS = 5
+COSTO = 1000
+CUOTAS = 2
+
+
+@pytest.fixture
+def programa_concluido(conectar):
+    """Programa concluido en 1901 con una inscripción (y sus cuotas) y una transacción"""
+    marca = uuid.uuid4().hex[:8].upper()
+    conexion = conectar()
+    with conexion, conexion.cursor() as cursor:
+        cursor.execute(
+            """
+            INSERT INTO programas (
+                codigo, nombre, duracion_meses, horas_totales, costo_total,
+                costo_mensualidad, numero_cuotas, cupos_maximos, cupos_inscritos,
+                estado, fecha_inicio, fecha_fin
+            ) VALUES (%s, 'Prueba archivo histórico', 6, 10, %s, %s, %s, 10, 0,
+                      'CONCLUIDO', '1901-01-01', '1901-06-30')
+            RETURNING id
+            """,
+            (f'ARC-{marca}', COSTO, COSTO / CUOTAS, CUOTAS)
+        )
+        programa_id = cursor.fetchone()[0]
+
+        cursor.execute(
+            """
+            INSERT INTO estudiantes (ci_numero, ci_expedicion, nombres, apellido_paterno)
+            VALUES (%s, 'LP', 'Prueba', 'Archivo')
+            RETURNING id
+            """,
+            (f'A{marca}',)
+        )
+        estudiante_id = cursor.fetchone()[0]
+
+        cursor.execute(
+            """
+            INSERT INTO inscripciones (estudiante_id, programa_id, fecha_inscripcion, valor_final)
+            VALUES (%s, %s, '1901-01-01', %s)
+            RETURNING id
+            """,
+            (estudiante_id, programa_id, COSTO)
+        )
+        inscripcion_id = cursor.fetchone()[0]
+
+        # ANULADO: no genera movimiento de caja y no impide archivar
+        cursor.execute(
+            """
+            INSERT INTO transacciones (
+                estudiante_id, programa_id, fecha_pago, monto_total, descuento_total,
+                monto_final, forma_pago, estado, observaciones
+            ) VALUES (%s, %s, '1901-02-01', 100, 0, 100, 'EFECTIVO', 'ANULADO', 'prueba-archivo')
+            RETURNING id
+            """,
+            (estudiante_id, programa_id)
+        )
+        transaccion_id = cursor.fetchone()[0]
+
+    yield {
+        'programa_id': programa_id,
+        'codigo': f'ARC-{marca}',
+        'inscripcion_id': inscripcion_id,
+        'transaccion_id': transaccion_id,
+    }
+
+    # Borrar tanto la copia archivada como lo que haya quedado vigente
+    with conexion, conexion.cursor() as cursor:
+        cursor.execute("DELETE FROM detalles_transaccion_archivo WHERE transaccion_id = %s", (transaccion_id,))
+        cursor.execute("DELETE FROM transacciones_archivo WHERE id = %s", (transaccion_id,))
+        cursor.execute("DELETE FROM cuotas_inscripcion_archivo WHERE inscripcion_id = %s", (inscripcion_id,))
+        cursor.execute("DELETE FROM inscripciones_archivo WHERE id = %s", (inscripcion_id,))
+        cursor.execute("DELETE FROM programas_archivo WHERE id = %s", (programa_id,))
+        cursor.execute("DELETE FROM transacciones WHERE id = %s", (transaccion_id,))
+        cursor.execute("DELETE FROM programas WHERE id = %s", (programa_id,))
+        cursor.execute("DELETE FROM estudiantes WHERE id = %s", (estudiante_id,))
+
+
+def _cuotas(conectar, tabla, inscripcion_id):
+    conexion = conectar()
+    with conexion, conexion.cursor() as cursor:
+        cursor.execute(
+            f"SELECT numero_cuota, monto, saldo FROM {tabla} WHERE inscripcion_id = %s ORDER BY numero_cuota",
+            (inscripcion_id,)
+        )
+        return cursor.fetchall()
+
+
+def test_archivar_programa_conserva_cuotas_y_lectura(conectar, database, programa_concluido):
+    from model.programa_model import ProgramaModel
+    from model.transaccion_model import TransaccionModel
+
+    cuotas = _cuotas(conectar, 'cuotas_inscripcion', programa_concluido['inscripcion_id'])
+    assert len(cuotas) == CUOTAS
+
+    archivados = ProgramaModel.archivar_programas_concluidos(ANIOS, 1)
+    assert [p['programa_id'] for p in archivados] == [programa_concluido['programa_id']]
+    assert archivados[0]['inscripciones_archivadas'] == 1
+    assert archivados[0]['transacciones_archivadas'] == 1
+
+    # Las cuotas se copian antes de que el borrado de la inscripción las elimine en cascada
+    assert _cuotas(conectar, 'cuotas_inscripcion', programa_concluido['inscripcion_id']) == []
+    assert _cuotas(conectar, 'cuotas_inscripcion_archivo', programa_concluido['inscripcion_id']) == cuotas
+
+    programa = ProgramaModel.obtener_programa(programa_concluido['programa_id'])
+    assert programa['success']
+    assert programa['data']['codigo'] == programa_concluido['codigo']
+
+    transaccion = TransaccionModel.obtener_por_id(programa_concluido['transaccion_id'])
+    assert transaccion['success']
+    assert transaccion['data']['programa_codigo'] == programa_concluido['codigo']
+    assert transaccion['data']['archivado_en'] is not None
@@ -0,0 +1,70 @@
+# Archivo: tests/test_cierre_caja.py
+# -*- coding: utf-8 -*-
+"""
+Acumulados de caja (actualizacion_cierre_caja.sql).
+
+Un pago confirmado suma su ingreso a caja_resumen_diario; al anularlo en un
+día todavía abierto su movimiento se elimina y el acumulado vuelve al valor
+anterior.
+"""
+
+import pytest
+
+FECHA = '2099-12-31'
+MONTO = 150
+MARCA = 'prueba-anulacion-caja'
+
+
+def _acumulado(cursor):
+    cursor.execute(
+        """
+        SELECT COALESCE(SUM(ingresos), 0), COALESCE(SUM(cantidad_ingresos), 0)
+        FROM caja_resumen_diario
+        WHERE fecha = %s AND forma_pago = 'EFECTIVO'
+        """,
+        (FECHA,)
+    )
+    return cursor.fetchone()
+
+
+def test_anular_pago_confirmado_revierte_acumulado(conectar):
+    conexion = conectar()
+    transaccion_id = None
+    try:
+        with conexion, conexion.cursor() as cursor:
+            cursor.execute("SELECT MIN(id) FROM usuarios")
+            usuario_id = cursor.fetchone()[0]
+            cursor.execute("SELECT 1 FROM cierres_caja WHERE fecha = %s", (FECHA,))
+            cerrado = cursor.fetchone()
+        if usuario_id is None or cerrado:
+            pytest.skip("Se necesita un usuario y la caja del día de prueba abierta")
+
+        with conexion, conexion.cursor() as cursor:
+            ingresos_antes, cantidad_antes = _acumulado(cursor)
+            cursor.execute(
+                """
+                INSERT INTO transacciones (
+                    fecha_pago, monto_total, descuento_total, monto_final,
+                    forma_pago, estado, observaciones, registrado_por
+                ) VALUES (%s, %s, 0, %s, 'EFECTIVO', 'CONFIRMADO', %s, %s)
+                RETURNING id
+                """,
+                (FECHA, MONTO, MONTO, MARCA, usuario_id)
+            )
+            transaccion_id = cursor.fetchone()[0]
+
+        with conexion, conexion.cursor() as cursor:
+            assert _acumulado(cursor) == (ingresos_antes + MONTO, cantidad_antes + 1)
+
+        with conexion, conexion.cursor() as cursor:
+            cursor.execute("UPDATE transacciones SET estado = 'ANULADO' WHERE id = %s", (transaccion_id,))
+
+        with conexion, conexion.cursor() as cursor:
+            assert _acumulado(cursor) == (ingresos_antes, cantidad_antes)
+            cursor.execute("SELECT COUNT(*) FROM movimientos_caja WHERE transaccion_id = %s", (transaccion_id,))
+            assert cursor.fetchone()[0] == 0
+    finally:
+        if transaccion_id:
+            with conexion, conexion.cursor() as cursor:
+                cursor.execute("DELETE FROM movimientos_caja WHERE transaccion_id = %s", (transaccion_id,))
+                cursor.execute("DELETE FROM transacciones WHERE id = %s", (transaccion_id,))
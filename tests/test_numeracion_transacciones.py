@@ -0,0 +1,72 @@
+# Archivo: tests/test_numeracion_transacciones.py
+# -*- coding: utf-8 -*-
+"""
+Numeración concurrente de transacciones (actualizacion_numeracion_transacciones.sql).
+
+Varios hilos insertan transacciones al mismo tiempo, cada una en su propia
+transacción confirmada; los números T-YYYY-NNNNNN asignados por el contador
+por año no deben repetirse ni dejar huecos.
+"""
+
+import re
+import threading
+
+HILOS = 8
+INSERCIONES_POR_HILO = 25
+MARCA = 'prueba-numeracion-concurrente'
+
+
+def _insertar_transacciones(conectar, barrera, numeros, ids, errores):
+    try:
+        conexion = conectar()
+        barrera.wait()
+        for _ in range(INSERCIONES_POR_HILO):
+            with conexion, conexion.cursor() as cursor:
+                cursor.execute(
+                    """
+                    INSERT INTO transacciones (
+                        fecha_pago, monto_total, descuento_total, monto_final,
+                        forma_pago, estado, observaciones
+                    ) VALUES (CURRENT_DATE, 0, 0, 0, 'EFECTIVO', 'REGISTRADO', %s)
+                    RETURNING id, numero_transaccion
+                    """,
+                    (MARCA,)
+                )
+                transaccion_id, numero = cursor.fetchone()
+            ids.append(transaccion_id)
+            numeros.append(numero)
+    except Exception as e:
+        errores.append(e)
+
+
+def test_numeracion_sin_duplicados_ni_huecos(conectar):
+    barrera = threading.Barrier(HILOS, timeout=30)
+    numeros, ids, errores = [], [], []
+    hilos = [
+        threading.Thread(target=_insertar_transacciones, args=(conectar, barrera, numeros, ids, errores))
+        for _ in range(HILOS)
+    ]
+
+    try:
+        for hilo in hilos:
+            hilo.start()
+        for hilo in hilos:
+            hilo.join()
+
+        assert not errores, errores
+        assert len(numeros) == HILOS * INSERCIONES_POR_HILO
+
+        # Sin duplicados
+        assert len(set(numeros)) == len(numeros)
+
+        # Mismo año y consecutivos contiguos
+        partes = [re.fullmatch(r'T-(\d{4})-(\d{6,})', n) for n in numeros]
+        assert all(partes), numeros
+        assert len({p.group(1) for p in partes}) == 1
+        consecutivos = sorted(int(p.group(2)) for p in partes)
+        assert consecutivos == list(range(consecutivos[0], consecutivos[0] + len(consecutivos)))
+    finally:
+        if ids:
+            conexion = conectar()
+            with conexion, conexion.cursor() as cursor:
+                cursor.execute("DELETE FROM transacciones WHERE id = ANY(%s)", (ids,))
@@ -0,0 +1,153 @@
+# Archivo: tests/test_reserva_cupos.py
+# -*- coding: utf-8 -*-
+"""
+Reserva concurrente de cupos (actualizacion_reserva_cupos.sql).
+
+Varios hilos inscriben al mismo tiempo en un programa con pocos cupos, por
+fn_crear_inscripcion (una estación por conexión) y por
+InscripcionModel.inscribir_en_lote (pool de la aplicación); el programa nunca
+debe superar cupos_maximos y cupos_inscritos debe coincidir con las
+inscripciones realmente creadas.
+"""
+
+import threading
+import uuid
+
+import pytest
+
+HILOS = 8
+ESTUDIANTES_POR_HILO = 3
+CUPOS = 10
+COSTO = 1000
+
+
+@pytest.fixture
+def programa(conectar):
+    """Programa con CUPOS cupos y HILOS * ESTUDIANTES_POR_HILO estudiantes de prueba"""
+    marca = uuid.uuid4().hex[:8].upper()
+    conexion = conectar()
+    with conexion, conexion.cursor() as cursor:
+        cursor.execute(
+            """
+            INSERT INTO programas (
+                codigo, nombre, duracion_meses, horas_totales, costo_total,
+                costo_mensualidad, numero_cuotas, cupos_maximos, cupos_inscritos,
+                estado, fecha_inicio
+            ) VALUES (%s, 'Prueba reserva concurrente de cupos', 1, 10, %s, %s, 1, %s, 0,
+                      'INSCRIPCIONES', CURRENT_DATE)
+            RETURNING id
+            """,
+            (f'PRB-{marca}', COSTO, COSTO, CUPOS)
+        )
+        programa_id = cursor.fetchone()[0]
+
+        estudiante_ids = []
+        for n in range(HILOS * ESTUDIANTES_POR_HILO):
+            cursor.execute(
+                """
+                INSERT INTO estudiantes (ci_numero, ci_expedicion, nombres, apellido_paterno)
+                VALUES (%s, 'LP', 'Prueba', 'Cupos')
+                RETURNING id
+                """,
+                (f'{marca}{n:03d}',)
+            )
+            estudiante_ids.append(cursor.fetchone()[0])
+
+    yield programa_id, estudiante_ids
+
+    # Las inscripciones y sus cuotas se borran en cascada
+    with conexion, conexion.cursor() as cursor:
+        cursor.execute("DELETE FROM transacciones WHERE programa_id = %s", (programa_id,))
+        cursor.execute("DELETE FROM programas WHERE id = %s", (programa_id,))
+        cursor.execute("DELETE FROM estudiantes WHERE id = ANY(%s)", (estudiante_ids,))
+
+
+def _lotes(estudiante_ids):
+    return [
+        estudiante_ids[i:i + ESTUDIANTES_POR_HILO]
+        for i in range(0, len(estudiante_ids), ESTUDIANTES_POR_HILO)
+    ]
+
+
+def _ejecutar_en_hilos(objetivo, lotes):
+    barrera = threading.Barrier(len(lotes), timeout=30)
+    errores = []
+
+    def _hilo(lote):
+        try:
+            barrera.wait()
+            objetivo(lote)
+        except Exception as e:
+            errores.append(e)
+
+    hilos = [threading.Thread(target=_hilo, args=(lote,)) for lote in lotes]
+    for hilo in hilos:
+        hilo.start()
+    for hilo in hilos:
+        hilo.join()
+    return errores
+
+
+def _ocupacion(conectar, programa_id):
+    conexion = conectar()
+    with conexion, conexion.cursor() as cursor:
+        cursor.execute(
+            """
+            SELECT p.cupos_maximos, p.cupos_inscritos,
+                   (SELECT COUNT(*) FROM inscripciones i WHERE i.programa_id = p.id)
+            FROM programas p
+            WHERE p.id = %s
+            """,
+            (programa_id,)
+        )
+        return cursor.fetchone()
+
+
+def test_fn_crear_inscripcion_no_sobrevende(conectar, programa):
+    programa_id, estudiante_ids = programa
+    exitos = []
+
+    def _inscribir(lote):
+        conexion = conectar()
+        for estudiante_id in lote:
+            with conexion, conexion.cursor() as cursor:
+                cursor.execute(
+                    "SELECT fn_crear_inscripcion(%s, %s, %s, %s)",
+                    (estudiante_id, programa_id, COSTO, 'prueba-reserva-cupos')
+                )
+                resultado = cursor.fetchone()[0]
+            if resultado['success']:
+                exitos.append(estudiante_id)
+
+    errores = _ejecutar_en_hilos(_inscribir, _lotes(estudiante_ids))
+    assert not errores, errores
+
+    cupos_maximos, cupos_inscritos, inscripciones = _ocupacion(conectar, programa_id)
+    assert cupos_inscritos <= cupos_maximos
+    assert inscripciones == cupos_inscritos
+    # Hay más estudiantes que cupos: se ocupan todos, sin reservas perdidas
+    assert len(exitos) == cupos_inscritos == CUPOS
+
+
+def test_inscribir_en_lote_no_sobrevende(conectar, database, programa):
+    from model.inscripcion_model import InscripcionModel
+
+    programa_id, estudiante_ids = programa
+    inscritos = []
+
+    def _inscribir(lote):
+        resultado = InscripcionModel.inscribir_en_lote(
+            programa_id, lote,
+            observaciones='prueba-reserva-cupos',
+            crear_transaccion_inicial=False
+        )
+        inscritos.append(resultado['inscritos'])
+
+    errores = _ejecutar_en_hilos(_inscribir, _lotes(estudiante_ids))
+    assert not errores, errores
+
+    cupos_maximos, cupos_inscritos, inscripciones = _ocupacion(conectar, programa_id)
+    assert cupos_inscritos <= cupos_maximos
+    assert inscripciones == cupos_inscritos
+    # Cada lote reserva todos sus cupos o ninguno
+    assert sum(inscritos) == cupos_inscritos == (CUPOS // ESTUDIANTES_POR_HILO) * ESTUDIANTES_POR_HILO
@@ -6,6 +6,7 @@ from .file_manager import FileManager
 from .security import SecurityUtils
 from .unxx_converter import UNSXXConverter
 from .validators import Validators
+from .planificador import PlanificadorTareas
 from .scheduler import ProgramaScheduler
 from .verificacion_inicio import ejecutar_verificacion_inicial
 __all__=[
@@ -13,6 +14,7 @@ __all__=[
     "SecurityUtils",
     "UNSXXConverter",
     "Validators",
+    "PlanificadorTareas",
     "ProgramaScheduler",
     "ejecutar_verificacion_inicial",
 ]
\ No newline at end of file
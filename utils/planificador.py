@@ -0,0 +1,343 @@
+# utils/planificador.py
+"""
+Planificador de tareas en segundo plano.
+
+Las tareas se registran con un intervalo en minutos o con una expresión tipo
+cron de cinco campos (minuto hora día mes día_semana) y un margen aleatorio
+(jitter) para que varias estaciones no consulten la base de datos al mismo
+tiempo. Cada ejecución corre en un pool de hilos, nunca en el hilo de la
+interfaz. Las tareas globales toman un advisory lock de PostgreSQL: si otra
+estación ya está ejecutando la misma tarea, ésta se omite.
+"""
+import logging
+import random
+import threading
+import time
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from typing import Any, Callable, Dict, List, Optional
+
+from config.database import Database
+
+logger = logging.getLogger(__name__)
+
+
+class ExpresionCron:
+    """Expresión cron de cinco campos: minuto hora día mes día_semana (0 = domingo)"""
+
+    # (mínimo, máximo) de cada campo
+    RANGOS = [(0, 59), (0, 23), (1, 31), (1, 12), (0, 6)]
+
+    def __init__(self, expresion: str):
+        campos = expresion.split()
+        if len(campos) != 5:
+            raise ValueError(f"La expresión cron debe tener 5 campos: '{expresion}'")
+
+        self.expresion = expresion
+        self.minutos, self.horas, self.dias, self.meses, self.dias_semana = [
+            self._parsear_campo(campo, minimo, maximo)
+            for campo, (minimo, maximo) in zip(campos, self.RANGOS)
+        ]
+        # Como en cron: si día y día_semana están restringidos basta con uno
+        self._dia_libre = campos[2] == '*'
+        self._dia_semana_libre = campos[4] == '*'
+
+    @staticmethod
+    def _parsear_campo(campo: str, minimo: int, maximo: int) -> set:
+        valores = set()
+        for parte in campo.split(','):
+            paso = 1
+            if '/' in parte:
+                parte, paso_texto = parte.split('/', 1)
+                paso = int(paso_texto)
+                if paso <= 0:
+                    raise ValueError(f"Paso inválido en campo cron: '{campo}'")
+
+            if parte == '*':
+                inicio, fin = minimo, maximo
+            elif '-' in parte:
+                inicio, fin = (int(v) for v in parte.split('-', 1))
+            else:
+                inicio = int(parte)
+                fin = maximo if paso > 1 else inicio
+
+            # 7 también es domingo en el campo día_semana
+            tope = 7 if maximo == 6 else maximo
+            if inicio < minimo or fin > tope or inicio > fin:
+                raise ValueError(f"Valor fuera de rango en campo cron: '{campo}'")
+            valores.update(v % 7 if maximo == 6 else v for v in range(inicio, fin + 1, paso))
+        return valores
+
+    def _coincide_dia(self, fecha: datetime) -> bool:
+        dia = fecha.day in self.dias
+        dia_semana = (fecha.isoweekday() % 7) in self.dias_semana
+        if self._dia_libre:
+            return dia_semana
+        if self._dia_semana_libre:
+            return dia
+        return dia or dia_semana
+
+    def siguiente(self, desde: datetime) -> datetime:
+        """Primer minuto posterior a `desde` que cumple la expresión"""
+        fecha = desde.replace(second=0, microsecond=0) + timedelta(minutes=1)
+        limite = fecha + timedelta(days=366 * 5)
+
+        while fecha <= limite:
+            if fecha.month not in self.meses:
+                anio, mes = (fecha.year + 1, 1) if fecha.month == 12 else (fecha.year, fecha.month + 1)
+                fecha = fecha.replace(year=anio, month=mes, day=1, hour=0, minute=0)
+                continue
+            if not self._coincide_dia(fecha):
+                fecha = (fecha + timedelta(days=1)).replace(hour=0, minute=0)
+                continue
+            if fecha.hour not in self.horas:
+                fecha = (fecha + timedelta(hours=1)).replace(minute=0)
+                continue
+            if fecha.minute not in self.minutos:
+                fecha += timedelta(minutes=1)
+                continue
+            return fecha
+
+        raise ValueError(f"La expresión cron nunca se cumple: '{self.expresion}'")
+
+
+class TareaProgramada:
+    """Tarea registrada en el planificador, con su programación y métricas"""
+
+    def __init__(self, nombre: str, funcion: Callable[[], Any],
+                 cada_minutos: Optional[float] = None, cron: Optional[str] = None,
+                 jitter_segundos: int = 0, bloqueo_global: bool = True,
+                 al_iniciar: bool = False):
+        if (cada_minutos is None) == (cron is None):
+            raise ValueError(f"La tarea '{nombre}' debe indicar cada_minutos o cron (sólo uno)")
+
+        self.nombre = nombre
+        self.funcion = funcion
+        self.cada_minutos = cada_minutos
+        self.cron = ExpresionCron(cron) if cron else None
+        self.jitter_segundos = max(0, jitter_segundos)
+        self.bloqueo_global = bloqueo_global
+
+        self.en_curso = False
+        self.proxima_ejecucion = datetime.now() if al_iniciar else self._calcular_siguiente(datetime.now())
+
+        # Métricas de ejecución
+        self.ejecuciones = 0
+        self.fallos = 0
+        self.omitidas = 0
+        self.ultima_ejecucion: Optional[datetime] = None
+        self.ultima_duracion = 0.0
+        self.duracion_total = 0.0
+        self.duracion_maxima = 0.0
+        self.ultimo_resultado: Optional[str] = None
+        self.ultimo_error: Optional[str] = None
+
+    def _calcular_siguiente(self, desde: datetime) -> datetime:
+        if self.cron:
+            siguiente = self.cron.siguiente(desde)
+        else:
+            siguiente = desde + timedelta(minutes=self.cada_minutos)  # type: ignore
+        if self.jitter_segundos:
+            siguiente += timedelta(seconds=random.uniform(0, self.jitter_segundos))
+        return siguiente
+
+    def programar_siguiente(self, desde: datetime) -> None:
+        self.proxima_ejecucion = self._calcular_siguiente(desde)
+
+    def registrar_ejecucion(self, inicio: datetime, duracion: float, error: Optional[str] = None) -> None:
+        self.ejecuciones += 1
+        self.ultima_ejecucion = inicio
+        self.ultima_duracion = duracion
+        self.duracion_total += duracion
+        self.duracion_maxima = max(self.duracion_maxima, duracion)
+        self.ultimo_resultado = 'ERROR' if error else 'OK'
+        self.ultimo_error = error
+        if error:
+            self.fallos += 1
+
+    def metricas(self) -> Dict[str, Any]:
+        return {
+            'nombre': self.nombre,
+            'programacion': self.cron.expresion if self.cron else f"cada {self.cada_minutos} min",
+            'en_curso': self.en_curso,
+            'ejecuciones': self.ejecuciones,
+            'fallos': self.fallos,
+            'omitidas': self.omitidas,
+            'ultima_ejecucion': self.ultima_ejecucion.isoformat(timespec='seconds') if self.ultima_ejecucion else None,
+            'ultima_duracion_segundos': round(self.ultima_duracion, 3),
+            'duracion_promedio_segundos': round(self.duracion_total / self.ejecuciones, 3) if self.ejecuciones else 0.0,
+            'duracion_maxima_segundos': round(self.duracion_maxima, 3),
+            'ultimo_resultado': self.ultimo_resultado,
+            'ultimo_error': self.ultimo_error,
+            'proxima_ejecucion': self.proxima_ejecucion.isoformat(timespec='seconds')
+        }
+
+
+class PlanificadorTareas(threading.Thread):
+    """Hilo que lanza las tareas registradas en un pool de hilos según su programación"""
+
+    # Primer argumento de pg_try_advisory_lock(int, int): espacio de claves de la aplicación
+    CLAVE_BLOQUEO_APP = 0x46475052  # 'FGPR'
+    ESPERA_MAXIMA_SEGUNDOS = 60
+
+    def __init__(self, max_workers: int = 3):
+        super().__init__(name="PlanificadorTareas", daemon=True)
+        self._tareas: Dict[str, TareaProgramada] = {}
+        self._lock = threading.Lock()
+        self._detener = threading.Event()
+        self._despertar = threading.Event()
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="TareaProgramada")
+
+    # ===== REGISTRO =====
+
+    def registrar(self, nombre: str, funcion: Callable[[], Any],
+                  cada_minutos: Optional[float] = None, cron: Optional[str] = None,
+                  jitter_segundos: int = 0, bloqueo_global: bool = True,
+                  al_iniciar: bool = False) -> TareaProgramada:
+        """
+        Registrar una tarea
+
+        Args:
+            nombre: Nombre único (también identifica el advisory lock)
+            funcion: Función sin argumentos a ejecutar
+            cada_minutos: Intervalo entre ejecuciones (excluyente con cron)
+            cron: Expresión cron de cinco campos, p. ej. '0 3 * * *'
+            jitter_segundos: Retraso aleatorio máximo que se suma a cada ejecución
+            bloqueo_global: Ejecutar en una sola estación a la vez (advisory lock)
+            al_iniciar: Ejecutar también en cuanto arranque el planificador
+
+        Returns:
+            La tarea registrada
+        """
+        tarea = TareaProgramada(nombre, funcion, cada_minutos, cron, jitter_segundos, bloqueo_global, al_iniciar)
+        with self._lock:
+            self._tareas[nombre] = tarea
+        self._despertar.set()
+        logger.info(f"📝 Tarea programada registrada: {nombre} ({tarea.metricas()['programacion']})")
+        return tarea
+
+    def ejecutar_ahora(self, nombre: str) -> bool:
+        """Lanzar una tarea fuera de su programación (False si no existe o está en curso)"""
+        with self._lock:
+            tarea = self._tareas.get(nombre)
+            if not tarea:
+                logger.warning(f"⚠️ Tarea no registrada: {nombre}")
+                return False
+            return self._lanzar(tarea)
+
+    def metricas(self) -> List[Dict[str, Any]]:
+        """Métricas de todas las tareas (duración de la última ejecución, fallos, etc.)"""
+        with self._lock:
+            return [tarea.metricas() for tarea in self._tareas.values()]
+
+    # ===== CICLO DE VIDA =====
+
+    def detener(self, timeout: float = 5.0) -> None:
+        """Detener el planificador; las tareas en curso terminan en segundo plano"""
+        self._detener.set()
+        self._despertar.set()
+        if self.is_alive():
+            self.join(timeout)
+        self._pool.shutdown(wait=False, cancel_futures=True)
+
+    def run(self) -> None:
+        logger.info("🕒 Planificador de tareas iniciado")
+        while not self._detener.is_set():
+            ahora = datetime.now()
+            espera = self.ESPERA_MAXIMA_SEGUNDOS
+
+            with self._lock:
+                for tarea in self._tareas.values():
+                    if tarea.proxima_ejecucion <= ahora:
+                        self._lanzar(tarea)
+                        tarea.programar_siguiente(ahora)
+                    espera = min(espera, (tarea.proxima_ejecucion - ahora).total_seconds())
+
+            self._despertar.wait(max(espera, 0.5))
+            self._despertar.clear()
+        logger.info("🛑 Planificador de tareas detenido")
+
+    # ===== EJECUCIÓN =====
+
+    def _lanzar(self, tarea: TareaProgramada) -> bool:
+        """Enviar la tarea al pool (llamar con _lock tomado)"""
+        if tarea.en_curso:
+            tarea.omitidas += 1
+            logger.debug(f"Tarea {tarea.nombre} aún en curso, se omite esta ejecución")
+            return False
+        tarea.en_curso = True
+        try:
+            self._pool.submit(self._ejecutar, tarea)
+        except RuntimeError:
+            # Pool ya cerrado (aplicación terminando)
+            tarea.en_curso = False
+            return False
+        return True
+
+    def _ejecutar(self, tarea: TareaProgramada) -> None:
+        inicio = datetime.now()
+        t0 = time.perf_counter()
+        error = None
+        ejecutada = False
+        try:
+            if tarea.bloqueo_global:
+                ejecutada = self._ejecutar_con_bloqueo(tarea)
+            else:
+                tarea.funcion()
+                ejecutada = True
+        except Exception as e:
+            error = str(e)
+            ejecutada = True
+            logger.error(f"❌ Error en tarea programada {tarea.nombre}: {e}", exc_info=True)
+        finally:
+            duracion = time.perf_counter() - t0
+            with self._lock:
+                tarea.en_curso = False
+                if ejecutada:
+                    tarea.registrar_ejecucion(inicio, duracion, error)
+                else:
+                    tarea.omitidas += 1
+                    tarea.ultimo_resultado = 'OMITIDA'
+
+        if ejecutada and not error:
+            logger.debug(f"✅ Tarea {tarea.nombre} completada en {duracion:.2f}s")
+
+    def _clave_bloqueo(self, nombre: str) -> int:
+        """Segundo argumento del advisory lock: crc32 del nombre como int4 con signo"""
+        clave = zlib.crc32(nombre.encode('utf-8'))
+        return clave - 2 ** 32 if clave >= 2 ** 31 else clave
+
+    def _ejecutar_con_bloqueo(self, tarea: TareaProgramada) -> bool:
+        """
+        Ejecutar la tarea sólo si esta estación obtiene el advisory lock
+
+        Returns:
+            False si otra estación la está ejecutando
+        """
+        connection = Database.get_connection()
+        if not connection:
+            raise Exception("No se pudo obtener conexión para el bloqueo de la tarea")
+
+        clave = self._clave_bloqueo(tarea.nombre)
+        cursor = connection.cursor()
+        try:
+            # Bloqueo de sesión: se mantiene tras el commit y se libera solo si
+            # la conexión se cae, así una estación caída no deja la tarea bloqueada
+            cursor.execute("SELECT pg_try_advisory_lock(%s, %s)", (self.CLAVE_BLOQUEO_APP, clave))
+            obtenido = cursor.fetchone()[0]  # type: ignore
+            connection.commit()
+
+            if not obtenido:
+                logger.debug(f"Tarea {tarea.nombre} en ejecución en otra estación, se omite")
+                return False
+
+            try:
+                tarea.funcion()
+            finally:
+                cursor.execute("SELECT pg_advisory_unlock(%s, %s)", (self.CLAVE_BLOQUEO_APP, clave))
+                connection.commit()
+            return True
+        finally:
+            cursor.close()
+            Database.return_connection(connection)
@@ -1,6 +1,9 @@
 # utils/scheduler.py
-from PySide6.QtCore import QTimer
+from config.database import Database
+from model.inscripcion_model import InscripcionModel
+from model.programa_model import ProgramaModel
 from service.programa_estado_service import ProgramaEstadoService
+from utils.planificador import PlanificadorTareas
 import logging
 
 logger = logging.getLogger(__name__)
@@ -8,29 +11,160 @@ logger = logging.getLogger(__name__)
 class ProgramaScheduler:
     """Scheduler para tareas automáticas relacionadas con programas"""
     
-    def __init__(self, interval_minutos=60):
+    TAREA_ESTADOS = 'verificar_estados_programas'
+    TAREA_SALDOS = 'verificar_saldos_inscripciones'
+    TAREA_CONEXIONES = 'limpiar_conexiones_inactivas'
+    TAREA_CACHES = 'precalentar_caches'
+    TAREA_ARCHIVO = 'archivar_programas_antiguos'
+    
+    # Programas por transacción al archivar; la tarea repite lotes hasta vaciar
+    LOTE_ARCHIVO = 20
+    
+    def __init__(self, interval_minutos=60, interval_saldos_minutos=360, corregir_saldos=True,
+                 interval_conexiones_minutos=10, interval_caches_minutos=30, max_workers=3,
+                 anios_archivo=ProgramaModel.ANIOS_ARCHIVO, cron_archivo='30 3 * * 0'):
         self.interval_minutos = interval_minutos
-        self.timer = QTimer()
-        self.timer.timeout.connect(self.verificar_estados)
+        self.interval_saldos_minutos = interval_saldos_minutos
+        self.corregir_saldos = corregir_saldos
+        self.anios_archivo = anios_archivo
+        
+        # Precargas de las cachés de la interfaz (PageCache de cada pestaña)
+        self._precalentadores = []
+        
+        # Las tareas corren en el pool del planificador, nunca en el hilo de la interfaz
+        self.planificador = PlanificadorTareas(max_workers=max_workers)
+        
+        # Estados de programas: al iniciar y luego periódicamente (una estación a la vez)
+        self.planificador.registrar(
+            self.TAREA_ESTADOS,
+            self._ejecutar_verificacion_estados,
+            cada_minutos=interval_minutos,
+            jitter_segundos=120,
+            al_iniciar=True
+        )
+        
+        # Verificación de los saldos precalculados de inscripciones
+        self.planificador.registrar(
+            self.TAREA_SALDOS,
+            self._ejecutar_verificacion_saldos,
+            cada_minutos=interval_saldos_minutos,
+            jitter_segundos=600
+        )
+        
+        # Cierre de las conexiones libres del pool local sin uso (cada estación
+        # tiene el suyo: sin bloqueo global); las prestadas no se tocan
+        self.planificador.registrar(
+            self.TAREA_CONEXIONES,
+            Database.close_idle_pooled_connections,
+            cada_minutos=interval_conexiones_minutos,
+            bloqueo_global=False
+        )
+        
+        # Precarga de cachés locales: expedientes de programas vigentes y las
+        # páginas registradas por la interfaz (cada estación tiene las suyas)
+        self.planificador.registrar(
+            self.TAREA_CACHES,
+            self._ejecutar_precalentado_caches,
+            cada_minutos=interval_caches_minutos,
+            jitter_segundos=60,
+            bloqueo_global=False,
+            al_iniciar=True
+        )
+        
+        # Archivo histórico de programas cerrados hace años (fuera del horario de
+        # atención; anios_archivo=None lo desactiva)
+        if anios_archivo:
+            self.planificador.registrar(
+                self.TAREA_ARCHIVO,
+                self._ejecutar_archivo_programas,
+                cron=cron_archivo
+            )
+    
+    def registrar_tarea(self, nombre, funcion, **programacion):
+        """Registrar una tarea adicional (ver PlanificadorTareas.registrar)"""
+        return self.planificador.registrar(nombre, funcion, **programacion)
     
     def start(self):
-        """Inicia el timer para verificación periódica"""
-        # Ejecutar primera verificación inmediatamente
-        self.verificar_estados()
-        
-        # Configurar verificaciones periódicas
-        self.timer.start(self.interval_minutos * 60 * 1000)  # Convertir a milisegundos
+        """Inicia el planificador de tareas en segundo plano"""
+        if not self.planificador.is_alive():
+            self.planificador.start()
         logger.info(f"🕒 Scheduler iniciado - Verificará cada {self.interval_minutos} minutos")
     
     def stop(self):
-        """Detiene el timer"""
-        self.timer.stop()
+        """Detiene el planificador"""
+        self.planificador.detener()
         logger.info("🛑 Scheduler detenido")
     
+    def metricas(self):
+        """Duración de la última ejecución y contadores de cada tarea"""
+        return self.planificador.metricas()
+    
     def verificar_estados(self):
-        """Ejecuta la verificación de estados"""
+        """Lanza la verificación de estados fuera de su programación"""
+        return self.planificador.ejecutar_ahora(self.TAREA_ESTADOS)
+    
+    def _ejecutar_verificacion_estados(self):
         logger.debug("🔄 Ejecutando verificación programada de estados...")
         resultado = ProgramaEstadoService.verificar_y_actualizar_estados()
         
+        if not resultado.get('success'):
+            raise Exception(resultado.get('mensaje', 'Error en verificación de estados'))
+        
         if resultado.get('actualizados', 0) > 0:
-            logger.info(f"📊 Verificación programada: {resultado.get('actualizados')} programas concluidos")
\ No newline at end of file
+            logger.info(f"📊 Verificación programada: {resultado.get('actualizados')} programas concluidos")
+    
+    def verificar_saldos(self):
+        """Lanza la verificación de saldos precalculados fuera de su programación"""
+        return self.planificador.ejecutar_ahora(self.TAREA_SALDOS)
+    
+    def _ejecutar_verificacion_saldos(self):
+        logger.debug("🔄 Ejecutando verificación programada de saldos de inscripciones...")
+        resultado = InscripcionModel.verificar_saldos_precalculados(corregir=self.corregir_saldos)
+        
+        if not resultado.get('exito'):
+            raise Exception(resultado.get('error', 'Error en verificación de saldos'))
+    
+        if resultado.get('desviaciones'):
+            logger.info(
+                f"📊 Verificación de saldos: {len(resultado['desviaciones'])} desviaciones, "
+                f"{resultado.get('corregidas', 0)} corregidas"
+            )
+    
+    def registrar_precalentador(self, funcion):
+        """Agregar una función sin argumentos a la precarga de cachés"""
+        self._precalentadores.append(funcion)
+    
+    def precalentar_caches(self):
+        """Lanza la precarga de cachés fuera de su programación"""
+        return self.planificador.ejecutar_ahora(self.TAREA_CACHES)
+    
+    def _ejecutar_precalentado_caches(self):
+        logger.debug("🔄 Precargando cachés...")
+        expedientes = ProgramaModel.precalentar_expedientes()
+        
+        for funcion in list(self._precalentadores):
+            funcion()
+        
+        logger.debug(f"📊 Cachés precargadas: {expedientes} expedientes, {len(self._precalentadores)} pestañas")
+    
+    def archivar_programas(self):
+        """Lanza el archivo de programas antiguos fuera de su programación"""
+        return self.planificador.ejecutar_ahora(self.TAREA_ARCHIVO)
+    
+    def _ejecutar_archivo_programas(self):
+        logger.debug("🔄 Ejecutando archivo programado de programas antiguos...")
+        total_programas = total_transacciones = 0
+        
+        # Lotes cortos: cada uno es una transacción y bloquea pocos programas
+        while True:
+            lote = ProgramaModel.archivar_programas_concluidos(self.anios_archivo, self.LOTE_ARCHIVO)
+            total_programas += len(lote)
+            total_transacciones += sum(p['transacciones_archivadas'] for p in lote)
+            if len(lote) < self.LOTE_ARCHIVO:
+                break
+        
+        if total_programas:
+            logger.info(
+                f"📊 Archivo histórico: {total_programas} programas y "
+                f"{total_transacciones} transacciones archivados"
+            )
@@ -0,0 +1,114 @@
+# Archivo: view/diario_pagos_dialog.py
+"""
+Diálogo con las operaciones del diario local de pagos que aún no llegaron a
+la base de datos (PENDIENTE o ERROR), con opción de reintentarlas.
+"""
+import logging
+from typing import Any, Dict, List
+
+from PySide6.QtWidgets import (
+    QDialog, QVBoxLayout, QHBoxLayout, QLabel, QPushButton,
+    QTableWidget, QTableWidgetItem, QHeaderView, QAbstractItemView
+)
+from PySide6.QtCore import Qt
+
+from service.diario_pagos_service import DiarioPagos
+
+logger = logging.getLogger(__name__)
+
+
+class DiarioPagosDialog(QDialog):
+    """Lista de pagos pendientes o con error del diario local"""
+
+    COLUMNAS = ["Estado", "Transacción", "Monto", "Registrado", "Intentos", "Último error"]
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+
+        self.operaciones: List[Dict[str, Any]] = []
+
+        self.setWindowTitle("📝 Diario de pagos")
+        self.setModal(True)
+        self.setMinimumSize(800, 400)
+
+        self.setup_ui()
+        self.cargar_operaciones()
+
+    def setup_ui(self):
+        """Configurar interfaz del diálogo"""
+        layout = QVBoxLayout(self)
+
+        self.lbl_resumen = QLabel()
+        layout.addWidget(self.lbl_resumen)
+
+        self.tabla = QTableWidget(0, len(self.COLUMNAS))
+        self.tabla.setHorizontalHeaderLabels(self.COLUMNAS)
+        self.tabla.setSelectionBehavior(QAbstractItemView.SelectionBehavior.SelectRows)
+        self.tabla.setEditTriggers(QAbstractItemView.EditTrigger.NoEditTriggers)
+        self.tabla.horizontalHeader().setSectionResizeMode(
+            len(self.COLUMNAS) - 1, QHeaderView.ResizeMode.Stretch
+        )
+        layout.addWidget(self.tabla)
+
+        botones = QHBoxLayout()
+        self.btn_reintentar = QPushButton("🔄 Reintentar seleccionados")
+        self.btn_reintentar.clicked.connect(self.reintentar_seleccionados)
+        self.btn_reintentar_errores = QPushButton("🔄 Reintentar todos con error")
+        self.btn_reintentar_errores.clicked.connect(self.reintentar_errores)
+        btn_actualizar = QPushButton("Actualizar")
+        btn_actualizar.clicked.connect(self.cargar_operaciones)
+        btn_cerrar = QPushButton("Cerrar")
+        btn_cerrar.clicked.connect(self.accept)
+
+        botones.addWidget(self.btn_reintentar)
+        botones.addWidget(self.btn_reintentar_errores)
+        botones.addStretch()
+        botones.addWidget(btn_actualizar)
+        botones.addWidget(btn_cerrar)
+        layout.addLayout(botones)
+
+    def cargar_operaciones(self):
+        """Cargar las operaciones sin aplicar del diario"""
+        self.operaciones = DiarioPagos.sin_aplicar()
+
+        self.tabla.setRowCount(len(self.operaciones))
+        for fila, operacion in enumerate(self.operaciones):
+            transaccion = (operacion.get('comprobante') or {}).get('transaccion', {})
+            valores = [
+                operacion['estado'],
+                transaccion.get('numero_transaccion') or str(operacion['transaccion_id']),
+                f"{float(operacion['datos'].get('monto_final', 0)):.2f}",
+                operacion['creado_en'][:19].replace('T', ' '),
+                str(operacion['intentos']),
+                operacion.get('ultimo_error') or '',
+            ]
+            for columna, valor in enumerate(valores):
+                item = QTableWidgetItem(valor)
+                if operacion['estado'] == 'ERROR':
+                    item.setForeground(Qt.GlobalColor.red)
+                self.tabla.setItem(fila, columna, item)
+
+        con_error = sum(1 for op in self.operaciones if op['estado'] == 'ERROR')
+        if self.operaciones:
+            self.lbl_resumen.setText(
+                f"{len(self.operaciones) - con_error} pagos pendientes de registrar y "
+                f"{con_error} con error. La caja no se puede cerrar hasta que se registren."
+            )
+        else:
+            self.lbl_resumen.setText("✅ Todos los pagos del diario están registrados en la base de datos.")
+        self.btn_reintentar.setEnabled(bool(self.operaciones))
+        self.btn_reintentar_errores.setEnabled(con_error > 0)
+
+    def reintentar_seleccionados(self):
+        """Volver a poner en cola las operaciones seleccionadas"""
+        filas = sorted({indice.row() for indice in self.tabla.selectedIndexes()})
+        for fila in filas:
+            DiarioPagos.reintentar(self.operaciones[fila]['clave'])
+        self.cargar_operaciones()
+
+    def reintentar_errores(self):
+        """Volver a poner en cola todas las operaciones con error"""
+        for operacion in self.operaciones:
+            if operacion['estado'] == 'ERROR':
+                DiarioPagos.reintentar(operacion['clave'])
+        self.cargar_operaciones()
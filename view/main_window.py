@@ -4,7 +4,7 @@ import sys
 from typing import Optional, Dict, Any
 from PySide6.QtWidgets import (
     QMainWindow, QTabWidget, QLabel, QMessageBox,
-    QWidget
+    QWidget, QPushButton
 )
 from PySide6.QtCore import Qt, QTimer
 from PySide6.QtGui import QResizeEvent
@@ -18,6 +18,7 @@ from .tabs.ayuda_tab import AyudaTab
 # Importar controladores
 from controller.programa_controller import ProgramaController
 from utils.unxx_converter import UNSXXConverter
+from service.diario_pagos_service import DiarioPagos
 
 
 class MainWindow(QMainWindow):
@@ -95,6 +96,65 @@ class MainWindow(QMainWindow):
         
         # Crear las pestañas usando las clases específicas
         self._create_tabs()
+        
+        # Estado del diario local de pagos en la barra de estado
+        self._setup_diario_pagos()
+    
+    # ===== DIARIO LOCAL DE PAGOS =====
+    
+    def _setup_diario_pagos(self) -> None:
+        """Mostrar en la barra de estado los pagos del diario aún no registrados"""
+        self._errores_diario = 0
+        
+        self.btn_diario_pagos = QPushButton()
+        self.btn_diario_pagos.setFlat(True)
+        self.btn_diario_pagos.clicked.connect(self.mostrar_diario_pagos)
+        self.btn_diario_pagos.hide()
+        self.statusBar().addPermanentWidget(self.btn_diario_pagos)
+        
+        if not DiarioPagos.HABILITADO:
+            return
+        
+        self.diario_timer = QTimer(self)
+        self.diario_timer.timeout.connect(self._actualizar_estado_diario)
+        self.diario_timer.start(5000)
+        self._actualizar_estado_diario()
+    
+    def _actualizar_estado_diario(self) -> None:
+        """Actualizar el indicador y avisar cuando aparecen pagos con error"""
+        try:
+            resumen = DiarioPagos.resumen()
+        except Exception as e:
+            print(f"⚠️ No se pudo leer el diario de pagos: {e}")
+            return
+        
+        pendientes = resumen.get('PENDIENTE', 0)
+        errores = resumen.get('ERROR', 0)
+        
+        if pendientes or errores:
+            texto = f"📝 Pagos sin registrar: {pendientes}"
+            if errores:
+                texto += f" | ❌ con error: {errores}"
+            self.btn_diario_pagos.setText(texto)
+            self.btn_diario_pagos.show()
+        else:
+            self.btn_diario_pagos.hide()
+        
+        nuevos_errores = errores > self._errores_diario
+        self._errores_diario = errores
+        if nuevos_errores:
+            self.mostrar_mensaje(
+                f"{errores} pagos del diario local no se pudieron registrar en la base de datos. "
+                "Revíselos y reintente desde el diario de pagos (barra de estado).",
+                "advertencia"
+            )
+    
+    def mostrar_diario_pagos(self) -> None:
+        """Abrir el diálogo de pagos pendientes o con error"""
+        from .diario_pagos_dialog import DiarioPagosDialog
+        
+        DiarioPagosDialog(self).exec()
+        self._actualizar_estado_diario()
     
     def _create_tabs(self) -> None:
         """Crear todas las pestañas de la aplicación"""
@@ -139,6 +199,10 @@ class MainWindow(QMainWindow):
         if isinstance(tab, InicioTab):
             tab.main_window = self
     
+    def precalentadores_cache(self) -> list:
+        """Funciones de precarga de caché de las pestañas (ver ProgramaScheduler)"""
+        return [tab.precalentar_cache for tab in self.tabs_dict.values() if hasattr(tab, 'precalentar_cache')]
+    
     def _create_basic_tab(self, tab_id: str, tab_name: str, content: str, user_data=None) -> BaseTab:
         """Crear una pestaña básica con contenido simple"""
         
@@ -743,6 +807,8 @@ class MainWindow(QMainWindow):
         for index, tab in self.tabs_dict.items():
             if isinstance(tab, InicioTab):
                 # Actualizar la pestaña de inicio si está mostrando programas
+                if hasattr(tab, 'invalidar_cache'):
+                    tab.invalidar_cache('programas')
                 if hasattr(tab, '_on_refresh'):
                     tab._on_refresh()
                 break
@@ -914,6 +980,8 @@ class MainWindow(QMainWindow):
         for index, tab in self.tabs_dict.items():
             if isinstance(tab, InicioTab):
                 # Actualizar la pestaña de inicio
+                if hasattr(tab, 'invalidar_cache'):
+                    tab.invalidar_cache('estudiantes')
                 if hasattr(tab, '_on_refresh'):
                     tab._on_refresh()
                 break
@@ -1026,6 +1094,8 @@ class MainWindow(QMainWindow):
         for index, tab in self.tabs_dict.items():
             if isinstance(tab, InicioTab):
                 # Actualizar la pestaña de inicio
+                if hasattr(tab, 'invalidar_cache'):
+                    tab.invalidar_cache('docentes')
                 if hasattr(tab, '_on_refresh'):
                     tab._on_refresh()
                 break
@@ -1133,6 +1203,8 @@ class MainWindow(QMainWindow):
         """Manejador para el cierre de la ventana - REEMPLAZAR"""
         if hasattr(self, 'reload_timer'):
             self.reload_timer.stop()
+        if hasattr(self, 'diario_timer'):
+            self.diario_timer.stop()
         
         # Cerrar todos los overlays activos
         self.close_all_overlays()
@@ -57,6 +57,7 @@ class DocenteOverlay(BaseOverlay):
         
         # Variables para comparación
         self.original_ci: str = ""
+        self.original_expedicion: str = ""
         self.original_email: str = ""
         
         # Variables de estado
@@ -471,26 +472,29 @@ class DocenteOverlay(BaseOverlay):
         if not self.apellido_paterno_input.text().strip():
             errores.append("El apellido paterno es obligatorio")
         
-        # Validar CI único (si es modo nuevo o CI cambió)
-        ci_numero = self.ci_numero_input.text().strip()
-        if ci_numero:
-            if self.modo == "nuevo" or (self.modo == "editar" and ci_numero != self.original_ci):
-                excluir_id = self.docente_id if self.docente_id else 0
-                if DocenteModel.verificar_ci_existente(ci_numero, excluir_id):
-                    errores.append(f"El CI {ci_numero} ya está registrado")
-        
-        # Validar email si se proporciona
+        # Validar formato de email si se proporciona
         email = self.email_input.text().strip()
         if email:
             valido, mensaje = Validators.validar_email(email)
             if not valido:
                 errores.append(f"Email: {mensaje}")
-            
-            # Validar email único
-            if email != self.original_email:
-                excluir_id = self.docente_id if self.docente_id else 0
-                if DocenteModel.verificar_email_existente(email, excluir_id):
-                    errores.append(f"El email {email} ya está registrado")
+        
+        # Validar CI y email únicos (sólo si son nuevos o cambiaron) en una consulta
+        ci_numero = self.ci_numero_input.text().strip()
+        ci_expedicion = self.ci_expedicion_combo.currentText()
+        ci_cambiado = ci_numero != self.original_ci or ci_expedicion != self.original_expedicion
+        ci_verificar = None
+        if ci_numero and (self.modo == "nuevo" or (self.modo == "editar" and ci_cambiado)):
+            ci_verificar = ci_numero
+        email_verificar = email if email and email != self.original_email else None
+        
+        if ci_verificar or email_verificar:
+            excluir_id = self.docente_id if self.docente_id else None
+            unicidad = DocenteModel.verificar_unicidad(ci_verificar, ci_expedicion, email_verificar, excluir_id)
+            if unicidad['ci_duplicado']:
+                errores.append(f"El CI {ci_numero}-{ci_expedicion} ya está registrado")
+            if unicidad['email_duplicado']:
+                errores.append(f"El email {email} ya está registrado")
         
         return len(errores) == 0, errores
     
@@ -531,6 +535,7 @@ class DocenteOverlay(BaseOverlay):
         self.docente_id = None
         self.original_data = {}
         self.original_ci = ""
+        self.original_expedicion = ""
         self.original_email = ""
         self.ci_numero_input.clear()
         self.ci_expedicion_combo.setCurrentIndex(0)
@@ -562,6 +567,7 @@ class DocenteOverlay(BaseOverlay):
         
         # Guardar datos originales para comparación
         self.original_ci = datos.get('ci_numero', '')
+        self.original_expedicion = datos.get('ci_expedicion', '') or ''
         self.original_email = datos.get('email', '')
         
         # Campos básicos
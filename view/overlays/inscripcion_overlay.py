@@ -9,10 +9,12 @@ Funcionalidades principales:
 3. Si ambos IDs existen pero no hay inscripción: Mostrar formulario de nueva inscripción
 4. Si existe inscripción: Mostrar información y transacciones relacionadas
 5. Si solo estudiante_id: Mostrar inscripciones existentes del estudiante
+6. Con programa_id y modo masivo: Inscribir varios estudiantes seleccionados a la vez
 
 Hereda de BaseOverlay.
 """
 import os
+import json
 import logging
 from typing import Optional, Dict, Any, List, Tuple
 from datetime import datetime
@@ -22,7 +24,7 @@ from PySide6.QtWidgets import (
     QComboBox, QDateEdit, QFrame, QScrollArea, QGridLayout,
     QMessageBox, QGroupBox, QSizePolicy, QSplitter, QTextEdit,
     QTableWidget, QTableWidgetItem, QHeaderView, QAbstractItemView,
-    QProgressBar, QRadioButton, QButtonGroup, QFormLayout
+    QProgressBar, QRadioButton, QButtonGroup, QFormLayout, QCheckBox
 )
 from PySide6.QtCore import Qt, QDate, QTimer, Signal
 from PySide6.QtGui import QFont, QColor, QBrush, QPixmap, QIcon
@@ -58,6 +60,12 @@ class InscripcionOverlay(BaseOverlay):
     estudiante_seleccionado = Signal(int)
     programa_seleccionado = Signal(int)
     
+    # Estudiantes disponibles cargados por página al hacer scroll
+    ESTUDIANTES_POR_PAGINA = 20
+    
+    # Tarjetas de inscripción dibujadas por lote al hacer scroll
+    TARJETAS_POR_LOTE = 5
+    
     # ===== MÉTODOS DE INICIALIZACIÓN =====
     
     def __init__(self, parent=None, usuario_id=None):
@@ -86,6 +94,19 @@ class InscripcionOverlay(BaseOverlay):
         self.btn_buscar_estudiante: Optional[QPushButton] = None
         self.estudiantes_list_widget: Optional[QWidget] = None
         self.estudiantes_list_layout: Optional[QVBoxLayout] = None
+        self.estudiantes_scroll: Optional[QScrollArea] = None
+        
+        # Estado de la carga paginada de estudiantes disponibles
+        self._criterio_estudiantes: str = ""
+        self._estudiantes_siguiente: Optional[Dict] = None
+        self._estudiantes_hay_mas: bool = False
+        self._cargando_estudiantes: bool = False
+        
+        # Inscripción masiva: estudiantes marcados (id -> nombre, en orden de selección)
+        self.modo_masivo: bool = False
+        self.estudiantes_seleccionados: Dict[int, str] = {}
+        self.modo_masivo_check: Optional[QCheckBox] = None
+        self.btn_inscribir_seleccionados: Optional[QPushButton] = None
         
         # Widgets para selección de programa
         self.seleccion_programa_frame: Optional[QFrame] = None
@@ -103,6 +124,13 @@ class InscripcionOverlay(BaseOverlay):
         # Widgets para listado de inscripciones
         self.inscripciones_container: Optional[QWidget] = None
         self.inscripciones_layout: Optional[QVBoxLayout] = None
+        self.scroll_principal: Optional[QScrollArea] = None
+        
+        # Tarjetas reutilizables por ID de inscripción (con la firma de sus datos)
+        self._tarjetas_inscripcion: Dict[int, QFrame] = {}
+        self._firmas_tarjetas: Dict[int, str] = {}
+        self._tarjetas_mostradas: int = 0
+        self._contexto_tarjetas: Tuple[Optional[int], Optional[int]] = (None, None)
         
         # Configurar UI
         self.setup_ui_especifica()
@@ -124,6 +152,7 @@ class InscripcionOverlay(BaseOverlay):
         scroll_widget.setWidgetResizable(True)
         scroll_widget.setFrameShape(QFrame.Shape.NoFrame)
         scroll_widget.setHorizontalScrollBarPolicy(Qt.ScrollBarPolicy.ScrollBarAlwaysOff)
+        self.scroll_principal = scroll_widget
         
         main_widget = QWidget()
         main_layout = QVBoxLayout(main_widget)
@@ -282,11 +311,49 @@ class InscripcionOverlay(BaseOverlay):
         
         estudiante_layout.addLayout(busqueda_layout)
         
+        # Inscripción masiva (sólo con programa definido)
+        masivo_layout = QHBoxLayout()
+        masivo_layout.setSpacing(10)
+        
+        self.modo_masivo_check = QCheckBox("👥 INSCRIPCIÓN MASIVA (marcar varios estudiantes)")
+        self.modo_masivo_check.setStyleSheet("font-weight: bold; color: #2c3e50; font-size: 12px;")
+        self.modo_masivo_check.setVisible(False)
+        masivo_layout.addWidget(self.modo_masivo_check, 1)
+        
+        self.btn_inscribir_seleccionados = QPushButton("✅ INSCRIBIR SELECCIONADOS (0)")
+        self.btn_inscribir_seleccionados.setMinimumHeight(35)
+        self.btn_inscribir_seleccionados.setEnabled(False)
+        self.btn_inscribir_seleccionados.setVisible(False)
+        self.btn_inscribir_seleccionados.setStyleSheet("""
+            QPushButton {
+                background: qlineargradient(x1:0, y1:0, x2:0, y2:1,
+                    stop:0 #9b59b6, stop:1 #8e44ad);
+                color: white;
+                border: none;
+                border-radius: 6px;
+                font-weight: bold;
+                font-size: 12px;
+                padding: 0 20px;
+            }
+            QPushButton:hover {
+                background: qlineargradient(x1:0, y1:0, x2:0, y2:1,
+                    stop:0 #8e44ad, stop:1 #7d3c98);
+            }
+            QPushButton:disabled {
+                background: #95a5a6;
+                color: #ecf0f1;
+            }
+        """)
+        masivo_layout.addWidget(self.btn_inscribir_seleccionados)
+        
+        estudiante_layout.addLayout(masivo_layout)
+        
         # Contenedor para lista de estudiantes
         estudiantes_scroll = QScrollArea()
         estudiantes_scroll.setWidgetResizable(True)
         estudiantes_scroll.setFrameShape(QFrame.Shape.NoFrame)
         estudiantes_scroll.setMinimumHeight(200)
+        self.estudiantes_scroll = estudiantes_scroll
         
         self.estudiantes_list_widget = QWidget()
         self.estudiantes_list_layout = QVBoxLayout(self.estudiantes_list_widget)
@@ -624,6 +691,25 @@ class InscripcionOverlay(BaseOverlay):
             self.busqueda_estudiante_input.returnPressed.connect(self.buscar_estudiante)
             # También conectar textChanged para búsqueda en tiempo real (opcional)
             # self.busqueda_estudiante_input.textChanged.connect(self.buscar_estudiante_automatico)
+        
+        # Cargar la siguiente página de estudiantes al llegar al final del scroll
+        if self.estudiantes_scroll:
+            self.estudiantes_scroll.verticalScrollBar().valueChanged.connect(
+                self._on_scroll_estudiantes
+            )
+            
+        # Dibujar más tarjetas de inscripción al llegar al final del overlay
+        if self.scroll_principal:
+            self.scroll_principal.verticalScrollBar().valueChanged.connect(
+                self._on_scroll_principal
+            )
+            
+        # Conexiones para inscripción masiva
+        if self.modo_masivo_check:
+            self.modo_masivo_check.toggled.connect(self.cambiar_modo_masivo)
+            
+        if self.btn_inscribir_seleccionados:
+            self.btn_inscribir_seleccionados.clicked.connect(self.inscribir_estudiantes_seleccionados)
             
         # Conexiones para selección de programa
         if self.programa_combo:
@@ -653,18 +739,18 @@ class InscripcionOverlay(BaseOverlay):
         """Buscar estudiantes según criterio ingresado"""
         try:
             criterio = self.busqueda_estudiante_input.text().strip()  # type: ignore
+            
+            # Con programa definido: sólo estudiantes no inscritos, paginados
+            if self.programa_id:
+                self.iniciar_carga_estudiantes_disponibles(criterio)
+                return
+            
             if not criterio:
                 self.mostrar_mensaje("Advertencia", "Ingrese un criterio de búsqueda", "warning")
                 return
             
             # Limpiar lista anterior
-            if self.estudiantes_list_layout:
-                while self.estudiantes_list_layout.count():
-                    child = self.estudiantes_list_layout.takeAt(0)
-                    widget = child.widget()
-                    if widget:
-                        widget.deleteLater()
-                        
+            self._limpiar_lista_estudiantes()
             self.estudiantes_encontrados = []
             
             # Intentar buscar por diferentes criterios
@@ -747,16 +833,7 @@ class InscripcionOverlay(BaseOverlay):
                         Database.return_connection(connection)
                         
             if not resultados:
-                no_data_label = QLabel("❌ No se encontraron estudiantes")
-                no_data_label.setStyleSheet("""
-                    color: #7f8c8d;
-                    font-size: 13px;
-                    font-style: italic;
-                    padding: 20px;
-                    text-align: center;
-                """)
-                if self.estudiantes_list_layout:
-                    self.estudiantes_list_layout.addWidget(no_data_label)
+                self._mostrar_sin_estudiantes()
                 return
             
             self.estudiantes_encontrados = resultados
@@ -773,6 +850,97 @@ class InscripcionOverlay(BaseOverlay):
             logger.error(f"Error buscando estudiantes: {e}")
             self.mostrar_mensaje("Error", f"Error al buscar estudiantes: {str(e)}", "error")
     
+    def iniciar_carga_estudiantes_disponibles(self, criterio: str = ""):
+        """Reiniciar la lista y cargar la primera página de estudiantes disponibles"""
+        self._limpiar_lista_estudiantes()
+        self.estudiantes_encontrados = []
+        self._criterio_estudiantes = criterio
+        self._estudiantes_siguiente = None
+        self._estudiantes_hay_mas = True
+        self.cargar_siguiente_pagina_estudiantes()
+    
+    def cargar_siguiente_pagina_estudiantes(self):
+        """Agregar a la lista la siguiente página de estudiantes no inscritos en el programa"""
+        if self._cargando_estudiantes or not self._estudiantes_hay_mas or not self.programa_id:
+            return
+        
+        self._cargando_estudiantes = True
+        try:
+            resultado = EstudianteModel.obtener_estudiantes_disponibles_paginado(
+                self.programa_id,
+                criterios=self._criterio_estudiantes,
+                limite=self.ESTUDIANTES_POR_PAGINA,
+                despues=self._estudiantes_siguiente
+            )
+            
+            if not resultado.get('success'):
+                self._estudiantes_hay_mas = False
+                self.mostrar_mensaje("Error", resultado.get('message', 'Error al buscar estudiantes'), "error")
+                return
+            
+            estudiantes = resultado.get('data', [])
+            self._estudiantes_siguiente = resultado.get('siguiente')
+            self._estudiantes_hay_mas = resultado.get('hay_mas', False)
+            
+            if not estudiantes and not self.estudiantes_encontrados:
+                self._mostrar_sin_estudiantes()
+                return
+            
+            for estudiante in estudiantes:
+                # Las tarjetas esperan 'id'; la función devuelve 'estudiante_id'
+                estudiante['id'] = estudiante.get('estudiante_id')
+                tarjeta = self.crear_tarjeta_estudiante(estudiante)
+                if tarjeta and self.estudiantes_list_layout:
+                    self.estudiantes_list_layout.addWidget(tarjeta)
+            self.estudiantes_encontrados.extend(estudiantes)
+            
+            logger.debug(f"✅ Estudiantes disponibles cargados: {len(self.estudiantes_encontrados)}")
+            
+        except Exception as e:
+            logger.error(f"Error cargando estudiantes disponibles: {e}")
+            self._estudiantes_hay_mas = False
+        finally:
+            self._cargando_estudiantes = False
+        
+        # Si la página no llena el área visible no habrá scroll: seguir cargando
+        if self._estudiantes_hay_mas and self.estudiantes_scroll:
+            QTimer.singleShot(0, self._completar_area_visible_estudiantes)
+    
+    def _completar_area_visible_estudiantes(self):
+        """Cargar más páginas mientras la lista no necesite barra de desplazamiento"""
+        if self.estudiantes_scroll and self.estudiantes_scroll.verticalScrollBar().maximum() == 0:
+            self.cargar_siguiente_pagina_estudiantes()
+    
+    def _on_scroll_estudiantes(self, valor: int):
+        """Pedir la siguiente página al acercarse al final de la lista"""
+        if not self.programa_id or not self.estudiantes_scroll:
+            return
+        barra = self.estudiantes_scroll.verticalScrollBar()
+        if valor >= barra.maximum() - 50:
+            self.cargar_siguiente_pagina_estudiantes()
+    
+    def _limpiar_lista_estudiantes(self):
+        """Eliminar las tarjetas de estudiantes mostradas"""
+        if self.estudiantes_list_layout:
+            while self.estudiantes_list_layout.count():
+                child = self.estudiantes_list_layout.takeAt(0)
+                widget = child.widget()
+                if widget:
+                    widget.deleteLater()
+    
+    def _mostrar_sin_estudiantes(self):
+        """Mostrar aviso de lista vacía"""
+        no_data_label = QLabel("❌ No se encontraron estudiantes")
+        no_data_label.setStyleSheet("""
+            color: #7f8c8d;
+            font-size: 13px;
+            font-style: italic;
+            padding: 20px;
+            text-align: center;
+        """)
+        if self.estudiantes_list_layout:
+            self.estudiantes_list_layout.addWidget(no_data_label)
+    
     def crear_tarjeta_estudiante(self, estudiante: Dict) -> QFrame:
         """Crear tarjeta para mostrar información de un estudiante"""
         tarjeta_frame = QFrame()
@@ -869,7 +1037,19 @@ class InscripcionOverlay(BaseOverlay):
             }
         """)
         btn_seleccionar.clicked.connect(lambda checked, eid=estudiante_id: self.seleccionar_estudiante(eid))
-        layout.addWidget(btn_seleccionar)
+        
+        if self.modo_masivo and self.programa_id:
+            # En modo masivo la tarjeta se marca en lugar de seleccionarse
+            check_incluir = QCheckBox("👥 Incluir en la inscripción masiva")
+            check_incluir.setStyleSheet("font-size: 12px; font-weight: bold; color: #8e44ad;")
+            check_incluir.setChecked(estudiante_id in self.estudiantes_seleccionados)
+            check_incluir.toggled.connect(
+                lambda marcado, eid=estudiante_id, nombre=nombre_completo:
+                    self.alternar_estudiante_masivo(eid, nombre, marcado)
+            )
+            layout.addWidget(check_incluir)
+        else:
+            layout.addWidget(btn_seleccionar)
         
         return tarjeta_frame
     
@@ -880,6 +1060,87 @@ class InscripcionOverlay(BaseOverlay):
         self.cargar_inscripciones()
         self.estudiante_seleccionado.emit(estudiante_id)
     
+    # ===== MÉTODOS PARA INSCRIPCIÓN MASIVA =====
+    
+    def cambiar_modo_masivo(self, activo: bool):
+        """Activar o desactivar la selección de varios estudiantes"""
+        self.modo_masivo = bool(activo) and self.programa_id is not None
+        self.estudiantes_seleccionados = {}
+        self.actualizar_boton_inscripcion_masiva()
+        
+        if self.btn_inscribir_seleccionados:
+            self.btn_inscribir_seleccionados.setVisible(self.modo_masivo)
+        
+        # Volver a dibujar las tarjetas con casillas (o con botón de selección)
+        if self.programa_id:
+            self.iniciar_carga_estudiantes_disponibles(self._criterio_estudiantes)
+    
+    def alternar_estudiante_masivo(self, estudiante_id: int, nombre: str, marcado: bool):
+        """Marcar o desmarcar un estudiante para la inscripción masiva"""
+        if marcado:
+            self.estudiantes_seleccionados[estudiante_id] = nombre
+        else:
+            self.estudiantes_seleccionados.pop(estudiante_id, None)
+        self.actualizar_boton_inscripcion_masiva()
+    
+    def actualizar_boton_inscripcion_masiva(self):
+        """Mostrar la cantidad de estudiantes marcados en el botón"""
+        if self.btn_inscribir_seleccionados:
+            cantidad = len(self.estudiantes_seleccionados)
+            self.btn_inscribir_seleccionados.setText(f"✅ INSCRIBIR SELECCIONADOS ({cantidad})")
+            self.btn_inscribir_seleccionados.setEnabled(cantidad > 0)
+    
+    def inscribir_estudiantes_seleccionados(self):
+        """Inscribir al programa a todos los estudiantes marcados en una sola operación"""
+        try:
+            if not self.programa_id or not self.estudiantes_seleccionados:
+                self.mostrar_mensaje("Advertencia", "Marque al menos un estudiante", "warning")
+                return
+            
+            cantidad = len(self.estudiantes_seleccionados)
+            respuesta = QMessageBox.question(
+                self,
+                "Confirmar inscripción masiva",
+                f"¿Inscribir {cantidad} estudiante(s) en el programa por su valor real "
+                f"(sin descuento)?",
+                QMessageBox.StandardButton.Yes | QMessageBox.StandardButton.No
+            )
+            if respuesta != QMessageBox.StandardButton.Yes:
+                return
+            
+            from controller.inscripcion_controller import InscripcionController
+            
+            resultado = InscripcionController.procesar_inscripcion_masiva(
+                programa_id=self.programa_id,
+                estudiante_ids=list(self.estudiantes_seleccionados.keys()),
+                usuario_id=self.usuario_actual_id
+            )
+            
+            # Resumen con el motivo de cada estudiante omitido
+            omitidos = [
+                f"• {self.estudiantes_seleccionados.get(r['estudiante_id'], r['estudiante_id'])}: {r['mensaje']}"
+                for r in resultado.get('resultados', []) if not r.get('exito')
+            ]
+            resumen = resultado.get('message', 'Error desconocido')
+            if omitidos:
+                resumen += "\n\nNo inscritos:\n" + "\n".join(omitidos[:20])
+                if len(omitidos) > 20:
+                    resumen += f"\n... y {len(omitidos) - 20} más"
+            
+            if resultado.get('inscritos', 0) > 0:
+                self.mostrar_mensaje("Inscripción masiva", resumen, "success" if not omitidos else "warning")
+                self.estudiantes_seleccionados = {}
+                self.actualizar_boton_inscripcion_masiva()
+                self.iniciar_carga_estudiantes_disponibles(self._criterio_estudiantes)
+                self.cargar_inscripciones()
+                self.inscripcion_creada.emit(resultado)
+            else:
+                self.mostrar_mensaje("Error", f"No se inscribió a ningún estudiante: {resumen}", "error")
+                
+        except Exception as e:
+            logger.error(f"Error en inscripción masiva: {e}")
+            self.mostrar_mensaje("Error", f"Error en inscripción masiva: {str(e)}", "error")
+    
     # ===== MÉTODOS PARA SELECCIÓN DE PROGRAMA =====
     
     def actualizar_boton_seleccion_programa(self):
@@ -1223,6 +1484,11 @@ class InscripcionOverlay(BaseOverlay):
                 logger.debug(f"📌 Selección estudiante visible: {mostrar_seleccion_estudiante}")
                 if mostrar_seleccion_estudiante and self.busqueda_estudiante_input:
                     self.busqueda_estudiante_input.setFocus()
+                if self.modo_masivo_check:
+                    self.modo_masivo_check.setVisible(mostrar_seleccion_estudiante and self.programa_id is not None)
+                # Con programa definido, mostrar la primera página de disponibles
+                if mostrar_seleccion_estudiante and self.programa_id and not self.estudiantes_encontrados:
+                    QTimer.singleShot(100, self.iniciar_carga_estudiantes_disponibles)
 
             if self.seleccion_programa_frame:
                 self.seleccion_programa_frame.setVisible(mostrar_seleccion_programa)
@@ -1376,14 +1642,6 @@ class InscripcionOverlay(BaseOverlay):
         try:
             logger.debug(f"🔍 Cargando inscripciones - Est: {self.estudiante_id}, Prog: {self.programa_id}")
             
-            # Limpiar contenedor
-            if self.inscripciones_layout:
-                while self.inscripciones_layout.count():
-                    child = self.inscripciones_layout.takeAt(0)
-                    widget = child.widget()
-                    if widget:
-                        widget.deleteLater()
-            
             self.inscripciones = []
             
             # Actualizar interfaz según contexto
@@ -1391,78 +1649,15 @@ class InscripcionOverlay(BaseOverlay):
             
             # Si no hay estudiante_id y no hay programa_id, mostrar mensaje
             if not self.estudiante_id and not self.programa_id:
+                self._limpiar_tarjetas_inscripcion()
                 self.mostrar_mensaje_no_datos("Seleccione un estudiante o programa para ver inscripciones")
                 return
             
-            # Determinar qué consulta hacer
-            inscripciones = []
-            
-            if self.estudiante_id and self.programa_id:
-                # Caso 1: Ambos IDs - buscar inscripción específica
-                logger.debug("🔍 Buscando inscripción específica estudiante-programa")
-                todas_inscripciones = InscripcionModel.obtener_programas_inscritos_estudiante(self.estudiante_id)
-                if todas_inscripciones:
-                    inscripciones = [insc for insc in todas_inscripciones 
-                                    if insc.get('programa_id') == self.programa_id]
-                    logger.debug(f"✅ Encontradas {len(inscripciones)} inscripciones específicas")
-                    
-            elif self.estudiante_id:
-                # Caso 2: Solo estudiante - todas sus inscripciones
-                logger.debug("🔍 Buscando todas las inscripciones del estudiante")
-                inscripciones = InscripcionModel.obtener_programas_inscritos_estudiante(self.estudiante_id)
-                if inscripciones:
-                    logger.debug(f"✅ Encontradas {len(inscripciones)} inscripciones del estudiante")
-                    
-            elif self.programa_id:
-                # Caso 3: Solo programa - todos los estudiantes inscritos
-                logger.debug("🔍 Buscando todas las inscripciones del programa")
-                from config.database import Database
-                connection = Database.get_connection()
-                if connection:
-                    cursor = connection.cursor()
-                    
-                    query = """
-                    SELECT 
-                        i.id,
-                        i.estudiante_id,
-                        i.programa_id,
-                        i.fecha_inscripcion,
-                        i.estado,
-                        i.valor_final,
-                        i.observaciones,
-                        CONCAT(e.apellido_paterno, ' ', e.apellido_materno, ' ', e.nombres) as estudiante_nombre,
-                        e.ci_numero,
-                        e.ci_expedicion,
-                        p.codigo as programa_codigo,
-                        p.nombre as programa_nombre,
-                        p.costo_total,
-                        p.costo_matricula,
-                        p.costo_inscripcion,
-                        p.costo_mensualidad,
-                        p.numero_cuotas
-                    FROM inscripciones i
-                    JOIN estudiantes e ON i.estudiante_id = e.id
-                    JOIN programas p ON i.programa_id = p.id
-                    WHERE i.programa_id = %s AND i.estado != 'RETIRADO'
-                    ORDER BY i.fecha_inscripcion DESC
-                    """
-                    cursor.execute(query, (self.programa_id,))
-                    if not cursor:
-                        logger.warning("No se pudo ejecutar la consulta de inscripciones por programa")
-                        self.mostrar_mensaje("Error", "Error al cargar inscripciones del programa", "error")
-                        return
-                    
-                    resultados = cursor.fetchall()
-                    
-                    if resultados:
-                        column_names = [desc[0] for desc in cursor.description] # type: ignore
-                        for row in resultados:
-                            inscripcion = dict(zip(column_names, row))
-                            inscripciones.append(inscripcion)
-                        logger.debug(f"✅ Encontradas {len(inscripciones)} inscripciones del programa")
-                    
-                    cursor.close()
-                    Database.return_connection(connection)
+            # Inscripciones con sus transacciones y saldo en una sola consulta
+            inscripciones = InscripcionModel.obtener_inscripciones_con_pagos(
+                estudiante_id=self.estudiante_id,
+                programa_id=self.programa_id
+            )
             
             # Validar que todas las inscripciones tengan ID válido
             inscripciones_validas = []
@@ -1476,23 +1671,123 @@ class InscripcionOverlay(BaseOverlay):
             self.inscripciones = inscripciones_validas
             
             # Mostrar resultados
-            if not inscripciones:
+            if not inscripciones_validas:
+                self._limpiar_tarjetas_inscripcion()
                 self.mostrar_mensaje_no_datos("No hay inscripciones relacionadas")
                 return
             
-            # Crear tarjetas para cada inscripción
-            logger.debug(f"🎨 Creando {len(inscripciones)} tarjetas de inscripción")
-            for inscripcion in inscripciones:
-                tarjeta = self.crear_tarjeta_inscripcion(inscripcion)
-                if tarjeta and self.inscripciones_layout:
-                    self.inscripciones_layout.addWidget(tarjeta)
+            # Conservar al menos las tarjetas ya visibles del mismo contexto;
+            # el resto se dibuja al hacer scroll
+            contexto = (self.estudiante_id, self.programa_id)
+            if contexto != self._contexto_tarjetas:
+                self._contexto_tarjetas = contexto
+                self._tarjetas_mostradas = 0
+            self._tarjetas_mostradas = min(
+                len(inscripciones_validas),
+                max(self._tarjetas_mostradas, self.TARJETAS_POR_LOTE)
+            )
+            self._sincronizar_tarjetas_inscripcion()
             
-            logger.debug(f"✅ Inscripciones cargadas exitosamente: {len(inscripciones)}")
+            logger.debug(f"✅ Inscripciones cargadas exitosamente: {len(inscripciones_validas)}")
             
         except Exception as e:
             logger.error(f"❌ Error crítico cargando inscripciones: {e}")
+            self._limpiar_tarjetas_inscripcion()
             self.mostrar_mensaje_no_datos(f"Error al cargar inscripciones: {str(e)}")
     
+    def _sincronizar_tarjetas_inscripcion(self):
+        """
+        Mostrar en orden las primeras `_tarjetas_mostradas` inscripciones
+
+        Las tarjetas se reutilizan por ID de inscripción: sólo se reconstruyen
+        las que cambiaron de datos y se eliminan las de inscripciones que ya no
+        están en el listado.
+        """
+        if not self.inscripciones_layout:
+            return
+        
+        visibles = self.inscripciones[:self._tarjetas_mostradas]
+        ids_visibles = {inscripcion.get('id') for inscripcion in visibles}
+        
+        # Quitar avisos y tarjetas que ya no corresponden
+        for i in reversed(range(self.inscripciones_layout.count())):
+            widget = self.inscripciones_layout.itemAt(i).widget()
+            if widget and widget not in self._tarjetas_inscripcion.values():
+                self.inscripciones_layout.removeWidget(widget)
+                widget.deleteLater()
+        for inscripcion_id in list(self._tarjetas_inscripcion):
+            if inscripcion_id not in ids_visibles:
+                tarjeta = self._tarjetas_inscripcion.pop(inscripcion_id)
+                self._firmas_tarjetas.pop(inscripcion_id, None)
+                self.inscripciones_layout.removeWidget(tarjeta)
+                tarjeta.deleteLater()
+        
+        posicion = 0
+        for inscripcion in visibles:
+            inscripcion_id = inscripcion.get('id')
+            firma = json.dumps(inscripcion, sort_keys=True, default=str)
+            tarjeta = self._tarjetas_inscripcion.get(inscripcion_id)
+            
+            if tarjeta is None or self._firmas_tarjetas.get(inscripcion_id) != firma:
+                nueva = self.crear_tarjeta_inscripcion(
+                    inscripcion,
+                    saldo=inscripcion.get('saldo'),
+                    transacciones=inscripcion.get('transacciones')
+                )
+                if tarjeta is not None:
+                    self.inscripciones_layout.removeWidget(tarjeta)
+                    tarjeta.deleteLater()
+                    self._tarjetas_inscripcion.pop(inscripcion_id, None)
+                    self._firmas_tarjetas.pop(inscripcion_id, None)
+                if nueva is None:
+                    continue
+                tarjeta = nueva
+                self._tarjetas_inscripcion[inscripcion_id] = tarjeta
+                self._firmas_tarjetas[inscripcion_id] = firma
+            
+            if self.inscripciones_layout.indexOf(tarjeta) != posicion:
+                self.inscripciones_layout.removeWidget(tarjeta)
+                self.inscripciones_layout.insertWidget(posicion, tarjeta)
+            posicion += 1
+        
+        logger.debug(f"🎨 Tarjetas de inscripción mostradas: {posicion} de {len(self.inscripciones)}")
+        
+        # Si las tarjetas no llenan el área visible no habrá scroll: seguir dibujando
+        if self._tarjetas_mostradas < len(self.inscripciones):
+            QTimer.singleShot(0, self._completar_area_visible_inscripciones)
+    
+    def _mostrar_mas_tarjetas_inscripcion(self):
+        """Dibujar el siguiente lote de tarjetas de inscripción"""
+        if self._tarjetas_mostradas >= len(self.inscripciones):
+            return
+        self._tarjetas_mostradas = min(len(self.inscripciones), self._tarjetas_mostradas + self.TARJETAS_POR_LOTE)
+        self._sincronizar_tarjetas_inscripcion()
+    
+    def _completar_area_visible_inscripciones(self):
+        """Dibujar más tarjetas mientras el listado no necesite barra de desplazamiento"""
+        if self.scroll_principal and self.scroll_principal.verticalScrollBar().maximum() == 0:
+            self._mostrar_mas_tarjetas_inscripcion()
+    
+    def _on_scroll_principal(self, valor: int):
+        """Dibujar más tarjetas al acercarse al final del overlay"""
+        if not self.scroll_principal:
+            return
+        barra = self.scroll_principal.verticalScrollBar()
+        if valor >= barra.maximum() - 200:
+            self._mostrar_mas_tarjetas_inscripcion()
+    
+    def _limpiar_tarjetas_inscripcion(self):
+        """Eliminar todas las tarjetas y avisos del listado de inscripciones"""
+        self._tarjetas_inscripcion = {}
+        self._firmas_tarjetas = {}
+        self._tarjetas_mostradas = 0
+        if self.inscripciones_layout:
+            while self.inscripciones_layout.count():
+                child = self.inscripciones_layout.takeAt(0)
+                widget = child.widget()
+                if widget:
+                    widget.deleteLater()
+    
     def mostrar_mensaje_no_datos(self, mensaje: str):
         """Mostrar mensaje cuando no hay datos"""
         try:
@@ -1533,8 +1828,17 @@ class InscripcionOverlay(BaseOverlay):
     
     # ===== MÉTODO PARA CREAR TARJETA DE INSCRIPCIÓN =====
     
-    def crear_tarjeta_inscripcion(self, inscripcion: Dict) -> Optional[QFrame]:
-        """Crear una tarjeta para mostrar una inscripción (actualizado para valor_final)"""
+    def crear_tarjeta_inscripcion(self, inscripcion: Dict, saldo: Optional[Dict] = None,
+                                  transacciones: Optional[List[Dict]] = None) -> Optional[QFrame]:
+        """
+        Crear una tarjeta para mostrar una inscripción (actualizado para valor_final)
+
+        Args:
+            inscripcion: Datos de la inscripción
+            saldo: Resultado de InscripcionModel.saldos_por_inscripciones para esta
+                inscripción; si se omite se calcula a partir de las transacciones
+            transacciones: Transacciones ya cargadas; si se omiten se consultan
+        """
         try:
             # Validar que la inscripción tenga ID válido
             inscripcion_id = inscripcion.get('id')
@@ -1649,7 +1953,7 @@ class InscripcionOverlay(BaseOverlay):
             info_layout.addWidget(fecha_info, 0, 1)
 
             # Valor Real
-            valor_real = float(inscripcion.get('costo_total', 0) or 0)
+            valor_real = saldo['costo_total'] if saldo else float(inscripcion.get('costo_total', 0) or 0)
             valor_real_label = QLabel("💰 VALOR REAL:")
             valor_real_label.setStyleSheet("font-weight: bold; color: #2c3e50; font-size: 12px;")
             info_layout.addWidget(valor_real_label, 0, 2)
@@ -1664,7 +1968,7 @@ class InscripcionOverlay(BaseOverlay):
             info_layout.addWidget(valor_real_info, 0, 3)
 
             # Valor Final
-            valor_final = float(inscripcion.get('valor_final', valor_real) or valor_real)
+            valor_final = saldo['valor_final'] if saldo else float(inscripcion.get('valor_final', valor_real) or valor_real)
             valor_final_label = QLabel("💵 VALOR FINAL:")
             valor_final_label.setStyleSheet("font-weight: bold; color: #2c3e50; font-size: 12px;")
             info_layout.addWidget(valor_final_label, 1, 0)
@@ -1826,12 +2130,13 @@ class InscripcionOverlay(BaseOverlay):
             main_layout.addWidget(info_frame)
 
             # ===== TRANSACCIONES =====
-            transacciones = []
             try:
                 estudiante_id_tx = inscripcion.get('estudiante_id')
                 programa_id_tx = inscripcion.get('programa_id')
 
-                if estudiante_id_tx and programa_id_tx:
+                if transacciones is not None:
+                    logger.debug(f"Usando {len(transacciones)} transacciones precargadas")
+                elif estudiante_id_tx and programa_id_tx:
                     logger.debug(f"Buscando transacciones para estudiante={estudiante_id_tx}, programa={programa_id_tx}")
                     resultado_tx = TransaccionModel.obtener_por_inscripcion(
                         estudiante_id=estudiante_id_tx,
@@ -1848,6 +2153,8 @@ class InscripcionOverlay(BaseOverlay):
             except Exception as e:
                 logger.error(f"Error obteniendo transacciones: {e}")
 
+            transacciones = transacciones or []
+
             if transacciones:
                 trans_header = QLabel("💳 TRANSACCIONES")
                 trans_header.setStyleSheet("""
@@ -2042,8 +2349,8 @@ class InscripcionOverlay(BaseOverlay):
 
                 main_layout.addWidget(trans_frame)
 
-                # Mostrar saldo final
-                saldo_final = max(0, saldo_acumulado)
+                # Mostrar saldo final (el calculado en lote excluye anuladas y rechazadas)
+                saldo_final = saldo['saldo_pendiente'] if saldo else max(0, saldo_acumulado)
                 saldo_frame = QFrame()
                 saldo_frame.setStyleSheet("""
                     QFrame {
@@ -2316,20 +2623,30 @@ class InscripcionOverlay(BaseOverlay):
     
     def _determinar_monto_sugerido(self, saldo_pendiente: float, costo_mensualidad: float,
                                     costo_matricula: float, costo_inscripcion: float,
-                                    total_pagado: float) -> float:
+                                    total_pagado: float, inscripcion_id: Optional[int] = None) -> float:
         """
         Determinar monto sugerido inteligentemente basado en contexto
         
+        Si se indica la inscripción, se sugiere el saldo de su próxima cuota
+        (cuotas_inscripcion); los costos del programa sólo se usan cuando la
+        inscripción no tiene cuotas pendientes.
+        
         Args:
             saldo_pendiente: Saldo pendiente de la inscripción
             costo_mensualidad: Costo de mensualidad del programa
             costo_matricula: Costo de matrícula
             costo_inscripcion: Costo de inscripción
             total_pagado: Total ya pagado
+            inscripcion_id: ID de la inscripción (opcional)
             
         Returns:
             Monto sugerido para la transacción
         """
+        if inscripcion_id:
+            proxima_cuota = InscripcionModel.obtener_proxima_cuota(inscripcion_id)
+            if proxima_cuota and proxima_cuota['saldo'] > 0:
+                return proxima_cuota['saldo']
+        
         # Si no hay nada pagado, sugerir inscripción o matrícula
         if total_pagado == 0:
             if costo_inscripcion > 0:
@@ -2505,6 +2822,21 @@ class InscripcionOverlay(BaseOverlay):
         self.inscripciones = []
         self.estudiantes_encontrados = []
         self.programas_disponibles = []
+        self._criterio_estudiantes = ""
+        self._estudiantes_siguiente = None
+        self._estudiantes_hay_mas = False
+        self.estudiantes_seleccionados = {}
+        
+        if self.modo_masivo_check:
+            # Sin disparar cambiar_modo_masivo, que recargaría la lista
+            self.modo_masivo_check.blockSignals(True)
+            self.modo_masivo_check.setChecked(False)
+            self.modo_masivo_check.blockSignals(False)
+        self.modo_masivo = False
+        self.actualizar_boton_inscripcion_masiva()
+        
+        if self.btn_inscribir_seleccionados:
+            self.btn_inscribir_seleccionados.setVisible(False)
         
         if self.estudiante_id_label:
             self.estudiante_id_label.setText("NO ESPECIFICADO")
@@ -2540,19 +2872,9 @@ class InscripcionOverlay(BaseOverlay):
         if self.observaciones_input:
             self.observaciones_input.clear()
             
-        if self.inscripciones_layout:
-            while self.inscripciones_layout.count():
-                child = self.inscripciones_layout.takeAt(0)
-                widget = child.widget()
-                if widget:
-                    widget.deleteLater()
+        self._limpiar_tarjetas_inscripcion()
                     
-        if self.estudiantes_list_layout:
-            while self.estudiantes_list_layout.count():
-                child = self.estudiantes_list_layout.takeAt(0)
-                widget = child.widget()
-                if widget:
-                    widget.deleteLater()
+        self._limpiar_lista_estudiantes()
     
     def mostrar_mensaje(self, titulo: str, mensaje: str, tipo: str = "info"):
         """Mostrar mensaje al usuario"""
@@ -73,6 +73,7 @@ class ProgramaOverlay(BaseOverlay):
         
         # Variables específicas
         self.programa_id: Optional[int] = None
+        self._expediente: Optional[Dict[str, Any]] = None
         self.codigo_construido = ""
         self.es_posgrado = False
         self.solo_lectura = False
@@ -556,9 +557,9 @@ class ProgramaOverlay(BaseOverlay):
 
         # Tabla de estudiantes
         self.tabla_estudiantes = QTableWidget()
-        self.tabla_estudiantes.setColumnCount(6)
+        self.tabla_estudiantes.setColumnCount(8)
         self.tabla_estudiantes.setHorizontalHeaderLabels([
-            "ID", "Estudiante", "Fecha Inscripción", "Estado", "Observaciones", "Acciones"
+            "ID", "Estudiante", "Fecha Inscripción", "Estado", "Pagado", "Saldo", "Observaciones", "Acciones"
         ])
         self.tabla_estudiantes.horizontalHeader().setStretchLastSection(False)
         self.tabla_estudiantes.setAlternatingRowColors(True)
@@ -1005,27 +1006,20 @@ class ProgramaOverlay(BaseOverlay):
             estimado_matricula = cupos_inscritos * costo_matricula
             estimado_inscripcion = cupos_inscritos * costo_inscripcion
 
-            # Obtener ingresos reales desde la base de datos usando TransaccionModel
+            # Ingresos reales desde el expediente del programa (en caché: esto
+            # corre en cada cambio de los campos de cupos y costos)
             ingresos_reales_totales = 0.0
             real_matricula = 0.0
             real_inscripcion = 0.0
             real_mensualidades = 0.0
 
-            if self.programa_id:
-                try:
-                    from model.transaccion_model import TransaccionModel
-
-                    # Obtener todos los totales reales de una sola vez
-                    totales = TransaccionModel.obtener_totales_reales_programa(self.programa_id)
-
-                    real_matricula = totales['matricula']
-                    real_inscripcion = totales['inscripcion']
-                    real_mensualidades = totales['mensualidad']
-                    ingresos_reales_totales = totales['total']
-                except Exception as e:
-                    logger.error(f"Error obteniendo ingresos reales: {e}")
-                    # En caso de error, no actualizar los valores reales
-                    pass
+            expediente = self._expediente or self._cargar_expediente()
+            if expediente:
+                pagos = expediente['pagos']
+                real_matricula = pagos['matricula']
+                real_inscripcion = pagos['inscripcion']
+                real_mensualidades = pagos['mensualidad']
+                ingresos_reales_totales = float(pagos['total'])
                 
             # Calcular saldo pendiente
             saldo_pendiente = ingresos_estimados_totales - ingresos_reales_totales
@@ -1048,8 +1042,8 @@ class ProgramaOverlay(BaseOverlay):
             logger.error(f"Error actualizando estadísticas: {e}")
     
     def _actualizar_lista_estudiantes(self):
-        """Actualizar lista de estudiantes (simulada)"""
-        self._cargar_estudiantes_inscritos()
+        """Actualizar lista de estudiantes consultando de nuevo la base de datos"""
+        self._cargar_estudiantes_inscritos(forzar=True)
     
     def _inscribir_estudiante(self):
         """Abrir diálogo para inscribir estudiante al programa actual"""
@@ -1098,22 +1092,17 @@ class ProgramaOverlay(BaseOverlay):
 
         if programa_id_inscripcion == self.programa_id:
             try:
-                from model.inscripcion_model import InscripcionModel
+                # Expediente actualizado (la inscripción ya invalidó la caché)
+                expediente = self._cargar_expediente(forzar=True)
 
-                # Obtener conteo actualizado de inscripciones
-                inscripciones = InscripcionModel.obtener_inscripciones_por_programa(self.programa_id)
-
-                if inscripciones is not None:
+                if expediente is not None:
                     # Actualizar cupos inscritos
-                    cupos_actuales = len(inscripciones)
+                    cupos_actuales = len(expediente['inscritos'])
                     self.cupos_inscritos_input.setText(str(cupos_actuales))
 
-                    # Recargar tabla de estudiantes
+                    # Recargar tabla de estudiantes, resumen de pagos y estadísticas
                     self._cargar_estudiantes_inscritos()
 
-                    # Actualizar estadísticas
-                    self._actualizar_estadisticas()
-
                     # Mostrar mensaje de confirmación
                     QMessageBox.information(self, "✅ Éxito", 
                         f"Estudiante inscrito exitosamente.\n\n"
@@ -1125,8 +1114,39 @@ class ProgramaOverlay(BaseOverlay):
                 logger.error(f"Error actualizando cupos después de inscripción: {e}")
     
     def _actualizar_resumen_pagos(self):
-        """Actualizar resumen de pagos (simulado)"""
+        """Llenar el resumen de pagos por estudiante desde el expediente del programa"""
         self.tabla_resumen_pagos.setRowCount(0)
+
+        expediente = self._expediente
+        if not expediente:
+            return
+
+        alinear_derecha = Qt.AlignmentFlag.AlignRight | Qt.AlignmentFlag.AlignVCenter
+
+        for row, inscrito in enumerate(expediente['inscritos']):
+            conceptos = inscrito.get('pagos_por_concepto') or {}
+            valores = [
+                float(conceptos.get('MATRICULA', 0)),
+                float(conceptos.get('INSCRIPCION', 0)),
+                float(conceptos.get('MENSUALIDAD', 0)),
+                float(inscrito.get('total_pagado', 0)),
+                float(inscrito.get('saldo_pendiente', 0))
+            ]
+
+            self.tabla_resumen_pagos.insertRow(row)
+            self.tabla_resumen_pagos.setItem(
+                row, 0, QTableWidgetItem(self._formatear_nombre_estudiante(inscrito))
+            )
+            for columna, valor in enumerate(valores, start=1):
+                item = QTableWidgetItem(f"{valor:,.2f}")
+                item.setTextAlignment(alinear_derecha)
+                self.tabla_resumen_pagos.setItem(row, columna, item)
+
+        pagos = expediente['pagos']
+        self.lbl_total_matriculas.setText(f"Total matrículas: Bs. {pagos['matricula']:,.2f}")
+        self.lbl_total_inscripciones.setText(f"Total inscripciones: Bs. {pagos['inscripcion']:,.2f}")
+        self.lbl_total_cuotas.setText(f"Total cuotas: Bs. {pagos['mensualidad']:,.2f}")
+        self.lbl_total_general.setText(f"TOTAL INGRESOS: Bs. {float(pagos['total']):,.2f}")
     
     def _cargar_docentes_desde_db(self):
         """Cargar docentes desde la base de datos"""
@@ -1417,6 +1437,7 @@ class ProgramaOverlay(BaseOverlay):
     def clear_form(self):
         """Limpiar todos los campos del formulario"""
         self.programa_id = None
+        self._expediente = None
         self.nivel_combo.setCurrentIndex(0)
         self.carrera_combo.setCurrentIndex(0)
         self.año_input.setText(str(QDate.currentDate().year()))
@@ -1779,19 +1800,45 @@ class ProgramaOverlay(BaseOverlay):
             QMessageBox.critical(self, "❌ Error", 
                                 f"Error al guardar el programa:\n\n{str(e)}")
     
-    def _cargar_estudiantes_inscritos(self):
-        """Cargar estudiantes inscritos en el programa desde la base de datos"""
+    def _cargar_expediente(self, forzar=False):
+        """
+        Cargar el expediente del programa (inscritos con saldos, totales de
+        pagos y ocupación) en una sola consulta y guardarlo en self._expediente
+        """
+        if not self.programa_id:
+            self._expediente = None
+            return None
+
+        from model.programa_model import ProgramaModel
+
+        resultado = ProgramaModel.obtener_expediente(self.programa_id, usar_cache=not forzar)
+        if not resultado.get('success'):
+            logger.error(f"Error obteniendo expediente del programa: {resultado.get('message')}")
+            self._expediente = None
+            return None
+
+        self._expediente = resultado['data']
+        return self._expediente
+    
+    def _cargar_estudiantes_inscritos(self, forzar=False):
+        """Cargar estudiantes inscritos en el programa desde el expediente"""
         if not self.programa_id:
             return
 
         try:
-            from model.inscripcion_model import InscripcionModel
-
             # Limpiar tabla
             self.tabla_estudiantes.setRowCount(0)
 
-            # Obtener inscripciones del programa
-            inscripciones = InscripcionModel.obtener_inscripciones_por_programa(self.programa_id)
+            # Programa, inscritos, saldos y totales en una sola consulta
+            expediente = self._cargar_expediente(forzar=forzar)
+            if expediente is None:
+                raise Exception("No se pudo obtener el expediente del programa")
+
+            inscripciones = expediente['inscritos']
+
+            # El resumen de pagos y las estadísticas salen del mismo expediente
+            self._actualizar_resumen_pagos()
+            self._actualizar_estadisticas()
 
             if not inscripciones:
                 # Mostrar mensaje de que no hay estudiantes
@@ -1800,14 +1847,14 @@ class ProgramaOverlay(BaseOverlay):
                 item.setTextAlignment(Qt.AlignmentFlag.AlignCenter)
                 item.setFlags(item.flags() & ~Qt.ItemFlag.ItemIsEditable)
                 self.tabla_estudiantes.setItem(0, 0, item)
-                self.tabla_estudiantes.setSpan(0, 0, 1, 5)
+                self.tabla_estudiantes.setSpan(0, 0, 1, 8)
                 return
 
             # Configurar la tabla
-            self.tabla_estudiantes.setColumnCount(6)  # Aumentamos a 6 columnas
+            self.tabla_estudiantes.setColumnCount(8)
             self.tabla_estudiantes.setHorizontalHeaderLabels([
                 "ID Inscripción", "Estudiante", "Fecha Inscripción", 
-                "Estado", "Observaciones", "Acciones"
+                "Estado", "Pagado", "Saldo", "Observaciones", "Acciones"
             ])
 
             # Llenar tabla con datos
@@ -1857,23 +1904,39 @@ class ProgramaOverlay(BaseOverlay):
 
                 self.tabla_estudiantes.setItem(row, 3, estado_item)
 
+                # Pagado y saldo (calculados en la consulta del expediente)
+                total_pagado = float(inscripcion.get('total_pagado', 0))
+                saldo_pendiente = float(inscripcion.get('saldo_pendiente', 0))
+                pagado_item = QTableWidgetItem(f"{total_pagado:,.2f}")
+                pagado_item.setTextAlignment(Qt.AlignmentFlag.AlignRight | Qt.AlignmentFlag.AlignVCenter)
+                self.tabla_estudiantes.setItem(row, 4, pagado_item)
+
+                saldo_item = QTableWidgetItem(f"{saldo_pendiente:,.2f}")
+                saldo_item.setTextAlignment(Qt.AlignmentFlag.AlignRight | Qt.AlignmentFlag.AlignVCenter)
+                saldo_item.setForeground(
+                    Qt.GlobalColor.darkRed if saldo_pendiente > 0 else Qt.GlobalColor.darkGreen
+                )
+                self.tabla_estudiantes.setItem(row, 5, saldo_item)
+
                 # Observaciones
-                observaciones = inscripcion.get('observaciones', '')
+                observaciones = inscripcion.get('observaciones') or ''
                 obs_item = QTableWidgetItem(observaciones)
-                self.tabla_estudiantes.setItem(row, 4, obs_item)
+                self.tabla_estudiantes.setItem(row, 6, obs_item)
 
                 # Botón Ver detalles (opcional)
                 btn_ver = QPushButton("👁️ Ver")
                 btn_ver.clicked.connect(lambda checked, i=inscripcion: self._ver_detalle_inscripcion(i))
-                self.tabla_estudiantes.setCellWidget(row, 5, btn_ver)
+                self.tabla_estudiantes.setCellWidget(row, 7, btn_ver)
 
             # Ajustar columnas
             self.tabla_estudiantes.horizontalHeader().setSectionResizeMode(1, QHeaderView.ResizeMode.Stretch)  # Columna estudiante se estira
-            self.tabla_estudiantes.horizontalHeader().setSectionResizeMode(4, QHeaderView.ResizeMode.Stretch)  # Columna observaciones se estira
+            self.tabla_estudiantes.horizontalHeader().setSectionResizeMode(6, QHeaderView.ResizeMode.Stretch)  # Columna observaciones se estira
             self.tabla_estudiantes.setColumnWidth(0, 100)  # ID
             self.tabla_estudiantes.setColumnWidth(2, 120)  # Fecha
             self.tabla_estudiantes.setColumnWidth(3, 100)  # Estado
-            self.tabla_estudiantes.setColumnWidth(5, 80)   # Acciones
+            self.tabla_estudiantes.setColumnWidth(4, 100)  # Pagado
+            self.tabla_estudiantes.setColumnWidth(5, 100)  # Saldo
+            self.tabla_estudiantes.setColumnWidth(7, 80)   # Acciones
 
         except Exception as e:
             logger.error(f"Error cargando estudiantes inscritos: {e}")
@@ -1881,7 +1944,7 @@ class ProgramaOverlay(BaseOverlay):
             item = QTableWidgetItem(f"Error al cargar estudiantes: {str(e)}")
             item.setTextAlignment(Qt.AlignmentFlag.AlignCenter)
             self.tabla_estudiantes.setItem(0, 0, item)
-            self.tabla_estudiantes.setSpan(0, 0, 1, 5)
+            self.tabla_estudiantes.setSpan(0, 0, 1, 8)
     
     def _formatear_nombre_estudiante(self, inscripcion):
         """Formatear nombre completo del estudiante"""
@@ -29,8 +29,10 @@ from model.estudiante_model import EstudianteModel
 from model.programa_model import ProgramaModel
 from model.transaccion_model import TransaccionModel
 from model.usuarios_model import UsuariosModel
+from service.diario_pagos_service import DiarioPagos
 
 import logging
+import uuid
 from datetime import datetime
 from typing import Dict, Any, Optional, List, Tuple
 
@@ -112,6 +114,15 @@ class DetalleTransaccionDialog(QDialog):
     
     def cargar_sugerencias(self):
         """Cargar sugerencias basadas en la inscripción"""
+        # Primero la próxima cuota pendiente del cronograma de la inscripción
+        if self.inscripcion_id:
+            proxima_cuota = InscripcionModel.obtener_proxima_cuota(self.inscripcion_id)
+            if proxima_cuota:
+                self.cbo_concepto.setCurrentIndex(self.cbo_concepto.findData("mensualidad"))
+                self.txt_precio.setText(f"{proxima_cuota['saldo']:.2f}")
+                self.txt_descripcion.setText(proxima_cuota['concepto'])
+                return
+        
         if self.datos_inscripcion:
             valor_final = self.datos_inscripcion.get('valor_final', 0)
             num_cuotas = self.datos_inscripcion.get('numero_cuotas', 1)
@@ -182,6 +193,16 @@ class TransaccionOverlay(BaseOverlay):
     transaccion_anulada = Signal(int)  # Emite ID de transacción anulada
     detalles_registrados = Signal(int)  # Emite ID de transacción cuando se registran detalles
     
+    # Mapeo con los IDs reales de conceptos_pago
+    CONCEPTOS_BD = {
+        'matricula': 6,
+        'inscripcion': 7,
+        'mensualidad': 8,
+        'certificado': 9,
+        'material': 10,
+        'otro': 6  # Por defecto usar MATRICULA si no coincide
+    }
+    
     def __init__(self, parent=None, titulo="Registro de Transacción", 
                 ancho_porcentaje=90, alto_porcentaje=90,
                 inscripcion_id: int = None,  # type:ignore
@@ -880,42 +901,9 @@ class TransaccionOverlay(BaseOverlay):
         
         # Actualizar resumen
         self.lbl_total_detalles.setText(f"Total Detalles: Bs. {total_detalles:,.2f}")
-        
-        # Actualizar en la base de datos si hay transacción guardada
-        if self.transaccion_id and not self.solo_lectura:
-            self._actualizar_montos_transaccion(total_detalles)
-    
-    def _actualizar_montos_transaccion(self, monto_final: float):
-        """Actualizar los montos de la transacción en la base de datos"""
-        try:
-            # Obtener datos actuales de la transacción
-            if self.transaccion_id is None:
-                logger.warning("No hay transacción activa para actualizar montos")
-                return
-            
-            transaccion = TransaccionModel.obtener_por_id(self.transaccion_id)
-            if transaccion and transaccion.get('success'):
-                datos = transaccion.get('transaccion', {})
-                
-                # Actualizar montos (descuento se mantiene como 0)
-                datos_actualizados = {
-                    'id': self.transaccion_id,
-                    'monto_total': monto_final,
-                    'descuento_total': 0,
-                    'monto_final': monto_final
-                }
-                
-                # Actualizar en la base de datos
-                resultado = TransaccionModel.actualizar(self.transaccion_id,datos_actualizados)
-                if resultado.get('success'):
-                    logger.info(f"Montos actualizados para transacción {self.transaccion_id}")
-                else:
-                    logger.error(f"Error actualizando montos: {resultado.get('error')}")
-        except Exception as e:
-            logger.error(f"Error al actualizar montos: {e}")
     
     def _agregar_detalle(self):
-        """Abrir diálogo para agregar detalle de concepto y guardarlo en BD"""
+        """Abrir diálogo para agregar un detalle de concepto (pendiente hasta guardar)"""
         logger.debug("🔄 Abriendo diálogo para agregar detalle")
         dialog = DetalleTransaccionDialog(
             self,
@@ -927,48 +915,11 @@ class TransaccionOverlay(BaseOverlay):
         if dialog.exec() == QDialog.DialogCode.Accepted:
             detalle = dialog.obtener_detalle()
 
-            # Si tenemos transacción_id, guardar en BD inmediatamente
-            if self.transaccion_id:
-                from model.detalle_transaccion_model import DetalleTransaccionModel
-
-                # Mapeo actualizado con los IDs reales de conceptos_pago
-                concepto_map = {
-                    'matricula': 6,
-                    'inscripcion': 7,
-                    'mensualidad': 8,
-                    'certificado': 9,
-                    'material': 10,
-                    'otro': 6  # Por defecto usar MATRICULA si no coincide
-                }
-
-                concepto_codigo = detalle['concepto_pago_id']
-                concepto_id = concepto_map.get(concepto_codigo)
-
-                if not concepto_id:
-                    logger.error(f"❌ Concepto '{concepto_codigo}' no encontrado en mapeo")
-                    self.mostrar_mensaje("Error", f"Concepto '{detalle['concepto_nombre']}' no configurado", "error")
-                    return
-
-                datos_bd = {
-                    'transaccion_id': self.transaccion_id,
-                    'concepto_pago_id': concepto_id,
-                    'descripcion': detalle['descripcion'],
-                    'cantidad': int(detalle['cantidad']),
-                    'precio_unitario': detalle['precio_unitario'],
-                    'subtotal': detalle['subtotal'],
-                    'orden': self.proximo_orden
-                }
-
-                logger.info(f"📦 Guardando detalle en BD: {datos_bd}")
-                resultado = DetalleTransaccionModel.crear(datos_bd)
-
-                if resultado.get('success'):
-                    detalle['id'] = resultado.get('id')
-                    logger.info(f"✅ Detalle guardado en BD con ID: {resultado.get('id')}")
-                else:
-                    logger.error(f"❌ Error guardando detalle: {resultado.get('error')}")
-                    self.mostrar_mensaje("Error", f"No se pudo guardar el detalle: {resultado.get('error')}", "error")
-                    return
+            # El detalle queda pendiente: se guarda junto con la cabecera al guardar o finalizar
+            if not self.CONCEPTOS_BD.get(detalle.get('concepto_pago_id')):
+                logger.error(f"❌ Concepto '{detalle['concepto_pago_id']}' no encontrado en mapeo")
+                self.mostrar_mensaje("Error", f"Concepto '{detalle['concepto_nombre']}' no configurado", "error")
+                return
 
             detalle['orden'] = self.proximo_orden
             self.proximo_orden += 1
@@ -977,6 +928,21 @@ class TransaccionOverlay(BaseOverlay):
             self._actualizar_monto_final()
             logger.info(f"✅ Detalle agregado: {detalle.get('descripcion')} - Bs. {detalle.get('subtotal')}")
     
+    def _detalle_para_bd(self, detalle: Dict[str, Any], orden: Optional[int]) -> Optional[Dict[str, Any]]:
+        """Convertir un detalle del diálogo al formato de detalles_transaccion"""
+        concepto_id = self.CONCEPTOS_BD.get(detalle.get('concepto_pago_id'))
+        if not concepto_id:
+            return None
+        
+        return {
+            'concepto_pago_id': concepto_id,
+            'descripcion': detalle['descripcion'],
+            'cantidad': int(detalle['cantidad']),
+            'precio_unitario': detalle['precio_unitario'],
+            'subtotal': detalle['subtotal'],
+            'orden': orden
+        }
+    
     def _refrescar_tabla_detalles(self):
         """Actualizar la tabla con los detalles temporales"""
         self.tabla_detalles.setRowCount(len(self.detalles_temporales))
@@ -1082,12 +1048,22 @@ class TransaccionOverlay(BaseOverlay):
             return
 
         if self.transaccion_id is None:
-            logger.error("No hay transacción activa para guardar")
-            self.mostrar_mensaje(
-                "Error",
-                "No hay una transacción activa para guardar. Por favor intente crear una nueva transacción.",
-                "error"
-            )
+            # Transacción nueva: cabecera y detalles se crean en una sola llamada
+            if not self.detalles_temporales:
+                self.mostrar_mensaje(
+                    "Validación",
+                    "Debe agregar al menos un detalle para guardar la transacción",
+                    "warning"
+                )
+                return
+            if self._crear_con_detalles(datos.get('estado') or 'REGISTRADO'):
+                logger.info(f"✅ Transacción {self.transaccion_id} creada con sus detalles")
+                self.mostrar_mensaje("Éxito", "Transacción guardada correctamente", "success")
+                self.transaccion_actualizada.emit(self.obtener_datos())
+            return
+
+        # Guardar en un solo INSERT los detalles que aún no están en la base de datos
+        if not self._guardar_detalles():
             return
 
         logger.info(f"Actualizando transacción ID: {self.transaccion_id} con datos: {datos}")
@@ -1124,20 +1100,24 @@ class TransaccionOverlay(BaseOverlay):
             )
             return
         
-        # Guardar los detalles en la base de datos (ya están guardados individualmente)
-        logger.info(f"Guardando {len(self.detalles_temporales)} detalles para transacción {self.transaccion_id}")
-        
-        # Actualizar montos finales en la transacción y cambiar estado a CONFIRMADO
         total_detalles = sum(d.get('subtotal', 0) for d in self.detalles_temporales)
-        if self.transaccion_id:
-            # Cambiar estado a CONFIRMADO para activar el trigger
-            datos_actualizacion = {
-                'id': self.transaccion_id,
-                'monto_total': total_detalles,
-                'monto_final': total_detalles,
-                'estado': 'CONFIRMADO'  # <-- ESTADO QUE ACTIVA EL TRIGGER
-            }
-            TransaccionModel.actualizar(self.transaccion_id, datos_actualizacion)
+        
+        if DiarioPagos.HABILITADO and self.transaccion_id:
+            # Escribir el pago en el diario local; el replicador lo aplica en segundo plano
+            if not self._registrar_en_diario(total_detalles):
+                return
+            mensaje = ("Transacción finalizada. El pago quedó en el diario local y se registrará en "
+                       "la base de datos en segundo plano; si falla se mostrará en el diario de pagos.")
+        elif self.transaccion_id is None:
+            # Cabecera CONFIRMADA y detalles en una sola llamada (el trigger registra la caja)
+            if not self._crear_con_detalles('CONFIRMADO'):
+                return
+            mensaje = "Transacción finalizada correctamente. Movimiento de caja registrado."
+        else:
+            # Detalles pendientes y confirmación de la transacción existente en una sola llamada
+            if not self._finalizar_existente(total_detalles):
+                return
+            mensaje = "Transacción finalizada correctamente. Movimiento de caja registrado."
         
         # Cambiar a modo visualización
         self._activar_modo_visualizacion()
@@ -1145,17 +1125,133 @@ class TransaccionOverlay(BaseOverlay):
         # Emitir señal
         self.detalles_registrados.emit(self.transaccion_id)
         
-        self.mostrar_mensaje(
-            "Éxito",
-            "Transacción finalizada correctamente. Movimiento de caja registrado.",
-            "success"
+        self.mostrar_mensaje("Éxito", mensaje, "success")
+    
+    def _registrar_en_diario(self, total_detalles: float) -> bool:
+        """Registrar la finalización (detalles pendientes + confirmación) en el diario local"""
+        detalles_bd = self._detalles_pendientes_bd()
+        if detalles_bd is None:
+            return False
+        
+        datos = {
+            'monto_total': total_detalles,
+            'monto_final': total_detalles
+        }
+        
+        try:
+            DiarioPagos.registrar_finalizacion(
+                self.transaccion_id, datos, detalles_bd,
+                comprobante=self._datos_comprobante(total_detalles)
+            )
+            return True
+        except Exception as e:
+            logger.error(f"❌ Error escribiendo el pago en el diario local: {e}")
+            self.mostrar_mensaje("Error", f"No se pudo registrar el pago: {str(e)}", "error")
+            return False
+    
+    def _datos_comprobante(self, total_detalles: float) -> Dict[str, Any]:
+        """Datos necesarios para imprimir el comprobante sin consultar la base de datos"""
+        estudiante = self.datos_estudiante or {}
+        programa = self.datos_programa or {}
+        
+        transaccion = {
+            **self.obtener_datos(),
+            'numero_transaccion': self.txt_numero_transaccion.text(),
+            'monto_total': total_detalles,
+            'monto_final': total_detalles,
+            'estado': 'CONFIRMADO',
+            'estudiante_nombre': estudiante.get('nombres', ''),
+            'estudiante_apellido_paterno': estudiante.get('paterno', ''),
+            'estudiante_apellido_materno': estudiante.get('materno', ''),
+            'estudiante_ci': estudiante.get('ci_completo', 'N/A'),
+            'programa_nombre': programa.get('nombre'),
+            'programa_codigo': programa.get('codigo'),
+        }
+        
+        return {'transaccion': transaccion, 'detalles': list(self.detalles_temporales)}
+    
+    def _detalles_pendientes_bd(self) -> Optional[List[Dict[str, Any]]]:
+        """Detalles temporales sin ID en formato de detalles_transaccion (None si alguno no es válido)"""
+        detalles_bd = []
+        for detalle in self.detalles_temporales:
+            if detalle.get('id'):
+                continue
+            datos = self._detalle_para_bd(detalle, detalle.get('orden'))
+            if not datos:
+                self.mostrar_mensaje("Error", f"Concepto '{detalle.get('concepto_nombre')}' no configurado", "error")
+                return None
+            detalles_bd.append(datos)
+        return detalles_bd
+    
+    def _asociar_ids_detalles(self, creados: List[Dict[str, Any]]):
+        """Asociar los IDs creados en la base de datos a cada detalle temporal por su orden"""
+        por_orden = {creado.get('orden'): creado for creado in creados}
+        for detalle in self.detalles_temporales:
+            creado = por_orden.get(detalle.get('orden'))
+            if creado and not detalle.get('id'):
+                detalle['id'] = creado.get('id')
+    
+    def _crear_con_detalles(self, estado: str) -> bool:
+        """Crear la cabecera y sus detalles pendientes con fn_registrar_transaccion_con_detalles"""
+        detalles_bd = self._detalles_pendientes_bd()
+        if detalles_bd is None:
+            return False
+        
+        datos = {**self.obtener_datos(), 'estado': estado, 'registrado_por': self.usuario_id}
+        resultado = TransaccionModel.crear_transaccion_con_detalles(datos, detalles_bd)
+        if not resultado.get('success'):
+            logger.error(f"❌ Error creando transacción con detalles: {resultado.get('error')}")
+            self.mostrar_mensaje("Error", f"No se pudo registrar la transacción: {resultado.get('error')}", "error")
+            return False
+        
+        self.transaccion_id = resultado.get('id')
+        self._asociar_ids_detalles(resultado.get('detalles', []))
+        if resultado.get('numero_transaccion'):
+            self.txt_numero_transaccion.setText(resultado['numero_transaccion'])
+        return True
+    
+    def _finalizar_existente(self, total_detalles: float) -> bool:
+        """Guardar los detalles pendientes y confirmar la transacción con fn_finalizar_transaccion"""
+        detalles_bd = self._detalles_pendientes_bd()
+        if detalles_bd is None:
+            return False
+        
+        datos = {
+            **self.obtener_datos(),
+            'monto_total': total_detalles,
+            'monto_final': total_detalles
+        }
+        resultado = TransaccionModel.finalizar_idempotente(
+            str(uuid.uuid4()), self.transaccion_id, datos, detalles_bd
         )
+        if not resultado.get('success'):
+            logger.error(f"❌ Error finalizando transacción {self.transaccion_id}: {resultado.get('error')}")
+            self.mostrar_mensaje("Error", f"No se pudo finalizar la transacción: {resultado.get('error')}", "error")
+            return False
+        return True
     
-    def _guardar_detalles(self):
-        """Guardar los detalles temporales en la base de datos"""
-        # Aquí se implementaría el guardado de detalles
-        # Por ahora solo registramos en log
-        logger.info(f"Guardando {len(self.detalles_temporales)} detalles para transacción {self.transaccion_id}")
+    def _guardar_detalles(self) -> bool:
+        """Guardar en lote los detalles temporales que aún no tienen ID en la base de datos"""
+        if not self.transaccion_id:
+            return True
+        
+        datos_bd = self._detalles_pendientes_bd()
+        if datos_bd is None:
+            return False
+        if not datos_bd:
+            return True
+        
+        logger.info(f"Guardando {len(datos_bd)} detalles para transacción {self.transaccion_id}")
+        
+        from model.detalle_transaccion_model import DetalleTransaccionModel
+        resultado = DetalleTransaccionModel.crear_lote(self.transaccion_id, datos_bd)
+        if not resultado.get('success'):
+            logger.error(f"❌ Error guardando detalles: {resultado.get('error')}")
+            self.mostrar_mensaje("Error", f"No se pudieron guardar los detalles: {resultado.get('error')}", "error")
+            return False
+        
+        self._asociar_ids_detalles(resultado.get('data', []))
+        return True
     
     def _ver_comprobante(self):
         """Generar y mostrar/ imprimir comprobante de la transacción"""
@@ -1168,6 +1264,35 @@ class TransaccionOverlay(BaseOverlay):
         try:
             from utils.comprobante_generator import ComprobanteGenerator
             
+            # Pagos finalizados en caja: imprimir desde el diario local sin consultar la BD
+            operacion = DiarioPagos.obtener_por_transaccion(self.transaccion_id) if DiarioPagos.HABILITADO else None
+            if operacion and operacion.get('estado') == 'ERROR':
+                # El pago no llegó a la base de datos: no emitir un comprobante de algo no registrado
+                self.mostrar_mensaje(
+                    "Error",
+                    "El pago de esta transacción no se pudo registrar en la base de datos "
+                    f"({operacion.get('ultimo_error') or 'error desconocido'}). "
+                    "Reintente desde el diario de pagos antes de imprimir el comprobante.",
+                    "error"
+                )
+                return
+            if operacion and operacion.get('comprobante'):
+                inscripcion = None
+                if self.datos_inscripcion:
+                    inscripcion = {
+                        'success': True,
+                        'inscripcion': self.datos_inscripcion,
+                        'estudiante': self.datos_estudiante or {},
+                        'programa': self.datos_programa or {}
+                    }
+                comprobante = ComprobanteGenerator.generar_comprobante(
+                    transaccion=operacion['comprobante']['transaccion'],
+                    detalles=operacion['comprobante']['detalles'],
+                    inscripcion=inscripcion
+                )
+                self._mostrar_dialogo_comprobante(comprobante)
+                return
+            
             # Obtener datos actualizados de la transacción
             resultado = TransaccionModel.obtener_por_id(self.transaccion_id)
             if not resultado.get('success'):
@@ -1554,8 +1679,11 @@ class TransaccionOverlay(BaseOverlay):
                 # Cargar datos de la inscripción para mostrar en UI
                 self.cargar_datos_inscripcion(inscripcion_id)
                 
-                # Recargar transacción para obtener el número generado
-                self._recargar_transaccion()
+                # La fila creada ya trae el número generado por el trigger
+                if resultado.get('data'):
+                    self._actualizar_campos_con_datos(resultado['data'])
+                else:
+                    self._recargar_transaccion()
                 
                 # Habilitar botones
                 self._actualizar_estado_botones()
@@ -1819,14 +1947,35 @@ class TransaccionOverlay(BaseOverlay):
             self.mostrar_mensaje("Error", "Faltan datos obligatorios para crear la transacción automática", "error")
             return
         
-        exito = self.inicializar_nueva_transaccion(
-            self.inscripcion_id,  # type: ignore
-            self.programa_id,  # type: ignore
-            self.estudiante_id # type: ignore
-        )
+        if DiarioPagos.HABILITADO:
+            # El diario confirma transacciones existentes: la cabecera se crea al abrir
+            exito = self.inicializar_nueva_transaccion(
+                self.inscripcion_id,  # type: ignore
+                self.programa_id,  # type: ignore
+                self.estudiante_id # type: ignore
+            )
+        else:
+            # La cabecera se crea junto con sus detalles al guardar o finalizar
+            exito = self._preparar_nueva_transaccion(self.inscripcion_id)  # type: ignore
         if not exito:
             QTimer.singleShot(2000, self.close_overlay)
     
+    def _preparar_nueva_transaccion(self, inscripcion_id: int) -> bool:
+        """Preparar el formulario de una transacción nueva sin crearla todavía en la base de datos"""
+        if not self.usuario_id:
+            logger.error("❌ No hay usuario_id disponible para crear la transacción")
+            self.mostrar_mensaje("Error de Sesión", 
+                                "No se pudo identificar al usuario. Por favor, inicie sesión nuevamente.", 
+                                "error")
+            return False
+        
+        self.cargar_datos_inscripcion(inscripcion_id)
+        self.txt_numero_transaccion.clear()
+        if not self.txt_observaciones.toPlainText().strip():
+            self.txt_observaciones.setPlainText(f'Pago Inscripción #{inscripcion_id}')
+        self._actualizar_estado_botones()
+        return True
+    
     def cargar_datos_inscripcion(self, inscripcion_id: int):
         """
         Cargar datos reales desde una inscripción para mostrar en la UI
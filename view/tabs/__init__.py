@@ -4,12 +4,15 @@ Módulo de pestañas personalizadas para la aplicación
 """
 
 from .base_tab import BaseTab
+from .entity_table_model import EntityTableModel, EstadoItemDelegate
 from .inicio_tab import InicioTab
 from .resumen_tab import ResumenTab
 
 # Exportar todas las clases
 __all__ = [
     'BaseTab', 
+    'EntityTableModel',
+    'EstadoItemDelegate',
     'InicioTab',
     'ResumenTab',
 ]
\ No newline at end of file
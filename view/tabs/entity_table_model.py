@@ -0,0 +1,257 @@
+# Archivo: view/tabs/entity_table_model.py
+# -*- coding: utf-8 -*-
+"""
+Descripción: Modelo de tabla virtualizado para las vistas de entidades
+(estudiantes, docentes y programas).
+
+Las filas se guardan por columnas en arreglos compactos y se formatean por
+lotes a medida que la vista las solicita mediante canFetchMore/fetchMore,
+de modo que mostrar miles de registros cuesta lo que cuesta el área visible.
+Autor: Sistema FormaGestPro
+Versión: 1.0.0
+"""
+
+import logging
+from array import array
+from typing import Any, Callable, Dict, List, Optional, Sequence
+
+from PySide6.QtCore import Qt, QAbstractTableModel, QModelIndex
+from PySide6.QtGui import QColor
+from PySide6.QtWidgets import QStyledItemDelegate
+
+# Configurar logging
+logger = logging.getLogger(__name__)
+
+# Tipos auxiliares
+Formateador = Callable[[Dict[str, Any]], Sequence[str]]
+FuenteRemota = Callable[[int, int], List[Dict[str, Any]]]
+
+
+class EntityTableModel(QAbstractTableModel):
+    """
+    Modelo de tabla por columnas con carga incremental.
+
+    Cada columna se describe con un diccionario:
+        {'titulo': 'ESTADO', 'alineacion': 'center' | 'right' | None,
+         'estado': True | False}
+
+    Los registros crudos se formatean sólo cuando la vista los necesita
+    (fetchMore). Opcionalmente se puede registrar una fuente remota
+    ``fuente(offset, limit)`` para seguir pidiendo filas a la base de datos
+    cuando se agotan las locales.
+    """
+
+    FETCH_BATCH = 100  # Filas formateadas por cada fetchMore
+
+    _ALINEACIONES = {
+        'center': Qt.AlignmentFlag.AlignCenter,
+        'right': Qt.AlignmentFlag.AlignRight | Qt.AlignmentFlag.AlignVCenter,
+    }
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self._columnas: List[Dict[str, Any]] = []
+        self._formateador: Optional[Formateador] = None
+        self._fuente: Optional[FuenteRemota] = None
+        self._fuente_agotada = True
+
+        # Almacenamiento por columnas
+        self._ids = array('q')
+        self._valores: List[List[str]] = []
+
+        # Registros pendientes de formatear
+        self._pendientes: List[Dict[str, Any]] = []
+        self._pos_pendiente = 0
+
+    # =========================================================================
+    # CONFIGURACIÓN
+    # =========================================================================
+
+    def configurar_columnas(self, columnas: List[Dict[str, Any]]) -> None:
+        """Definir las columnas del modelo y descartar las filas actuales."""
+        self.beginResetModel()
+        self._columnas = list(columnas)
+        self._limpiar_filas()
+        self.endResetModel()
+
+    def cargar_registros(self, registros: List[Dict[str, Any]],
+                        formateador: Formateador,
+                        fuente: Optional[FuenteRemota] = None) -> None:
+        """
+        Reemplazar el contenido del modelo.
+
+        Args:
+            registros: Registros crudos (diccionarios) a mostrar
+            formateador: Función que convierte un registro en los textos de
+                cada columna (la primera columna debe ser el ID)
+            fuente: Función opcional ``(offset, limit)`` para pedir más
+                registros cuando se agotan los recibidos
+        """
+        self.beginResetModel()
+        self._limpiar_filas()
+        self._formateador = formateador
+        self._pendientes = list(registros or [])
+        self._fuente = fuente
+        self._fuente_agotada = fuente is None
+        self.endResetModel()
+
+        # Formatear el primer lote para que la vista tenga algo que pintar
+        if self.canFetchMore(QModelIndex()):
+            self.fetchMore(QModelIndex())
+
+    def clear(self) -> None:
+        """Eliminar todas las filas manteniendo las columnas."""
+        self.beginResetModel()
+        self._limpiar_filas()
+        self.endResetModel()
+
+    def _limpiar_filas(self) -> None:
+        """Reiniciar el almacenamiento interno."""
+        self._ids = array('q')
+        self._valores = [[] for _ in self._columnas]
+        self._pendientes = []
+        self._pos_pendiente = 0
+        self._fuente = None
+        self._fuente_agotada = True
+
+    # =========================================================================
+    # API DE QABSTRACTTABLEMODEL
+    # =========================================================================
+
+    def rowCount(self, parent: QModelIndex = QModelIndex()) -> int:
+        if parent.isValid():
+            return 0
+        return len(self._ids)
+
+    def columnCount(self, parent: QModelIndex = QModelIndex()) -> int:
+        if parent.isValid():
+            return 0
+        return len(self._columnas)
+
+    def data(self, index: QModelIndex, role: int = Qt.ItemDataRole.DisplayRole) -> Any:
+        if not index.isValid():
+            return None
+
+        row, col = index.row(), index.column()
+        if row >= len(self._ids) or col >= len(self._columnas):
+            return None
+
+        if role == Qt.ItemDataRole.DisplayRole:
+            return self._valores[col][row]
+        if role == Qt.ItemDataRole.TextAlignmentRole:
+            return self._ALINEACIONES.get(self._columnas[col].get('alineacion'))
+        if role == Qt.ItemDataRole.UserRole:
+            return self._ids[row]
+        return None
+
+    def headerData(self, section: int, orientation: Qt.Orientation,
+                role: int = Qt.ItemDataRole.DisplayRole) -> Any:
+        if role != Qt.ItemDataRole.DisplayRole:
+            return None
+        if orientation == Qt.Orientation.Horizontal and 0 <= section < len(self._columnas):
+            return self._columnas[section].get('titulo', '')
+        if orientation == Qt.Orientation.Vertical:
+            return str(section + 1)
+        return None
+
+    def canFetchMore(self, parent: QModelIndex = QModelIndex()) -> bool:
+        if parent.isValid():
+            return False
+        return self._pos_pendiente < len(self._pendientes) or not self._fuente_agotada
+
+    def fetchMore(self, parent: QModelIndex = QModelIndex()) -> None:
+        if parent.isValid():
+            return
+
+        # Pedir más registros a la fuente remota si ya no hay locales
+        if self._pos_pendiente >= len(self._pendientes) and not self._fuente_agotada:
+            self._solicitar_a_fuente()
+
+        inicio = self._pos_pendiente
+        fin = min(inicio + self.FETCH_BATCH, len(self._pendientes))
+        if fin <= inicio or self._formateador is None:
+            return
+
+        primera = len(self._ids)
+        self.beginInsertRows(QModelIndex(), primera, primera + (fin - inicio) - 1)
+        for registro in self._pendientes[inicio:fin]:
+            self._agregar_fila(registro)
+        self._pos_pendiente = fin
+        self.endInsertRows()
+
+        # Liberar registros crudos ya formateados
+        if self._pos_pendiente >= len(self._pendientes):
+            self._pendientes = []
+            self._pos_pendiente = 0
+
+    def _solicitar_a_fuente(self) -> None:
+        """Pedir el siguiente lote a la fuente remota."""
+        fuente = self._fuente
+        if fuente is None:
+            self._fuente_agotada = True
+            return
+
+        try:
+            nuevos = fuente(len(self._ids), self.FETCH_BATCH) or []
+        except Exception as e:
+            logger.error(f"Error obteniendo filas adicionales: {e}")
+            nuevos = []
+
+        if len(nuevos) < self.FETCH_BATCH:
+            self._fuente_agotada = True
+        self._pendientes = list(nuevos)
+        self._pos_pendiente = 0
+
+    def _agregar_fila(self, registro: Dict[str, Any]) -> None:
+        """Formatear un registro y anexarlo a los arreglos por columna."""
+        formateador = self._formateador
+        if formateador is None:
+            return
+
+        textos = formateador(registro)
+        try:
+            self._ids.append(int(registro.get('id') or 0))
+        except (ValueError, TypeError):
+            self._ids.append(0)
+
+        for col, valores in enumerate(self._valores):
+            valores.append(textos[col] if col < len(textos) else '')
+
+    # =========================================================================
+    # ACCESO A DATOS
+    # =========================================================================
+
+    def id_en_fila(self, row: int) -> Optional[int]:
+        """Obtener el ID del registro mostrado en una fila."""
+        if 0 <= row < len(self._ids):
+            return self._ids[row] or None
+        return None
+
+    def columnas_estado(self) -> List[int]:
+        """Índices de las columnas que muestran un estado."""
+        return [i for i, c in enumerate(self._columnas) if c.get('estado')]
+
+
+class EstadoItemDelegate(QStyledItemDelegate):
+    """Delegado que colorea las celdas de estado según su valor."""
+
+    # (fragmento, color) evaluados en orden: INACTIVO antes que ACTIVO
+    COLORES = [
+        ("INACTIVO", QColor(Qt.GlobalColor.red)),
+        ("CANCELADO", QColor(Qt.GlobalColor.red)),
+        ("ACTIVO", QColor(Qt.GlobalColor.green)),
+        ("EN_CURSO", QColor(Qt.GlobalColor.green)),
+        ("PLANIFICADO", QColor(Qt.GlobalColor.blue)),
+        ("FINALIZADO", QColor(Qt.GlobalColor.darkGray)),
+    ]
+
+    def initStyleOption(self, option, index) -> None:
+        super().initStyleOption(option, index)
+        option.displayAlignment = Qt.AlignmentFlag.AlignCenter
+
+        estado = str(index.data(Qt.ItemDataRole.DisplayRole) or "").upper()
+        for fragmento, color in self.COLORES:
+            if fragmento in estado:
+                option.palette.setColor(option.palette.ColorRole.Text, color)
+                option.palette.setColor(option.palette.ColorRole.HighlightedText, color)
+                break
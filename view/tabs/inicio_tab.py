@@ -15,12 +15,14 @@ from PySide6.QtCore import Qt, Signal, QTimer
 from PySide6.QtGui import QFont, QAction
 from PySide6.QtWidgets import (
     QLabel, QPushButton, QHBoxLayout, QVBoxLayout,
-    QLineEdit, QComboBox, QTableWidget, QTableWidgetItem,
+    QLineEdit, QComboBox, QTableView,
     QHeaderView, QGroupBox, QGridLayout,
     QFrame, QMessageBox, QMenu, QWidget, QAbstractItemView
 )
 
 from .base_tab import BaseTab
+from .entity_table_model import EntityTableModel, EstadoItemDelegate
+from .page_cache import PageCache, Pagina
 from model.programa_model import ProgramaModel
 from model.docente_model import DocenteModel
 from model.estudiante_model import EstudianteModel
@@ -44,6 +46,7 @@ class InicioTab(BaseTab):
     
     # Constantes de configuración
     PAGE_SIZE = 10  # Registros por página
+    PAGE_CACHE_SIZE = 30  # Páginas retenidas en la caché LRU
     VIEW_TYPES = ["estudiantes", "docentes", "programas"]
     
     def __init__(self, user_data=None, parent=None):
@@ -69,8 +72,14 @@ class InicioTab(BaseTab):
         self.total_pages = 1
         self.total_records = 0
         
+        # Caché de páginas por (vista, filtros, offset)
+        self.page_cache = PageCache(max_pages=self.PAGE_CACHE_SIZE)
+        
         # Inicializar componentes
-        self.table = QTableWidget()
+        self.table = QTableView()
+        self.table_model = EntityTableModel(self)
+        self.table.setModel(self.table_model)
+        self.estado_delegate = EstadoItemDelegate(self.table)
         self.action_buttons_container = QVBoxLayout()  # Inicializar como QVBoxLayout
         
         # Configurar el header
@@ -166,7 +175,9 @@ class InicioTab(BaseTab):
         self.table.setEditTriggers(QAbstractItemView.EditTrigger.NoEditTriggers)
         
         # Conectar señales
-        self.table.itemSelectionChanged.connect(self._on_table_selection_changed)
+        self.table.selectionModel().selectionChanged.connect(
+            lambda *_: self._on_table_selection_changed()
+        )
         self.table.doubleClicked.connect(self._on_table_double_click)
         
         # Configurar menú contextual
@@ -520,41 +531,67 @@ class InicioTab(BaseTab):
     def _configure_table_for_estudiantes(self) -> None:
         """Configurar tabla para mostrar estudiantes."""
         columnas = [
-            "ID", "CARNET", "NOMBRE COMPLETO", "EMAIL",
-            "TELÉFONO", "ESTADO", "FECHA REGISTRO"
+            {'titulo': "ID", 'alineacion': 'center'},
+            {'titulo': "CARNET"},
+            {'titulo': "NOMBRE COMPLETO"},
+            {'titulo': "EMAIL"},
+            {'titulo': "TELÉFONO"},
+            {'titulo': "ESTADO", 'estado': True},
+            {'titulo': "FECHA REGISTRO", 'alineacion': 'center'},
         ]
         self._setup_table_columns(columnas, [2])
     
     def _configure_table_for_docentes(self) -> None:
         """Configurar tabla para mostrar docentes."""
         columnas = [
-            "ID", "CARNET", "NOMBRE COMPLETO", "EMAIL",
-            "TELÉFONO", "ESPECIALIDAD", "TITULO", "ESTADO", "FECHA REGISTRO"
+            {'titulo': "ID", 'alineacion': 'center'},
+            {'titulo': "CARNET"},
+            {'titulo': "NOMBRE COMPLETO"},
+            {'titulo': "EMAIL"},
+            {'titulo': "TELÉFONO"},
+            {'titulo': "ESPECIALIDAD"},
+            {'titulo': "TITULO"},
+            {'titulo': "ESTADO", 'estado': True},
+            {'titulo': "FECHA REGISTRO", 'alineacion': 'center'},
         ]
         self._setup_table_columns(columnas, [2])
     
     def _configure_table_for_programas(self) -> None:
         """Configurar tabla para mostrar programas."""
         columnas = [
-            "ID", "CÓDIGO", "NOMBRE", "DURACIÓN (meses)",
-            "HORAS", "ESTADO", "COSTO TOTAL", "CUPOS",
-            "FECHA INICIO", "FECHA FIN"
+            {'titulo': "ID", 'alineacion': 'center'},
+            {'titulo': "CÓDIGO"},
+            {'titulo': "NOMBRE"},
+            {'titulo': "DURACIÓN (meses)", 'alineacion': 'center'},
+            {'titulo': "HORAS", 'alineacion': 'center'},
+            {'titulo': "ESTADO", 'estado': True},
+            {'titulo': "COSTO TOTAL", 'alineacion': 'right'},
+            {'titulo': "CUPOS", 'alineacion': 'center'},
+            {'titulo': "FECHA INICIO", 'alineacion': 'center'},
+            {'titulo': "FECHA FIN", 'alineacion': 'center'},
         ]
         self._setup_table_columns(columnas, [2])
     
-    def _setup_table_columns(self, columns: list, stretch_columns: list) -> None:
-        """Configurar columnas de la tabla."""
-        self.table.setColumnCount(len(columns))
-        self.table.setHorizontalHeaderLabels(columns)
+    def _setup_table_columns(self, columns: List[Dict], stretch_columns: list) -> None:
+        """Configurar columnas del modelo de tabla y sus delegados."""
+        # Quitar delegados de estado de la vista anterior
+        for i in range(self.table_model.columnCount()):
+            self.table.setItemDelegateForColumn(i, None)
+        
+        self.table_model.configurar_columnas(columns)
         
         header = self.table.horizontalHeader()
+        # Medir sólo las filas visibles al ajustar columnas al contenido
+        header.setResizeContentsPrecision(0)
         for i in range(len(columns)):
             if i in stretch_columns:
                 header.setSectionResizeMode(i, QHeaderView.ResizeMode.Stretch)
             else:
                 header.setSectionResizeMode(i, QHeaderView.ResizeMode.ResizeToContents)
         
-        self.table.setRowCount(0)
+        for i in self.table_model.columnas_estado():
+            self.table.setItemDelegateForColumn(i, self.estado_delegate)
+        
         self.current_data = []
     
     # =========================================================================
@@ -667,7 +704,7 @@ class InicioTab(BaseTab):
     
     def _on_view_details(self) -> None:
         """Manejador base: Ver detalles del registro seleccionado."""
-        current_row = self.table.currentRow()
+        current_row = self.table.currentIndex().row()
         if current_row < 0:
             self._mostrar_info("Ver Detalles", "Por favor, seleccione un registro de la tabla para ver detalles.")
             return
@@ -691,7 +728,7 @@ class InicioTab(BaseTab):
     
     def _on_edit(self) -> None:
         """Manejador base: Editar registro seleccionado."""
-        current_row = self.table.currentRow()
+        current_row = self.table.currentIndex().row()
         if current_row < 0:
             self._mostrar_info("Editar", "Por favor, seleccione un registro de la tabla para editar.")
             return
@@ -726,6 +763,9 @@ class InicioTab(BaseTab):
             # Limpiar selección para evitar referencias inválidas
             self.table.clearSelection()
 
+            # Descartar páginas en caché de la vista actual
+            self.page_cache.invalidar(self.current_view)
+
             # Resetear variables de estado
             self.current_page = 1
             self.total_records = 0
@@ -755,15 +795,7 @@ class InicioTab(BaseTab):
     def _load_estudiantes_page(self, offset: int) -> None:
         """Cargar página de estudiantes."""
         try:
-            estudiantes = EstudianteModel.buscar_estudiantes_completo(
-                limit=self.PAGE_SIZE,
-                offset=offset
-            )
-            
-            # Contar total
-            self.total_records = EstudianteModel.contar_estudiantes()
-            self.total_pages = max(1, (self.total_records + self.PAGE_SIZE - 1) // self.PAGE_SIZE)
-            
+            estudiantes = self._obtener_pagina("estudiantes", None, offset)
             self._mostrar_estudiantes_en_tabla(estudiantes)
             
         except Exception as e:
@@ -780,41 +812,34 @@ class InicioTab(BaseTab):
             logger.info("No hay estudiantes para mostrar")
             return
         
-        self.table.setRowCount(len(estudiantes))
-        
-        for row, estudiante in enumerate(estudiantes):
-            self._agregar_fila_estudiante(row, estudiante)
+        self.current_data = estudiantes
+        self.table_model.cargar_registros(estudiantes, self._formatear_fila_estudiante)
         
         self._actualizar_paginacion()
         logger.info(f"{len(estudiantes)} estudiantes mostrados")
     
-    def _agregar_fila_estudiante(self, row: int, estudiante: Dict) -> None:
-        """Agregar una fila de estudiante a la tabla."""
-        # ID
-        self._set_table_item(row, 0, str(estudiante.get('id', '')), align_center=True)
-        
+    def _formatear_fila_estudiante(self, estudiante: Dict) -> List[str]:
+        """Convertir un estudiante en los textos de cada columna de la tabla."""
         # Carnet
         ci_numero = estudiante.get('ci_numero', '')
         ci_expedicion = estudiante.get('ci_expedicion', '')
         carnet = f"{ci_numero}-{ci_expedicion}" if ci_numero and ci_expedicion else f"{ci_numero}"
-        self._set_table_item(row, 1, carnet)
         
         # Nombre completo
         nombre_completo = f"{estudiante.get('nombres', '')} {estudiante.get('apellido_paterno', '')} {estudiante.get('apellido_materno', '')}".strip()
-        self._set_table_item(row, 2, nombre_completo)
-        
-        # Email y Teléfono
-        self._set_table_item(row, 3, estudiante.get('email', ''))
-        self._set_table_item(row, 4, estudiante.get('telefono', ''))
         
         # Estado
         estado = "ACTIVO" if estudiante.get('activo', True) else "INACTIVO"
-        estado_item = self._create_status_item(estado)
-        self.table.setItem(row, 5, estado_item)
         
-        # Fecha registro
-        fecha_registro = estudiante.get('fecha_registro', '')
-        self._set_table_item(row, 6, str(fecha_registro), align_center=True)
+        return [
+            str(estudiante.get('id', '')),
+            carnet,
+            nombre_completo,
+            estudiante.get('email', '') or '',
+            estudiante.get('telefono', '') or '',
+            estado,
+            str(estudiante.get('fecha_registro', '')),
+        ]
     
     def _buscar_estudiantes_filtrados(self) -> None:
         """Buscar estudiantes con filtros del formulario."""
@@ -856,20 +881,8 @@ class InicioTab(BaseTab):
     def _load_estudiantes_filtrados_page(self, offset: int) -> None:
         """Cargar página de estudiantes con filtros aplicados."""
         try:
-            filtros = self.current_filters
-            
-            estudiantes = EstudianteModel.buscar_estudiantes_completo(
-                ci_numero=filtros.get('ci_numero'),
-                ci_expedicion=filtros.get('ci_expedicion'),
-                nombres=filtros.get('nombres'),
-                limit=self.PAGE_SIZE,
-                offset=offset
-            )
-            
-            if self.total_records == 0:
-                self.total_records = self._count_estudiantes_filtrados(filtros)
-                self.total_pages = max(1, (self.total_records + self.PAGE_SIZE - 1) // self.PAGE_SIZE)
-            
+            filtros = {k: v for k, v in self.current_filters.items() if k != 'view'}
+            estudiantes = self._obtener_pagina("estudiantes", filtros, offset)
             self._mostrar_estudiantes_en_tabla(estudiantes)
             
         except Exception as e:
@@ -883,16 +896,7 @@ class InicioTab(BaseTab):
     def _load_docentes_page(self, offset: int) -> None:
         """Cargar página de docentes."""
         try:
-            docentes = DocenteModel.obtener_todos_docentes(
-                limit=self.PAGE_SIZE,
-                offset=offset
-            )
-            
-            # Contar total
-            if self.total_records == 0:
-                self.total_records = DocenteModel.contar_docentes()
-                self.total_pages = max(1, (self.total_records + self.PAGE_SIZE - 1) // self.PAGE_SIZE)
-            
+            docentes = self._obtener_pagina("docentes", None, offset)
             self._mostrar_docentes_en_tabla(docentes)
             
         except Exception as e:
@@ -909,43 +913,36 @@ class InicioTab(BaseTab):
             logger.info("No hay docentes para mostrar")
             return
         
-        self.table.setRowCount(len(docentes))
-        
-        for row, docente in enumerate(docentes):
-            self._agregar_fila_docente(row, docente)
+        self.current_data = docentes
+        self.table_model.cargar_registros(docentes, self._formatear_fila_docente)
         
         self._actualizar_paginacion()
         logger.info(f"{len(docentes)} docentes mostrados")
     
-    def _agregar_fila_docente(self, row: int, docente: Dict) -> None:
-        """Agregar una fila de docente a la tabla."""
-        # ID y Carnet
-        self._set_table_item(row, 0, str(docente.get('id', '')), align_center=True)
+    def _formatear_fila_docente(self, docente: Dict) -> List[str]:
+        """Convertir un docente en los textos de cada columna de la tabla."""
+        # Carnet
         ci_numero = docente.get('ci_numero', '')
         ci_expedicion = docente.get('ci_expedicion', '')
         carnet = f"{ci_numero}-{ci_expedicion}" if ci_numero and ci_expedicion else f"{ci_numero}"
-        self._set_table_item(row, 1, carnet)
         
         # Nombre completo
         nombre_completo = f"{docente.get('nombres', '')} {docente.get('apellido_paterno', '')} {docente.get('apellido_materno', '')}".strip()
-        self._set_table_item(row, 2, nombre_completo)
-        
-        # Contacto
-        self._set_table_item(row, 3, docente.get('email', ''))
-        self._set_table_item(row, 4, docente.get('telefono', ''))
-        
-        # Información profesional
-        self._set_table_item(row, 5, docente.get('especialidad', ''))
-        self._set_table_item(row, 6, docente.get('titulo_profesional', ''))
         
         # Estado
         estado = "ACTIVO" if docente.get('activo', True) else "INACTIVO"
-        estado_item = self._create_status_item(estado)
-        self.table.setItem(row, 7, estado_item)
         
-        # Fecha registro
-        fecha_registro = docente.get('fecha_registro', '')
-        self._set_table_item(row, 8, str(fecha_registro), align_center=True)
+        return [
+            str(docente.get('id', '')),
+            carnet,
+            nombre_completo,
+            docente.get('email', '') or '',
+            docente.get('telefono', '') or '',
+            docente.get('especialidad', '') or '',
+            docente.get('titulo_profesional', '') or '',
+            estado,
+            str(docente.get('fecha_registro', '')),
+        ]
     
     def _buscar_docentes_filtrados(self) -> None:
         """Buscar docentes con filtros del formulario."""
@@ -996,16 +993,7 @@ class InicioTab(BaseTab):
     def _load_programas_page(self, offset: int) -> None:
         """Cargar página de programas."""
         try:
-            programas = ProgramaModel.buscar_programas(
-                limit=self.PAGE_SIZE,
-                offset=offset
-            )
-
-            # Contar total para paginación
-            if self.total_records == 0:
-                self.total_records = ProgramaModel.contar_programas()
-                self.total_pages = max(1, (self.total_records + self.PAGE_SIZE - 1) // self.PAGE_SIZE)
-
+            programas = self._obtener_pagina("programas", None, offset)
             self._mostrar_programas_en_tabla(programas)
 
         except Exception as e:
@@ -1047,49 +1035,42 @@ class InicioTab(BaseTab):
             logger.info("No hay programas para mostrar")
             return
         
-        self.table.setRowCount(len(programas))
-        
-        for row, programa in enumerate(programas):
-            self._agregar_fila_programa(row, programa)
+        self.current_data = programas
+        self.table_model.cargar_registros(programas, self._formatear_fila_programa)
         
         self._actualizar_paginacion()
         logger.info(f"{len(programas)} programas mostrados")
     
-    def _agregar_fila_programa(self, row: int, programa: Dict) -> None:
-        """Agregar una fila de programa a la tabla."""
-        # ID y Código
-        self._set_table_item(row, 0, str(programa.get('id', '')), align_center=True)
-        self._set_table_item(row, 1, programa.get('codigo', ''))
-        
-        # Nombre
-        self._set_table_item(row, 2, programa.get('nombre', ''))
-        
+    def _formatear_fila_programa(self, programa: Dict) -> List[str]:
+        """Convertir un programa en los textos de cada columna de la tabla."""
         # Duración y Horas
         duracion = programa.get('duracion_meses', '')
         horas = programa.get('horas_totales', '')
-        self._set_table_item(row, 3, str(duracion) if duracion is not None else '', align_center=True)
-        self._set_table_item(row, 4, str(horas) if horas is not None else '', align_center=True)
-        
-        # Estado
-        estado = programa.get('estado', '')
-        estado_item = self._create_status_item(estado)
-        self.table.setItem(row, 5, estado_item)
         
         # Costo y Cupos
         costo = programa.get('costo_total', 0)
         costo_text = f"${costo:,.2f}" if costo else "$0.00"
-        self._set_table_item(row, 6, costo_text, align_right=True)
         
         cupos_max = programa.get('cupos_maximos', '')
         cupos_ins = programa.get('cupos_inscritos', 0)
         cupos_text = f"{cupos_ins}/{cupos_max}" if cupos_max else f"{cupos_ins}/∞"
-        self._set_table_item(row, 7, cupos_text, align_center=True)
         
         # Fechas
         fecha_inicio = programa.get('fecha_inicio', '')
         fecha_fin = programa.get('fecha_fin', '')
-        self._set_table_item(row, 8, str(fecha_inicio) if fecha_inicio else '', align_center=True)
-        self._set_table_item(row, 9, str(fecha_fin) if fecha_fin else '', align_center=True)
+        
+        return [
+            str(programa.get('id', '')),
+            programa.get('codigo', '') or '',
+            programa.get('nombre', '') or '',
+            str(duracion) if duracion is not None else '',
+            str(horas) if horas is not None else '',
+            programa.get('estado', '') or '',
+            costo_text,
+            cupos_text,
+            str(fecha_inicio) if fecha_inicio else '',
+            str(fecha_fin) if fecha_fin else '',
+        ]
     
     def _obtener_filtros_programas(self) -> tuple:
         """Obtener filtros del formulario de programas."""
@@ -1757,52 +1738,99 @@ class InicioTab(BaseTab):
         """Alias para compatibilidad con código existente."""
         self._update_pagination_buttons()
     
+    def _obtener_pagina(self, vista: str, filtros: Optional[Dict],
+                        offset: int) -> List[Dict]:
+        """
+        Obtener una página desde la caché o la base de datos.
+
+        Actualiza el total de registros y programa la precarga de la página
+        siguiente en segundo plano.
+        """
+        clave = PageCache.crear_clave(vista, filtros, offset)
+        pagina = self.page_cache.get(clave)
+        
+        if pagina is None:
+            generacion = self.page_cache.generacion(vista)
+            pagina = self._consultar_pagina(vista, filtros, offset)
+            self.page_cache.put(clave, pagina, generacion)
+        else:
+            logger.debug(f"Página servida desde caché: {clave}")
+        
+        registros, total = pagina
+        self.total_records = total
+        self.total_pages = max(1, (total + self.PAGE_SIZE - 1) // self.PAGE_SIZE)
+        
+        # Precargar la página siguiente
+        siguiente = offset + self.PAGE_SIZE
+        if siguiente < total:
+            self.page_cache.prefetch(
+                PageCache.crear_clave(vista, filtros, siguiente),
+                lambda: self._consultar_pagina(vista, filtros, siguiente)
+            )
+        
+        return registros
+    
+    def _consultar_pagina(self, vista: str, filtros: Optional[Dict],
+                        offset: int) -> Pagina:
+        """Consultar una página y su total (sin tocar el estado de la UI)."""
+        filtros = filtros or {}
+        
+        if vista == "estudiantes":
+            registros = EstudianteModel.buscar_estudiantes_completo(
+                ci_numero=filtros.get('ci_numero'),
+                ci_expedicion=filtros.get('ci_expedicion'),
+                nombres=filtros.get('nombres'),
+                limit=self.PAGE_SIZE,
+                offset=offset
+            )
+            if any(filtros.values()):
+                total = self._count_estudiantes_filtrados(filtros)
+            else:
+                total = EstudianteModel.contar_estudiantes()
+        elif vista == "docentes":
+            registros = DocenteModel.obtener_todos_docentes(
+                limit=self.PAGE_SIZE,
+                offset=offset
+            )
+            total = DocenteModel.contar_docentes()
+        elif vista == "programas":
+            registros = ProgramaModel.buscar_programas(
+                limit=self.PAGE_SIZE,
+                offset=offset
+            )
+            total = ProgramaModel.contar_programas()
+        else:
+            raise ValueError(f"Vista desconocida: {vista}")
+        
+        return registros, total
+    
+    def precalentar_cache(self) -> None:
+        """
+        Cargar en la caché la primera página sin filtros de cada vista.
+
+        Se ejecuta en el planificador de tareas (fuera del hilo de la UI).
+        """
+        for vista in ("estudiantes", "docentes", "programas"):
+            clave = PageCache.crear_clave(vista, None, 0)
+            if self.page_cache.get(clave) is None:
+                generacion = self.page_cache.generacion(vista)
+                self.page_cache.put(clave, self._consultar_pagina(vista, None, 0), generacion)
+    
+    def invalidar_cache(self, vista: Optional[str] = None) -> None:
+        """Invalidar páginas en caché tras guardar, actualizar o eliminar."""
+        self.page_cache.invalidar(vista)
+    
     # =========================================================================
     # SECCIÓN 14: UTILIDADES Y MÉTODOS AUXILIARES
     # =========================================================================
     
     def _obtener_id_registro_seleccionado(self) -> Optional[int]:
         """Obtener ID del registro seleccionado en la tabla."""
-        current_row = self.table.currentRow()
+        current_row = self.table.currentIndex().row()
         if current_row < 0:
             return None
         
-        id_item = self.table.item(current_row, 0)
-        if not id_item:
-            return None
-        
-        try:
-            return int(id_item.text())
-        except (ValueError, TypeError):
-            logger.error(f"ID inválido: {id_item.text()}")
-            return None
-    
-    def _set_table_item(self, row: int, col: int, text: str,
-        align_center: bool = False, align_right: bool = False) -> None:
-        """Configurar item en tabla con alineación opcional."""
-        item = QTableWidgetItem(text)
-        if align_center:
-            item.setTextAlignment(Qt.AlignmentFlag.AlignCenter)
-        elif align_right:
-            item.setTextAlignment(Qt.AlignmentFlag.AlignRight | Qt.AlignmentFlag.AlignVCenter)
-        self.table.setItem(row, col, item)
-    
-    def _create_status_item(self, estado: str) -> QTableWidgetItem:
-        """Crear item de estado con color según estado."""
-        item = QTableWidgetItem(estado)
-        item.setTextAlignment(Qt.AlignmentFlag.AlignCenter)
-        
-        estado_upper = estado.upper()
-        if "ACTIVO" in estado_upper or "EN_CURSO" in estado_upper:
-            item.setForeground(Qt.GlobalColor.green)
-        elif "INACTIVO" in estado_upper or "CANCELADO" in estado_upper:
-            item.setForeground(Qt.GlobalColor.red)
-        elif "PLANIFICADO" in estado_upper:
-            item.setForeground(Qt.GlobalColor.blue)
-        elif "FINALIZADO" in estado_upper:
-            item.setForeground(Qt.GlobalColor.darkGray)
-        
-        return item
+        return self.table_model.id_en_fila(current_row)
     
     def _abrir_estudiante_overlay(self, estudiante_id: int, modo: str):
         """Abrir overlay de estudiante."""
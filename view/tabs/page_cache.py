@@ -0,0 +1,116 @@
+# Archivo: view/tabs/page_cache.py
+# -*- coding: utf-8 -*-
+"""
+Descripción: Caché LRU de páginas para la navegación paginada de entidades.
+
+Cada página se guarda con la clave (vista, filtros, offset) junto al total de
+registros. Incluye precarga en segundo plano de la página siguiente y
+invalidación por vista cuando se guarda, actualiza o elimina un registro.
+Autor: Sistema FormaGestPro
+Versión: 1.0.0
+"""
+
+import logging
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+# Configurar logging
+logger = logging.getLogger(__name__)
+
+# (registros, total_registros)
+Pagina = Tuple[List[Dict[str, Any]], int]
+ClavePagina = Tuple[str, Tuple, int]
+# (generación global, generación de la vista)
+Generacion = Tuple[int, int]
+
+
+class PageCache:
+    """Caché LRU de páginas, segura para hilos, con precarga en segundo plano."""
+
+    def __init__(self, max_pages: int = 30):
+        self.max_pages = max_pages
+        self._paginas: "OrderedDict[ClavePagina, Pagina]" = OrderedDict()
+        self._generacion_global = 0
+        self._generaciones: Dict[str, int] = {}
+        self._en_curso: set = set()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def crear_clave(vista: str, filtros: Optional[Dict[str, Any]], offset: int) -> ClavePagina:
+        """Construir una clave hashable a partir de la vista, filtros y offset."""
+        filtros_norm = tuple(sorted(
+            (k, v) for k, v in (filtros or {}).items() if v is not None
+        ))
+        return (vista, filtros_norm, offset)
+
+    def get(self, clave: ClavePagina) -> Optional[Pagina]:
+        """Obtener una página marcándola como usada recientemente."""
+        with self._lock:
+            pagina = self._paginas.get(clave)
+            if pagina is not None:
+                self._paginas.move_to_end(clave)
+            return pagina
+
+    def put(self, clave: ClavePagina, pagina: Pagina,
+            generacion: Optional[Generacion] = None) -> None:
+        """
+        Guardar una página expulsando la menos usada si se supera el límite.
+
+        Si se indica ``generacion`` y la vista fue invalidada mientras la
+        página se consultaba, la página se descarta por estar desactualizada.
+        """
+        vista = clave[0]
+        with self._lock:
+            if generacion is not None and generacion != self._generacion_actual(vista):
+                logger.debug(f"Página descartada por invalidación: {clave}")
+                return
+
+            self._paginas[clave] = pagina
+            self._paginas.move_to_end(clave)
+            while len(self._paginas) > self.max_pages:
+                self._paginas.popitem(last=False)
+
+    def _generacion_actual(self, vista: str) -> Generacion:
+        # Llamar con self._lock tomado
+        return (self._generacion_global, self._generaciones.get(vista, 0))
+
+    def generacion(self, vista: str) -> Generacion:
+        """Generación actual de una vista (cambia en cada invalidación)."""
+        with self._lock:
+            return self._generacion_actual(vista)
+
+    def invalidar(self, vista: Optional[str] = None) -> None:
+        """Eliminar las páginas de una vista (o de todas si no se indica)."""
+        with self._lock:
+            if vista is None:
+                # La generación global cubre también vistas aún no vistas
+                self._generacion_global += 1
+                self._paginas.clear()
+            else:
+                self._generaciones[vista] = self._generaciones.get(vista, 0) + 1
+                for clave in [c for c in self._paginas if c[0] == vista]:
+                    del self._paginas[clave]
+
+        logger.debug(f"Caché de páginas invalidada: {vista or 'todas'}")
+
+    def prefetch(self, clave: ClavePagina, consulta: Callable[[], Pagina]) -> None:
+        """Consultar una página en un hilo de fondo si aún no está en caché."""
+        with self._lock:
+            if clave in self._paginas or clave in self._en_curso:
+                return
+            self._en_curso.add(clave)
+            generacion = self._generacion_actual(clave[0])
+
+        def tarea():
+            try:
+                self.put(clave, consulta(), generacion)
+                logger.debug(f"Página precargada: {clave}")
+            except Exception as e:
+                logger.warning(f"⚠️ Error precargando página {clave}: {e}")
+            finally:
+                with self._lock:
+                    self._en_curso.discard(clave)
+
+        hilo = threading.Thread(target=tarea, name="PagePrefetch", daemon=True)
+        hilo.start()
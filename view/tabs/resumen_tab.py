@@ -19,12 +19,13 @@ from PySide6.QtWidgets import (
     QSizePolicy, QScrollArea, QProgressBar,
     QTableWidget, QTableWidgetItem, QHeaderView,
     QAbstractItemView, QSplitter, QMessageBox, QComboBox,
-    QToolTip, QFileDialog, QDialog, QTextEdit
+    QToolTip, QFileDialog, QDialog, QTextEdit,
+    QInputDialog, QProgressDialog
 )
 from PySide6.QtCore import (
     Qt, QTimer, QDate, QDateTime,
     Signal, Slot, QPropertyAnimation,
-    QEasingCurve, QParallelAnimationGroup, QPoint
+    QEasingCurve, QParallelAnimationGroup, QPoint, QThread
 )
 from PySide6.QtGui import (
     QPainter, QLinearGradient,
@@ -37,6 +38,7 @@ from model.docente_model import DocenteModel
 from model.programa_model import ProgramaModel
 from model.inscripcion_model import InscripcionModel
 from model.resumen_model import ResumenModel  # NUEVO: Usar el modelo de resumen
+from service.exportacion_libro_service import ExportacionLibroService
 
 from config.constants import EstadoPrograma
 
@@ -208,6 +210,34 @@ class StatCard(AnimatedCard):
             self.clicked.emit(self.stat_id)
         super().mousePressEvent(event)
 
+class ExportacionLibroThread(QThread):
+    """Hilo para exportar el libro de transacciones sin bloquear la interfaz"""
+    
+    progreso = Signal(int, int)       # filas escritas, total
+    finalizado = Signal(dict)         # resultado de ExportacionLibroService.exportar
+    
+    def __init__(self, fecha_inicio, fecha_fin, formato: str, parent=None):
+        super().__init__(parent)
+        self.fecha_inicio = fecha_inicio
+        self.fecha_fin = fecha_fin
+        self.formato = formato
+        self._cancelado = False
+    
+    def cancelar(self):
+        """Solicitar la cancelación (se atiende entre lotes)"""
+        self._cancelado = True
+    
+    def run(self):
+        """Ejecutar la exportación en segundo plano"""
+        resultado = ExportacionLibroService.exportar(
+            self.fecha_inicio,
+            self.fecha_fin,
+            self.formato,
+            progreso=self.progreso.emit,
+            cancelado=lambda: self._cancelado
+        )
+        self.finalizado.emit(resultado)
+
 # ============================================================================
 # CLASE PRINCIPAL: RESUMENTAB (VERSIÓN CORREGIDA)
 # ============================================================================
@@ -233,6 +263,8 @@ class ResumenTab(BaseTab):
         self.resumen_data = {}
         self.stat_cards = []
         self.is_initialized = False
+        self.exportacion_thread = None
+        self.exportacion_progreso = None
         
         # Inicializar modelos (CAMBIO IMPORTANTE: usar modelos en lugar de controladores)
         self.estudiante_model = EstudianteModel()
@@ -1268,6 +1300,23 @@ class ResumenTab(BaseTab):
         """)
         btn_export.clicked.connect(self.generate_report)
         
+        btn_libro = QPushButton("📒 Exportar Libro")
+        btn_libro.setStyleSheet("""
+            QPushButton {
+                background-color: #8e44ad;
+                color: white;
+                padding: 8px 16px;
+                border-radius: 6px;
+                font-weight: bold;
+                border: none;
+                margin-right: 10px;
+            }
+            QPushButton:hover {
+                background-color: #7d3c98;
+            }
+        """)
+        btn_libro.clicked.connect(self.exportar_libro_transacciones)
+        
         btn_settings = QPushButton("⚙️ Configuración")
         btn_settings.setStyleSheet("""
             QPushButton {
@@ -1286,6 +1335,7 @@ class ResumenTab(BaseTab):
         
         toolbar_layout.addWidget(btn_refresh)
         toolbar_layout.addWidget(btn_export)
+        toolbar_layout.addWidget(btn_libro)
         toolbar_layout.addWidget(btn_settings)
         
         parent_layout.addWidget(toolbar_frame)
@@ -1546,6 +1596,65 @@ class ResumenTab(BaseTab):
             logger.error(f"Error generando reporte: {e}")
             QMessageBox.critical(self, "Error", f"No se pudo generar el reporte:\n{str(e)}")
     
+    def exportar_libro_transacciones(self):
+        """Exportar el libro anual de transacciones en un hilo de fondo"""
+        if self.exportacion_thread and self.exportacion_thread.isRunning():
+            QMessageBox.information(self, "📒 Exportar Libro", "Ya hay una exportación en curso.")
+            return
+        
+        anio_actual = datetime.now().year
+        anio, ok = QInputDialog.getInt(
+            self, "📒 Exportar Libro", "Gestión (año):", anio_actual, 2000, anio_actual
+        )
+        if not ok:
+            return
+        
+        formato, ok = QInputDialog.getItem(
+            self, "📒 Exportar Libro", "Formato:", ["CSV", "XLSX", "Parquet"], 0, False
+        )
+        if not ok:
+            return
+        
+        self.exportacion_progreso = QProgressDialog(
+            f"Exportando libro de transacciones {anio}...", "Cancelar", 0, 0, self
+        )
+        self.exportacion_progreso.setWindowTitle("📒 Exportar Libro")
+        self.exportacion_progreso.setWindowModality(Qt.WindowModality.WindowModal)
+        self.exportacion_progreso.setMinimumDuration(0)
+        
+        self.exportacion_thread = ExportacionLibroThread(
+            datetime(anio, 1, 1).date(), datetime(anio, 12, 31).date(), formato.lower(), self
+        )
+        self.exportacion_thread.progreso.connect(self._on_exportacion_progreso)
+        self.exportacion_thread.finalizado.connect(self._on_exportacion_finalizada)
+        self.exportacion_progreso.canceled.connect(self.exportacion_thread.cancelar)
+        self.exportacion_thread.start()
+    
+    def _on_exportacion_progreso(self, escritas: int, total: int):
+        """Actualizar el diálogo de avance de la exportación"""
+        if self.exportacion_progreso:
+            self.exportacion_progreso.setMaximum(max(total, 1))
+            self.exportacion_progreso.setValue(escritas)
+            self.exportacion_progreso.setLabelText(f"Exportando libro de transacciones: {escritas:,} de {total:,} filas")
+    
+    def _on_exportacion_finalizada(self, resultado: dict):
+        """Informar el resultado de la exportación"""
+        if self.exportacion_progreso:
+            self.exportacion_progreso.close()
+            self.exportacion_progreso = None
+        
+        if resultado.get('success'):
+            QMessageBox.information(
+                self,
+                "📒 Libro Exportado",
+                f"Se exportaron {resultado['filas']:,} filas en {resultado['segundos']} s.\n\n"
+                f"Archivo:\n{resultado['ruta']}"
+            )
+        elif not resultado.get('cancelado'):
+            QMessageBox.critical(
+                self, "Error", f"No se pudo exportar el libro:\n{resultado.get('error', 'Error desconocido')}"
+            )
+    
     def open_settings(self):
         """Abrir configuración del Resumen"""
         QMessageBox.information(
@@ -1584,6 +1693,11 @@ class ResumenTab(BaseTab):
         if hasattr(self, 'animation_timer'):
             self.animation_timer.stop()
         
+        # Detener una exportación en curso
+        if self.exportacion_thread and self.exportacion_thread.isRunning():
+            self.exportacion_thread.cancelar()
+            self.exportacion_thread.wait(5000)
+        
         logger.info("ResumenTab cerrado")
         super().closeEvent(event)
 